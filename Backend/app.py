@@ -5,10 +5,12 @@ This module initializes the Quart application and sets up the API routes.
 """
 import os
 import sys
-from quart import Quart, jsonify, request, make_response, current_app
+from quart import Quart, jsonify, request, make_response, current_app, g
 from quart_cors import cors
 from dotenv import load_dotenv
 import asyncio
+import hmac
+import uuid
 import logging # Added for explicit logger configuration
 
 # Add the project root to the Python path
@@ -96,6 +98,13 @@ def create_app(test_config=None):
     from routes import clean_seat_service
     app.register_blueprint(clean_seat_service.bp)
 
+    # Open the per-worker pooled HTTP session before anything calls Verteil
+    @app.before_serving
+    async def initialize_http_pool():
+        """Create the shared aiohttp session used for all Verteil API calls."""
+        from services.http_client import http_client
+        await http_client.initialize()
+
     # Initialize centralized authentication
     @app.before_serving
     async def initialize_auth():
@@ -119,10 +128,115 @@ def create_app(test_config=None):
         token_manager.set_config(auth_config)
         app.logger.info("Centralized TokenManager initialized with app configuration")
 
+        # Fetch the token now and keep renewing it in the background so
+        # requests never wait on the token endpoint
+        from services.http_client import http_client
+        await token_manager.start_background_refresh(session=http_client.get_session())
+
         # Log all registered routes
         for rule in app.url_map.iter_rules():
             app.logger.info(f"Route: {rule.endpoint} -> {rule.rule}")
-    
+
+    # Open the per-worker async Redis pool on the worker's event loop
+    @app.before_serving
+    async def initialize_redis_storage():
+        """Create the async Redis connection pool used by route handlers."""
+        from services.async_redis_flight_storage import async_redis_flight_storage
+
+        if await async_redis_flight_storage.initialize():
+            app.logger.info("Async Redis flight storage pool initialized")
+        else:
+            app.logger.warning("Async Redis flight storage unavailable - running without Redis cache")
+
+    # Start (and warm up) the pool that runs CPU-heavy NDC transforms
+    @app.before_serving
+    async def initialize_transform_executor():
+        """Start the transform executor used for large NDC responses."""
+        from services.transform_executor import transform_executor
+        await transform_executor.initialize()
+
+    # Write this worker's metrics where /metrics on any worker can merge them
+    @app.before_serving
+    async def start_metrics_snapshots():
+        """Start the periodic metrics snapshot task (multiprocess mode only)."""
+        from services.metrics import metrics_registry
+        await metrics_registry.start()
+
+    @app.after_serving
+    async def stop_metrics_snapshots():
+        """Stop the metrics snapshot task."""
+        from services.metrics import metrics_registry
+        await metrics_registry.stop()
+
+    # Measure event loop lag and capture what blocks the loop
+    @app.before_serving
+    async def start_loop_watchdog():
+        """Start the event loop watchdog on this worker."""
+        from services.loop_watchdog import loop_watchdog
+        await loop_watchdog.start()
+
+    @app.after_serving
+    async def stop_loop_watchdog():
+        """Stop the event loop watchdog."""
+        from services.loop_watchdog import loop_watchdog
+        await loop_watchdog.stop()
+
+    # Give every request an ID (X-Request-ID if the caller sent one) so loop
+    # stalls and logs can be attributed to it
+    @app.before_request
+    async def track_request():
+        """Assign the request ID and register the request with the loop watchdog."""
+        from services.loop_watchdog import loop_watchdog
+        from services.flight.deadline import DeadlineConfig, start_request_deadline
+        g.request_id = request.headers.get('X-Request-ID') or str(uuid.uuid4())
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        loop_watchdog.track_request(route, request.method, request.path, g.request_id)
+        # Verteil calls made for this request stop retrying once the caller would have given up
+        g.deadline_token = start_request_deadline(route, request.headers.get(DeadlineConfig.HEADER))
+
+    @app.after_request
+    async def add_request_id_header(response):
+        """Return the request ID to the caller."""
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    @app.teardown_request
+    async def untrack_request(exc):
+        """Unregister the request from the loop watchdog and clear its deadline."""
+        from services.flight.deadline import end_request_deadline
+        from services.loop_watchdog import loop_watchdog
+        loop_watchdog.untrack_request()
+        try:
+            end_request_deadline(g.pop('deadline_token', None))
+        except ValueError:
+            # Teardown ran in a different context than before_request
+            pass
+
+    @app.after_serving
+    async def close_transform_executor():
+        """Shut down the transform executor pool."""
+        from services.transform_executor import transform_executor
+        await transform_executor.close()
+
+    @app.after_serving
+    async def close_redis_storage():
+        """Close the async Redis connection pool."""
+        from services.async_redis_flight_storage import async_redis_flight_storage
+        await async_redis_flight_storage.close()
+
+    @app.after_serving
+    async def stop_token_refresh():
+        """Stop the background token refresh task."""
+        from utils.auth import TokenManager
+        await TokenManager.get_instance().stop_background_refresh()
+
+    @app.after_serving
+    async def close_http_pool():
+        """Close the shared aiohttp session and its pooled connections."""
+        from services.http_client import http_client
+        await http_client.close()
+
     # Add error handler for 404
     @app.errorhandler(404)
     async def not_found(error):
@@ -132,6 +246,27 @@ def create_app(test_config=None):
             'error': str(error)
         }), 404
         
+    # Verteil calls abandoned because the request deadline was reached
+    from services.flight.exceptions import CircuitOpenError, DeadlineExceeded
+
+    @app.errorhandler(DeadlineExceeded)
+    async def deadline_exceeded(error):
+        return jsonify({
+            'status': 'error',
+            'message': str(error),
+            'request_id': g.get('request_id')
+        }), 504
+
+    # Verteil calls rejected by an open circuit breaker
+    @app.errorhandler(CircuitOpenError)
+    async def circuit_open(error):
+        headers = {'Retry-After': str(max(int(error.retry_after or 0), 1))}
+        return jsonify({
+            'status': 'error',
+            'message': str(error),
+            'request_id': g.get('request_id')
+        }), 503, headers
+
     # Add error handler for 500
     @app.errorhandler(500)
     async def server_error(error):
@@ -146,8 +281,40 @@ def create_app(test_config=None):
     # Health check endpoint
     @app.route('/api/health')
     async def health_check():
-        """Health check endpoint."""
-        return jsonify({"status": "healthy"}), 200
+        """Health check endpoint; reports Verteil circuit breaker states of this worker."""
+        from services.flight.circuit_breaker import OPEN, circuit_breaker
+
+        circuits = circuit_breaker.get_stats()
+        # The worker itself is fine; "degraded" tells monitoring a Verteil service is failing
+        status = "degraded" if any(values['state'] == OPEN for values in circuits.values()) else "healthy"
+        return jsonify({"status": status, "circuits": circuits}), 200
+
+    # Prometheus scrape endpoint
+    @app.route('/metrics')
+    async def metrics():
+        """Export Verteil, cache, token and transform metrics in the Prometheus text format."""
+        from services.metrics import MetricsConfig, metrics_registry
+
+        if not MetricsConfig.ENABLED:
+            return jsonify({'status': 'error', 'message': 'Metrics are disabled.'}), 404
+
+        # Merging worker snapshots reads files; keep it off the event loop
+        body = await asyncio.to_thread(metrics_registry.render)
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    # Event loop stalls seen by this worker
+    @app.route('/debug/event-loop')
+    async def event_loop_report():
+        """Return this worker's event loop lag statistics and the most recent stalls with their stacks."""
+        from services.loop_watchdog import LoopWatchdogConfig, loop_watchdog
+
+        if not LoopWatchdogConfig.DEBUG_ENDPOINT or not LoopWatchdogConfig.DEBUG_TOKEN:
+            return jsonify({'status': 'error', 'message': 'The event loop debug endpoint is disabled.'}), 404
+        if not hmac.compare_digest(request.headers.get('X-Debug-Token', ''), LoopWatchdogConfig.DEBUG_TOKEN):
+            return jsonify({'status': 'error', 'message': 'Invalid or missing X-Debug-Token header.'}), 403
+
+        limit = request.args.get('limit', type=int)
+        return jsonify({'status': 'success', 'data': loop_watchdog.get_report(limit=limit)}), 200
         
 
     
@@ -26,8 +26,13 @@ class RedisConfig:
     HEALTH_CHECK_INTERVAL = 30
     MAX_CONNECTIONS = 50
 
-def get_redis_connection():
-    """Create and return a Redis connection with enhanced error handling"""
+def get_redis_connection(decode_responses: bool = True):
+    """Create and return a Redis connection with enhanced error handling
+
+    Args:
+        decode_responses: Decode replies to str. Pass False for clients that
+            store raw (compressed) bytes.
+    """
     try:
         redis_url = RedisConfig.REDIS_URL
         
@@ -42,7 +47,7 @@ def get_redis_connection():
                 retry_on_timeout=RedisConfig.RETRY_ON_TIMEOUT,
                 health_check_interval=RedisConfig.HEALTH_CHECK_INTERVAL,
                 max_connections=RedisConfig.MAX_CONNECTIONS,
-                decode_responses=True
+                decode_responses=decode_responses
             )
         else:
             # Use individual connection parameters (fallback)
@@ -58,7 +63,7 @@ def get_redis_connection():
                 retry_on_timeout=RedisConfig.RETRY_ON_TIMEOUT,
                 health_check_interval=RedisConfig.HEALTH_CHECK_INTERVAL,
                 max_connections=RedisConfig.MAX_CONNECTIONS,
-                decode_responses=True
+                decode_responses=decode_responses
             )
         
         # Test the connection
@@ -70,6 +75,45 @@ def get_redis_connection():
         logger.error(f"Failed to connect to Redis: {str(e)}")
         raise
 
+def get_async_redis_connection(decode_responses: bool = True):
+    """Create an asyncio Redis client backed by its own connection pool.
+
+    The pool is bound to the event loop it is first used on, so each worker
+    should create its client from inside its running loop (e.g. before_serving).
+    Unlike get_redis_connection, the connection is not tested here; callers
+    should await ``ping()`` themselves.
+
+    Args:
+        decode_responses: Decode replies to str. Pass False for clients that
+            store raw (compressed) bytes.
+    """
+    import redis.asyncio as aioredis
+
+    redis_url = RedisConfig.REDIS_URL
+    pool_kwargs = dict(
+        socket_timeout=RedisConfig.SOCKET_TIMEOUT,
+        socket_connect_timeout=RedisConfig.SOCKET_CONNECT_TIMEOUT,
+        retry_on_timeout=RedisConfig.RETRY_ON_TIMEOUT,
+        health_check_interval=RedisConfig.HEALTH_CHECK_INTERVAL,
+        max_connections=RedisConfig.MAX_CONNECTIONS,
+        decode_responses=decode_responses
+    )
+
+    if redis_url and redis_url != 'redis://localhost:6379/0':
+        logger.info(f"Creating async Redis pool using URL: {_mask_password(redis_url)}")
+        pool = aioredis.ConnectionPool.from_url(redis_url, **pool_kwargs)
+    else:
+        logger.info(f"Creating async Redis pool using individual parameters: {RedisConfig.HOST}:{RedisConfig.PORT}")
+        pool = aioredis.ConnectionPool(
+            host=RedisConfig.HOST,
+            port=RedisConfig.PORT,
+            db=RedisConfig.DB,
+            password=RedisConfig.PASSWORD,
+            **pool_kwargs
+        )
+
+    return aioredis.Redis(connection_pool=pool)
+
 def _mask_password(redis_url: str) -> str:
     """Mask the password in Redis URL for logging"""
     try:
@@ -5,15 +5,16 @@ import json
 import logging
 import uuid
 import hashlib
-from quart import Blueprint, request, jsonify, current_app
+from quart import Blueprint, request, jsonify, current_app, g, has_request_context
 from quart_cors import route_cors
 from utils.auth import TokenManager
 from scripts.build_seatavailability_rq import build_seatavailability_request
 from scripts.build_servicelist_rq import build_servicelist_request
-from services.redis_flight_storage import RedisFlightStorage
+from services.async_redis_flight_storage import async_redis_flight_storage
 from services.flight.core import FlightService
+from services.flight.exceptions import CircuitOpenError, DeadlineExceeded
 from utils.service_list_transformer import transform_service_list_lean_frontend
-from utils.seat_availability_transformer import transform_seat_availability_lean_frontend
+from services.transform_executor import transform_executor
 import aiohttp
 
 logger = logging.getLogger(__name__)
@@ -44,7 +45,9 @@ ALLOWED_ORIGINS = [
 ]
 
 def _get_request_id() -> str:
-    """Generate a unique request ID."""
+    """Return the ID assigned to the current request (a new one outside a request)."""
+    if has_request_context() and 'request_id' in g:
+        return g.request_id
     return str(uuid.uuid4())
 
 def _create_error_response(message: str, status_code: int = 400, request_id: str = None) -> dict:
@@ -154,8 +157,7 @@ async def check_seat_availability_cache():
         # Prefer cache key approach for retrieving raw response
         if flight_price_cache_key:
             try:
-                redis_storage = RedisFlightStorage()
-                cached_result = redis_storage.get_flight_price(flight_price_cache_key)
+                cached_result = await async_redis_flight_storage.get_flight_price(flight_price_cache_key)
                 if cached_result['success']:
                     flight_price_response = cached_result['data']
                     logger.info(f"Retrieved flight price response from cache key for cache check: {flight_price_cache_key}")
@@ -175,8 +177,7 @@ async def check_seat_availability_cache():
         cache_key = _generate_seat_availability_cache_key(flight_price_response, segment_key)
         
         # Try to retrieve cached data from Redis
-        redis_storage = RedisFlightStorage()
-        cached_result = redis_storage.get_seat_availability(cache_key)
+        cached_result = await async_redis_flight_storage.get_seat_availability(cache_key)
         
         if cached_result['success']:
             logger.info(f"Seat availability cache hit for key: {cache_key} - Request ID: {request_id}")
@@ -232,8 +233,7 @@ async def check_service_list_cache():
         # Prefer cache key approach for retrieving raw response
         if flight_price_cache_key:
             try:
-                redis_storage = RedisFlightStorage()
-                cached_result = redis_storage.get_flight_price(flight_price_cache_key)
+                cached_result = await async_redis_flight_storage.get_flight_price(flight_price_cache_key)
                 if cached_result['success']:
                     flight_price_response = cached_result['data']
                     logger.info(f"Retrieved flight price response from cache key for cache check: {flight_price_cache_key}")
@@ -253,8 +253,7 @@ async def check_service_list_cache():
         cache_key = _generate_service_list_cache_key(flight_price_response)
         
         # Try to retrieve cached data from Redis
-        redis_storage = RedisFlightStorage()
-        cached_result = redis_storage.get_service_list(cache_key)
+        cached_result = await async_redis_flight_storage.get_service_list(cache_key)
         
         if cached_result['success']:
             logger.info(f"Service list cache hit for key: {cache_key} - Request ID: {request_id}")
@@ -310,12 +309,12 @@ async def get_seat_availability():
         flight_price_cache_key = data.get('flight_price_cache_key')
         flight_price_response = data.get('flight_price_response')
 
-        # Use cache_manager to get RAW flight price response (not Redis storage which has transformed data)
+        # Use the shared raw response store to get RAW flight price response (not Redis storage which has transformed data)
         if flight_price_cache_key:
             try:
-                from utils.cache_manager import cache_manager
+                from services.raw_response_store import raw_response_store
                 logger.info(f"Attempting to retrieve RAW flight price response from cache with key: {flight_price_cache_key}")
-                flight_price_response = cache_manager.get(flight_price_cache_key)
+                flight_price_response = await raw_response_store.get(flight_price_cache_key)
                 if flight_price_response:
                     logger.info(f"✅ Successfully retrieved RAW flight price response from cache key: {flight_price_cache_key}")
                     logger.info(f"Retrieved response type: {type(flight_price_response)}, keys: {list(flight_price_response.keys()) if isinstance(flight_price_response, dict) else 'Not a dict'}")
@@ -325,15 +324,7 @@ async def get_seat_availability():
                         logger.info("Unwrapped FlightPriceRS structure for build script")
                 else:
                     logger.warning(f"❌ RAW flight price response not found in cache: {flight_price_cache_key}")
-                    # Check what keys exist in cache_manager (for debugging)
-                    try:
-                        cache_keys = list(cache_manager._cache.keys())
-                        logger.info(f"Available cache keys: {cache_keys}")
-                        # Look for similar keys
-                        similar_keys = [k for k in cache_keys if 'flight_price_raw' in k]
-                        logger.info(f"Similar flight_price_raw keys found: {similar_keys}")
-                    except Exception:
-                        logger.info("Could not inspect cache keys")
+                    logger.info(f"Raw response store stats: {raw_response_store.get_stats()}")
                     return jsonify(_create_error_response("Flight price data expired. Please request new pricing.", 404, request_id))
             except Exception as cache_error:
                 logger.error(f"Error retrieving RAW flight price response from cache: {cache_error}")
@@ -413,7 +404,8 @@ async def get_seat_availability():
         # Transform the raw API response for frontend consumption
         print(f"Transforming SeatAvailability response for frontend...")
         try:
-            transformed_result = transform_seat_availability_lean_frontend(result)
+            # Runs off the event loop; large seat maps take a while to transform
+            transformed_result = await transform_executor.run('seat_availability', result)
             
             if transformed_result['status'] == 'success':
                 logger.info(f"Successfully transformed SeatAvailability response - Request ID: {request_id}")
@@ -446,8 +438,7 @@ async def get_seat_availability():
         # Cache the transformed result
         try:
             cache_key = _generate_seat_availability_cache_key(flight_price_response, data.get('segment_key'))
-            redis_storage = RedisFlightStorage()
-            cache_result = redis_storage.store_seat_availability(
+            cache_result = await async_redis_flight_storage.store_seat_availability(
                 seat_data=final_data,  # Cache the transformed data
                 session_id=cache_key,
                 ttl=300  # 5 minutes
@@ -467,6 +458,10 @@ async def get_seat_availability():
             'message': 'SeatAvailability successfully transformed for frontend'
         })
                 
+    except (DeadlineExceeded, CircuitOpenError) as e:
+        # Answered by the app's 504 / 503 (Retry-After) handlers
+        logger.warning(f"CLEAN SeatAvailability request abandoned: {str(e)} - Request ID: {request_id}")
+        raise
     except Exception as e:
         print(f"ERROR in clean seat endpoint: {str(e)}")
         logger.error(f"CLEAN SeatAvailability request failed: {str(e)} - Request ID: {request_id}", exc_info=True)
@@ -503,12 +498,12 @@ async def get_service_list():
         flight_price_cache_key = data.get('flight_price_cache_key')
         flight_price_response = data.get('flight_price_response')
 
-        # Use cache_manager to get RAW flight price response (not Redis storage which has transformed data)
+        # Use the shared raw response store to get RAW flight price response (not Redis storage which has transformed data)
         if flight_price_cache_key:
             try:
-                from utils.cache_manager import cache_manager
+                from services.raw_response_store import raw_response_store
                 logger.info(f"Attempting to retrieve RAW flight price response from cache with key: {flight_price_cache_key}")
-                flight_price_response = cache_manager.get(flight_price_cache_key)
+                flight_price_response = await raw_response_store.get(flight_price_cache_key)
                 if flight_price_response:
                     logger.info(f"✅ Successfully retrieved RAW flight price response from cache key: {flight_price_cache_key}")
                     logger.info(f"Retrieved response type: {type(flight_price_response)}, keys: {list(flight_price_response.keys()) if isinstance(flight_price_response, dict) else 'Not a dict'}")
@@ -518,15 +513,7 @@ async def get_service_list():
                         logger.info("Unwrapped FlightPriceRS structure for build script")
                 else:
                     logger.warning(f"❌ RAW flight price response not found in cache: {flight_price_cache_key}")
-                    # Check what keys exist in cache_manager (for debugging)
-                    try:
-                        cache_keys = list(cache_manager._cache.keys())
-                        logger.info(f"Available cache keys: {cache_keys}")
-                        # Look for similar keys
-                        similar_keys = [k for k in cache_keys if 'flight_price_raw' in k]
-                        logger.info(f"Similar flight_price_raw keys found: {similar_keys}")
-                    except Exception:
-                        logger.info("Could not inspect cache keys")
+                    logger.info(f"Raw response store stats: {raw_response_store.get_stats()}")
                     return jsonify(_create_error_response("Flight price data expired. Please request new pricing.", 404, request_id))
             except Exception as cache_error:
                 logger.error(f"Error retrieving RAW flight price response from cache: {cache_error}")
@@ -633,8 +620,7 @@ async def get_service_list():
         # Cache the transformed result
         try:
             cache_key = _generate_service_list_cache_key(flight_price_response)
-            redis_storage = RedisFlightStorage()
-            cache_result = redis_storage.store_service_list(
+            cache_result = await async_redis_flight_storage.store_service_list(
                 service_data=final_data,  # Cache the transformed data
                 session_id=cache_key,
                 ttl=300  # 5 minutes
@@ -654,6 +640,10 @@ async def get_service_list():
             'message': 'ServiceList successfully transformed for frontend'
         })
                 
+    except (DeadlineExceeded, CircuitOpenError) as e:
+        # Answered by the app's 504 / 503 (Retry-After) handlers
+        logger.warning(f"CLEAN ServiceList request abandoned: {str(e)} - Request ID: {request_id}")
+        raise
     except Exception as e:
         print(f"ERROR in clean service endpoint: {str(e)}")
         logger.error(f"CLEAN ServiceList request failed: {str(e)} - Request ID: {request_id}", exc_info=True)
@@ -8,7 +8,7 @@ from quart import Blueprint, request, jsonify
 from quart_cors import cors
 import logging
 
-from services.redis_flight_storage import redis_flight_storage
+from services.async_redis_flight_storage import async_redis_flight_storage
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +41,7 @@ async def store_flight_search():
         session_id = data.get('session_id')
         ttl = data.get('ttl')
         
-        result = redis_flight_storage.store_flight_search(
+        result = await async_redis_flight_storage.store_flight_search(
             search_data=search_data,
             session_id=session_id,
             ttl=ttl
@@ -69,7 +69,7 @@ async def get_flight_search(session_id: str):
         session_id: Session ID to retrieve data for
     """
     try:
-        result = redis_flight_storage.get_flight_search(session_id)
+        result = await async_redis_flight_storage.get_flight_search(session_id)
         
         if result['success']:
             return jsonify(result), 200
@@ -109,7 +109,7 @@ async def store_flight_price():
         session_id = data['session_id']
         ttl = data.get('ttl')
         
-        result = redis_flight_storage.store_flight_price(
+        result = await async_redis_flight_storage.store_flight_price(
             price_data=price_data,
             session_id=session_id,
             ttl=ttl
@@ -137,7 +137,7 @@ async def get_flight_price(session_id: str):
         session_id: Session ID to retrieve data for
     """
     try:
-        result = redis_flight_storage.get_flight_price(session_id)
+        result = await async_redis_flight_storage.get_flight_price(session_id)
         
         if result['success']:
             return jsonify(result), 200
@@ -177,7 +177,7 @@ async def store_booking_data():
         session_id = data['session_id']
         ttl = data.get('ttl')
         
-        result = redis_flight_storage.store_booking_data(
+        result = await async_redis_flight_storage.store_booking_data(
             booking_data=booking_data,
             session_id=session_id,
             ttl=ttl
@@ -205,7 +205,7 @@ async def get_booking_data(session_id: str):
         session_id: Session ID to retrieve data for
     """
     try:
-        result = redis_flight_storage.get_booking_data(session_id)
+        result = await async_redis_flight_storage.get_booking_data(session_id)
         
         if result['success']:
             return jsonify(result), 200
@@ -229,7 +229,7 @@ async def delete_session_data(session_id: str):
         session_id: Session ID to delete data for
     """
     try:
-        result = redis_flight_storage.delete_session_data(session_id)
+        result = await async_redis_flight_storage.delete_session_data(session_id)
         
         if result['success']:
             return jsonify(result), 200
@@ -251,7 +251,8 @@ async def health_check():
     """
     try:
         # Test Redis connection
-        redis_flight_storage.redis_client.ping()
+        if not await async_redis_flight_storage.ping():
+            raise ConnectionError("Redis is not reachable")
         
         return jsonify({
             'success': True,
@@ -10,7 +10,7 @@ from quart_cors import route_cors
 from utils.auth import TokenManager
 from scripts.build_seatavailability_rq import build_seatavailability_request
 from scripts.build_servicelist_rq import build_servicelist_request
-import aiohttp
+from services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -89,7 +89,7 @@ async def get_seat_availability():
 
         # Get TokenManager token (same as other working endpoints)
         token_manager = TokenManager.get_instance()
-        bearer_token = token_manager.get_token()
+        bearer_token = await token_manager.get_token_async()
         
         # Build the request using the working script
         seatavailability_request = build_seatavailability_request(
@@ -113,18 +113,18 @@ async def get_seat_availability():
         # Make API call
         api_url = f"{config.get('VERTEIL_API_BASE_URL')}/entrygate/rest/request:preSeatAvailability"
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, headers=headers, json=seatavailability_request, timeout=30) as response:
-                result = await response.json()
-                
-                logger.info(f"SeatAvailability request completed successfully - Status: {response.status} - Request ID: {request_id}")
-                
-                return jsonify({
-                    'status': 'success',
-                    'data': result,
-                    'request_id': request_id
-                })
-                
+        session = http_client.get_session()
+        async with session.post(api_url, headers=headers, json=seatavailability_request, timeout=30) as response:
+            result = await response.json()
+            
+            logger.info(f"SeatAvailability request completed successfully - Status: {response.status} - Request ID: {request_id}")
+            
+            return jsonify({
+                'status': 'success',
+                'data': result,
+                'request_id': request_id
+            })
+            
     except Exception as e:
         logger.error(f"SeatAvailability request failed: {str(e)} - Request ID: {request_id}", exc_info=True)
         return jsonify(_create_error_response(f"SeatAvailability request failed: {str(e)}", 500, request_id))
@@ -171,7 +171,7 @@ async def get_service_list():
 
         # Get TokenManager token (same as other working endpoints)
         token_manager = TokenManager.get_instance()
-        bearer_token = token_manager.get_token()
+        bearer_token = await token_manager.get_token_async()
         
         # Build the request using the working script
         servicelist_request = build_servicelist_request(
@@ -195,18 +195,18 @@ async def get_service_list():
         # Make API call
         api_url = f"{config.get('VERTEIL_API_BASE_URL')}/entrygate/rest/request:preServiceList"
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, headers=headers, json=servicelist_request, timeout=30) as response:
-                result = await response.json()
-                
-                logger.info(f"ServiceList request completed successfully - Status: {response.status} - Request ID: {request_id}")
-                
-                return jsonify({
-                    'status': 'success',
-                    'data': result,
-                    'request_id': request_id
-                })
-                
+        session = http_client.get_session()
+        async with session.post(api_url, headers=headers, json=servicelist_request, timeout=30) as response:
+            result = await response.json()
+            
+            logger.info(f"ServiceList request completed successfully - Status: {response.status} - Request ID: {request_id}")
+            
+            return jsonify({
+                'status': 'success',
+                'data': result,
+                'request_id': request_id
+            })
+            
     except Exception as e:
         logger.error(f"ServiceList request failed: {str(e)} - Request ID: {request_id}", exc_info=True)
         return jsonify(_create_error_response(f"ServiceList request failed: {str(e)}", 500, request_id))
\ No newline at end of file
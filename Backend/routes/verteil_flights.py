@@ -10,11 +10,9 @@ import os
 from typing import Dict, Any, Optional
 from datetime import datetime
 
-from quart import Blueprint, request, jsonify, current_app, make_response
+from quart import Blueprint, request, jsonify, current_app, make_response, g, has_request_context
 from quart_cors import cors, route_cors
 from functools import wraps
-import time
-from collections import OrderedDict
 
 
 
@@ -22,38 +20,11 @@ from collections import OrderedDict
 from services.flight.air_shopping import process_air_shopping_enhanced, process_air_shopping_basic
 from services.flight.search import process_air_shopping  # Legacy compatibility
 
+# Identical concurrent requests share one upstream call (across workers via Redis)
+from services.request_coalescer import request_coalescer
 
-
-# Simple in-memory request deduplication cache
-class RequestDeduplicationCache:
-    def __init__(self, max_size=100, ttl=5):
-        self.cache = OrderedDict()
-        self.max_size = max_size
-        self.ttl = ttl  # seconds
-    
-    def _cleanup(self):
-        current_time = time.time()
-        # Remove expired entries
-        expired_keys = [k for k, (_, timestamp) in self.cache.items() 
-                      if current_time - timestamp > self.ttl]
-        for k in expired_keys:
-            self.cache.pop(k, None)
-        
-        # Trim to max size if needed
-        while len(self.cache) > self.max_size:
-            self.cache.popitem(last=False)
-    
-    def add_request(self, key):
-        self._cleanup()
-        current_time = time.time()
-        self.cache[key] = (current_time, current_time)
-    
-    def is_duplicate(self, key):
-        self._cleanup()
-        return key in self.cache
-
-# Initialize request deduplication cache
-request_cache = RequestDeduplicationCache(max_size=1000, ttl=2)  # 2 second TTL - reduced from 5 to improve UX
+# Server-side filter/sort/paging over cached flight cards
+from utils.offer_query import OFFER_KEYS_FIELD, apply_offer_query, build_offer_keys
 
 # Import from the new modular flight service
 from services.flight import (
@@ -64,9 +35,10 @@ from services.flight import (
     process_order_create,
     process_flight_price
 )
+from services.flight.exceptions import CircuitOpenError, DeadlineExceeded
 
-# Import Redis flight storage for enhanced caching
-from services.redis_flight_storage import redis_flight_storage
+# Import async Redis flight storage for enhanced caching
+from services.async_redis_flight_storage import async_redis_flight_storage
 import hashlib
 
 # Configure logging
@@ -96,7 +68,9 @@ def init_app(app):
 
 
 def _get_request_id() -> str:
-    """Generate a unique request ID."""
+    """Return the ID assigned to the current request (a new one outside a request)."""
+    if has_request_context() and 'request_id' in g:
+        return g.request_id
     return str(uuid.uuid4())
 
 def _generate_cache_key(search_params: Dict[str, Any], cache_type: str = "search") -> str:
@@ -335,7 +309,7 @@ async def check_flight_search_cache():
     Check if flight search data exists in cache and return it if valid.
     
     POST JSON Body:
-    - Same parameters as air-shopping endpoint
+    - Same parameters as air-shopping endpoint (including filter/sort options)
     
     Returns:
     - Cached flight data if available and valid
@@ -358,7 +332,7 @@ async def check_flight_search_cache():
         cache_key = _generate_cache_key(data)
         
         # Try to retrieve cached data from Redis
-        cached_result = redis_flight_storage.get_flight_search(cache_key)
+        cached_result = await async_redis_flight_storage.get_flight_search(cache_key)
         
         if cached_result['success']:
             logger.info(f"Cache hit for key: {cache_key} - Request ID: {request_id}")
@@ -367,7 +341,7 @@ async def check_flight_search_cache():
             return jsonify({
                 'status': 'success',
                 'source': 'cache',
-                'data': cached_result['data'],
+                'data': apply_offer_query(cached_result['data'], data),
                 'cached_at': cached_result['stored_at'],
                 'expires_at': cached_result['expires_at'],
                 'request_id': request_id,
@@ -393,6 +367,75 @@ async def check_flight_search_cache():
             'request_id': request_id
         })
 
+@bp.route('/air-shopping/offers', methods=['GET', 'POST', 'OPTIONS'])
+@route_cors(
+    allow_origin=ALLOWED_ORIGINS,
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Content-Type"],
+    allow_credentials=True,
+    max_age=600
+)
+async def query_cached_offers():
+    """
+    Filter, sort and page the offers of a cached flight search.
+    
+    Parameters (query string or JSON body):
+    - cache_key: The flight_search_cache_key returned with the search results
+    - Filter, sort and paging options as for the air-shopping endpoint
+    
+    Returns:
+    - The matching page of offers with metadata.query totals and facets
+    - Cache miss response if the search has expired
+    """
+    if request.method == 'OPTIONS':
+        return await make_response(), 200
+
+    request_id = _get_request_id()
+
+    try:
+        if request.method == 'GET':
+            data = request.args.to_dict()
+        else:
+            data = await request.get_json() or {}
+
+        cache_key = data.get('cache_key') or data.get('flight_search_cache_key')
+        if not cache_key or not str(cache_key).startswith('flight_search:'):
+            return jsonify(_create_error_response(
+                message="A valid cache_key is required",
+                status_code=400,
+                request_id=request_id
+            )), 400
+
+        cached_result = await async_redis_flight_storage.get_flight_search(cache_key)
+        if not cached_result['success']:
+            logger.info(f"Offer query cache miss for key: {cache_key} - Request ID: {request_id}")
+            return jsonify({
+                'status': 'cache_miss',
+                'message': 'Search results have expired; please search again',
+                'request_id': request_id,
+                'cache_key': cache_key
+            }), 404
+
+        return jsonify({
+            'status': 'success',
+            'source': 'cache',
+            'data': apply_offer_query(cached_result['data'], data),
+            'cached_at': cached_result['stored_at'],
+            'expires_at': cached_result['expires_at'],
+            'request_id': request_id,
+            'cache_key': cache_key
+        })
+
+    except Exception as e:
+        logger.error(f"Offer query error: {str(e)} - Request ID: {request_id}", exc_info=True)
+        return jsonify(_create_error_response(
+            message="An unexpected error occurred",
+            status_code=500,
+            request_id=request_id,
+            details={"error": str(e)}
+        )), 500
+
 @bp.route('/air-shopping', methods=['GET', 'POST', 'OPTIONS'])
 @route_cors(
     allow_origin=ALLOWED_ORIGINS,
@@ -424,6 +467,8 @@ async def air_shopping():
     - [maxStops]: Maximum number of stops (0, 1, 2+) (optional)
     - [departTimeMin]: Minimum departure time in HH:MM format (optional)
     - [departTimeMax]: Maximum departure time in HH:MM format (optional)
+    - [sortBy], [sortOrder]: Same as for POST (optional)
+    - [page], [pageSize]: Return one page of the matching offers (optional)
     - [enableRoundtrip]: Boolean to enable round trip transformation (default: false)
     
     POST JSON Body:
@@ -438,11 +483,17 @@ async def air_shopping():
     - [numInfants]: Number of infant passengers (0-8, default: 0)
     - [cabinPreference]: Cabin class preference (ECONOMY, PREMIUM_ECONOMY, BUSINESS, FIRST)
     - [directOnly]: Boolean to show only direct flights (default: false)
-    - [filters]: Advanced filtering options (optional)
+    - [filters]: Advanced filtering options (optional); same names as the GET
+      filter parameters (minPrice, maxPrice, airlines, maxStops, departTimeMin, departTimeMax)
     - [sortBy]: Sorting preference ('price', 'duration', 'departure', 'arrival', 'stops')
     - [sortOrder]: Sort order ('asc' or 'desc') (default: 'asc')
+    - [page], [pageSize]: Return one page of the matching offers (optional)
     - [enableRoundtrip]: Boolean to enable round trip transformation (default: false)
     
+    Filters, sorting and paging run on the backend against the cached flight
+    cards; a refinement of an earlier search costs one cache read. When any of
+    them is given, metadata.query reports the totals and filter facets.
+    
     Returns:
     - Flight search results with enhanced filtering and sorting
     """
@@ -454,23 +505,6 @@ async def air_shopping():
     request_id = _get_request_id()
     logger.info(f"Air shopping request received - Request ID: {request_id}")
     
-    # Create a fingerprint of the request to detect duplicates
-    request_data = await request.get_data()
-    request_fingerprint = f"{request.remote_addr}:{request.path}:{request_data.decode()}"
-    
-    # Check for duplicate request (skip for OPTIONS)
-    if request.method != 'OPTIONS' and request_cache.is_duplicate(request_fingerprint):
-        logger.warning(f"Duplicate request detected - Request ID: {request_id}")
-        return jsonify({
-            'status': 'error',
-            'message': 'Duplicate request detected. Please wait a moment and try again.',
-            'request_id': request_id
-        }), 429  # Too Many Requests
-    
-    # Add to cache (skip for OPTIONS)
-    if request.method != 'OPTIONS':
-        request_cache.add_request(request_fingerprint)
-    
     try:
         # Get request data based on method
         if request.method == 'GET':
@@ -621,13 +655,13 @@ async def air_shopping():
         # Check if we have cached data first (only for GET and POST without force_refresh)
         force_refresh = converted_data.get('force_refresh', False)
         if not force_refresh:
-            cached_result = redis_flight_storage.get_flight_search(cache_key)
+            cached_result = await async_redis_flight_storage.get_flight_search(cache_key)
             
             if cached_result['success']:
                 logger.info(f"🚀 Cache hit! Returning cached data for key: {cache_key} - Request ID: {request_id}")
                 
-                # Ensure the raw response cache key is updated with current request_id
-                cached_data = cached_result['data']
+                # Apply filters/sorting to the cached cards (drops the precomputed keys)
+                cached_data = apply_offer_query(cached_result['data'], data)
                 if cached_data and cached_data.get('metadata'):
                     # Check if we have a stored raw_response_cache_key
                     original_raw_key = cached_data['metadata'].get('raw_response_cache_key')
@@ -638,9 +672,8 @@ async def air_shopping():
                             original_request_id = original_raw_key.replace('air_shopping_raw_', '')
                             # Verify the raw response cache is still valid
                             try:
-                                from utils.cache_manager import cache_manager
-                                raw_response = cache_manager.get(original_raw_key)
-                                if raw_response:
+                                from services.raw_response_store import raw_response_store
+                                if await raw_response_store.exists(original_raw_key):
                                     logger.info(f"✅ Raw response cache still valid for key: {original_raw_key}")
                                 else:
                                     logger.warning(f"⚠️ Raw response cache expired for key: {original_raw_key}")
@@ -673,39 +706,51 @@ async def air_shopping():
         # Add configuration to the request data
         converted_data['config'] = dict(current_app.config)
 
-        if use_enhanced:
-            # Use enhanced air shopping with multi-airline support
-            logger.info(f"🔍 Using enhanced air shopping service (cache miss) - Request ID: {request_id}")
-            result = await process_air_shopping_enhanced(converted_data)
-        else:
-            # Use basic air shopping for legacy compatibility
-            logger.info(f"🔍 Using basic air shopping service (cache miss) - Request ID: {request_id}")
-            result = await process_air_shopping_basic(converted_data)
-
-        # Cache the successful result for future requests
-        if result.get('status') == 'success' and result.get('data'):
-            try:
-                cache_result = redis_flight_storage.store_flight_search(
-                    search_data=result['data'],
-                    session_id=cache_key,
-                    ttl=300  # 5 minutes (reduced to match typical offer expiration times)
-                )
-                if cache_result['success']:
-                    logger.info(f"💾 Cached search results for key: {cache_key} - Request ID: {request_id}")
-                    # Add cache info to response
-                    result['cache_key'] = cache_key
-                    result['cached'] = True
+        async def _search() -> Dict[str, Any]:
+            if use_enhanced:
+                # Use enhanced air shopping with multi-airline support
+                logger.info(f"🔍 Using enhanced air shopping service (cache miss) - Request ID: {request_id}")
+                result = await process_air_shopping_enhanced(converted_data)
+            else:
+                # Use basic air shopping for legacy compatibility
+                logger.info(f"🔍 Using basic air shopping service (cache miss) - Request ID: {request_id}")
+                result = await process_air_shopping_basic(converted_data)
+
+            # Cache the successful result for future requests
+            if result.get('status') == 'success' and result.get('data'):
+                try:
+                    # Store the filter/sort keys with the cards so later refinements only scan them
+                    search_data = {**result['data'], OFFER_KEYS_FIELD: build_offer_keys(result['data'].get('offers') or [])}
+                    cache_result = await async_redis_flight_storage.store_flight_search(
+                        search_data=search_data,
+                        session_id=cache_key,
+                        ttl=300  # 5 minutes (reduced to match typical offer expiration times)
+                    )
+                    if cache_result['success']:
+                        logger.info(f"💾 Cached search results for key: {cache_key} - Request ID: {request_id}")
+                        # Add cache info to response
+                        result['cache_key'] = cache_key
+                        result['cached'] = True
                     
-                    # Add flight search cache key to metadata for pricing API access
-                    if result.get('data') and result['data'].get('metadata'):
-                        result['data']['metadata']['flight_search_cache_key'] = cache_key
-                        logger.info(f"Added flight_search_cache_key to metadata: {cache_key}")
-                else:
-                    logger.warning(f"Failed to cache search results: {cache_result.get('message')} - Request ID: {request_id}")
+                        # Add flight search cache key to metadata for pricing API access
+                        if result.get('data') and result['data'].get('metadata'):
+                            result['data']['metadata']['flight_search_cache_key'] = cache_key
+                            logger.info(f"Added flight_search_cache_key to metadata: {cache_key}")
+                    else:
+                        logger.warning(f"Failed to cache search results: {cache_result.get('message')} - Request ID: {request_id}")
+                        result['cached'] = False
+                except Exception as cache_error:
+                    logger.error(f"Error caching search results: {str(cache_error)} - Request ID: {request_id}")
                     result['cached'] = False
-            except Exception as cache_error:
-                logger.error(f"Error caching search results: {str(cache_error)} - Request ID: {request_id}")
-                result['cached'] = False
+            return result
+
+        # Concurrent identical searches wait for the same Verteil call
+        result = await request_coalescer.run(cache_key, _search)
+
+        # Each caller may filter differently; never modify the shared result
+        result = {**result, 'request_id': request_id}
+        if result.get('status') == 'success' and isinstance(result.get('data'), dict):
+            result = {**result, 'data': apply_offer_query(result['data'], data)}
 
         # Log success
         service_type = "enhanced" if use_enhanced else "basic"
@@ -715,9 +760,9 @@ async def air_shopping():
         if result.get('status') == 'success':
             response = jsonify(result)
         else:
-            # Handle error response
+            # Handle error response (504 when the request deadline was reached, 503 while the circuit is open)
             response = jsonify(result)
-            response.status_code = 500
+            response.status_code = result.get('status_code', 500)
 
         return response
         
@@ -792,7 +837,7 @@ async def check_flight_price_cache():
         cache_key = _generate_flight_price_cache_key(data['offer_id'], data['shopping_response_id'])
         
         # Try to retrieve cached data from Redis
-        cached_result = redis_flight_storage.get_flight_price(cache_key)
+        cached_result = await async_redis_flight_storage.get_flight_price(cache_key)
         
         if cached_result['success']:
             logger.info(f"Flight price cache hit for key: {cache_key} - Request ID: {request_id}")
@@ -909,7 +954,7 @@ async def flight_price():
         # Check if we have cached pricing data first
         force_refresh = data.get('force_refresh', False)
         if not force_refresh:
-            cached_result = redis_flight_storage.get_flight_price(cache_key)
+            cached_result = await async_redis_flight_storage.get_flight_price(cache_key)
             
             if cached_result['success']:
                 logger.info(f"🚀 Flight price cache hit! Returning cached data for key: {cache_key} - Request ID: {request_id}")
@@ -953,45 +998,11 @@ async def flight_price():
             'config': dict(current_app.config)  # Pass the app configuration
         }
         
-        # Add request deduplication to prevent multiple concurrent API calls for same flight pricing
-        dedup_key = f"flight_price:{cache_key}"
-        if request_cache.is_duplicate(dedup_key):
-            logger.info(f"🔄 Duplicate flight price request detected for key: {cache_key}. Waiting for ongoing request... - Request ID: {request_id}")
-            
-            # Wait for the ongoing request to complete by polling cache
-            import asyncio
-            wait_time = 0
-            max_wait = 10  # Maximum 10 seconds wait
-            
-            while wait_time < max_wait:
-                await asyncio.sleep(0.5)  # Wait 500ms
-                wait_time += 0.5
-                
-                # Check if cache now has the result
-                cached_result = redis_flight_storage.get_flight_price(cache_key)
-                if cached_result['success']:
-                    logger.info(f"🎯 Duplicate request resolved via cache for key: {cache_key} - Request ID: {request_id}")
-                    return jsonify({
-                        'status': 'success',
-                        'source': 'cache_after_dedup',
-                        'data': cached_result['data'],
-                        'cached_at': cached_result['stored_at'],
-                        'expires_at': cached_result['expires_at'],
-                        'request_id': request_id,
-                        'cache_key': cache_key,
-                        'message': 'Flight price data retrieved after deduplication wait'
-                    })
-            
-            logger.warning(f"⏰ Deduplication wait timeout for key: {cache_key}. Proceeding with request - Request ID: {request_id}")
-        
-        # Mark this request as in progress to prevent duplicates
-        request_cache.add_request(dedup_key)
-        
-        try:
+        async def _price() -> Dict[str, Any]:
             # Process the flight price request
             logger.info(f"🔍 Processing flight price request (cache miss) - Request ID: {request_id}")
             result = await process_flight_price(price_request)
-            
+        
             # Check if the result is an error due to expired offers
             is_expired_offer_error = False
             if result and isinstance(result, dict) and result.get('status') == 'error':
@@ -1005,33 +1016,32 @@ async def flight_price():
                     'offer not found'
                 ]
                 is_expired_offer_error = any(indicator in error_msg for indicator in expired_offer_indicators)
-                
+            
                 if is_expired_offer_error:
                     logger.warning(f"🕐 Detected expired offer error - Request ID: {request_id}")
-                    
+                
                     # Try to invalidate cached search data and retry once
                     try:
                         # Extract search parameters from the air shopping response for cache invalidation
                         air_shopping = data.get('air_shopping_response', {})
                         metadata = air_shopping.get('metadata', {})
-                        
+                    
                         if metadata.get('flight_search_cache_key'):
                             # Invalidate the cached search data
                             search_cache_key = metadata['flight_search_cache_key']
                             logger.info(f"🗑️ Invalidating expired search cache: {search_cache_key} - Request ID: {request_id}")
-                            
+                        
                             # Try to delete the cached search data
                             try:
-                                redis_connection = redis_flight_storage.redis_client
-                                if redis_connection and redis_flight_storage.redis_available:
-                                    redis_connection.delete(search_cache_key)
+                                if await async_redis_flight_storage.is_available():
+                                    await async_redis_flight_storage.delete_keys(search_cache_key)
                                     logger.info(f"✅ Successfully invalidated search cache: {search_cache_key}")
                             except Exception as invalidate_error:
                                 logger.warning(f"Failed to invalidate search cache: {invalidate_error}")
-                        
+                    
                         # Return a specific error response that the frontend can handle
                         logger.info(f"💫 Returning expired offer error for frontend handling - Request ID: {request_id}")
-                        return jsonify({
+                        return {
                             'status': 'expired_offer_error',
                             'error': 'Flight offers have expired. Please search again for fresh results.',
                             'error_code': 'EXPIRED_OFFERS',
@@ -1039,16 +1049,16 @@ async def flight_price():
                             'request_id': request_id,
                             'should_retry_search': True,
                             'original_error': result.get('error', '')
-                        })
-                        
+                        }
+                    
                     except Exception as retry_error:
                         logger.error(f"Error during expired offer retry handling: {str(retry_error)} - Request ID: {request_id}")
                         # Fall through to return the original error
-            
+        
             # Cache the successful result for future requests
             if result and isinstance(result, dict) and result.get('status') == 'success' and result.get('data'):
                 try:
-                    cache_result = redis_flight_storage.store_flight_price(
+                    cache_result = await async_redis_flight_storage.store_flight_price(
                         price_data=result['data'],
                         session_id=cache_key,
                         ttl=300  # 5 minutes - same as flight search to ensure consistency
@@ -1057,26 +1067,26 @@ async def flight_price():
                         logger.info(f"💾 Cached flight price data for key: {cache_key} - Request ID: {request_id}")
                         result['cache_key'] = cache_key
                         result['cached'] = True
-                        
+                    
                         # 🚀 ROBUST SOLUTION: Ensure metadata always exists and contains flight_price_cache_key
                         if not result.get('data'):
                             result['data'] = {}
                         if not result['data'].get('metadata'):
                             result['data']['metadata'] = {}
-                        
+                    
                         # Preserve raw cache key from pricing service if it exists, otherwise use processed cache key
                         if not result['data']['metadata'].get('flight_price_cache_key'):
                             result['data']['metadata']['flight_price_cache_key'] = cache_key
                             logger.info(f"✅ Added processed flight_price_cache_key to metadata: {cache_key}")
                         else:
                             logger.info(f"✅ Preserved raw flight_price_cache_key in metadata: {result['data']['metadata']['flight_price_cache_key']}")
-                        
+                    
                         # Add processed cache key separately for reference
                         result['data']['metadata']['processed_cache_key'] = cache_key
-                        
+                    
                         # 🔧 CRITICAL: Ensure frontend receives cache key at top level too
                         result['flight_price_cache_key'] = result['data']['metadata']['flight_price_cache_key']
-                        
+                    
                         logger.info(f"🔑 GUARANTEED flight_price_cache_key transmission: metadata={result['data']['metadata']['flight_price_cache_key']}, top_level={result['flight_price_cache_key']}")
                     else:
                         logger.warning(f"Failed to cache flight price data: {cache_result.get('message')} - Request ID: {request_id}")
@@ -1084,20 +1094,35 @@ async def flight_price():
                 except Exception as cache_error:
                     logger.error(f"Error caching flight price data: {str(cache_error)} - Request ID: {request_id}")
                     result['cached'] = False
-            
+
+            return result
+
+        try:
+            # Concurrent identical pricing requests wait for the same Verteil call
+            result = await request_coalescer.run(cache_key, _price)
+            # The result may be another request's; report this request's ID
+            if isinstance(result, dict):
+                result = {**result, 'request_id': request_id}
+
             # Log the result status
             if result and isinstance(result, dict):
                 status = result.get('status', 'unknown')
                 logger.info(f"Flight price request completed with status: {status} - Request ID: {request_id}")
-                if status == 'error' and not is_expired_offer_error:
+                if status == 'error':
                     logger.error(f"Error in flight price request: {result.get('error', 'No error details')} - Request ID: {request_id}")
 
             return jsonify(result)
             
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Flight price request abandoned: {str(e)} - Request ID: {request_id}")
+            raise
         except Exception as e:
             logger.error(f"Unhandled exception in flight price endpoint: {str(e)} - Request ID: {request_id}", exc_info=True)
             return jsonify(_create_error_response("An internal server error occurred", 500, request_id))
         
+    except (DeadlineExceeded, CircuitOpenError):
+        # Answered by the app's 504 / 503 (Retry-After) handlers
+        raise
     except json.JSONDecodeError:
         error_msg = "Invalid JSON payload"
         logger.error(f"{error_msg} - Request ID: {request_id}")
@@ -1153,7 +1178,7 @@ async def check_booking_cache():
         cache_key = _generate_booking_cache_key(data['booking_id'])
         
         # Try to retrieve cached data from Redis
-        cached_result = redis_flight_storage.get_booking_data(cache_key)
+        cached_result = await async_redis_flight_storage.get_booking_data(cache_key)
         
         if cached_result['success']:
             logger.info(f"Booking cache hit for key: {cache_key} - Request ID: {request_id}")
@@ -1210,7 +1235,7 @@ async def debug_token():
 
         # Try to get a token to see if it triggers generation
         try:
-            token = token_manager.get_token()
+            token = await token_manager.get_token_async()
             token_available = True
         except Exception as e:
             token_available = False
@@ -1250,6 +1275,64 @@ async def debug_token():
             'error': str(e)
         }), 500
 
+@bp.route('/debug/http-pool', methods=['GET', 'OPTIONS'])
+@route_cors(
+    allow_origin=ALLOWED_ORIGINS,
+    allow_methods=["GET", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Content-Type"],
+    allow_credentials=True,
+    max_age=600
+)
+async def debug_http_pool():
+    """Debug endpoint to check connection reuse of the shared HTTP pool."""
+    try:
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        from services.http_client import http_client
+
+        return jsonify({
+            'status': 'success',
+            'pid': os.getpid(),
+            'pool': http_client.get_stats()
+        })
+    except Exception as e:
+        logger.error(f"Debug HTTP pool endpoint failed: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@bp.route('/debug/transform-executor', methods=['GET', 'OPTIONS'])
+@route_cors(
+    allow_origin=ALLOWED_ORIGINS,
+    allow_methods=["GET", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Content-Type"],
+    allow_credentials=True,
+    max_age=600
+)
+async def debug_transform_executor():
+    """Debug endpoint showing queue depth and timings of the transform executor."""
+    try:
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        from services.transform_executor import transform_executor
+
+        return jsonify({
+            'status': 'success',
+            'pid': os.getpid(),
+            'executor': transform_executor.get_stats()
+        })
+    except Exception as e:
+        logger.error(f"Debug transform executor endpoint failed: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @bp.route('/debug/config', methods=['GET', 'OPTIONS'])
 @route_cors(
     allow_origin=ALLOWED_ORIGINS,
@@ -1449,9 +1532,7 @@ async def create_order():
                 if flight_price_cache_key:
                     logger.info(f"[DEBUG] Found flight price cache key: {flight_price_cache_key} (ReqID: {request_id})")
                     try:
-                        from services.redis_flight_storage import RedisFlightStorage
-                        redis_flight_storage = RedisFlightStorage()
-                        cached_result = redis_flight_storage.get_flight_price(flight_price_cache_key)
+                        cached_result = await async_redis_flight_storage.get_flight_price(flight_price_cache_key)
                         if cached_result['success']:
                             logger.info(f"[DEBUG] Retrieved flight price response from Redis cache (ReqID: {request_id})")
                             flight_price_response = cached_result['data']
@@ -1535,6 +1616,10 @@ async def create_order():
                 'request_id': request_id
             })
     
+    except (DeadlineExceeded, CircuitOpenError) as e:
+        # Answered by the app's 504 / 503 (Retry-After) handlers
+        logger.warning(f"Order creation abandoned: {str(e)} - Request ID: {request_id}")
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in order creation: {str(e)} - Request ID: {request_id}", exc_info=True)
         return jsonify(_create_error_response("An unexpected error occurred during order creation", 500, request_id))
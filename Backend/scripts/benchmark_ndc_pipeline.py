@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+NDC Pipeline Benchmark Suite
+
+Times and memory-profiles every transformer and request builder on the NDC
+fixtures in ``Seats & Services`` and on synthetic scaled-up variants of them
+(offers, priced offers, seats and services repeated ``--scales`` times,
+with unique IDs where they matter). Response payloads recorded in ``api_logs`` (legacy
+``*_response.json`` files and rotated ``*.jsonl.gz`` segments) can be added
+with ``--api-logs``.
+
+Each case is timed over ``--iterations`` runs on a fresh copy of its input;
+peak memory is measured with ``tracemalloc`` in a separate run so it does not
+skew the timings. Results are written as JSON so runs can be compared release
+over release with ``--compare``.
+
+Usage:
+    python scripts/benchmark_ndc_pipeline.py [--iterations 10] [--scales 1,5,10]
+        [--cases air_shopping,flight_price] [--api-logs api_logs]
+        [--output results.json] [--compare baseline.json] [--threshold 0.2]
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add the Backend directory to Python path so we can import services
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from scripts.build_airshopping_rq import build_airshopping_request
+from scripts.build_flightprice_rq import build_flight_price_request
+from scripts.build_ordercreate_rq import generate_order_create_rq
+from scripts.build_seatavailability_rq import build_seatavailability_request
+from scripts.build_servicelist_rq import build_servicelist_request
+from transformers.enhanced_air_shopping_transformer import transform_air_shopping_for_results_enhanced
+from utils.air_shopping_transformer import transform_air_shopping_for_results
+from utils.api_logger import APILogger
+from utils.data_transformer import transform_verteil_to_frontend
+from utils.flight_price_transformer import transform_for_frontend
+from utils.multi_airline_flight_card_generator import generate_enhanced_flight_cards
+from utils.ndc_response_index import NdcResponseIndex
+from utils.offer_index import OfferIndex
+from utils.offer_table import OfferTable
+from utils.seat_availability_transformer import transform_seat_availability_lean_frontend
+from utils.service_list_transformer import transform_service_list_lean_frontend
+
+DEFAULT_FIXTURES_DIR = backend_dir / 'Seats & Services'
+RESULTS_VERSION = 1
+
+# Fixture file -> response type
+FIXTURE_FILES = {
+    'AirShoppingRS': '2_AirShoppingRS.json',
+    'FlightPriceRS': '4_FlightPriceRS.json',
+    'ServiceListRS': '6_ServiceListRS.json',
+    'SeatAvailabilityRS': '8_SeatAvailabilityRS.json',
+    'OrderCreateRS': '10_OrderCreateRS.json',
+}
+
+# API logger service name -> response type
+API_LOG_SERVICES = {
+    'AirShopping': 'AirShoppingRS',
+    'FlightPrice': 'FlightPriceRS',
+    'ServiceList': 'ServiceListRS',
+    'SeatAvailability': 'SeatAvailabilityRS',
+    'OrderCreate': 'OrderCreateRS',
+}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic scaling
+# ---------------------------------------------------------------------------
+
+def _repeat(items: List[Any], factor: int, rename: Optional[Callable[[Any, int], None]] = None) -> List[Any]:
+    result = list(items)
+    for copy_number in range(1, factor):
+        for item in items:
+            clone = copy.deepcopy(item)
+            if rename:
+                rename(clone, copy_number)
+            result.append(clone)
+    return result
+
+
+def _suffix(node: Any, field: str, copy_number: int) -> None:
+    if isinstance(node, dict):
+        if isinstance(node.get(field), dict) and 'value' in node[field]:
+            node[field]['value'] = f"{node[field]['value']}_S{copy_number}"
+        elif isinstance(node.get(field), str):
+            node[field] = f"{node[field]}_S{copy_number}"
+
+
+def scale_payload(response_type: str, data: Dict[str, Any], factor: int) -> Dict[str, Any]:
+    """
+    Return a copy of ``data`` with its main repeating list ``factor`` times longer.
+
+    AirShopping offers, FlightPrice priced offers, SeatAvailability seats and
+    flights, and ServiceList services are repeated; repeated offers and
+    services get unique IDs.
+    """
+    if factor <= 1:
+        return data
+    data = copy.deepcopy(data)
+    if response_type == 'AirShoppingRS':
+        for airline_offers in data.get('OffersGroup', {}).get('AirlineOffers', []):
+            airline_offers['AirlineOffer'] = _repeat(
+                airline_offers.get('AirlineOffer', []), factor, lambda offer, n: _suffix(offer, 'OfferID', n)
+            )
+    elif response_type == 'FlightPriceRS':
+        priced = data.get('PricedFlightOffers', {})
+        priced['PricedFlightOffer'] = _repeat(priced.get('PricedFlightOffer', []), factor)
+    elif response_type == 'SeatAvailabilityRS':
+        seat_list = data.get('DataLists', {}).get('SeatList', {})
+        seat_list['Seats'] = _repeat(seat_list.get('Seats', []), factor)
+        data['Flights'] = _repeat(data.get('Flights', []), factor)
+    elif response_type == 'ServiceListRS':
+        services = data.get('Services', {})
+        services['Service'] = _repeat(services.get('Service', []), factor, lambda service, n: _suffix(service, 'ObjectKey', n))
+    return data
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+
+def _sample_passengers(flight_price_response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build passenger input for OrderCreate from the FlightPrice travelers."""
+    travelers = flight_price_response.get('DataLists', {}).get('AnonymousTravelerList', {}).get('AnonymousTraveler', [])
+    passengers = []
+    for number, traveler in enumerate(travelers or [{'ObjectKey': 'PAX1', 'PTC': {'value': 'ADT'}}], start=1):
+        passengers.append({
+            'ObjectKey': traveler.get('ObjectKey', f'PAX{number}'),
+            'PTC': (traveler.get('PTC') or {}).get('value', 'ADT'),
+            'Name': {'Title': 'Mr', 'Given': ['JAN'], 'Surname': 'DOE'},
+            'Gender': 'Male',
+            'BirthDate': '1992-06-10',
+            'Contacts': {
+                'EmailContact': {'Address': {'value': 'benchmark@example.com'}},
+                'PhoneContact': {'Number': [{'value': '9987655232', 'CountryCode': '91'}], 'Application': 'Home'},
+            },
+        })
+    return passengers
+
+
+def _air_shopping_offers(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare the inputs of the stages that run after the enhanced transform."""
+    index = NdcResponseIndex(data)
+    offers = transform_air_shopping_for_results_enhanced(data, index=index).get('offers', [])
+    return {'response': data, 'index': index, 'offers': offers}
+
+
+# Case name -> (response type, kind, setup, function). ``setup`` prepares the
+# untimed input from the parsed payload; ``function`` is the timed call.
+CASES: Dict[str, Tuple[str, str, Optional[Callable[[Dict[str, Any]], Any]], Callable[[Any], Any]]] = {
+    'air_shopping.response_index': ('AirShoppingRS', 'transformer', None, NdcResponseIndex),
+    'air_shopping.enhanced_transform': ('AirShoppingRS', 'transformer', None,
+                                        lambda data: transform_air_shopping_for_results_enhanced(data)),
+    'air_shopping.flight_cards': ('AirShoppingRS', 'transformer', _air_shopping_offers,
+                                  lambda prepared: generate_enhanced_flight_cards(prepared['response'], prepared['offers'], index=prepared['index'])),
+    'air_shopping.offer_index': ('AirShoppingRS', 'transformer', _air_shopping_offers,
+                                 lambda prepared: OfferIndex.build(prepared['response'], prepared['index'], prepared['offers']).to_dict()),
+    'air_shopping.offer_table': ('AirShoppingRS', 'transformer',
+                                 lambda data: generate_enhanced_flight_cards(data, _air_shopping_offers(data)['offers']),
+                                 lambda cards: OfferTable.build(cards).to_dict()),
+    'air_shopping.legacy_transform': ('AirShoppingRS', 'transformer', None, transform_air_shopping_for_results),
+    'air_shopping.verteil_to_frontend': ('AirShoppingRS', 'transformer', None, transform_verteil_to_frontend),
+    'flight_price.transform_for_frontend': ('FlightPriceRS', 'transformer', None, transform_for_frontend),
+    'seat_availability.lean_frontend': ('SeatAvailabilityRS', 'transformer', None, transform_seat_availability_lean_frontend),
+    'service_list.lean_frontend': ('ServiceListRS', 'transformer', None, transform_service_list_lean_frontend),
+    'build.air_shopping_request': ('AirShoppingRS', 'builder', None, lambda _data: build_airshopping_request(
+        trip_type='ROUND_TRIP',
+        od_segments=[
+            {'Origin': 'BOM', 'Destination': 'LHR', 'DepartureDate': '2025-08-17'},
+            {'Origin': 'LHR', 'Destination': 'BOM', 'DepartureDate': '2025-08-24'},
+        ],
+        num_adults=2, num_children=1, num_infants=1
+    )),
+    'build.flight_price_request': ('AirShoppingRS', 'builder', None,
+                                   lambda data: build_flight_price_request(data, selected_offer_index=0)),
+    'build.seat_availability_request': ('FlightPriceRS', 'builder', None,
+                                        lambda data: build_seatavailability_request(data, selected_offer_index=0)),
+    'build.service_list_request': ('FlightPriceRS', 'builder', None,
+                                   lambda data: build_servicelist_request(data, selected_offer_index=0)),
+    'build.order_create_request': ('FlightPriceRS', 'builder',
+                                   lambda data: (data, _sample_passengers(data)),
+                                   lambda prepared: generate_order_create_rq(prepared[0], prepared[1], {'MethodType': 'Cash'})),
+}
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def load_fixtures(fixtures_dir: Path) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Return (response type, fixture name, data) for every bundled fixture."""
+    fixtures = []
+    for response_type, file_name in FIXTURE_FILES.items():
+        path = fixtures_dir / file_name
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                fixtures.append((response_type, file_name, json.load(f)))
+    return fixtures
+
+
+def load_api_log_fixtures(api_logs_dir: Path) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Return successful response payloads recorded by the API logger."""
+    reader = APILogger(base_dir=str(api_logs_dir))
+    fixtures = []
+    for service_name, response_type in API_LOG_SERVICES.items():
+        for source, record in reader.iter_records(service_name, record_type='response'):
+            if record.get('status_code') == 200 and isinstance(record.get('response'), dict):
+                fixtures.append((response_type, os.path.relpath(source, api_logs_dir.parent), record['response']))
+    return fixtures
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _quiet_call(function: Callable[[Any], Any], argument: Any) -> Any:
+    # Several builders print progress; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(argument)
+
+
+def _count_items(result: Any) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        for key in ('offers', 'flights', 'services'):
+            if isinstance(result.get(key), list):
+                return len(result[key])
+        data = result.get('data')
+        if isinstance(data, dict):
+            return _count_items(data)
+    return None
+
+
+def run_case(case: str, fixture_name: str, scale: int, data: Dict[str, Any], iterations: int) -> Dict[str, Any]:
+    """Time one case on one input and measure its peak memory."""
+    _, kind, setup, function = CASES[case]
+    blob = json.dumps(data).encode('utf-8')
+    row: Dict[str, Any] = {
+        'case': case,
+        'kind': kind,
+        'fixture': fixture_name,
+        'scale': scale,
+        'input_bytes': len(blob),
+    }
+
+    def fresh_input() -> Any:
+        # Every run gets its own copy in case the function mutates its input
+        parsed = json.loads(blob)
+        return _quiet_call(setup, parsed) if setup else parsed
+
+    try:
+        # Warm-up run (imports, caches) is not measured
+        result = _quiet_call(function, fresh_input())
+        row['items'] = _count_items(result)
+
+        timings = []
+        for _ in range(iterations):
+            argument = fresh_input()
+            start = time.perf_counter()
+            _quiet_call(function, argument)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        argument = fresh_input()
+        tracemalloc.start()
+        try:
+            _quiet_call(function, argument)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    timings.sort()
+    row['timings_ms'] = {
+        'min': timings[0],
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'p95': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        'max': timings[-1],
+    }
+    row['peak_memory_kb'] = peak / 1024
+    return row
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=backend_dir,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _row_key(row: Dict[str, Any]) -> Tuple[str, str, int]:
+    return row['case'], row['fixture'], row['scale']
+
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Return the rows whose median time grew by more than ``threshold`` (fraction) over ``baseline``."""
+    baseline_rows = {_row_key(row): row for row in baseline.get('results', []) if 'timings_ms' in row}
+    regressions = []
+    for row in results['results']:
+        previous = baseline_rows.get(_row_key(row))
+        if not previous or 'timings_ms' not in row:
+            continue
+        before, after = previous['timings_ms']['median'], row['timings_ms']['median']
+        change = (after - before) / before if before else 0.0
+        row['baseline_median_ms'] = before
+        row['change'] = change
+        if change > threshold:
+            regressions.append(row)
+    return regressions
+
+
+def print_report(results: Dict[str, Any], stream) -> None:
+    print(f"{'case':<38}{'fixture':<28}{'scale':>6}{'input KB':>10}{'items':>7}"
+          f"{'median ms':>11}{'p95 ms':>10}{'peak KB':>10}{'change':>9}", file=stream)
+    for row in results['results']:
+        fixture = row['fixture'] if len(row['fixture']) <= 26 else '…' + row['fixture'][-25:]
+        prefix = f"{row['case']:<38}{fixture:<28}{row['scale']:>6}{row['input_bytes'] / 1024:>10.1f}"
+        if 'error' in row:
+            print(f"{prefix}  ERROR {row['error']}", file=stream)
+            continue
+        change = f"{row['change'] * 100:+.0f}%" if 'change' in row else ''
+        items = row.get('items') if row.get('items') is not None else '-'
+        print(f"{prefix}{items:>7}{row['timings_ms']['median']:>11.2f}{row['timings_ms']['p95']:>10.2f}"
+              f"{row['peak_memory_kb']:>10.0f}{change:>9}", file=stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark NDC transformers and request builders')
+    parser.add_argument('--iterations', type=int, default=10, help='Timed runs per case and input')
+    parser.add_argument('--scales', default='1,5,10', help='Comma separated scale factors for synthetic variants')
+    parser.add_argument('--cases', default='', help='Comma separated case name prefixes (default: all)')
+    parser.add_argument('--fixtures', type=Path, default=DEFAULT_FIXTURES_DIR, help='Directory of NDC fixtures')
+    parser.add_argument('--api-logs', type=Path, help='Also benchmark responses recorded in this api_logs directory')
+    parser.add_argument('--output', type=Path, help='Write JSON results here (default: stdout)')
+    parser.add_argument('--compare', type=Path, help='Baseline JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Median slowdown counted as a regression (0.2 = 20%%)')
+    parser.add_argument('--log-level', default='WARNING', help='Log level while benchmarking')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    scales = sorted({max(int(scale), 1) for scale in args.scales.split(',') if scale.strip()})
+    prefixes = [prefix.strip() for prefix in args.cases.split(',') if prefix.strip()]
+    cases = [case for case in CASES if not prefixes or any(case.startswith(prefix) for prefix in prefixes)]
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No fixtures found in {args.fixtures}", file=sys.stderr)
+        return 1
+    extra_fixtures = load_api_log_fixtures(args.api_logs) if args.api_logs else []
+
+    rows = []
+    for case in cases:
+        response_type = CASES[case][0]
+        for fixture_type, fixture_name, data in fixtures:
+            if fixture_type != response_type:
+                continue
+            for scale in scales:
+                print(f"Running {case} on {fixture_name} x{scale}...", file=sys.stderr)
+                rows.append(run_case(case, fixture_name, scale, scale_payload(response_type, data, scale), args.iterations))
+        for fixture_type, fixture_name, data in extra_fixtures:
+            if fixture_type == response_type:
+                print(f"Running {case} on {fixture_name}...", file=sys.stderr)
+                rows.append(run_case(case, fixture_name, 1, data, args.iterations))
+
+    results = {
+        'version': RESULTS_VERSION,
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'iterations': args.iterations,
+        'scales': scales,
+        'results': rows,
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        results['baseline'] = str(args.compare)
+        results['regressions'] = [_row_key(row) for row in regressions]
+
+    print_report(results, sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output, encoding='utf-8')
+        print(f"\nResults written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold * 100:.0f}%:", file=sys.stderr)
+        for row in regressions:
+            print(f"  {row['case']} on {row['fixture']} x{row['scale']}: "
+                  f"{row['baseline_median_ms']:.2f} -> {row['timings_ms']['median']:.2f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Redis Payload Codec Benchmark
+
+Compares the legacy ``json -> gzip -> base64`` payload format with the binary
+codec (orjson/json + zstd/lz4/zlib) on the NDC fixtures in ``Seats & Services``.
+For each fixture it reports the stored size and the mean encode/decode time.
+
+Usage:
+    python scripts/benchmark_payload_codec.py [--iterations 20] [--fixtures DIR]
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the Backend directory to Python path so we can import services
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from services import payload_codec
+from services.payload_codec import (
+    COMPRESSOR_LZ4, COMPRESSOR_NONE, COMPRESSOR_ZLIB, COMPRESSOR_ZSTD,
+    decode_payload, encode_payload
+)
+from services.redis_flight_storage import compress_data
+
+DEFAULT_FIXTURES_DIR = backend_dir / 'Seats & Services'
+
+
+def _envelope(data):
+    """Wrap fixture data the way RedisFlightStorage does."""
+    return {
+        "data": data,
+        "stored_at": datetime.utcnow().isoformat(),
+        "expires_at": (datetime.utcnow() + timedelta(seconds=300)).isoformat(),
+        "data_type": "benchmark"
+    }
+
+
+def _time_ms(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    return (time.perf_counter() - start) * 1000 / iterations, result
+
+
+def _codecs():
+    """(name, encoder) pairs for every codec usable in this environment."""
+    codecs = [('legacy gzip+base64', compress_data)]
+    binary = [('none', COMPRESSOR_NONE), ('zlib', COMPRESSOR_ZLIB)]
+    if payload_codec.lz4_frame is not None:
+        binary.append(('lz4', COMPRESSOR_LZ4))
+    if payload_codec.zstandard is not None:
+        binary.append(('zstd', COMPRESSOR_ZSTD))
+
+    serializer = 'orjson' if payload_codec.orjson is not None else 'json'
+    for name, compressor_id in binary:
+        codecs.append((f"binary {serializer}+{name}", lambda data, c=compressor_id: encode_payload(data, c)))
+    return codecs
+
+
+def benchmark_fixture(path, iterations):
+    """Benchmark all codecs on one fixture file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        envelope = _envelope(json.load(f))
+    json_size = len(json.dumps(envelope, default=str).encode('utf-8'))
+
+    rows = []
+    for name, encoder in _codecs():
+        encode_ms, encoded = _time_ms(lambda: encoder(envelope), iterations)
+        decode_ms, decoded = _time_ms(lambda: decode_payload(encoded), iterations)
+        assert decoded['data'] == envelope['data'], f"{name} round trip mismatch for {path.name}"
+        size = len(encoded) if isinstance(encoded, bytes) else len(encoded.encode('utf-8'))
+        rows.append((name, size, size / json_size * 100, encode_ms, decode_ms))
+    return json_size, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Redis payload codecs on NDC fixtures')
+    parser.add_argument('--iterations', type=int, default=20, help='Encode/decode repetitions per codec')
+    parser.add_argument('--fixtures', type=Path, default=DEFAULT_FIXTURES_DIR, help='Directory of JSON fixtures')
+    args = parser.parse_args()
+
+    fixtures = sorted(args.fixtures.glob('*RS.json'))
+    if not fixtures:
+        print(f"No *RS.json fixtures found in {args.fixtures}")
+        return 1
+
+    print(f"Codec settings: {payload_codec.describe_codec()}")
+    print(f"Iterations per codec: {args.iterations}\n")
+
+    for path in fixtures:
+        json_size, rows = benchmark_fixture(path, args.iterations)
+        print(f"{path.name} (JSON {json_size / 1024:.1f} KB)")
+        print(f"  {'codec':<28}{'size KB':>10}{'% JSON':>9}{'encode ms':>12}{'decode ms':>12}")
+        for name, size, ratio, encode_ms, decode_ms in rows:
+            print(f"  {name:<28}{size / 1024:>10.1f}{ratio:>8.1f}%{encode_ms:>12.2f}{decode_ms:>12.2f}")
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
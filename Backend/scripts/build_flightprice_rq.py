@@ -9,10 +9,12 @@ import logging
 try:
     from utils.multi_airline_detector import MultiAirlineDetector
     from utils.reference_extractor import EnhancedReferenceExtractor
+    from utils.offer_index import OfferIndex
 except ImportError:
     # Fallback for standalone execution
     MultiAirlineDetector = None
     EnhancedReferenceExtractor = None
+    OfferIndex = None
 
 logger = logging.getLogger(__name__)
 
@@ -64,7 +66,7 @@ def filter_price_metadata(price_metadatas_container, all_offer_refs_set):
     return {"PriceMetadatas": {"PriceMetadata": filtered_items}}
 
 
-def build_flight_price_request(airshopping_response, selected_offer_index=0, selected_airline_owner=None):
+def build_flight_price_request(airshopping_response, selected_offer_index=0, selected_airline_owner=None, offer_index=None):
     """
     Enhanced FlightPrice request builder with multi-airline support.
 
@@ -73,6 +75,8 @@ def build_flight_price_request(airshopping_response, selected_offer_index=0, sel
         selected_offer_index (int): Index of the selected offer (for multi-airline: global index)
         selected_airline_owner (str, optional): The airline owner code (e.g., 'KQ', 'BA').
                                                If not provided, will be auto-detected.
+        offer_index (OfferIndex, optional): Index built from this response when it was cached.
+                                            Enables direct lookups instead of scanning the response.
 
     Returns:
         dict: FlightPrice request payload
@@ -84,21 +88,24 @@ def build_flight_price_request(airshopping_response, selected_offer_index=0, sel
 
     # Detect response type and extract airline context
     is_multi_airline = False
-    if MultiAirlineDetector:
+    if offer_index is not None:
+        is_multi_airline = offer_index.is_multi_airline
+        logger.info(f"Response type (from offer index): {'multi-airline' if is_multi_airline else 'single-airline'}")
+    elif MultiAirlineDetector:
         is_multi_airline = MultiAirlineDetector.is_multi_airline_response(airshopping_response)
         logger.info(f"Response type: {'multi-airline' if is_multi_airline else 'single-airline'}")
 
     if is_multi_airline:
         return _build_multi_airline_flight_price_request(
-            airshopping_response, selected_offer_index, selected_airline_owner
+            airshopping_response, selected_offer_index, selected_airline_owner, offer_index
         )
     else:
         return _build_single_airline_flight_price_request(
-            airshopping_response, selected_offer_index, selected_airline_owner
+            airshopping_response, selected_offer_index, selected_airline_owner, offer_index
         )
 
 
-def _build_multi_airline_flight_price_request(airshopping_response, selected_offer_index, selected_airline_owner=None):
+def _build_multi_airline_flight_price_request(airshopping_response, selected_offer_index, selected_airline_owner=None, offer_index=None):
     """
     Build FlightPrice request for multi-airline response.
 
@@ -106,6 +113,7 @@ def _build_multi_airline_flight_price_request(airshopping_response, selected_off
         airshopping_response (dict): The multi-airline AirShopping response
         selected_offer_index (int): Global index of the selected offer
         selected_airline_owner (str, optional): The airline owner code
+        offer_index (OfferIndex, optional): Precomputed offer index of the response
 
     Returns:
         dict: FlightPrice request payload
@@ -115,6 +123,26 @@ def _build_multi_airline_flight_price_request(airshopping_response, selected_off
     offers_group = airshopping_response.get("OffersGroup", {})
     data_lists = airshopping_response.get("DataLists", {})
 
+    if offer_index is not None:
+        # Direct lookup of the selected priced offer
+        entry, selected_offer, selected_airline_offers_node = offer_index.get_priced_offer(
+            airshopping_response, selected_offer_index
+        )
+        if selected_offer is None:
+            raise ValueError(f"Multi-airline offer index {selected_offer_index} out of range (total: {len(offer_index.priced_offers)})")
+
+        airline_owner = entry.get("owner") or ""
+        if not airline_owner:
+            # Fallback: try to get from AirlineOffers node (legacy structure)
+            airline_owner = selected_airline_offers_node.get("Owner", {}).get("value", "")
+        logger.info(f"Selected multi-airline offer from airline {airline_owner} at local index {entry['local']}")
+
+        shopping_response_id = _get_airline_shopping_response_id(airshopping_response, airline_owner, offer_index)
+
+        return _build_common_flight_price_request(
+            airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists, offer_index
+        )
+
     try:
         # Recreate the flattened offers array (matching transformer logic)
         airline_offers_list = offers_group.get("AirlineOffers", [])
@@ -156,11 +184,11 @@ def _build_multi_airline_flight_price_request(airshopping_response, selected_off
 
     # Continue with common offer processing logic
     return _build_common_flight_price_request(
-        airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists
+        airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists, offer_index
     )
 
 
-def _build_single_airline_flight_price_request(airshopping_response, selected_offer_index, selected_airline_owner=None):
+def _build_single_airline_flight_price_request(airshopping_response, selected_offer_index, selected_airline_owner=None, offer_index=None):
     """
     Build FlightPrice request for single-airline response (legacy logic).
 
@@ -168,6 +196,7 @@ def _build_single_airline_flight_price_request(airshopping_response, selected_of
         airshopping_response (dict): The single-airline AirShopping response
         selected_offer_index (int): Index of the selected offer in AirlineOffers
         selected_airline_owner (str, optional): The airline owner code
+        offer_index (OfferIndex, optional): Precomputed offer index of the response
 
     Returns:
         dict: FlightPrice request payload
@@ -219,26 +248,30 @@ def _build_single_airline_flight_price_request(airshopping_response, selected_of
 
     # Continue with common offer processing logic
     return _build_common_flight_price_request(
-        airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists
+        airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists, offer_index
     )
 
 
-def _get_airline_shopping_response_id(airshopping_response, airline_code):
+def _get_airline_shopping_response_id(airshopping_response, airline_code, offer_index=None):
     """
     Get airline-specific ShoppingResponseID for multi-airline responses.
 
     Args:
         airshopping_response (dict): The AirShopping response
         airline_code (str): The airline code
+        offer_index (OfferIndex, optional): Precomputed offer index of the response
 
     Returns:
         str: The airline-specific ShoppingResponseID
     """
     try:
-        if EnhancedReferenceExtractor:
-            extractor = EnhancedReferenceExtractor(airshopping_response)
-            refs = extractor.extract_references()
-            shopping_ids = refs.get('shopping_response_ids', {})
+        if offer_index is not None or EnhancedReferenceExtractor:
+            if offer_index is not None:
+                shopping_ids = offer_index.shopping_response_ids
+            else:
+                extractor = EnhancedReferenceExtractor(airshopping_response)
+                refs = extractor.extract_references()
+                shopping_ids = refs.get('shopping_response_ids', {})
 
             airline_shopping_id = shopping_ids.get(airline_code)
             if airline_shopping_id:
@@ -262,17 +295,57 @@ def _get_airline_shopping_response_id(airshopping_response, airline_code):
         return ""
 
 
-def _filter_airline_specific_data(data_lists, airline_owner):
+def _filter_airline_specific_data_indexed(data_lists, airline_owner, offer_index):
+    """
+    Indexed variant of _filter_airline_specific_data.
+
+    Picks the airline's DataLists entries by their precomputed positions
+    instead of scanning every list; the result has the same shape.
+    """
+    logger.info(f"Filtering DataLists for airline (indexed): {airline_owner}")
+
+    airline_lists = offer_index.get_airline_data_lists(data_lists, airline_owner)
+    filtered_data_lists = {}
+
+    travelers = [traveler.copy() for traveler in airline_lists.get("AnonymousTravelerList", [])]
+    if travelers:
+        filtered_data_lists["AnonymousTravelerList"] = {"AnonymousTraveler": travelers}
+        logger.info(f"Filtered {len(travelers)} travelers for airline {airline_owner}")
+    else:
+        logger.warning(f"No travelers found for airline {airline_owner}")
+        filtered_data_lists["AnonymousTravelerList"] = {}
+
+    for list_name, item_name in (
+        ("CarryOnAllowanceList", "CarryOnAllowance"),
+        ("CheckedBagAllowanceList", "CheckedBagAllowance"),
+        ("FareList", "FareGroup"),
+        ("FlightSegmentList", "FlightSegment"),
+        ("FlightList", "Flight"),
+        ("OriginDestinationList", "OriginDestination"),
+    ):
+        items = airline_lists.get(list_name)
+        if items:
+            filtered_data_lists[list_name] = {item_name: items}
+            logger.info(f"Filtered {len(items)} {item_name} entries for airline {airline_owner}")
+
+    return filtered_data_lists, {}
+
+
+def _filter_airline_specific_data(data_lists, airline_owner, offer_index=None):
     """
     Filter DataLists to only include data relevant to the selected airline.
 
     Args:
         data_lists (dict): The DataLists from the AirShopping response
         airline_owner (str): The airline owner code (e.g., 'QR', 'KL')
+        offer_index (OfferIndex, optional): Precomputed offer index of the response
 
     Returns:
         tuple: (filtered_data_lists, traveler_key_mapping)
     """
+    if offer_index is not None:
+        return _filter_airline_specific_data_indexed(data_lists, airline_owner, offer_index)
+
     logger.info(f"Filtering DataLists for airline: {airline_owner}")
 
     filtered_data_lists = {}
@@ -433,7 +506,7 @@ def _filter_airline_specific_data(data_lists, airline_owner):
     return filtered_data_lists, traveler_key_mapping
 
 
-def _build_common_flight_price_request(airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists):
+def _build_common_flight_price_request(airshopping_response, selected_offer, airline_owner, shopping_response_id, data_lists, offer_index=None):
     """
     Build the common parts of the FlightPrice request payload.
 
@@ -443,6 +516,7 @@ def _build_common_flight_price_request(airshopping_response, selected_offer, air
         airline_owner (str): The airline owner code
         shopping_response_id (str): The ShoppingResponseID to use
         data_lists (dict): The DataLists from the response
+        offer_index (OfferIndex, optional): Precomputed offer index of the response
 
     Returns:
         dict: FlightPrice request payload
@@ -450,7 +524,7 @@ def _build_common_flight_price_request(airshopping_response, selected_offer, air
     logger.info(f"Building common flight price request for airline {airline_owner}")
 
     # Filter DataLists to only include airline-specific data
-    filtered_data_lists, traveler_key_mapping = _filter_airline_specific_data(data_lists, airline_owner)
+    filtered_data_lists, traveler_key_mapping = _filter_airline_specific_data(data_lists, airline_owner, offer_index)
     logger.info(f"Traveler key mapping: {traveler_key_mapping}")
 
     all_offer_refs_for_metadata_filtering = set()
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Booking Funnel Load Generator
+
+Drives simulated users through the booking funnel against a running backend
+(for example the 4-worker Procfile deployment, with ``VERTEIL_API_BASE_URL``
+pointing at ``scripts/mock_verteil_server.py``) and reports per-route latency
+percentiles, throughput and error rates.
+
+Each virtual user repeatedly picks a journey from ``--mix`` and runs its steps
+in order, waiting a random think time between steps:
+
+    browse       autocomplete (origin and destination), air-shopping, refine
+                 (air-shopping again with a sort/filter, served from the cache)
+    price        browse + flight-price
+    ancillaries  price + service-list + seat-availability
+    book         ancillaries + order-create (needs --allow-booking)
+
+A step that fails ends its journey. A response counts as an error when the
+HTTP status is >= 400, when the JSON body has ``status: error`` (several
+routes return errors with HTTP 200), or when the request raises or times out.
+
+Usage:
+    python scripts/load_test_booking_funnel.py --base-url http://localhost:8000
+        [--users 50] [--duration 120] [--ramp-up 10] [--journeys 0]
+        [--mix browse=50,price=25,ancillaries=15,book=10] [--allow-booking]
+        [--think-time 1-3] [--routes NBO-DXB,LHR-JFK] [--days-ahead 14-60]
+        [--round-trip-share 0.3] [--output results.json] [--max-error-rate 0.01]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger('load_test_booking_funnel')
+
+RESULTS_VERSION = 1
+
+# Step name -> (method, path)
+STEPS = {
+    'autocomplete': ('GET', '/api/airports/autocomplete'),
+    'air_shopping': ('POST', '/api/verteil/air-shopping'),
+    'refine': ('POST', '/api/verteil/air-shopping'),
+    'flight_price': ('POST', '/api/verteil/flight-price'),
+    'service_list': ('POST', '/api/verteil/service-list'),
+    'seat_availability': ('POST', '/api/verteil/seat-availability'),
+    'order_create': ('POST', '/api/verteil/order-create'),
+}
+
+_BROWSE = ('autocomplete', 'air_shopping', 'refine')
+JOURNEYS = {
+    'browse': _BROWSE,
+    'price': _BROWSE + ('flight_price',),
+    'ancillaries': _BROWSE + ('flight_price', 'service_list', 'seat_availability'),
+    'book': _BROWSE + ('flight_price', 'service_list', 'seat_availability', 'order_create'),
+}
+
+REFINEMENTS = (
+    {'sortBy': 'price', 'sortOrder': 'asc'},
+    {'sortBy': 'duration', 'sortOrder': 'asc'},
+    {'sortBy': 'departure', 'sortOrder': 'asc', 'maxStops': 1},
+    {'maxStops': 0, 'page': 1, 'pageSize': 20},
+    {'departTimeMin': '06:00', 'departTimeMax': '12:00'},
+)
+
+CABINS = ('ECONOMY', 'ECONOMY', 'ECONOMY', 'PREMIUM_ECONOMY', 'BUSINESS')
+
+
+class StepFailed(Exception):
+    """A journey step failed; the journey stops here."""
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+class LoadStats:
+    """Latency samples and outcome counters per step and per journey."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.outcomes: Dict[str, Dict[str, int]] = {step: {} for step in STEPS}
+        self.bytes_received: Dict[str, int] = {step: 0 for step in STEPS}
+        self.journeys: Dict[str, Dict[str, int]] = {}
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def record(self, step: str, latency: float, outcome: str, size: int = 0) -> None:
+        self.latencies[step].append(latency)
+        self.outcomes[step][outcome] = self.outcomes[step].get(outcome, 0) + 1
+        self.bytes_received[step] += size
+
+    def record_journey(self, journey: str, outcome: str) -> None:
+        counters = self.journeys.setdefault(journey, {})
+        counters[outcome] = counters.get(outcome, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max((self.finished_at or time.monotonic()) - self.started_at, 1e-9)
+        routes = {}
+        total_requests = total_errors = 0
+        for step, samples in self.latencies.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            errors = sum(count for outcome, count in self.outcomes[step].items() if outcome != 'ok')
+            total_requests += len(samples)
+            total_errors += errors
+            method, path = STEPS[step]
+            routes[step] = {
+                'route': f"{method} {path}",
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': errors / len(samples),
+                'throughput_rps': len(samples) / elapsed,
+                'latency_ms': {
+                    'mean': sum(ordered) / len(ordered) * 1000,
+                    'p50': _percentile(ordered, 0.50) * 1000,
+                    'p95': _percentile(ordered, 0.95) * 1000,
+                    'p99': _percentile(ordered, 0.99) * 1000,
+                    'max': ordered[-1] * 1000,
+                },
+                'outcomes': dict(self.outcomes[step]),
+                'bytes_received': self.bytes_received[step],
+            }
+        completed = sum(counters.get('completed', 0) for counters in self.journeys.values())
+        return {
+            'elapsed_seconds': elapsed,
+            'requests': total_requests,
+            'errors': total_errors,
+            'error_rate': total_errors / total_requests if total_requests else 0.0,
+            'throughput_rps': total_requests / elapsed,
+            'journeys_completed_per_minute': completed / elapsed * 60,
+            'routes': routes,
+            'journeys': self.journeys,
+        }
+
+
+class FunnelClient:
+    """Issues the funnel requests for one journey and carries state between steps."""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str, stats: LoadStats,
+                 args: argparse.Namespace, rng: random.Random):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.args = args
+        self.rng = rng
+        self.context: Dict[str, Any] = {}
+
+    async def _call(self, step: str, params: Optional[Dict[str, Any]] = None,
+                    body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        method, path = STEPS[step]
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url + path, params=params, json=body) as response:
+                raw = await response.read()
+                latency = time.perf_counter() - start
+                status = response.status
+        except asyncio.TimeoutError:
+            self.stats.record(step, time.perf_counter() - start, 'timeout')
+            raise StepFailed(f"{step}: timeout")
+        except aiohttp.ClientError as e:
+            self.stats.record(step, time.perf_counter() - start, 'connection_error')
+            raise StepFailed(f"{step}: {e}")
+
+        try:
+            payload = json.loads(raw) if raw else {}
+        except ValueError:
+            payload = None
+        if status >= 400:
+            self.stats.record(step, latency, f"http_{status}", len(raw))
+            raise StepFailed(f"{step}: HTTP {status}")
+        if not isinstance(payload, dict):
+            self.stats.record(step, latency, 'invalid_json', len(raw))
+            raise StepFailed(f"{step}: response is not a JSON object")
+        if payload.get('status') == 'error':
+            self.stats.record(step, latency, 'status_error', len(raw))
+            raise StepFailed(f"{step}: {payload.get('message') or payload.get('error')}")
+        self.stats.record(step, latency, 'ok', len(raw))
+        return payload
+
+    def _search_body(self) -> Dict[str, Any]:
+        origin, destination = self.rng.choice(self.args.route_pairs)
+        min_days, max_days = self.args.days_range
+        departure = date.today() + timedelta(days=self.rng.randint(min_days, max_days))
+        segment = {'origin': origin, 'destination': destination, 'departureDate': departure.isoformat()}
+        round_trip = self.rng.random() < self.args.round_trip_share
+        if round_trip:
+            segment['returnDate'] = (departure + timedelta(days=self.rng.randint(3, 14))).isoformat()
+        return {
+            'tripType': 'ROUND_TRIP' if round_trip else 'ONE_WAY',
+            'odSegments': [segment],
+            'numAdults': self.args.adults,
+            'numChildren': 0,
+            'numInfants': 0,
+            'cabinPreference': self.rng.choice(CABINS),
+            'directOnly': False,
+        }
+
+    async def autocomplete(self) -> None:
+        body = self.context['search'] = self._search_body()
+        segment = body['odSegments'][0]
+        # A user types the first letters of each airport before picking it
+        for code in (segment['origin'], segment['destination']):
+            for length in range(2, len(code) + 1):
+                await self._call('autocomplete', params={'query': code[:length].lower(), 'limit': 10})
+
+    async def air_shopping(self) -> None:
+        payload = await self._call('air_shopping', body=self.context['search'])
+        data = payload.get('data') or {}
+        offers = data.get('offers') or []
+        if not offers:
+            raise StepFailed('air_shopping: no offers')
+        # Users mostly pick from the top of the list
+        self.context['offer'] = self.rng.choice(offers[:10])
+        self.context['search_metadata'] = data.get('metadata') or {}
+
+    async def refine(self) -> None:
+        await self._call('refine', body={**self.context['search'], **self.rng.choice(REFINEMENTS)})
+
+    async def flight_price(self) -> None:
+        offer, metadata = self.context['offer'], self.context['search_metadata']
+        shopping_response_ids = metadata.get('shopping_response_ids') or {}
+        airline = offer.get('airline')
+        airline_code = airline.get('code') if isinstance(airline, dict) else airline
+        shopping_response_id = shopping_response_ids.get(airline_code) or next(iter(shopping_response_ids.values()), '')
+        payload = await self._call('flight_price', body={
+            'offer_id': str(offer.get('id')),
+            'shopping_response_id': shopping_response_id,
+            'air_shopping_response': {'metadata': metadata},
+        })
+        data = payload.get('data') or {}
+        self.context['flight_price'] = data
+        self.context['flight_price_cache_key'] = (
+            payload.get('flight_price_cache_key') or (data.get('metadata') or {}).get('flight_price_cache_key')
+        )
+
+    def _flight_price_reference(self) -> Dict[str, Any]:
+        cache_key = self.context.get('flight_price_cache_key')
+        if cache_key:
+            return {'flight_price_cache_key': cache_key}
+        return {'flight_price_response': self.context.get('flight_price')}
+
+    async def service_list(self) -> None:
+        await self._call('service_list', body=self._flight_price_reference())
+
+    async def seat_availability(self) -> None:
+        await self._call('seat_availability', body=self._flight_price_reference())
+
+    async def order_create(self) -> None:
+        cache_key = self.context.get('flight_price_cache_key')
+        flight_price_response = {'metadata': {'flight_price_cache_key': cache_key}} if cache_key else self.context.get('flight_price')
+        await self._call('order_create', body={
+            'flight_price_response': flight_price_response,
+            'passengers': [_sample_passenger(self.rng, number) for number in range(1, self.args.adults + 1)],
+            'payment': {'payment_method': 'CASH', 'currency': 'USD'},
+            'contact_info': {
+                'email': 'load.test@example.com',
+                'phone': '700000000',
+                'phoneCountryCode': '254',
+                'street': '1 Load Test Road',
+                'postalCode': '00100',
+                'city': 'Nairobi',
+                'countryCode': 'KE',
+            },
+            'OfferID': str(self.context['offer'].get('id')),
+        })
+
+
+def _sample_passenger(rng: random.Random, number: int) -> Dict[str, Any]:
+    expiry_year = date.today().year + 5
+    return {
+        'type': 'adult',
+        'title': 'Mr',
+        'firstName': f'Load{number}',
+        'lastName': f'Tester{rng.randint(1000, 9999)}',
+        'gender': 'Male',
+        'nationality': 'KE',
+        'dob': {'year': '1990', 'month': '01', 'day': f'{number:02d}'},
+        'documentType': 'PT',
+        'documentNumber': f'LT{rng.randint(100000, 999999)}',
+        'issuingCountry': 'KE',
+        'expiryDate': {'year': str(expiry_year), 'month': '12', 'day': '31'},
+    }
+
+
+async def run_journey(client: FunnelClient, journey: str) -> None:
+    """Run the steps of ``journey`` with think times in between."""
+    for index, step in enumerate(JOURNEYS[journey]):
+        if index and client.args.think_range[1] > 0:
+            await asyncio.sleep(client.rng.uniform(*client.args.think_range))
+        try:
+            await getattr(client, step)()
+        except StepFailed as e:
+            logger.debug(f"Journey '{journey}' failed at {e}")
+            client.stats.record_journey(journey, f'failed_at_{step}')
+            return
+    client.stats.record_journey(journey, 'completed')
+
+
+async def virtual_user(user_id: int, session: aiohttp.ClientSession, stats: LoadStats,
+                       args: argparse.Namespace, deadline: float, budget: Dict[str, int]) -> None:
+    rng = random.Random(None if args.seed is None else args.seed + user_id)
+    names, weights = zip(*args.journey_mix.items())
+    if args.ramp_up > 0:
+        await asyncio.sleep(args.ramp_up * user_id / args.users)
+    while time.monotonic() < deadline:
+        if args.journeys:
+            if budget['remaining'] <= 0:
+                return
+            budget['remaining'] -= 1
+        journey = rng.choices(names, weights)[0]
+        await run_journey(FunnelClient(session, args.base_url, stats, args, rng), journey)
+
+
+async def run_load(args: argparse.Namespace) -> LoadStats:
+    stats = LoadStats()
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.users, limit_per_host=args.users)
+    deadline = time.monotonic() + args.duration
+    budget = {'remaining': args.journeys}
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        reporter = asyncio.create_task(_progress(stats, args.report_interval))
+        try:
+            await asyncio.gather(*(
+                virtual_user(user_id, session, stats, args, deadline, budget) for user_id in range(args.users)
+            ))
+        finally:
+            reporter.cancel()
+    stats.finished_at = time.monotonic()
+    return stats
+
+
+async def _progress(stats: LoadStats, interval: float) -> None:
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        summary = stats.summary()
+        print(f"[{summary['elapsed_seconds']:6.0f}s] {summary['requests']} requests, "
+              f"{summary['throughput_rps']:.1f} req/s, {summary['error_rate'] * 100:.1f}% errors", file=sys.stderr)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_range(value: str, cast=float) -> Tuple[Any, Any]:
+    low, _, high = value.partition('-')
+    low = cast(low)
+    return low, cast(high) if high else low
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"Unknown journey '{name}' (choose from {', '.join(JOURNEYS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def _parse_routes(value: str) -> List[Tuple[str, str]]:
+    pairs = []
+    for item in value.split(','):
+        origin, _, destination = item.strip().upper().partition('-')
+        if len(origin) != 3 or len(destination) != 3:
+            raise argparse.ArgumentTypeError(f"Expected routes like NBO-DXB, got '{item}'")
+        pairs.append((origin, destination))
+    return pairs
+
+
+def print_report(summary: Dict[str, Any], stream) -> None:
+    print(f"{'step':<19}{'route':<40}{'requests':>9}{'err %':>7}{'req/s':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}", file=stream)
+    for step, row in summary['routes'].items():
+        latency = row['latency_ms']
+        print(f"{step:<19}{row['route']:<40}{row['requests']:>9}{row['error_rate'] * 100:>7.1f}"
+              f"{row['throughput_rps']:>8.1f}{latency['p50']:>9.0f}{latency['p95']:>9.0f}"
+              f"{latency['p99']:>9.0f}{latency['max']:>9.0f}", file=stream)
+    print(file=stream)
+    for journey, counters in summary['journeys'].items():
+        outcomes = ', '.join(f"{outcome}={count}" for outcome, count in sorted(counters.items()))
+        print(f"journey {journey:<12} {outcomes}", file=stream)
+    print(f"\n{summary['requests']} requests in {summary['elapsed_seconds']:.1f}s: "
+          f"{summary['throughput_rps']:.1f} req/s, {summary['error_rate'] * 100:.2f}% errors, "
+          f"{summary['journeys_completed_per_minute']:.1f} completed journeys/min", file=stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the booking funnel of a running backend')
+    parser.add_argument('--base-url', default='http://localhost:8000', help='Backend base URL')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Test duration in seconds')
+    parser.add_argument('--ramp-up', type=float, default=0, help='Seconds over which users are started')
+    parser.add_argument('--journeys', type=int, default=0, help='Stop after this many journeys (0: run for --duration)')
+    parser.add_argument('--mix', default='browse=50,price=30,ancillaries=20',
+                        help='Journey weights, e.g. browse=50,price=25,ancillaries=15,book=10')
+    parser.add_argument('--allow-booking', action='store_true',
+                        help='Allow the book journey (creates orders on the configured NDC endpoint)')
+    parser.add_argument('--think-time', default='0.5-2', help='Seconds between steps, a value or a min-max range')
+    parser.add_argument('--routes', default='NBO-DXB,DXB-LHR,LHR-JFK,NBO-LHR', help='Origin-destination pairs to search')
+    parser.add_argument('--days-ahead', default='14-60', help='Departure date range in days from today')
+    parser.add_argument('--round-trip-share', type=float, default=0.3, help='Share of round trip searches')
+    parser.add_argument('--adults', type=int, default=1, help='Adults per search and booking')
+    parser.add_argument('--timeout', type=float, default=90, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible journeys')
+    parser.add_argument('--report-interval', type=float, default=10, help='Seconds between progress lines (0: off)')
+    parser.add_argument('--output', help='Write the JSON results to this file (default: stdout)')
+    parser.add_argument('--max-error-rate', type=float, help='Exit with status 1 above this overall error rate')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+    try:
+        args.journey_mix = _parse_mix(args.mix)
+        args.route_pairs = _parse_routes(args.routes)
+        args.think_range = _parse_range(args.think_time)
+        args.days_range = _parse_range(args.days_ahead, int)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+    if not args.journey_mix:
+        parser.error('--mix selects no journeys')
+    if 'book' in args.journey_mix and not args.allow_booking:
+        parser.error('the book journey creates real orders; pass --allow-booking (against a mock NDC server)')
+    if args.users < 1:
+        parser.error('--users must be at least 1')
+
+    stats = asyncio.run(run_load(args))
+    summary = stats.summary()
+    results = {
+        'version': RESULTS_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'config': {
+            'base_url': args.base_url,
+            'users': args.users,
+            'duration': args.duration,
+            'ramp_up': args.ramp_up,
+            'journeys': args.journeys,
+            'mix': args.journey_mix,
+            'think_time': list(args.think_range),
+            'routes': ['-'.join(pair) for pair in args.route_pairs],
+            'days_ahead': list(args.days_range),
+            'round_trip_share': args.round_trip_share,
+            'adults': args.adults,
+        },
+        **summary,
+    }
+
+    print_report(summary, sys.stderr)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"\nResults written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.max_error_rate is not None and summary['error_rate'] > args.max_error_rate:
+        print(f"Error rate {summary['error_rate'] * 100:.2f}% exceeds {args.max_error_rate * 100:.2f}%", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
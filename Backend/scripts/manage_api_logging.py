@@ -80,11 +80,11 @@ def status():
         logs_dir = Path('api_logs')
         if logs_dir.exists():
             # Count log files
-            air_shopping_logs = len(list((logs_dir / 'air_shopping').glob('*.json'))) if (logs_dir / 'air_shopping').exists() else 0
-            flight_price_logs = len(list((logs_dir / 'flight_price').glob('*.json'))) if (logs_dir / 'flight_price').exists() else 0
-            booking_logs = len(list((logs_dir / 'booking').glob('*.json'))) if (logs_dir / 'booking').exists() else 0
-            service_list_logs = len(list((logs_dir / 'service_list').glob('*.json'))) if (logs_dir / 'service_list').exists() else 0
-            seat_availability_logs = len(list((logs_dir / 'seat_availability').glob('*.json'))) if (logs_dir / 'seat_availability').exists() else 0
+            air_shopping_logs = len(list((logs_dir / 'air_shopping').glob('*.json*'))) if (logs_dir / 'air_shopping').exists() else 0
+            flight_price_logs = len(list((logs_dir / 'flight_price').glob('*.json*'))) if (logs_dir / 'flight_price').exists() else 0
+            booking_logs = len(list((logs_dir / 'booking').glob('*.json*'))) if (logs_dir / 'booking').exists() else 0
+            service_list_logs = len(list((logs_dir / 'service_list').glob('*.json*'))) if (logs_dir / 'service_list').exists() else 0
+            seat_availability_logs = len(list((logs_dir / 'seat_availability').glob('*.json*'))) if (logs_dir / 'seat_availability').exists() else 0
             
             print(f"Logs directory: {logs_dir.absolute()}")
             print(f"Log files:")
@@ -123,7 +123,7 @@ def _cleanup_logs_fallback(days_to_keep=7):
         cutoff_time = time.time() - (days_to_keep * 24 * 60 * 60)
         cleaned_count = 0
 
-        for log_file in logs_dir.rglob("*.json"):
+        for log_file in logs_dir.rglob("*.json*"):
             if log_file.stat().st_mtime < cutoff_time:
                 log_file.unlink()
                 cleaned_count += 1
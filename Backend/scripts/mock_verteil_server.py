@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Mock Verteil NDC Server
+
+Local stand-in for the Verteil NDC API so the search -> price -> seats -> book
+flow can be load tested offline. Point the backend at it with::
+
+    VERTEIL_API_BASE_URL=http://localhost:8090
+
+Endpoints:
+    POST /oauth2/token                                   client_credentials token
+    POST /entrygate/rest/request:airShopping             AirShoppingRS
+    POST /entrygate/rest/request:flightPrice             FlightPriceRS
+    POST /entrygate/rest/request:(pre)ServiceList        ServiceListRS
+    POST /entrygate/rest/request:(pre)SeatAvailability   SeatAvailabilityRS
+    POST /entrygate/rest/request:orderCreate             OrderCreateRS
+    GET  /__mock/stats                                   request counters
+    GET|POST /__mock/config                              read/change injection settings
+    POST /__mock/reset                                   clear counters and issued tokens
+
+Responses are served round-robin from the NDC fixtures in ``Seats & Services``
+and, with ``--api-logs``, the successful responses recorded by the API logger.
+Each response is serialized once at startup, so the server itself adds almost
+no CPU time to a load test.
+
+NDC calls must carry a bearer token issued by the token endpoint that has not
+expired (``--token-ttl``), so token refresh paths are exercised as well.
+Latency (``--latency-ms`` plus up to ``--jitter-ms``, per service with
+``--service-latency``) and the share of 500, 401 and 429 responses
+(``--error-rate``, ``--unauthorized-rate``, ``--rate-limit-rate``) can be
+changed while the server runs through ``POST /__mock/config``.
+
+Usage:
+    python scripts/mock_verteil_server.py [--port 8090] [--latency-ms 300]
+        [--jitter-ms 200] [--service-latency AirShopping=1500]
+        [--error-rate 0.01] [--unauthorized-rate 0.005] [--rate-limit-rate 0.02]
+        [--api-logs api_logs]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# Add the Backend directory to Python path so we can import utils
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from utils.api_logger import APILogger
+
+logger = logging.getLogger('mock_verteil_server')
+
+DEFAULT_FIXTURES_DIR = backend_dir / 'Seats & Services'
+NDC_PATH_PREFIX = '/entrygate/rest/request:'
+
+# Fixture file -> service name
+FIXTURE_FILES = {
+    '2_AirShoppingRS.json': 'AirShopping',
+    '4_FlightPriceRS.json': 'FlightPrice',
+    '6_ServiceListRS.json': 'ServiceList',
+    '8_SeatAvailabilityRS.json': 'SeatAvailability',
+    '10_OrderCreateRS.json': 'OrderCreate',
+}
+
+# NDC action in the request path -> service name
+NDC_ACTIONS = {
+    'airShopping': 'AirShopping',
+    'flightPrice': 'FlightPrice',
+    'serviceList': 'ServiceList',
+    'preServiceList': 'ServiceList',
+    'seatAvailability': 'SeatAvailability',
+    'preSeatAvailability': 'SeatAvailability',
+    'orderCreate': 'OrderCreate',
+}
+
+# Settings that can be changed through POST /__mock/config
+RUNTIME_SETTINGS = ('latency_ms', 'jitter_ms', 'service_latency_ms', 'error_rate',
+                    'unauthorized_rate', 'rate_limit_rate', 'retry_after', 'token_ttl')
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class MockConfig:
+    """Environment driven defaults for the mock server (overridable on the command line)."""
+
+    HOST = os.getenv('MOCK_VERTEIL_HOST', '127.0.0.1')
+    PORT = int(os.getenv('MOCK_VERTEIL_PORT', 8090))
+    TOKEN_PATH = os.getenv('VERTEIL_TOKEN_ENDPOINT', '/oauth2/token')
+    # Credentials required by the token endpoint; any Basic credentials are accepted when unset
+    USERNAME = os.getenv('MOCK_VERTEIL_USERNAME', '')
+    PASSWORD = os.getenv('MOCK_VERTEIL_PASSWORD', '')
+    TOKEN_TTL = int(os.getenv('MOCK_VERTEIL_TOKEN_TTL', 3600))
+    # Base latency plus uniform jitter, in milliseconds
+    LATENCY_MS = _env_float('MOCK_VERTEIL_LATENCY_MS', 0)
+    JITTER_MS = _env_float('MOCK_VERTEIL_JITTER_MS', 0)
+    # Share of NDC calls answered with 500, 401 and 429
+    ERROR_RATE = _env_float('MOCK_VERTEIL_ERROR_RATE', 0)
+    UNAUTHORIZED_RATE = _env_float('MOCK_VERTEIL_UNAUTHORIZED_RATE', 0)
+    RATE_LIMIT_RATE = _env_float('MOCK_VERTEIL_RATE_LIMIT_RATE', 0)
+    # Retry-After seconds sent with injected 429s
+    RETRY_AFTER = int(os.getenv('MOCK_VERTEIL_RETRY_AFTER', 1))
+
+
+def _ndc_error(code: str, text: str) -> Dict[str, Any]:
+    """Build an error body shaped like a Verteil NDC error response."""
+    return {'Errors': {'Error': [{'Code': code, 'ShortText': text, 'value': text}]}}
+
+
+def load_responses(fixtures_dir: Path, api_logs_dir: Optional[Path] = None) -> Dict[str, List[Tuple[str, bytes]]]:
+    """
+    Load and pre-serialize the responses to serve.
+
+    Args:
+        fixtures_dir: Directory with the numbered NDC fixtures
+        api_logs_dir: Optional API logger directory to add recorded 200 responses from
+
+    Returns:
+        Service name -> [(source, JSON body)]
+    """
+    responses: Dict[str, List[Tuple[str, bytes]]] = {service: [] for service in FIXTURE_FILES.values()}
+
+    for file_name, service in FIXTURE_FILES.items():
+        path = fixtures_dir / file_name
+        if not path.exists():
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            body = json.dumps(json.load(f), separators=(',', ':')).encode('utf-8')
+        responses[service].append((file_name, body))
+
+    if api_logs_dir is not None:
+        reader = APILogger(base_dir=str(api_logs_dir))
+        for service in responses:
+            for source, record in reader.iter_records(service, record_type='response'):
+                if record.get('status_code') == 200 and isinstance(record.get('response'), dict):
+                    body = json.dumps(record['response'], separators=(',', ':')).encode('utf-8')
+                    responses[service].append((source, body))
+
+    return responses
+
+
+class MockVerteilServer:
+    """aiohttp application serving recorded NDC responses with fault injection."""
+
+    def __init__(self, responses: Dict[str, List[Tuple[str, bytes]]], settings: Dict[str, Any],
+                 username: str = '', password: str = '', token_path: str = '/oauth2/token'):
+        """
+        Args:
+            responses: Output of ``load_responses``
+            settings: Initial values for ``RUNTIME_SETTINGS``
+            username: Required token endpoint user (any when empty)
+            password: Required token endpoint password
+            token_path: Path of the token endpoint
+        """
+        self.responses = responses
+        self.settings = dict(settings)
+        self.username = username
+        self.password = password
+        self.token_path = '/' + token_path.lstrip('/')
+        self._cursors: Dict[str, int] = {service: 0 for service in responses}
+        # token -> expiry (epoch seconds)
+        self._tokens: Dict[str, float] = {}
+        self._random = random.Random()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self._started_at = time.time()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._in_flight = 0
+        self._max_in_flight = 0
+
+    def _count(self, service: str, outcome: str) -> None:
+        service_stats = self._stats.setdefault(service, {})
+        service_stats[outcome] = service_stats.get(outcome, 0) + 1
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post(self.token_path, self.handle_token)
+        app.router.add_post(NDC_PATH_PREFIX + '{action}', self.handle_ndc)
+        app.router.add_get('/__mock/stats', self.handle_stats)
+        app.router.add_get('/__mock/config', self.handle_config)
+        app.router.add_post('/__mock/config', self.handle_config)
+        app.router.add_post('/__mock/reset', self.handle_reset)
+        return app
+
+    # -- token endpoint ----------------------------------------------------
+
+    def _check_basic_auth(self, header: str) -> bool:
+        if not header.startswith('Basic '):
+            return False
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+        except (ValueError, UnicodeDecodeError):
+            return False
+        if not self.username:
+            return bool(username)
+        return secrets.compare_digest(username, self.username) and secrets.compare_digest(password, self.password)
+
+    async def handle_token(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        if form.get('grant_type') != 'client_credentials':
+            self._count('Token', '400')
+            return web.json_response({'error': 'unsupported_grant_type'}, status=400)
+        if not self._check_basic_auth(request.headers.get('Authorization', '')):
+            self._count('Token', '401')
+            return web.json_response({'error': 'invalid_client'}, status=401)
+
+        ttl = int(self.settings['token_ttl'])
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        self._tokens[token] = now + ttl
+        # Drop expired tokens so long runs do not grow the table
+        if len(self._tokens) > 1000:
+            self._tokens = {key: expiry for key, expiry in self._tokens.items() if expiry > now}
+        self._count('Token', '200')
+        return web.json_response({
+            'access_token': token,
+            'token_type': 'bearer',
+            'expires_in': ttl,
+            'scope': 'api',
+        })
+
+    # -- NDC endpoints -----------------------------------------------------
+
+    def _has_valid_token(self, header: str) -> bool:
+        if not header.startswith('Bearer '):
+            return False
+        expiry = self._tokens.get(header[7:])
+        return expiry is not None and expiry > time.time()
+
+    def _latency(self, service: str) -> float:
+        latency_ms = self.settings['service_latency_ms'].get(service, self.settings['latency_ms'])
+        jitter_ms = self.settings['jitter_ms']
+        if jitter_ms:
+            latency_ms += self._random.uniform(0, jitter_ms)
+        return max(latency_ms, 0) / 1000
+
+    def _next_response(self, service: str) -> Optional[bytes]:
+        pool = self.responses.get(service)
+        if not pool:
+            return None
+        index = self._cursors[service] % len(pool)
+        self._cursors[service] = index + 1
+        return pool[index][1]
+
+    async def handle_ndc(self, request: web.Request) -> web.Response:
+        action = request.match_info['action']
+        service = NDC_ACTIONS.get(action)
+        if service is None:
+            self._count(action, '404')
+            return web.json_response(_ndc_error('404', f'Unknown NDC action: {action}'), status=404)
+
+        self._in_flight += 1
+        self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        try:
+            # Read the body like the real API would before answering
+            await request.read()
+            await asyncio.sleep(self._latency(service))
+
+            if not self._has_valid_token(request.headers.get('Authorization', '')):
+                self._count(service, '401')
+                return web.json_response({'error': 'invalid_token', 'error_description': 'Access token expired or invalid'}, status=401)
+
+            roll = self._random.random()
+            if roll < self.settings['unauthorized_rate']:
+                self._count(service, '401_injected')
+                return web.json_response({'error': 'invalid_token', 'error_description': 'Access token expired'}, status=401)
+            roll -= self.settings['unauthorized_rate']
+            if roll < self.settings['rate_limit_rate']:
+                self._count(service, '429_injected')
+                return web.json_response(
+                    _ndc_error('429', 'Too many requests'), status=429,
+                    headers={'Retry-After': str(self.settings['retry_after'])}
+                )
+            roll -= self.settings['rate_limit_rate']
+            if roll < self.settings['error_rate']:
+                self._count(service, '500_injected')
+                return web.json_response(_ndc_error('500', 'Internal server error (injected)'), status=500)
+
+            body = self._next_response(service)
+            if body is None:
+                self._count(service, '404')
+                return web.json_response(_ndc_error('404', f'No recorded {service} responses'), status=404)
+            self._count(service, '200')
+            return web.Response(body=body, content_type='application/json')
+        finally:
+            self._in_flight -= 1
+
+    # -- control endpoints -------------------------------------------------
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'uptime_seconds': round(time.time() - self._started_at, 1),
+            'in_flight': self._in_flight,
+            'max_in_flight': self._max_in_flight,
+            'active_tokens': sum(1 for expiry in self._tokens.values() if expiry > time.time()),
+            'responses_loaded': {service: len(pool) for service, pool in self.responses.items()},
+            'services': self._stats,
+        })
+
+    async def handle_config(self, request: web.Request) -> web.Response:
+        if request.method == 'POST':
+            try:
+                updates = await request.json()
+            except ValueError:
+                return web.json_response({'status': 'error', 'error': 'Body must be JSON'}, status=400)
+            unknown = [key for key in updates if key not in RUNTIME_SETTINGS]
+            if unknown:
+                return web.json_response({'status': 'error', 'error': f"Unknown settings: {', '.join(unknown)}"}, status=400)
+            self.settings.update(updates)
+            logger.info(f"Mock settings updated: {updates}")
+        return web.json_response({'status': 'success', 'settings': self.settings})
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        self._tokens.clear()
+        return web.json_response({'status': 'success'})
+
+
+def _parse_service_latency(values: List[str]) -> Dict[str, float]:
+    latencies = {}
+    for value in values:
+        service, _, latency = value.partition('=')
+        if service not in FIXTURE_FILES.values() or not latency:
+            raise argparse.ArgumentTypeError(f"Expected <Service>=<ms> with a service of "
+                                             f"{', '.join(FIXTURE_FILES.values())}, got '{value}'")
+        latencies[service] = float(latency)
+    return latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Local mock of the Verteil NDC API')
+    parser.add_argument('--host', default=MockConfig.HOST)
+    parser.add_argument('--port', type=int, default=MockConfig.PORT)
+    parser.add_argument('--fixtures', type=Path, default=DEFAULT_FIXTURES_DIR, help='Directory of NDC fixtures')
+    parser.add_argument('--api-logs', type=Path, help='Also serve 200 responses recorded in this API log directory')
+    parser.add_argument('--token-path', default=MockConfig.TOKEN_PATH)
+    parser.add_argument('--token-ttl', type=int, default=MockConfig.TOKEN_TTL, help='Token lifetime in seconds')
+    parser.add_argument('--latency-ms', type=float, default=MockConfig.LATENCY_MS)
+    parser.add_argument('--jitter-ms', type=float, default=MockConfig.JITTER_MS)
+    parser.add_argument('--service-latency', action='append', default=[], metavar='SERVICE=MS',
+                        help='Base latency for one service, e.g. AirShopping=1500 (repeatable)')
+    parser.add_argument('--error-rate', type=float, default=MockConfig.ERROR_RATE, help='Share of 500 responses')
+    parser.add_argument('--unauthorized-rate', type=float, default=MockConfig.UNAUTHORIZED_RATE, help='Share of 401 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=MockConfig.RATE_LIMIT_RATE, help='Share of 429 responses')
+    parser.add_argument('--retry-after', type=int, default=MockConfig.RETRY_AFTER, help='Retry-After seconds on 429')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.INFO),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    # One line per request would dominate a load test
+    logging.getLogger('aiohttp.access').setLevel(logging.WARNING)
+
+    try:
+        service_latency = _parse_service_latency(args.service_latency)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    responses = load_responses(args.fixtures, args.api_logs)
+    for service, pool in responses.items():
+        logger.info(f"{service}: {len(pool)} recorded responses")
+    if not any(responses.values()):
+        logger.error(f"No responses found in {args.fixtures}")
+        return 1
+
+    server = MockVerteilServer(
+        responses,
+        settings={
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'service_latency_ms': service_latency,
+            'error_rate': args.error_rate,
+            'unauthorized_rate': args.unauthorized_rate,
+            'rate_limit_rate': args.rate_limit_rate,
+            'retry_after': args.retry_after,
+            'token_ttl': args.token_ttl,
+        },
+        username=MockConfig.USERNAME,
+        password=MockConfig.PASSWORD,
+        token_path=args.token_path,
+    )
+    logger.info(f"Mock Verteil API on http://{args.host}:{args.port} "
+                f"(set VERTEIL_API_BASE_URL=http://{args.host}:{args.port})")
+    web.run_app(server.create_app(), host=args.host, port=args.port, print=None)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Async Redis-based Flight Data Storage Service
+
+Asyncio counterpart of ``RedisFlightStorage`` built on ``redis.asyncio``. It
+exposes the same ``store_*``/``get_*`` API (as coroutines) and writes the same
+key layout and payload format, so data stored by either implementation can be
+read by the other. Each worker process owns one connection pool, created in
+``before_serving`` so that it is bound to the worker's event loop.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from config.redis_config import get_async_redis_connection
+from services.metrics import cache_payload_bytes, cache_requests, cache_writes
+from services.payload_codec import decode_payload, encode_storage_data
+
+logger = logging.getLogger(__name__)
+
+
+# data_type -> (label used in messages, stored data_type, compressed in the legacy format)
+# Mirrors the formats written by RedisFlightStorage for each data type.
+_DATA_TYPES = {
+    'search': ('Flight search', 'flight_search', True),
+    'price': ('Flight price', 'flight_price', False),
+    'booking': ('Booking', 'booking_data', False),
+    'seat_availability': ('Seat availability', 'seat_availability', True),
+    'service_list': ('Service list', 'service_list', True),
+}
+
+
+class AsyncRedisFlightStorage:
+    """Asyncio Redis storage for flight data with automatic expiration."""
+
+    RECONNECT_INTERVAL = 30  # seconds between reconnect attempts while Redis is down
+
+    def __init__(self):
+        """Create the storage; the connection pool is opened by ``initialize()``."""
+        self.redis_client = None
+        self.redis_available = False
+        self.default_ttl = 300  # 5 minutes in seconds (matches RedisFlightStorage)
+        self._loop = None
+        self._init_lock: Optional[asyncio.Lock] = None
+        self._last_connect_attempt = 0.0
+
+    async def initialize(self) -> bool:
+        """
+        Open the per-worker connection pool and verify it with a PING.
+
+        Returns:
+            bool: True if Redis is reachable
+        """
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+
+        async with self._init_lock:
+            loop = asyncio.get_running_loop()
+            if self.redis_client is not None and self._loop is loop and self.redis_available:
+                return True
+
+            self._last_connect_attempt = time.monotonic()
+            try:
+                # Payloads are raw bytes (see services.payload_codec)
+                client = get_async_redis_connection(decode_responses=False)
+                await client.ping()
+                self.redis_client = client
+                self.redis_available = True
+                self._loop = loop
+                logger.info("Async Redis Flight Storage initialized successfully")
+            except Exception as e:
+                logger.warning(f"Async Redis connection failed: {e}. Running without Redis cache.")
+                self.redis_client = None
+                self.redis_available = False
+
+        return self.redis_available
+
+    async def close(self) -> None:
+        """Close the worker's connection pool."""
+        client, self.redis_client = self.redis_client, None
+        self.redis_available = False
+        if client is not None:
+            try:
+                await client.aclose() if hasattr(client, 'aclose') else await client.close()
+                await client.connection_pool.disconnect()
+            except Exception as e:
+                logger.warning(f"Error closing async Redis pool: {e}")
+
+    async def _ensure_client(self) -> bool:
+        """Make sure a pool bound to the running loop exists, reconnecting if due."""
+        if self.redis_available and self._loop is asyncio.get_running_loop():
+            return True
+        if (not self.redis_available and self._last_connect_attempt
+                and time.monotonic() - self._last_connect_attempt < self.RECONNECT_INTERVAL):
+            return False
+        return await self.initialize()
+
+    async def is_available(self) -> bool:
+        """Return True if Redis can currently be used."""
+        return await self._ensure_client()
+
+    async def get_client(self):
+        """Return the worker's Redis client, or None while Redis is unavailable."""
+        if not await self._ensure_client():
+            return None
+        return self.redis_client
+
+    async def ping(self) -> bool:
+        """PING Redis; returns False instead of raising when unreachable."""
+        if not await self._ensure_client():
+            return False
+        try:
+            return bool(await self.redis_client.ping())
+        except Exception as e:
+            logger.warning(f"Async Redis ping failed: {e}")
+            return False
+
+    def _generate_session_id(self) -> str:
+        """Generate a unique session ID for flight data."""
+        return str(uuid.uuid4())
+
+    def _get_key(self, session_id: str, data_type: str) -> str:
+        """Generate Redis key for flight data."""
+        return f"flight:{data_type}:{session_id}"
+
+    async def _store(
+        self,
+        data_type: str,
+        data: Dict[str, Any],
+        session_id: Optional[str],
+        ttl: Optional[int]
+    ) -> Dict[str, Any]:
+        """Store ``data`` under ``flight:{data_type}:{session_id}``."""
+        label, stored_type, compressed = _DATA_TYPES[data_type]
+        lower_label = label.lower()
+
+        try:
+            if not session_id:
+                session_id = self._generate_session_id()
+
+            if not ttl:
+                ttl = self.default_ttl
+
+            if not await self._ensure_client():
+                cache_writes.inc(storage=data_type, result='unavailable')
+                logger.warning(f"Redis not available, cannot store {lower_label} data")
+                return {
+                    "success": True,
+                    "session_id": session_id,
+                    "expires_at": (datetime.utcnow() + timedelta(seconds=ttl)).isoformat(),
+                    "message": f"{label} data processed (Redis unavailable - data not cached)"
+                }
+
+            key = self._get_key(session_id, data_type)
+
+            storage_data = {
+                "data": data,
+                "stored_at": datetime.utcnow().isoformat(),
+                "expires_at": (datetime.utcnow() + timedelta(seconds=ttl)).isoformat(),
+                "data_type": stored_type
+            }
+
+            if compressed and data_type == 'search':
+                storage_data["compressed"] = True
+            payload = encode_storage_data(storage_data, compressed)
+
+            await self.redis_client.setex(key, ttl, payload)
+            cache_writes.inc(storage=data_type, result='stored')
+            cache_payload_bytes.observe(len(payload), storage=data_type, operation='write')
+
+            logger.info(f"Stored {lower_label} data for session_id: {session_id}")
+
+            return {
+                "success": True,
+                "session_id": session_id,
+                "expires_at": storage_data["expires_at"],
+                "message": f"{label} data stored successfully"
+            }
+
+        except Exception as e:
+            cache_writes.inc(storage=data_type, result='error')
+            logger.error(f"Failed to store {lower_label} data: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"Failed to store {lower_label} data"
+            }
+
+    async def _get(self, data_type: str, session_id: str) -> Dict[str, Any]:
+        """Retrieve data stored under ``flight:{data_type}:{session_id}``."""
+        label, _, _ = _DATA_TYPES[data_type]
+        lower_label = label.lower()
+
+        try:
+            if not await self._ensure_client():
+                cache_requests.inc(storage=data_type, result='unavailable')
+                logger.warning(f"Redis not available, cannot retrieve {lower_label} data")
+                return {
+                    "success": False,
+                    "error": "Redis cache unavailable",
+                    "message": f"{label} data cannot be retrieved (Redis unavailable)"
+                }
+
+            key = self._get_key(session_id, data_type)
+            stored_data = await self.redis_client.get(key)
+
+            if not stored_data:
+                cache_requests.inc(storage=data_type, result='miss')
+                return {
+                    "success": False,
+                    "error": f"{label} data not found or expired",
+                    "message": f"No {lower_label} data found for this session"
+                }
+
+            # Binary, compressed text and plain JSON entries are all decoded here
+            parsed_data = decode_payload(stored_data)
+            cache_requests.inc(storage=data_type, result='hit')
+            cache_payload_bytes.observe(len(stored_data), storage=data_type, operation='read')
+
+            logger.info(f"Retrieved {lower_label} data for session_id: {session_id}")
+
+            return {
+                "success": True,
+                "data": parsed_data["data"],
+                "stored_at": parsed_data["stored_at"],
+                "expires_at": parsed_data["expires_at"],
+                "message": f"{label} data retrieved successfully"
+            }
+
+        except Exception as e:
+            cache_requests.inc(storage=data_type, result='error')
+            logger.error(f"Failed to retrieve {lower_label} data: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"Failed to retrieve {lower_label} data"
+            }
+
+    async def store_flight_search(
+        self,
+        search_data: Dict[str, Any],
+        session_id: Optional[str] = None,
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store flight search data in Redis. See RedisFlightStorage.store_flight_search."""
+        return await self._store('search', search_data, session_id, ttl)
+
+    async def get_flight_search(self, session_id: str) -> Dict[str, Any]:
+        """Retrieve flight search data from Redis."""
+        return await self._get('search', session_id)
+
+    async def store_flight_price(
+        self,
+        price_data: Dict[str, Any],
+        session_id: str,
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store flight price data in Redis."""
+        return await self._store('price', price_data, session_id, ttl)
+
+    async def get_flight_price(self, session_id: str) -> Dict[str, Any]:
+        """Retrieve flight price data from Redis."""
+        return await self._get('price', session_id)
+
+    async def store_booking_data(
+        self,
+        booking_data: Dict[str, Any],
+        session_id: str,
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store booking data in Redis."""
+        return await self._store('booking', booking_data, session_id, ttl)
+
+    async def get_booking_data(self, session_id: str) -> Dict[str, Any]:
+        """Retrieve booking data from Redis."""
+        return await self._get('booking', session_id)
+
+    async def store_seat_availability(
+        self,
+        seat_data: Dict[str, Any],
+        session_id: str,
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store seat availability data in Redis."""
+        return await self._store('seat_availability', seat_data, session_id, ttl)
+
+    async def get_seat_availability(self, session_id: str) -> Dict[str, Any]:
+        """Retrieve seat availability data from Redis."""
+        return await self._get('seat_availability', session_id)
+
+    async def store_service_list(
+        self,
+        service_data: Dict[str, Any],
+        session_id: str,
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store service list data in Redis."""
+        return await self._store('service_list', service_data, session_id, ttl)
+
+    async def get_service_list(self, session_id: str) -> Dict[str, Any]:
+        """Retrieve service list data from Redis."""
+        return await self._get('service_list', session_id)
+
+    async def delete_keys(self, *keys: str) -> int:
+        """Delete raw Redis keys; returns the number of keys removed."""
+        if not keys or not await self._ensure_client():
+            return 0
+        return await self.redis_client.delete(*keys)
+
+    async def delete_session_data(self, session_id: str) -> Dict[str, Any]:
+        """
+        Delete all flight data for a session.
+
+        Args:
+            session_id: Session ID to delete data for
+
+        Returns:
+            Dict with success status and any error messages
+        """
+        try:
+            if not await self._ensure_client():
+                logger.warning("Redis not available, cannot delete session data")
+                return {
+                    "success": True,
+                    "deleted_count": 0,
+                    "message": "Session data deletion skipped (Redis unavailable)"
+                }
+
+            deleted_count = await self.delete_keys(
+                self._get_key(session_id, "search"),
+                self._get_key(session_id, "price"),
+                self._get_key(session_id, "booking")
+            )
+
+            logger.info(f"Deleted {deleted_count} keys for session_id: {session_id}")
+
+            return {
+                "success": True,
+                "deleted_count": deleted_count,
+                "message": f"Deleted {deleted_count} data entries for session"
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to delete session data: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Failed to delete session data"
+            }
+
+
+# Create a singleton instance (one connection pool per worker process)
+async_redis_flight_storage = AsyncRedisFlightStorage()
@@ -23,9 +23,9 @@ from typing import Dict, Any, List, Optional
 
 from .core import FlightService
 from .decorators import async_rate_limited, async_cache
-from .exceptions import ValidationError, FlightServiceError
-from transformers.enhanced_air_shopping_transformer import transform_air_shopping_for_results_enhanced
-from utils.multi_airline_flight_card_generator import generate_enhanced_flight_cards
+from .exceptions import ValidationError, FlightServiceError, CircuitOpenError, DeadlineExceeded
+from services.transform_executor import transform_executor
+from utils.offer_index import offer_index_cache_key
 from scripts.build_airshopping_rq import build_airshopping_request
 
 logger = logging.getLogger(__name__)
@@ -165,27 +165,29 @@ class AirShoppingService(FlightService):
                 logger.error(f"Unexpected error during raw flight search: {str(e)}", exc_info=True)
                 raise FlightServiceError(f"An unexpected error occurred: {e}") from e
             
-            # Step 2: Enhanced transformation with multi-airline support
-            transform_start = datetime.now()
+            # Steps 2-3: Enhanced transformation with multi-airline support and
+            # flight card generation, run off the event loop by the transform executor
+            stage_start = datetime.now()
             filter_airlines = self.config.get('FILTER_UNSUPPORTED_AIRLINES', False)
-            # Pass search context for intelligent route display
-            transformed_data = transform_air_shopping_for_results_enhanced(raw_response, filter_airlines, search_criteria)
-            transform_time = (datetime.now() - transform_start).total_seconds()
-            
-            offers = transformed_data.get('offers', [])
-            metadata = transformed_data.get('metadata', {})
-            
+            # Pass search context for intelligent route display (app config stays behind)
+            search_context = {k: v for k, v in search_criteria.items() if k != 'config'}
+            stage_result = await transform_executor.run(
+                'air_shopping', raw_response,
+                filter_airlines=filter_airlines, search_context=search_context
+            )
+            stage_time = (datetime.now() - stage_start).total_seconds()
+
+            metadata = stage_result['metadata']
+            enhanced_flight_cards = stage_result['cards']
+            transform_time = stage_result['transform_time']
+            card_time = stage_result['card_time']
+
             logger.info(f"Enhanced transformation completed in {transform_time:.3f}s - "
                        f"{metadata.get('total_offers', 0)} offers, "
                        f"Multi-airline: {metadata.get('is_multi_airline', False)} - "
                        f"Request ID: {request_id}")
-            
-            # Step 3: Generate enhanced flight cards
-            card_start = datetime.now()
-            enhanced_flight_cards = generate_enhanced_flight_cards(raw_response, offers)
-            card_time = (datetime.now() - card_start).total_seconds()
-            
-            logger.info(f"Enhanced flight cards generated in {card_time:.3f}s - "
+            logger.info(f"Enhanced flight cards generated in {card_time:.3f}s "
+                       f"(transform stage total {stage_time:.3f}s) - "
                        f"{len(enhanced_flight_cards)} cards - Request ID: {request_id}")
 
             # Step 4: Cache raw response for flight pricing
@@ -194,13 +196,18 @@ class AirShoppingService(FlightService):
             # This ensures consistency between flight search and pricing calls
             raw_response_cache_key = f"air_shopping_raw_{request_id}"
 
-            # Store raw response in backend cache for flight pricing
+            # Store raw response in the shared store so pricing works on any worker
             try:
-                from utils.cache_manager import cache_manager
+                from services.raw_response_store import raw_response_store
                 # Cache for 30 minutes (1800 seconds) - longer TTL to prevent expiration during flight selection
                 # This gives users more time to select flights and request pricing
-                cache_manager.set(raw_response_cache_key, raw_response, ttl=1800)
+                await raw_response_store.set(raw_response_cache_key, raw_response, ttl=1800)
                 logger.info(f"Raw response cached with key: {raw_response_cache_key} (TTL: 30 minutes)")
+
+                # Store the offer index alongside it so FlightPrice can find offers
+                # and airline data without rescanning the raw response
+                if stage_result.get('offer_index'):
+                    await raw_response_store.set(offer_index_cache_key(raw_response_cache_key), stage_result['offer_index'], ttl=1800)
             except Exception as cache_error:
                 logger.warning(f"Failed to cache raw response: {cache_error}")
                 # Continue without caching - fallback to sending raw response
@@ -219,6 +226,7 @@ class AirShoppingService(FlightService):
                         'search_time': search_time,
                         'transform_time': transform_time,
                         'card_generation_time': card_time,
+                        'transform_stage_time': stage_time,
                         'total_time': total_time
                     },
                     'request_id': request_id,
@@ -334,6 +342,15 @@ async def process_air_shopping_enhanced(search_criteria: Dict[str, Any]) -> Dict
                 'request_id': request_id
             }
             
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Verteil call abandoned in enhanced air shopping orchestrator - "
+                          f"Request ID: {request_id}: {e}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'status_code': e.status_code,
+                'request_id': request_id
+            }
         except Exception as e:
             logger.error(f"Error in enhanced air shopping orchestrator - "
                         f"Request ID: {request_id}: {e}", exc_info=True)
@@ -373,6 +390,15 @@ async def process_air_shopping_basic(search_criteria: Dict[str, Any]) -> Dict[st
                 'request_id': request_id
             }
             
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Verteil call abandoned in basic air shopping orchestrator - "
+                          f"Request ID: {request_id}: {e}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'status_code': e.status_code,
+                'request_id': request_id
+            }
         except Exception as e:
             logger.error(f"Error in basic air shopping orchestrator - "
                         f"Request ID: {request_id}: {e}", exc_info=True)
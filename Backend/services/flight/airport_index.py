@@ -0,0 +1,192 @@
+"""
+Airport Autocomplete Index
+
+In-memory index over the airports loaded from ``airports.csv``. It is built
+once when ``AirportService`` loads its data and answers autocomplete queries
+without scanning every row:
+
+- exact IATA codes are looked up in a dict
+- prefixes of whole values and of individual words are found by binary search
+  over sorted term lists
+- substrings are found by intersecting n-gram posting lists and then checking
+  only the surviving candidates
+
+Results are ranked exact code first, then exact value, value prefix, word
+prefix and finally substring matches.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Searchable fields in ranking order (earlier fields win ties)
+SEARCH_FIELDS = ('iata_code', 'city', 'airport_name', 'country')
+
+# search_by values accepted by the API -> fields they cover
+SEARCH_BY_FIELDS = {
+    'all': SEARCH_FIELDS,
+    'iata': ('iata_code',),
+    'city': ('city',),
+    'airport_name': ('airport_name',),
+    'country': ('country',),
+}
+
+# Match tiers (lower ranks first)
+TIER_EXACT_CODE = 0
+TIER_EXACT_VALUE = 1
+TIER_VALUE_PREFIX = 2
+TIER_WORD_PREFIX = 3
+TIER_SUBSTRING = 4
+
+# Queries are split into n-grams of this size for substring search;
+# shorter queries use the bigram postings
+NGRAM_SIZE = 3
+
+_WORD_SPLIT = re.compile(r'[^0-9a-z]+')
+# Sorts after any character in a normalized term (prefix range upper bound)
+_PREFIX_END = '\uffff'
+
+
+def normalize(value: Optional[str]) -> str:
+    """Lowercase ``value`` and strip accents so 'São' matches 'sao'."""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+def _ngrams(value: str, size: int) -> Set[str]:
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+class AirportIndex:
+    """Prefix/n-gram index over airport records."""
+
+    def __init__(self, airports: List[Dict[str, str]]):
+        """
+        Build the index.
+
+        Args:
+            airports: Airport dicts with 'iata_code', 'airport_name', 'city', 'country'
+        """
+        self.airports = airports
+        self._values: List[Dict[str, str]] = []
+        self._by_code: Dict[str, List[int]] = {}
+        # field -> sorted [(term, airport id)] for whole values and for words
+        self._value_terms: Dict[str, List[Tuple[str, int]]] = {field: [] for field in SEARCH_FIELDS}
+        self._word_terms: Dict[str, List[Tuple[str, int]]] = {field: [] for field in SEARCH_FIELDS}
+        # field -> n-gram -> airport ids (ascending)
+        self._trigrams: Dict[str, Dict[str, List[int]]] = {field: {} for field in SEARCH_FIELDS}
+        self._bigrams: Dict[str, Dict[str, List[int]]] = {field: {} for field in SEARCH_FIELDS}
+
+        for airport_id, airport in enumerate(airports):
+            values = {field: normalize(airport.get(field)) for field in SEARCH_FIELDS}
+            self._values.append(values)
+
+            if values['iata_code']:
+                self._by_code.setdefault(values['iata_code'], []).append(airport_id)
+
+            for field, value in values.items():
+                if not value:
+                    continue
+                self._value_terms[field].append((value, airport_id))
+                for word in set(_WORD_SPLIT.split(value)):
+                    if word:
+                        self._word_terms[field].append((word, airport_id))
+                for gram in _ngrams(value, NGRAM_SIZE):
+                    self._trigrams[field].setdefault(gram, []).append(airport_id)
+                for gram in _ngrams(value, 2):
+                    self._bigrams[field].setdefault(gram, []).append(airport_id)
+
+        for terms in (*self._value_terms.values(), *self._word_terms.values()):
+            terms.sort()
+        self._value_keys = {field: [term for term, _ in terms] for field, terms in self._value_terms.items()}
+        self._word_keys = {field: [term for term, _ in terms] for field, terms in self._word_terms.items()}
+
+    def __len__(self) -> int:
+        return len(self.airports)
+
+    def _prefix_ids(self, keys: List[str], terms: List[Tuple[str, int]], prefix: str) -> Iterable[int]:
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + _PREFIX_END, start)
+        return (airport_id for _, airport_id in terms[start:end])
+
+    def _substring_ids(self, field: str, query: str) -> Iterable[int]:
+        if len(query) >= NGRAM_SIZE:
+            postings, grams = self._trigrams[field], _ngrams(query, NGRAM_SIZE)
+        else:
+            postings, grams = self._bigrams[field], {query}
+
+        lists = [postings.get(gram) for gram in grams]
+        if not all(lists):
+            return ()
+        if len(lists) == 1:
+            # The query is a single n-gram, so every posting is a match
+            return lists[0]
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return ()
+        # n-grams can match out of order; confirm the actual substring
+        return (airport_id for airport_id in candidates if query in self._values[airport_id][field])
+
+    def search(self, query: str, search_by: str = 'all', limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Find airports matching ``query``.
+
+        Args:
+            query: Search text (code, city, airport name or country)
+            search_by: One of SEARCH_BY_FIELDS ('all', 'iata', 'city', 'airport_name', 'country')
+            limit: Maximum number of results (None for all)
+
+        Returns:
+            Airport dicts ordered by match quality
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        fields = SEARCH_BY_FIELDS.get(search_by, SEARCH_FIELDS)
+
+        # airport id -> best (tier, field rank)
+        best: Dict[int, Tuple[int, int]] = {}
+
+        def offer(airport_ids: Iterable[int], tier: int, field_rank: int) -> None:
+            rank = (tier, field_rank)
+            for airport_id in airport_ids:
+                current = best.get(airport_id)
+                if current is None or rank < current:
+                    best[airport_id] = rank
+
+        def enough() -> bool:
+            return limit is not None and len(best) >= limit
+
+        if 'iata_code' in fields:
+            offer(self._by_code.get(query, ()), TIER_EXACT_CODE, 0)
+
+        # Lower tiers can only add results ranked after the ones already found,
+        # so stop as soon as a tier fills the limit
+        if not enough():
+            for field_rank, field in enumerate(fields):
+                for airport_id in self._prefix_ids(self._value_keys[field], self._value_terms[field], query):
+                    exact = self._values[airport_id][field] == query
+                    offer((airport_id,), TIER_EXACT_VALUE if exact else TIER_VALUE_PREFIX, field_rank)
+        if not enough():
+            for field_rank, field in enumerate(fields):
+                offer(self._prefix_ids(self._word_keys[field], self._word_terms[field], query), TIER_WORD_PREFIX, field_rank)
+        if not enough():
+            for field_rank, field in enumerate(fields):
+                offer(self._substring_ids(field, query), TIER_SUBSTRING, field_rank)
+
+        ranked = sorted(
+            best,
+            key=lambda airport_id: (
+                best[airport_id],
+                self._values[airport_id]['city'],
+                self._values[airport_id]['airport_name'],
+            )
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.airports[airport_id] for airport_id in ranked]
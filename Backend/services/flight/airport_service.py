@@ -1,10 +1,14 @@
 import os
 from typing import List, Dict, Optional
 
+from services.metrics import cache_requests
+
 from .airport_data_parser import parse_airport_data
+from .airport_index import AirportIndex, SEARCH_BY_FIELDS
 
 class AirportService:
     _airports_data: Optional[List[Dict[str, str]]] = None
+    _airport_index: Optional[AirportIndex] = None
     _csv_path: Optional[str] = None
 
     def __init__(self, csv_file_path: Optional[str] = None) -> None:
@@ -31,6 +35,8 @@ class AirportService:
         """Loads airport data from the CSV file."""
         if AirportService._csv_path and os.path.exists(AirportService._csv_path):
             AirportService._airports_data = parse_airport_data(AirportService._csv_path)
+            # Index once so autocomplete lookups never scan the full list
+            AirportService._airport_index = AirportIndex(AirportService._airports_data or [])
             if AirportService._airports_data:
                 print(f"Successfully loaded {len(AirportService._airports_data)} airports from {AirportService._csv_path}")
             else:
@@ -41,16 +47,19 @@ class AirportService:
             # when data loading fails and _airports_data was initially None.
             print(f"Error: Airport CSV file not found at {AirportService._csv_path}. Airport search will not work.")
 
-    def search_airports(self, query: str, search_by: str = 'city') -> List[Dict[str, str]]:
+    def search_airports(self, query: str, search_by: str = 'all', limit: Optional[int] = None) -> List[Dict[str, str]]:
         """
         Searches for airports based on a query string.
 
         Args:
-            query (str): The search term (e.g., city name or airport name).
-            search_by (str): The field to search by ('city' or 'airport_name'). Defaults to 'city'.
+            query (str): The search term (IATA code, city, airport name or country).
+            search_by (str): The field to search by ('all', 'iata', 'city', 'airport_name'
+                             or 'country'). Defaults to 'all'.
+            limit (Optional[int]): Maximum number of results. Defaults to all matches.
 
         Returns:
-            List[Dict[str, str]]: A list of matching airports.
+            List[Dict[str, str]]: Matching airports, exact code matches first, then
+                                  prefix matches, then substring matches.
         """
         if AirportService._airports_data is None:
             # Attempt to load data if not already loaded (e.g., if init failed silently)
@@ -62,29 +71,21 @@ class AirportService:
         if not query or not AirportService._airports_data:
             return []
 
-        query = query.lower().strip()
-        results: List[Dict[str, str]] = []
-
-        field_map = {
-            'city': 'city',
-            'airport_name': 'airport_name'
-        }
-
-        search_field = field_map.get(search_by)
-        if not search_field:
-            print(f"Warning: Invalid search_by parameter '{search_by}'. Defaulting to 'city'.")
-            search_field = 'city'
-
-        for airport in AirportService._airports_data:
-            value_to_check = airport.get(search_field)
-            if value_to_check and query in value_to_check.lower():
-                results.append({
-                    'iata': airport.get('iata_code'),
-                    'name': airport.get('airport_name'),
-                    'city': airport.get('city'),
-                    'country': airport.get('country')
-                })
-        return results
+        if search_by not in SEARCH_BY_FIELDS:
+            print(f"Warning: Invalid search_by parameter '{search_by}'. Defaulting to 'all'.")
+            search_by = 'all'
+
+        matches = AirportService._airport_index.search(query, search_by=search_by, limit=limit)
+        cache_requests.inc(storage='airport', result='hit' if matches else 'miss')
+        return [
+            {
+                'iata': airport.get('iata_code'),
+                'name': airport.get('airport_name'),
+                'city': airport.get('city'),
+                'country': airport.get('country')
+            }
+            for airport in matches
+        ]
 
 # Example Usage (for testing purposes)
 if __name__ == '__main__':
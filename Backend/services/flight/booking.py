@@ -8,9 +8,10 @@ from typing import Dict, Any, Optional, List
 import uuid
 import json
 
+from services.async_redis_flight_storage import async_redis_flight_storage
 from .core import FlightService
 from .decorators import async_cache, async_rate_limited
-from .exceptions import FlightServiceError, ValidationError, BookingError
+from .exceptions import FlightServiceError, ValidationError, BookingError, DeadlineExceeded, CircuitOpenError
 from .types import BookingResponse, SearchCriteria
 
 logger = logging.getLogger(__name__)
@@ -144,7 +145,7 @@ class FlightBookingService(FlightService):
             # Build the request payload first (this will enhance the flight_price_response)
             logger.info(f"[DEBUG] About to call _build_booking_payload (ReqID: {request_id})")
             print(f"[PRINT DEBUG] About to call _build_booking_payload (ReqID: {request_id})")
-            payload = self._build_booking_payload(
+            payload = await self._build_booking_payload(
                 flight_price_response=flight_price_response,
                 passengers=passengers,
                 payment_info=payment_info,
@@ -182,7 +183,10 @@ class FlightBookingService(FlightService):
                 'raw_order_create_response': response,  # Include raw NDC response for itinerary generation
                 'request_id': request_id
             }
-            
+
+        except (DeadlineExceeded, CircuitOpenError):
+            # Answered by the app's 504 / 503 handlers, not as a booking error
+            raise
         except ValidationError as e:
             logger.error(f"Validation error in create_booking: {str(e)}")
             return {
@@ -629,7 +633,7 @@ class FlightBookingService(FlightService):
         if len(country_code) != 2 or not country_code.isalpha():
             raise ValidationError("Valid country code is required (2-letter ISO format)")
     
-    def _build_booking_payload(
+    async def _build_booking_payload(
         self,
         flight_price_response: Dict[str, Any],
         passengers: List[Dict[str, Any]],
@@ -706,9 +710,6 @@ class FlightBookingService(FlightService):
             # Try to get the raw flight price response from the new Redis flight storage system
             raw_flight_price_response = None
             try:
-                from services.redis_flight_storage import RedisFlightStorage
-                redis_flight_storage = RedisFlightStorage()
-
                 # Try multiple cache keys since request_id might be different between pricing and booking
                 # Check if metadata contains the actual cache key
                 metadata_cache_key = None
@@ -734,7 +735,7 @@ class FlightBookingService(FlightService):
 
                 # Try to get cached data from Redis flight storage
                 for cache_key in cache_keys_to_try:
-                    cached_result = redis_flight_storage.get_flight_price(cache_key)
+                    cached_result = await async_redis_flight_storage.get_flight_price(cache_key)
                     if cached_result['success']:
                         raw_flight_price_response = cached_result['data']
                         logger.info(f"[DEBUG] Found raw flight price response in Redis using key: {cache_key} (ReqID: {request_id})")
@@ -0,0 +1,253 @@
+"""
+Circuit Breakers
+
+One breaker per Verteil service (per worker) stops calls to a service that is
+failing instead of letting every request wait through full retries.
+
+- closed: calls go through. Outcomes are counted in a rolling window of
+  ``CIRCUIT_BREAKER_WINDOW`` seconds (in ``CIRCUIT_BREAKER_BUCKETS`` buckets).
+  Once the window holds at least ``CIRCUIT_BREAKER_MIN_CALLS`` calls and
+  ``CIRCUIT_BREAKER_FAILURE_RATE`` of them failed, the breaker opens.
+- open: calls fail immediately with ``CircuitOpenError`` (HTTP 503); callers
+  with a cached response get it even if stale (see
+  ``decorators.async_response_cache``). After ``CIRCUIT_BREAKER_OPEN_SECONDS``
+  the breaker becomes half-open.
+- half-open: up to ``CIRCUIT_BREAKER_HALF_OPEN_CALLS`` trial calls go through
+  at a time. That many successes close the breaker; any failure opens it
+  again.
+
+5xx responses, timeouts and connection errors count as failures. 429s (left
+to the concurrency limiter and rate governor), other 4xx responses,
+attempts cut short by the request deadline and cancelled attempts do not.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+from services.flight.exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+# Attempt statuses (as recorded by FlightService._make_request) that say nothing about the service's health
+_NEUTRAL_STATUSES = frozenset({'429', '401', 'deadline', 'cancelled'})
+
+
+def is_failure(status: str) -> bool:
+    """Return True if an attempt with this status counts against the service."""
+    if status in _NEUTRAL_STATUSES:
+        return False
+    return not status.isdigit() or status.startswith('5')
+
+
+class CircuitBreakerConfig:
+    """Environment driven settings for the Verteil circuit breakers."""
+
+    ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Rolling window the failure rate is computed over, in seconds
+    WINDOW = float(os.getenv('CIRCUIT_BREAKER_WINDOW', 30))
+    BUCKETS = max(int(os.getenv('CIRCUIT_BREAKER_BUCKETS', 10)), 1)
+    # Calls needed in the window before the breaker can open
+    MIN_CALLS = int(os.getenv('CIRCUIT_BREAKER_MIN_CALLS', 10))
+    FAILURE_RATE = float(os.getenv('CIRCUIT_BREAKER_FAILURE_RATE', 0.5))
+    # Seconds an open breaker rejects calls before letting trial calls through
+    OPEN_SECONDS = float(os.getenv('CIRCUIT_BREAKER_OPEN_SECONDS', 30))
+    # Concurrent trial calls while half-open, and successes needed to close
+    HALF_OPEN_CALLS = max(int(os.getenv('CIRCUIT_BREAKER_HALF_OPEN_CALLS', 2)), 1)
+
+
+class _Breaker:
+    """State and rolling outcome counts of one Verteil service."""
+
+    __slots__ = ('state', 'opened_at', 'buckets', 'calls', 'failures',
+                 'trials', 'trial_successes', 'transitions', 'rejections')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        # [bucket start, calls, failures], oldest first
+        self.buckets: Deque[List[float]] = deque()
+        self.calls = 0
+        self.failures = 0
+        self.trials = 0
+        self.trial_successes = 0
+        self.transitions = {state: 0 for state in STATES}
+        self.rejections = 0
+
+    def trim(self, now: float) -> None:
+        while self.buckets and self.buckets[0][0] <= now - CircuitBreakerConfig.WINDOW:
+            _, calls, failures = self.buckets.popleft()
+            self.calls -= calls
+            self.failures -= failures
+
+    def add(self, now: float, failed: bool) -> None:
+        self.trim(now)
+        width = CircuitBreakerConfig.WINDOW / CircuitBreakerConfig.BUCKETS
+        if not self.buckets or now >= self.buckets[-1][0] + width:
+            self.buckets.append([now, 0, 0])
+        bucket = self.buckets[-1]
+        bucket[1] += 1
+        self.calls += 1
+        if failed:
+            bucket[2] += 1
+            self.failures += 1
+
+    def reset_window(self) -> None:
+        self.buckets.clear()
+        self.calls = 0
+        self.failures = 0
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers of the Verteil services called by this worker."""
+
+    def __init__(self):
+        self._breakers: Dict[str, _Breaker] = {}
+        # Guards state read by /metrics and /api/health from other threads
+        self._lock = threading.Lock()
+
+    def _breaker(self, service: str) -> _Breaker:
+        breaker = self._breakers.get(service)
+        if breaker is None:
+            breaker = self._breakers[service] = _Breaker()
+        return breaker
+
+    def _transition(self, service: str, breaker: _Breaker, state: str, now: float) -> None:
+        breaker.state = state
+        breaker.transitions[state] += 1
+        breaker.trials = 0
+        breaker.trial_successes = 0
+        if state == OPEN:
+            breaker.opened_at = now
+            logger.warning(
+                f"Circuit for {service} opened: {breaker.failures}/{breaker.calls} calls failed "
+                f"in the last {CircuitBreakerConfig.WINDOW:.0f}s"
+            )
+        elif state == CLOSED:
+            breaker.reset_window()
+            logger.info(f"Circuit for {service} closed")
+        else:
+            logger.info(f"Circuit for {service} half-open: letting trial calls through")
+
+    def _reject(self, service: str, breaker: _Breaker, now: float) -> CircuitOpenError:
+        breaker.rejections += 1
+        retry_after = max(breaker.opened_at + CircuitBreakerConfig.OPEN_SECONDS - now, 0.0)
+        return CircuitOpenError(
+            f"{service} is temporarily unavailable (circuit open after repeated failures). "
+            f"Please try again in {max(retry_after, 1.0):.0f}s.",
+            service_name=service,
+            retry_after=retry_after,
+        )
+
+    def check(self, service: str) -> None:
+        """
+        Fail fast if a call to ``service`` would be rejected; does not take a trial slot.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with every trial slot taken
+        """
+        if not CircuitBreakerConfig.ENABLED:
+            return
+        with self._lock:
+            breaker = self._breakers.get(service)
+            if breaker is None or breaker.state == CLOSED:
+                return
+            now = time.monotonic()
+            if breaker.state == OPEN and now - breaker.opened_at < CircuitBreakerConfig.OPEN_SECONDS:
+                raise self._reject(service, breaker, now)
+            if breaker.state == HALF_OPEN and breaker.trials >= CircuitBreakerConfig.HALF_OPEN_CALLS:
+                raise self._reject(service, breaker, now)
+
+    def allow(self, service: str) -> bool:
+        """
+        Admit one attempt to ``service``.
+
+        Returns:
+            bool: True if the attempt is a half-open trial (pass it to ``record``)
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the attempt
+        """
+        if not CircuitBreakerConfig.ENABLED:
+            return False
+        with self._lock:
+            breaker = self._breaker(service)
+            if breaker.state == CLOSED:
+                return False
+            now = time.monotonic()
+            if breaker.state == OPEN:
+                if now - breaker.opened_at < CircuitBreakerConfig.OPEN_SECONDS:
+                    raise self._reject(service, breaker, now)
+                self._transition(service, breaker, HALF_OPEN, now)
+            if breaker.trials >= CircuitBreakerConfig.HALF_OPEN_CALLS:
+                raise self._reject(service, breaker, now)
+            breaker.trials += 1
+            return True
+
+    def record(self, service: str, status: str, trial: bool = False) -> None:
+        """
+        Count the outcome of an attempt admitted by ``allow``.
+
+        Args:
+            service: Verteil service name
+            status: HTTP status of the attempt, or 'timeout' / 'client_error' / 'error' / 'deadline'
+            trial: Value returned by ``allow``
+        """
+        if not CircuitBreakerConfig.ENABLED:
+            return
+        neutral = status in _NEUTRAL_STATUSES
+        failed = is_failure(status)
+        now = time.monotonic()
+        with self._lock:
+            breaker = self._breaker(service)
+            if trial:
+                if breaker.state != HALF_OPEN:
+                    return
+                breaker.trials -= 1
+                if failed:
+                    self._transition(service, breaker, OPEN, now)
+                elif not neutral:
+                    breaker.trial_successes += 1
+                    if breaker.trial_successes >= CircuitBreakerConfig.HALF_OPEN_CALLS:
+                        self._transition(service, breaker, CLOSED, now)
+                return
+
+            if breaker.state != CLOSED or neutral:
+                return
+            breaker.add(now, failed)
+            if (breaker.calls >= CircuitBreakerConfig.MIN_CALLS
+                    and breaker.failures >= breaker.calls * CircuitBreakerConfig.FAILURE_RATE):
+                self._transition(service, breaker, OPEN, now)
+
+    def get_states(self) -> Dict[str, str]:
+        """Return the state of every service's breaker."""
+        with self._lock:
+            return {service: breaker.state for service, breaker in self._breakers.items()}
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return state, window counts, transitions and rejections per service."""
+        now = time.monotonic()
+        with self._lock:
+            stats = {}
+            for service, breaker in self._breakers.items():
+                breaker.trim(now)
+                stats[service] = {
+                    'state': breaker.state,
+                    'calls': breaker.calls,
+                    'failures': breaker.failures,
+                    'open_for_seconds': round(now - breaker.opened_at, 1) if breaker.state == OPEN else 0.0,
+                    'transitions': dict(breaker.transitions),
+                    'rejections': breaker.rejections,
+                }
+            return stats
+
+
+# Create a singleton instance (one registry per worker process)
+circuit_breaker = CircuitBreakerRegistry()
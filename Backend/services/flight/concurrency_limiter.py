@@ -0,0 +1,242 @@
+"""
+Adaptive Concurrency Limiter
+
+Caps how many calls to each Verteil service are in flight at once and adapts
+the cap to how the upstream responds (AIMD):
+
+- every successful call within the latency tolerance adds ``1 / limit``, so
+  the limit grows by about one per round of calls while Verteil keeps up;
+- a throttled call (429, 503) or a timeout multiplies the limit by
+  ``BACKOFF_RATIO``;
+- a successful call slower than ``LATENCY_TOLERANCE`` times the service's
+  baseline latency (a slow moving average of past calls) multiplies the limit
+  by ``LATENCY_BACKOFF_RATIO``.
+
+Decreases are applied at most once per baseline latency, so a burst of 429s
+for calls sent together counts as one congestion signal. Callers over the
+limit wait in arrival order for a slot; a caller still waiting after
+``MAX_WAIT`` seconds gets ``RateLimitExceeded``.
+
+Limits are kept per worker process: each worker reacts to the latency and
+throttling it observes. Per-service starting and maximum limits come from
+``VERTEIL_CONCURRENCY_LIMITS``, e.g. ``AirShopping=10:40,FlightPrice=20:80``
+(initial : max); other services use ``ADAPTIVE_CONCURRENCY_INITIAL`` /
+``ADAPTIVE_CONCURRENCY_MAX``.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from services.flight.exceptions import RateLimitExceeded
+from services.metrics import concurrency_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+# Attempt statuses (as recorded by FlightService._make_request) meaning Verteil is overloaded
+_DROP_STATUSES = frozenset({'429', '503', 'timeout'})
+# Attempt statuses that only hand the slot back (the call was abandoned by our side)
+_IGNORED_STATUSES = frozenset({'deadline', 'cancelled', 'rejected'})
+
+
+def _parse_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        service, limit = item.split('=', 1)
+        initial, _, maximum = limit.partition(':')
+        try:
+            limits[service.strip()] = (int(initial), int(maximum) if maximum else 0)
+        except ValueError:
+            logger.warning(f"Ignoring invalid VERTEIL_CONCURRENCY_LIMITS entry: {item}")
+    return limits
+
+
+class ConcurrencyLimiterConfig:
+    """Environment driven settings for adaptive outbound concurrency."""
+
+    ENABLED = os.getenv('ADAPTIVE_CONCURRENCY_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Default in-flight limits per Verteil service and worker
+    INITIAL = int(os.getenv('ADAPTIVE_CONCURRENCY_INITIAL', 20))
+    MIN = max(int(os.getenv('ADAPTIVE_CONCURRENCY_MIN', 1)), 1)
+    MAX = int(os.getenv('ADAPTIVE_CONCURRENCY_MAX', 200))
+    # Per-service overrides: "Service=initial:max,..."
+    SERVICE_LIMITS = _parse_limits(os.getenv('VERTEIL_CONCURRENCY_LIMITS', ''))
+    # Multiplier applied on 429/503/timeouts
+    BACKOFF_RATIO = float(os.getenv('ADAPTIVE_CONCURRENCY_BACKOFF_RATIO', 0.5))
+    # Multiplier applied when a call is slower than LATENCY_TOLERANCE x baseline
+    LATENCY_BACKOFF_RATIO = float(os.getenv('ADAPTIVE_CONCURRENCY_LATENCY_BACKOFF_RATIO', 0.9))
+    LATENCY_TOLERANCE = float(os.getenv('ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE', 2.0))
+    # Weight of a new sample in the baseline latency average
+    BASELINE_SMOOTHING = float(os.getenv('ADAPTIVE_CONCURRENCY_BASELINE_SMOOTHING', 0.05))
+    # Longest a caller waits for a slot before RateLimitExceeded is raised
+    MAX_WAIT = float(os.getenv('ADAPTIVE_CONCURRENCY_MAX_WAIT', 10))
+
+
+class _ServiceLimit:
+    """Limit, in-flight count and waiters of one Verteil service."""
+
+    __slots__ = ('limit', 'max_limit', 'in_flight', 'waiters', 'baseline', 'last_decrease', 'decreases')
+
+    def __init__(self, initial: int, max_limit: int):
+        self.max_limit = max(max_limit, ConcurrencyLimiterConfig.MIN)
+        self.limit = float(min(max(initial, ConcurrencyLimiterConfig.MIN), self.max_limit))
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.baseline: Optional[float] = None
+        self.last_decrease = 0.0
+        self.decreases = {'throttled': 0, 'latency': 0}
+
+    @property
+    def capacity(self) -> int:
+        return max(int(self.limit), ConcurrencyLimiterConfig.MIN)
+
+
+class ConcurrencyPermit:
+    """One acquired slot; hand it back with ``AdaptiveConcurrencyLimiter.release``."""
+
+    __slots__ = ('service', 'acquired_at')
+
+    def __init__(self, service: str):
+        self.service = service
+        self.acquired_at = time.monotonic()
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limits per Verteil service for this worker."""
+
+    def __init__(self):
+        self._services: Dict[str, _ServiceLimit] = {}
+        # Guards state read by /metrics from a thread
+        self._lock = threading.Lock()
+
+    def _state(self, service: str) -> _ServiceLimit:
+        state = self._services.get(service)
+        if state is None:
+            initial, max_limit = ConcurrencyLimiterConfig.SERVICE_LIMITS.get(
+                service, (ConcurrencyLimiterConfig.INITIAL, ConcurrencyLimiterConfig.MAX)
+            )
+            state = self._services[service] = _ServiceLimit(initial, max_limit or ConcurrencyLimiterConfig.MAX)
+        return state
+
+    async def acquire(self, service: str, max_wait: Optional[float] = None) -> Optional[ConcurrencyPermit]:
+        """
+        Take a slot for a call to ``service``, waiting for one if necessary.
+
+        Args:
+            service: Verteil service name (e.g. 'AirShopping')
+            max_wait: Longest acceptable wait in seconds (default ADAPTIVE_CONCURRENCY_MAX_WAIT)
+
+        Returns:
+            ConcurrencyPermit, or None when the limiter is disabled
+
+        Raises:
+            RateLimitExceeded: If no slot became free within ``max_wait``
+        """
+        if not ConcurrencyLimiterConfig.ENABLED:
+            return None
+        if max_wait is None:
+            max_wait = ConcurrencyLimiterConfig.MAX_WAIT
+
+        with self._lock:
+            state = self._state(service)
+            if state.in_flight < state.capacity and not state.waiters:
+                state.in_flight += 1
+                return ConcurrencyPermit(service)
+            waiter = asyncio.get_running_loop().create_future()
+            state.waiters.append(waiter)
+
+        queued_at = time.monotonic()
+        try:
+            # The releasing caller counts the slot as ours before resolving the future
+            await asyncio.wait_for(waiter, timeout=max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if waiter.done() and not waiter.cancelled():
+                    # A slot was handed over as we gave up; pass it on
+                    self._release_slot(state)
+                elif waiter in state.waiters:
+                    state.waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            concurrency_wait_seconds.observe(time.monotonic() - queued_at, service=service)
+            raise RateLimitExceeded(
+                f"Too many concurrent {service} requests: no slot within {max_wait:.1f}s "
+                f"(limit {state.capacity}). Please try again later."
+            ) from None
+
+        concurrency_wait_seconds.observe(time.monotonic() - queued_at, service=service)
+        return ConcurrencyPermit(service)
+
+    def release(self, permit: Optional[ConcurrencyPermit], status: str) -> None:
+        """
+        Hand back a slot and adapt the limit to the outcome of the call.
+
+        Args:
+            permit: Permit returned by ``acquire`` (None is ignored)
+            status: HTTP status of the call, or 'timeout' / 'client_error' / 'error' / 'cancelled'
+        """
+        if permit is None:
+            return
+        now = time.monotonic()
+        latency = now - permit.acquired_at
+
+        with self._lock:
+            state = self._services[permit.service]
+            if status in _IGNORED_STATUSES:
+                self._release_slot(state)
+                return
+            if status in _DROP_STATUSES:
+                self._decrease(state, now, ConcurrencyLimiterConfig.BACKOFF_RATIO, 'throttled')
+            elif status.startswith('2'):
+                baseline = state.baseline
+                if baseline is not None and latency > baseline * ConcurrencyLimiterConfig.LATENCY_TOLERANCE:
+                    self._decrease(state, now, ConcurrencyLimiterConfig.LATENCY_BACKOFF_RATIO, 'latency')
+                # Only grow while the limit is actually being used
+                elif state.in_flight >= state.capacity / 2:
+                    state.limit = min(state.limit + 1.0 / state.limit, float(state.max_limit))
+                smoothing = ConcurrencyLimiterConfig.BASELINE_SMOOTHING
+                state.baseline = latency if baseline is None else baseline + smoothing * (latency - baseline)
+            self._release_slot(state)
+
+    def _decrease(self, state: _ServiceLimit, now: float, ratio: float, reason: str) -> None:
+        # Calls sent together fail together; treat them as one signal
+        if now - state.last_decrease < max(state.baseline or 0.0, 1.0):
+            return
+        previous = state.capacity
+        state.limit = max(state.limit * ratio, float(ConcurrencyLimiterConfig.MIN))
+        state.last_decrease = now
+        state.decreases[reason] += 1
+        if state.capacity != previous:
+            logger.info(f"Verteil concurrency limit lowered from {previous} to {state.capacity} ({reason})")
+
+    def _release_slot(self, state: _ServiceLimit) -> None:
+        state.in_flight -= 1
+        while state.waiters and state.in_flight < state.capacity:
+            waiter = state.waiters.popleft()
+            if waiter.done():
+                continue
+            state.in_flight += 1
+            waiter.set_result(None)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return limit, in-flight count, queue length and decreases per service."""
+        with self._lock:
+            return {
+                service: {
+                    'limit': state.capacity,
+                    'in_flight': state.in_flight,
+                    'queued': len(state.waiters),
+                    'baseline_seconds': state.baseline,
+                    'decreases': dict(state.decreases),
+                }
+                for service, state in self._services.items()
+            }
+
+
+# Create a singleton instance (one limiter per worker process)
+concurrency_limiter = AdaptiveConcurrencyLimiter()
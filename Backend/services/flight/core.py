@@ -21,12 +21,18 @@ import asyncio # For asyncio.sleep
 # e.g., from Backend.services.flight.decorators import ...
 from utils.cache_manager import cache_manager
 from utils.api_logger import api_logger
-from services.flight.decorators import async_cache, async_rate_limited
+from services.metrics import deadline_exceeded, verteil_request_seconds, verteil_retries
+from services.flight.decorators import async_circuit_breaker, async_response_cache, async_verteil_rate_limited
+from services.flight.circuit_breaker import circuit_breaker
+from services.flight.concurrency_limiter import ConcurrencyLimiterConfig, concurrency_limiter
+from services.flight.deadline import DeadlineConfig, cap_wait, check_deadline, time_remaining
 from services.flight.exceptions import (
     FlightServiceError,
     RateLimitExceeded,
     AuthenticationError,
-    APIError
+    APIError,
+    CircuitOpenError,
+    DeadlineExceeded
 )
 from services.flight.types import (
     SearchCriteria,
@@ -38,6 +44,7 @@ from services.flight.types import (
 # Import datetime for the utility function
 from datetime import datetime
 from utils.auth import TokenManager
+from services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -95,15 +102,22 @@ class FlightService:
         logger.info("FlightService initialized - TokenManager will handle authentication as needed")
 
     async def _get_session(self) -> aiohttp.ClientSession:
+        # All services share the worker's pooled session so connections to the
+        # Verteil API are kept alive between requests
         if self._session is None or self._session.closed:
-            timeout_seconds = float(self.config.get('VERTEIL_API_TIMEOUT', 30))
-            timeout = aiohttp.ClientTimeout(total=timeout_seconds)
-            self._session = aiohttp.ClientSession(timeout=timeout)
+            self._session = http_client.get_session()
         return self._session
 
+    def _get_request_timeout(self) -> aiohttp.ClientTimeout:
+        """Per-request timeout; the shared session is not tied to one service's config."""
+        timeout_seconds = float(self.config.get('VERTEIL_API_TIMEOUT', 30))
+        return aiohttp.ClientTimeout(total=timeout_seconds)
+
     async def close(self):
-        if self._session and not self._session.closed:
+        # The pooled session outlives the service; it is closed in after_serving
+        if self._session and not self._session.closed and not http_client.is_shared(self._session):
             await self._session.close()
+        self._session = None
 
     async def __aenter__(self):
         await self._get_session() # Ensure session is created on entry
@@ -115,8 +129,11 @@ class FlightService:
     async def _get_access_token(self) -> str:
         """Get access token using the centralized TokenManager."""
         try:
-            # TokenManager returns the token in 'Bearer <token>' format
-            full_token = self._token_manager.get_token(self.config)
+            # TokenManager returns the token in 'Bearer <token>' format.
+            # The async path never blocks the event loop and shares one refresh
+            # between concurrent requests.
+            session = await self._get_session()
+            full_token = await self._token_manager.get_token_async(self.config, session=session)
             # Extract just the token part (remove 'Bearer ' prefix)
             if full_token.startswith('Bearer '):
                 return full_token[7:]  # Remove 'Bearer ' prefix
@@ -149,8 +166,9 @@ class FlightService:
 
         return headers
 
-    @async_rate_limited(limit=100, window=60) # Decorators from original code
-    @async_cache(timeout=300)                 # Decorators from original code
+    @async_response_cache()                   # Cache hits do not count against the rate limit; stale ones serve open circuits
+    @async_circuit_breaker()                  # Fails fast while the service's circuit is open
+    @async_verteil_rate_limited()             # Per service and ThirdpartyId, queued up to RATE_LIMIT_MAX_WAIT
     async def _make_request(
         self,
         endpoint: str,
@@ -190,19 +208,52 @@ class FlightService:
         max_retries = int(self.config.get('VERTEIL_MAX_RETRIES', 3))
         retry_delay_base = int(self.config.get('VERTEIL_RETRY_DELAY', 1))
 
+        request_timeout = kwargs.pop('timeout', None) or self._get_request_timeout()
+
         # Track request start time for response time calculation
         request_start_time = time.time()
 
         for attempt in range(max_retries):
+            # HTTP status of this attempt, or the kind of failure, for the latency metrics
+            attempt_status = 'error'
+            check_deadline(service_name, 'attempt')
+            # Held for the HTTP exchange only, not for the backoff sleep
+            try:
+                permit = await concurrency_limiter.acquire(
+                    service_name, max_wait=cap_wait(ConcurrencyLimiterConfig.MAX_WAIT)
+                )
+            except RateLimitExceeded:
+                # Report a wait cut short by the deadline as such
+                check_deadline(service_name, 'attempt')
+                raise
+            try:
+                # Rejects retries once the service's circuit has opened
+                trial = circuit_breaker.allow(service_name)
+            except CircuitOpenError:
+                concurrency_limiter.release(permit, 'rejected')
+                raise
+            # Never wait for Verteil longer than the caller will wait for us
+            attempt_timeout = request_timeout
+            remaining = time_remaining()
+            deadline_capped = (
+                remaining is not None
+                and service_name not in DeadlineConfig.UNCAPPED_SERVICES
+                and (request_timeout.total is None or remaining < request_timeout.total)
+            )
+            if deadline_capped:
+                attempt_timeout = aiohttp.ClientTimeout(total=remaining)
+            attempt_start = time.perf_counter()
             try:
                 session = await self._get_session()
                 async with session.request(
                     method=method,
                     url=url,
+                    timeout=attempt_timeout,
                     json=api_payload, # Verteil API endpoints expect JSON body without request_id
                     headers=headers,
                     **{k:v for k,v in kwargs.items() if k != 'request_id'} # Pass other kwargs, but not request_id as it's in payload
                 ) as response:
+                    attempt_status = str(response.status)
                     # Attempt to get JSON, but handle cases where it might not be (e.g. unexpected HTML error page)
                     try:
                         response_data = await response.json()
@@ -212,7 +263,7 @@ class FlightService:
                         # If it's a 401, still try to invalidate token
                         if response.status == 401 and attempt < max_retries -1:
                              logger.warning(f"Received 401 (Unauthorized) with non-JSON response for {service_name} (ReqID: {log_request_id}). Clearing TokenManager token.")
-                             self._token_manager.clear_token()
+                             self._token_manager.clear_token(token=headers['Authorization'][7:])
                              # Fall through to retry logic
                         else:
                              raise APIError(f"API request for {service_name} (ReqID: {log_request_id}) failed with status {response.status}. Response was not JSON: {response_text[:200]}", status_code=response.status)
@@ -234,10 +285,10 @@ class FlightService:
                         error_msg = f"API request for {service_name} (ReqID: {log_request_id}) failed with status {response.status}. Response: {json.dumps(response_data)}"
                         if response.status == 401: # Unauthorized
                             logger.warning(f"Received 401 (Unauthorized) for {service_name} (ReqID: {log_request_id}). Clearing TokenManager token.")
-                            self._token_manager.clear_token()
+                            self._token_manager.clear_token(token=headers['Authorization'][7:])
                             if attempt == max_retries - 1: # Last attempt
                                 raise AuthenticationError(error_msg)
-                            # Fall through to retry logic, will attempt to get new token on next _get_headers call
+                            # Fall through to retry logic, which rebuilds the headers with a new token
                         elif response.status == 429: # Rate limit
                             raise RateLimitExceeded(f"Rate limit exceeded for {service_name} (ReqID: {log_request_id}). Please try again later.")
                         else: # Other client/server errors
@@ -269,20 +320,47 @@ class FlightService:
 
                         return response_data # Success
             
+            except asyncio.CancelledError:
+                # The caller went away (client disconnect, shutdown); says nothing about Verteil
+                attempt_status = 'cancelled'
+                raise
             except aiohttp.ClientError as e: # Includes ClientConnectionError, ClientTimeout etc.
+                if attempt_status == 'error':
+                    attempt_status = 'timeout' if isinstance(e, asyncio.TimeoutError) else 'client_error'
+                if attempt_status == 'timeout' and deadline_capped:
+                    # Cut short by the request deadline, not a slow upstream
+                    attempt_status = 'deadline'
+                    deadline_exceeded.inc(service=service_name, stage='attempt')
+                    raise DeadlineExceeded(f"Request deadline reached during {service_name} attempt {attempt + 1} (ReqID: {log_request_id}).") from e
                 logger.warning(f"Attempt {attempt + 1}/{max_retries} for {service_name} (ReqID: {log_request_id}) failed with ClientError: {str(e)}.")
                 if attempt == max_retries - 1:
                     raise APIError(f"Request for {service_name} (ReqID: {log_request_id}) failed after {max_retries} attempts due to ClientError: {str(e)}")
             # Catch other exceptions like JSONDecodeError from response.json() if content type is wrong but not caught by ContentTypeError
             except Exception as e: 
+                if attempt_status == 'error' and isinstance(e, asyncio.TimeoutError):
+                    attempt_status = 'deadline' if deadline_capped else 'timeout'
+                if attempt_status == 'deadline':
+                    deadline_exceeded.inc(service=service_name, stage='attempt')
+                    raise DeadlineExceeded(f"Request deadline reached during {service_name} attempt {attempt + 1} (ReqID: {log_request_id}).") from e
                 logger.error(f"Attempt {attempt + 1}/{max_retries} for {service_name} (ReqID: {log_request_id}) failed with unexpected error: {str(e)}", exc_info=True)
                 if attempt == max_retries - 1:
                     raise APIError(f"Request for {service_name} (ReqID: {log_request_id}) failed after {max_retries} attempts due to unexpected error: {str(e)}")
+            finally:
+                concurrency_limiter.release(permit, attempt_status)
+                circuit_breaker.record(service_name, attempt_status, trial)
+                verteil_request_seconds.observe(time.perf_counter() - attempt_start, service=service_name, status=attempt_status)
             
             # If we are here, it means an attempt failed and it's not the last one, so sleep and retry.
             sleep_duration = retry_delay_base * (2**attempt) # Exponential backoff
+            # Skip a retry that cannot finish before the caller gives up
+            check_deadline(service_name, 'retry', needed=sleep_duration)
+            circuit_breaker.check(service_name)
+            verteil_retries.inc(service=service_name, status=attempt_status)
             logger.info(f"Retrying attempt {attempt + 2}/{max_retries} for {service_name} (ReqID: {log_request_id}) in {sleep_duration}s...")
             await asyncio.sleep(sleep_duration)
+            if attempt_status == '401':
+                # The token was rejected; use the replacement (possibly published by another worker)
+                headers = await self._get_headers(service_name, airline_code)
         
         # Should not be reached if max_retries > 0, as loop will either return or raise.
         # Adding for safety in case max_retries is 0 or loop logic changes.
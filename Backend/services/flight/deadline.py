@@ -0,0 +1,154 @@
+"""
+Request Deadlines
+
+Every request gets a deadline when it arrives: the ``X-Request-Timeout``
+header (seconds) if the caller sent one, otherwise the route's default from
+``REQUEST_DEADLINE_ROUTES`` (e.g. ``/api/verteil/order-create=90``) or
+``REQUEST_DEADLINE_DEFAULT``. The deadline lives in a context variable, so it
+follows the request from the route handler through the ``process_*``
+orchestrators into ``FlightService._make_request`` (and into tasks they start)
+without being passed explicitly.
+
+``_make_request`` shrinks each attempt's timeout to the time left, caps queue
+waits in the rate governor and concurrency limiter, and does not start an
+attempt or a retry that cannot get ``REQUEST_DEADLINE_MIN_ATTEMPT`` seconds.
+It raises ``DeadlineExceeded`` (HTTP 504) instead. Attempts of services in
+``REQUEST_DEADLINE_UNCAPPED_SERVICES`` (OrderCreate) keep their full timeout
+once sent, so a booking is not abandoned while Verteil is creating it. Code
+running outside a request has no deadline and keeps the configured timeouts.
+"""
+import contextvars
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from services.flight.exceptions import DeadlineExceeded
+from services.metrics import deadline_exceeded
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_routes(value: str) -> Dict[str, float]:
+    routes = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        route, seconds = item.rsplit('=', 1)
+        try:
+            routes[route.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid REQUEST_DEADLINE_ROUTES entry: {item}")
+    return routes
+
+
+class DeadlineConfig:
+    """Environment driven settings for request deadlines."""
+
+    ENABLED = os.getenv('REQUEST_DEADLINE_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Header carrying the caller's budget in seconds
+    HEADER = os.getenv('REQUEST_DEADLINE_HEADER', 'X-Request-Timeout')
+    # Budget for routes without an override (the frontend gives up after 60s)
+    DEFAULT = float(os.getenv('REQUEST_DEADLINE_DEFAULT', 55))
+    # Per-route overrides by URL rule: "/api/verteil/air-shopping=45,..."
+    ROUTES = _parse_routes(os.getenv('REQUEST_DEADLINE_ROUTES', ''))
+    # Upper bound for budgets sent in the header
+    MAX = float(os.getenv('REQUEST_DEADLINE_MAX', 120))
+    # Least time worth starting a Verteil attempt with
+    MIN_ATTEMPT = float(os.getenv('REQUEST_DEADLINE_MIN_ATTEMPT', 2))
+    # Services whose attempts are never cut short once sent (not idempotent)
+    UNCAPPED_SERVICES = frozenset(
+        name.strip() for name in os.getenv('REQUEST_DEADLINE_UNCAPPED_SERVICES', 'OrderCreate').split(',') if name.strip()
+    )
+
+
+class Deadline:
+    """Point in (monotonic) time by which a request must be answered."""
+
+    __slots__ = ('budget', 'expires_at')
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    'request_deadline', default=None
+)
+
+
+def start_request_deadline(route: str, header_value: Optional[str] = None) -> Optional[contextvars.Token]:
+    """
+    Set the deadline of the current request (call from ``before_request``).
+
+    Args:
+        route: URL rule of the request (e.g. '/api/verteil/air-shopping')
+        header_value: Value of the deadline header, if sent
+
+    Returns:
+        Token for ``end_request_deadline``, or None when no deadline applies
+    """
+    if not DeadlineConfig.ENABLED:
+        return None
+    budget = DeadlineConfig.ROUTES.get(route, DeadlineConfig.DEFAULT)
+    if header_value:
+        try:
+            budget = min(float(header_value), DeadlineConfig.MAX)
+        except ValueError:
+            logger.warning(f"Ignoring invalid {DeadlineConfig.HEADER} header: {header_value}")
+    if budget <= 0:
+        return None
+    return _current_deadline.set(Deadline(budget))
+
+
+def end_request_deadline(token: Optional[contextvars.Token]) -> None:
+    """Clear the deadline set by ``start_request_deadline`` (call from ``teardown_request``)."""
+    if token is not None:
+        _current_deadline.reset(token)
+
+
+def get_deadline() -> Optional[Deadline]:
+    """Return the current request's deadline (None outside a request)."""
+    return _current_deadline.get()
+
+
+def time_remaining() -> Optional[float]:
+    """Return the seconds left before the current deadline (None without one)."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def cap_wait(seconds: float) -> float:
+    """Limit a queue wait so an attempt can still follow it."""
+    remaining = time_remaining()
+    if remaining is None:
+        return seconds
+    return min(seconds, max(remaining - DeadlineConfig.MIN_ATTEMPT, 0.0))
+
+
+def check_deadline(service_name: str, stage: str, needed: float = 0.0) -> Optional[float]:
+    """
+    Make sure ``needed`` seconds plus one minimal attempt fit before the deadline.
+
+    Args:
+        service_name: Verteil service about to be called
+        stage: What would happen next ('attempt' or 'retry'), for the error and metrics
+        needed: Seconds spent before the attempt starts (e.g. backoff sleep)
+
+    Returns:
+        Seconds left, or None without a deadline
+
+    Raises:
+        DeadlineExceeded: If there is not enough time left
+    """
+    remaining = time_remaining()
+    if remaining is None or remaining >= needed + DeadlineConfig.MIN_ATTEMPT:
+        return remaining
+    deadline_exceeded.inc(service=service_name, stage=stage)
+    raise DeadlineExceeded(
+        f"Request deadline reached before {service_name} {stage}: {remaining:.1f}s left "
+        f"of {_current_deadline.get().budget:.0f}s."
+    )
@@ -1,12 +1,20 @@
 """
 Async Decorators for Flight Service
 
-This module contains decorators for caching and rate limiting async functions.
+This module contains decorators for caching, rate limiting and circuit
+breaking async functions.
 """
-from typing import TypeVar, Callable, Awaitable, Any, Optional
+import logging
+from typing import TypeVar, Callable, Awaitable, Any, Dict, Optional
 from functools import wraps
 from utils.cache_manager import cache_manager
-from services.flight.exceptions import RateLimitExceeded
+from services.flight.circuit_breaker import circuit_breaker
+from services.flight.deadline import cap_wait
+from services.flight.exceptions import CircuitOpenError
+from services.flight.rate_governor import RateGovernorConfig, rate_governor
+from services.flight.response_cache import canonical_hash, response_cache
+
+logger = logging.getLogger(__name__)
 
 # Type variable for generic function typing
 T = TypeVar('T')
@@ -31,8 +39,8 @@ def async_cache(timeout: int = 300, key_prefix: str = 'acache_') -> Callable:
                 # args[1] is offer_id, args[2] is shopping_response_id
                 cache_key = f"{key_prefix}{f.__name__}:offer_{args[1]}:shopping_{args[2]}"
             else:
-                # Fallback to original method for other functions
-                cache_key = f"{key_prefix}{f.__name__}:{str(args)}:{str(kwargs)}"
+                # Hash the arguments instead of embedding them: they can hold whole NDC responses
+                cache_key = f"{key_prefix}{f.__name__}:{canonical_hash([args, kwargs])}"
             
             # Try to get cached result
             cached_result = cache_manager.get(cache_key)
@@ -50,27 +58,147 @@ def async_cache(timeout: int = 300, key_prefix: str = 'acache_') -> Callable:
         return decorated_function
     return decorator
 
+def async_response_cache() -> Callable:
+    """
+    Decorator caching ``FlightService._make_request`` responses per Verteil service.
+
+    The key is a hash of the canonicalized request and the TTL comes from the
+    service's policy (see ``services.flight.response_cache``); services
+    without a policy, such as OrderCreate, always reach the API. While the
+    service's circuit breaker is open, an expired entry still within
+    ``RESPONSE_CACHE_STALE_TTL`` is returned instead of the error.
+
+    Returns:
+        Decorated ``_make_request`` with response caching
+    """
+    def decorator(f: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(f)
+        async def decorated_function(
+            self: Any,
+            endpoint: str,
+            payload: Dict[str, Any],
+            service_name: str,
+            method: str = 'POST',
+            airline_code: Optional[str] = None,
+            **kwargs: Any
+        ) -> T:
+            policy = response_cache.policy_for(service_name)
+            if policy is None:
+                return await f(self, endpoint, payload, service_name, method, airline_code, **kwargs)
+
+            # Headers that select what Verteil returns besides the payload
+            scope = {
+                'base_url': self.config.get('VERTEIL_API_BASE_URL'),
+                'office_id': self.config.get('VERTEIL_OFFICE_ID'),
+                'third_party_id': airline_code or self.config.get('VERTEIL_THIRD_PARTY_ID'),
+            }
+            cache_key = response_cache.make_key(service_name, endpoint, method, payload, scope)
+
+            cached_result = await response_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+
+            try:
+                result = await f(self, endpoint, payload, service_name, method, airline_code, **kwargs)
+            except CircuitOpenError:
+                stale_result = await response_cache.get_stale(cache_key)
+                if stale_result is None:
+                    raise
+                logger.warning(f"Circuit for {service_name} is open; serving a stale cached response")
+                return stale_result
+            try:
+                await response_cache.set(cache_key, service_name, policy, result)
+            except Exception as e:
+                # A response that cannot be cached is still a good response
+                logger.warning(f"Failed to cache {service_name} response: {e}", exc_info=True)
+            return result
+        return decorated_function
+    return decorator
+
 def async_rate_limited(limit: int = 100, window: int = 60, key_prefix: str = 'arl_') -> Callable:
     """
     Decorator to rate limit async function calls.
-    
+
+    Calls take a token from a bucket holding ``limit`` tokens and refilling
+    over ``window`` seconds, shared by all workers (see
+    ``services.flight.rate_governor``). Calls beyond the limit are queued
+    until a token is due, up to ``RATE_LIMIT_MAX_WAIT`` seconds.
+
     Args:
         limit: Maximum number of requests allowed in the time window
         window: Time window in seconds (default: 60)
         key_prefix: Prefix for rate limit keys
-        
+
     Returns:
         Decorated async function with rate limiting
     """
     def decorator(f: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        bucket = f"{key_prefix}{f.__qualname__}"
+
         @wraps(f)
         async def decorated_function(*args: Any, **kwargs: Any) -> T:
-            # Generate rate limit key
-            rate_key = f"{key_prefix}{f.__name__}:{str(args)[:50]}"
-            
-            if cache_manager.rate_limit(rate_key, limit, window):
-                raise RateLimitExceeded("Rate limit exceeded. Please try again later.")
-                
+            await rate_governor.acquire(bucket, rate=limit / window, capacity=limit)
             return await f(*args, **kwargs)
         return decorated_function
     return decorator
+
+def async_verteil_rate_limited() -> Callable:
+    """
+    Decorator rate limiting ``FlightService._make_request`` per Verteil service and ThirdpartyId.
+
+    Limits come from ``VERTEIL_RATE_LIMITS`` (see
+    ``services.flight.rate_governor``). AirShopping requests without an
+    airline code share one bucket. Callers are not queued past the point
+    where their request deadline would leave no time for the call.
+
+    Returns:
+        Decorated ``_make_request`` with rate limiting
+    """
+    def decorator(f: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(f)
+        async def decorated_function(
+            self: Any,
+            endpoint: str,
+            payload: Dict[str, Any],
+            service_name: str,
+            method: str = 'POST',
+            airline_code: Optional[str] = None,
+            **kwargs: Any
+        ) -> T:
+            third_party_id = airline_code or self.config.get('VERTEIL_THIRD_PARTY_ID') or 'all'
+            rate, burst = rate_governor.verteil_limit(service_name)
+            await rate_governor.acquire(
+                f"verteil:{service_name}:{third_party_id}",
+                rate=rate,
+                capacity=burst,
+                max_wait=cap_wait(RateGovernorConfig.MAX_WAIT)
+            )
+            return await f(self, endpoint, payload, service_name, method, airline_code, **kwargs)
+        return decorated_function
+    return decorator
+
+def async_circuit_breaker() -> Callable:
+    """
+    Decorator failing ``FlightService._make_request`` fast while the service's circuit is open.
+
+    Rejected calls raise ``CircuitOpenError`` before taking a rate limit
+    token (see ``services.flight.circuit_breaker``).
+
+    Returns:
+        Decorated ``_make_request`` with a circuit breaker check
+    """
+    def decorator(f: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(f)
+        async def decorated_function(
+            self: Any,
+            endpoint: str,
+            payload: Dict[str, Any],
+            service_name: str,
+            method: str = 'POST',
+            airline_code: Optional[str] = None,
+            **kwargs: Any
+        ) -> T:
+            circuit_breaker.check(service_name)
+            return await f(self, endpoint, payload, service_name, method, airline_code, **kwargs)
+        return decorated_function
+    return decorator
@@ -40,3 +40,18 @@ class BookingError(FlightServiceError):
 class PricingError(FlightServiceError):
     """Raised when there's an error during the pricing process."""
     pass
+
+
+class DeadlineExceeded(FlightServiceError):
+    """Raised when a request's deadline leaves no time for (another) Verteil call."""
+    status_code = 504
+
+
+class CircuitOpenError(FlightServiceError):
+    """Raised without calling Verteil while the circuit breaker of a service is open."""
+    status_code = 503
+
+    def __init__(self, message: str, service_name: str = None, retry_after: float = None):
+        self.service_name = service_name
+        self.retry_after = retry_after
+        super().__init__(message)
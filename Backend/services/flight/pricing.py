@@ -5,7 +5,7 @@ This module handles flight pricing operations using the Verteil NDC API.
 """
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import uuid
 import sys
 import os
@@ -13,18 +13,20 @@ from datetime import datetime
 import asyncio
 
 # Import the flight price transformer and request builder from their respective packages
-from utils.flight_price_transformer import transform_for_frontend, transform_flight_price_response
+from utils.flight_price_transformer import transform_flight_price_response
 from scripts.build_flightprice_rq import build_flight_price_request
 
 # Import service components
 from services.flight.core import FlightService
+from services.transform_executor import transform_executor
 from services.flight.decorators import async_cache, async_rate_limited
-from services.flight.exceptions import FlightServiceError, ValidationError
+from services.flight.exceptions import CircuitOpenError, DeadlineExceeded, FlightServiceError, ValidationError
 from services.flight.types import PricingResponse, SearchCriteria
 
 # Import Phase 1 core infrastructure for multi-airline support
 from utils.multi_airline_detector import MultiAirlineDetector
-from utils.reference_extractor import EnhancedReferenceExtractor
+from utils.ndc_response_index import NdcResponseIndex
+from utils.offer_index import OfferIndex, offer_index_cache_key
 
 logger = logging.getLogger(__name__)
 
@@ -73,17 +75,19 @@ class FlightPricingService(FlightService):
         try:
             # Try to retrieve raw response from cache if cache key is provided
             actual_airshopping_response = airshopping_response
+            offer_index = None
 
             # Check if we received metadata instead of raw response (optimized flow)
             if isinstance(airshopping_response, dict) and 'raw_response_cache_key' in airshopping_response:
                 cache_key = airshopping_response['raw_response_cache_key']
                 logger.info(f"Detected optimized flow with cache key: {cache_key}")
                 try:
-                    from utils.cache_manager import cache_manager
-                    cached_raw_response = cache_manager.get(cache_key)
+                    from services.raw_response_store import raw_response_store
+                    cached_raw_response = await raw_response_store.get(cache_key)
                     if cached_raw_response:
                         logger.info(f"✅ Retrieved raw air shopping response from cache using key: {cache_key}")
                         actual_airshopping_response = cached_raw_response
+                        offer_index = await self._load_offer_index(cache_key)
                     else:
                         logger.warning(f"⚠️ Raw response not found in cache for key: {cache_key}")
                         logger.warning("Raw cache likely expired. Checking for alternative cache keys...")
@@ -98,7 +102,7 @@ class FlightPricingService(FlightService):
                         fallback_found = False
                         for alt_key in alternative_keys:
                             try:
-                                fallback_response = cache_manager.get(alt_key)
+                                fallback_response = await raw_response_store.get(alt_key)
                                 if fallback_response:
                                     logger.info(f"✅ Found fallback cache data with key: {alt_key}")
                                     actual_airshopping_response = fallback_response
@@ -131,11 +135,12 @@ class FlightPricingService(FlightService):
             # Also check the raw_response_cache_key parameter (alternative method)
             elif raw_response_cache_key:
                 try:
-                    from utils.cache_manager import cache_manager
-                    cached_raw_response = cache_manager.get(raw_response_cache_key)
+                    from services.raw_response_store import raw_response_store
+                    cached_raw_response = await raw_response_store.get(raw_response_cache_key)
                     if cached_raw_response:
                         logger.info(f"✅ Retrieved raw response from cache using parameter key: {raw_response_cache_key}")
                         actual_airshopping_response = cached_raw_response
+                        offer_index = await self._load_offer_index(raw_response_cache_key)
                     else:
                         logger.warning(f"⚠️ Raw response not found in cache for parameter key: {raw_response_cache_key}, using provided response")
                 except Exception as cache_error:
@@ -177,15 +182,19 @@ class FlightPricingService(FlightService):
                             first_traveler = traveler_list[0]
                             logger.info(f"[DEBUG] First traveler ObjectKey: {first_traveler.get('ObjectKey', 'N/A')}")
 
+            # Index the offers once if no index was stored with the cached response
+            if offer_index is None and 'OffersGroup' in actual_airshopping_response:
+                offer_index = OfferIndex.build(actual_airshopping_response)
+
             # Extract airline code from the offer using the actual raw response
             logger.info(f"🔧 DEBUGGING: About to call _extract_airline_code_from_offer with response type: {type(actual_airshopping_response)}")
             logger.info(f"🔧 DEBUGGING: Response keys being passed: {list(actual_airshopping_response.keys())[:5]}")
-            airline_code = self._extract_airline_code_from_offer(actual_airshopping_response, offer_id)
+            airline_code = self._extract_airline_code_from_offer(actual_airshopping_response, offer_id, offer_index)
             logger.info(f"Extracted airline code '{airline_code}' for offer {offer_id} (ReqID: {request_id})")
 
             # Get airline-specific ShoppingResponseID for multi-airline support using the actual raw response
             if airline_code:
-                airline_shopping_response_id = self._get_shopping_response_id_for_airline(actual_airshopping_response, airline_code)
+                airline_shopping_response_id = self._get_shopping_response_id_for_airline(actual_airshopping_response, airline_code, offer_index)
                 if airline_shopping_response_id:
                     # Use airline-specific ShoppingResponseID if available
                     shopping_response_id = airline_shopping_response_id
@@ -207,7 +216,8 @@ class FlightPricingService(FlightService):
             # Build the pricing payload
             pricing_payload = self._build_pricing_payload(
                 airshopping_response=actual_airshopping_response,
-                offer_id=offer_id
+                offer_id=offer_id,
+                offer_index=offer_index
             )
 
             # [PASSENGER DEBUG] Log passenger data in pricing payload
@@ -240,16 +250,16 @@ class FlightPricingService(FlightService):
             # Cache the raw flight price response for order creation
             flight_price_cache_key = f"flight_price_raw_{request_id}_{int(datetime.now().timestamp())}"
             try:
-                from utils.cache_manager import cache_manager
+                from services.raw_response_store import raw_response_store
                 # Cache for 30 minutes (1800 seconds) - same as frontend session
-                cache_manager.set(flight_price_cache_key, response, ttl=1800)
+                await raw_response_store.set(flight_price_cache_key, response, ttl=1800)
                 logger.info(f"Raw flight price response cached with key: {flight_price_cache_key}")
             except Exception as cache_error:
                 logger.warning(f"Failed to cache raw flight price response: {cache_error}")
                 flight_price_cache_key = None
 
             # Process the response, passing the frontend's offer_id to ensure consistency
-            processed_response = self._process_pricing_response(
+            processed_response = await self._process_pricing_response(
                 response=response,
                 request_id=request_id,
                 frontend_offer_id=offer_id,  # Pass the frontend's offer ID to maintain consistency
@@ -268,7 +278,10 @@ class FlightPricingService(FlightService):
                 'data': processed_response,
                 'request_id': request_id
             }
-            
+
+        except (DeadlineExceeded, CircuitOpenError):
+            # Answered by the app's 504 / 503 handlers, not as a pricing error
+            raise
         except ValidationError as e:
             logger.error(f"Validation error in get_flight_price: {str(e)}")
             return {
@@ -284,7 +297,32 @@ class FlightPricingService(FlightService):
                 'request_id': request_id
             }
     
-    def _extract_airline_code_from_offer(self, airshopping_response: Dict[str, Any], offer_id: str) -> Optional[str]:
+    async def _load_offer_index(self, raw_response_cache_key: str) -> Optional[OfferIndex]:
+        """
+        Load the offer index stored next to a cached AirShopping response.
+
+        Args:
+            raw_response_cache_key: Cache key of the raw AirShopping response
+
+        Returns:
+            The OfferIndex, or None if it is missing (it is then built on demand)
+        """
+        try:
+            from services.raw_response_store import raw_response_store
+            offer_index = OfferIndex.from_dict(await raw_response_store.get(offer_index_cache_key(raw_response_cache_key)))
+            if offer_index is not None:
+                logger.info(f"Loaded offer index for {raw_response_cache_key} ({offer_index.total_offers} offers)")
+            return offer_index
+        except Exception as e:
+            logger.warning(f"Failed to load offer index for {raw_response_cache_key}: {e}")
+            return None
+
+    def _extract_airline_code_from_offer(
+        self,
+        airshopping_response: Dict[str, Any],
+        offer_id: str,
+        offer_index: Optional[OfferIndex] = None
+    ) -> Optional[str]:
         """
         Enhanced airline code extraction with multi-airline support.
 
@@ -300,6 +338,9 @@ class FlightPricingService(FlightService):
             logger.info(f"🔧 DEBUGGING: Inside _extract_airline_code_from_offer - response type: {type(airshopping_response)}")
             logger.info(f"🔧 DEBUGGING: Inside _extract_airline_code_from_offer - response keys: {list(airshopping_response.keys())[:5]}")
 
+            if offer_index is not None:
+                return self._extract_airline_code_from_offer_index(airshopping_response, offer_id, offer_index)
+
             # Detect response type
             is_multi_airline = MultiAirlineDetector.is_multi_airline_response(airshopping_response)
 
@@ -312,6 +353,45 @@ class FlightPricingService(FlightService):
             logger.error(f"Error extracting airline code for offer {offer_id}: {str(e)}", exc_info=True)
             return None
 
+    def _extract_airline_code_from_offer_index(
+        self,
+        airshopping_response: Dict[str, Any],
+        offer_id: str,
+        offer_index: OfferIndex
+    ) -> Optional[str]:
+        """
+        Extract airline code with direct offer index lookups.
+
+        Follows the same rules as the multi-/single-airline scans below.
+        """
+        if offer_index.is_multi_airline:
+            try:
+                offer_position = int(offer_id)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid offer_id format for multi-airline: {offer_id}, error: {e}")
+                return None
+
+            entry, _, _ = offer_index.get_priced_offer(airshopping_response, offer_position)
+            if entry is None:
+                logger.error(f"Multi-airline offer index {offer_position} out of range (total offers: {len(offer_index.priced_offers)})")
+                return None
+            if not entry.get('owner'):
+                logger.warning(f"No Owner found in OfferID for multi-airline offer index {offer_position}")
+                return None
+
+            logger.info(f"Extracted airline code '{entry['owner']}' from multi-airline offer index {offer_position}")
+            return entry['owner']
+
+        entry = offer_index.find_by_offer_id(offer_id)
+        if entry is None:
+            logger.warning(f"Could not find single-airline offer {offer_id} in AirShopping response")
+            return None
+
+        offer, airline_offer = offer_index.resolve_offer(airshopping_response, entry)
+        if offer is None:
+            return None
+        return self._get_single_airline_offer_code(airline_offer, offer)
+
     def _extract_airline_from_multi_airline_offer(self, airshopping_response: Dict[str, Any], offer_id: str) -> Optional[str]:
         """
         Extract airline code from multi-airline response using offer index.
@@ -414,34 +494,9 @@ class FlightPricingService(FlightService):
 
                     if current_offer_id == offer_id:
                         logger.info(f"Found matching single-airline offer at AirlineOffers[{i}].AirlineOffer[{j}]")
-
-                        # Try multiple paths for airline code extraction
-                        # 1. From Owner at airline_offer level
-                        owner = airline_offer.get('Owner', {})
-                        if isinstance(owner, dict):
-                            airline_code = owner.get('value')
-                            if airline_code:
-                                logger.info(f"Found airline code '{airline_code}' from Owner")
-                                return airline_code
-
-                        # 2. From ValidatingCarrier in the offer
-                        validating_carrier = offer.get('ValidatingCarrier', {})
-                        if isinstance(validating_carrier, dict):
-                            airline_code = validating_carrier.get('value')
-                            if airline_code:
-                                logger.info(f"Found airline code '{airline_code}' from ValidatingCarrier")
-                                return airline_code
-
-                        # 3. From FlightSegments if available
-                        flight_segments = offer.get('FlightSegments', [])
-                        if isinstance(flight_segments, list) and flight_segments:
-                            for segment in flight_segments:
-                                operating_carrier = segment.get('OperatingCarrier', {})
-                                if isinstance(operating_carrier, dict):
-                                    airline_code = operating_carrier.get('value')
-                                    if airline_code:
-                                        logger.info(f"Found airline code '{airline_code}' from OperatingCarrier")
-                                        return airline_code
+                        airline_code = self._get_single_airline_offer_code(airline_offer, offer)
+                        if airline_code:
+                            return airline_code
 
             logger.warning(f"Could not find single-airline offer {offer_id} in AirShopping response")
             return None
@@ -450,13 +505,60 @@ class FlightPricingService(FlightService):
             logger.error(f"Error extracting airline code from single-airline offer: {e}")
             return None
 
-    def _get_shopping_response_id_for_airline(self, airshopping_response: Dict[str, Any], airline_code: str) -> Optional[str]:
+    def _get_single_airline_offer_code(self, airline_offer: Dict[str, Any], offer: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the airline code of a matched single-airline offer.
+
+        Args:
+            airline_offer: The AirlineOffers node containing the offer
+            offer: The matched AirlineOffer
+
+        Returns:
+            The airline code or None if not found
+        """
+        # Try multiple paths for airline code extraction
+        # 1. From Owner at airline_offer level
+        owner = airline_offer.get('Owner', {})
+        if isinstance(owner, dict):
+            airline_code = owner.get('value')
+            if airline_code:
+                logger.info(f"Found airline code '{airline_code}' from Owner")
+                return airline_code
+
+        # 2. From ValidatingCarrier in the offer
+        validating_carrier = offer.get('ValidatingCarrier', {})
+        if isinstance(validating_carrier, dict):
+            airline_code = validating_carrier.get('value')
+            if airline_code:
+                logger.info(f"Found airline code '{airline_code}' from ValidatingCarrier")
+                return airline_code
+
+        # 3. From FlightSegments if available
+        flight_segments = offer.get('FlightSegments', [])
+        if isinstance(flight_segments, list) and flight_segments:
+            for segment in flight_segments:
+                operating_carrier = segment.get('OperatingCarrier', {})
+                if isinstance(operating_carrier, dict):
+                    airline_code = operating_carrier.get('value')
+                    if airline_code:
+                        logger.info(f"Found airline code '{airline_code}' from OperatingCarrier")
+                        return airline_code
+
+        return None
+
+    def _get_shopping_response_id_for_airline(
+        self,
+        airshopping_response: Dict[str, Any],
+        airline_code: str,
+        offer_index: Optional[OfferIndex] = None
+    ) -> Optional[str]:
         """
         Get the airline-specific ShoppingResponseID for multi-airline responses.
 
         Args:
             airshopping_response: The AirShopping response
             airline_code: The airline code to get ShoppingResponseID for
+            offer_index: Optional precomputed offer index (avoids re-parsing the response)
 
         Returns:
             The airline-specific ShoppingResponseID or None if not found
@@ -464,15 +566,11 @@ class FlightPricingService(FlightService):
         try:
             logger.info(f"Getting ShoppingResponseID for airline: {airline_code}")
 
-            # Check if this is a multi-airline response
-            is_multi_airline = MultiAirlineDetector.is_multi_airline_response(airshopping_response)
-
-            if is_multi_airline:
-                # Use the enhanced reference extractor to get airline-specific ShoppingResponseIDs
-                extractor = EnhancedReferenceExtractor(airshopping_response)
-                refs = extractor.extract_references()
+            # Parse once: the index holds both the multi-airline flag and per-airline IDs
+            response_index = offer_index or NdcResponseIndex(airshopping_response)
 
-                shopping_ids = refs.get('shopping_response_ids', {})
+            if response_index.is_multi_airline:
+                shopping_ids = response_index.shopping_response_ids
                 airline_shopping_id = shopping_ids.get(airline_code)
 
                 if airline_shopping_id:
@@ -505,7 +603,8 @@ class FlightPricingService(FlightService):
     def _build_pricing_payload(
         self,
         airshopping_response: Dict[str, Any],
-        offer_id: str
+        offer_id: str,
+        offer_index: Optional[OfferIndex] = None
     ) -> Dict[str, Any]:
         """
         Build the FlightPrice request payload using the request builder.
@@ -513,6 +612,7 @@ class FlightPricingService(FlightService):
         Args:
             airshopping_response: The AirShopping response (may be transformed frontend format)
             offer_id: The ID of the offer to price (can be index or OfferID)
+            offer_index: Optional precomputed offer index for the raw AirShopping response
 
         Returns:
             Dictionary containing the request payload
@@ -567,6 +667,10 @@ class FlightPricingService(FlightService):
                 logger.info("[DEBUG] No AirShoppingRS wrapper found, using data directly")
                 unwrapped_response = original_response
 
+            # The offer index describes the raw response it was built from
+            if offer_index is not None and unwrapped_response is not airshopping_response:
+                offer_index = None
+
             if is_index_based:
                 # NEW INDEX-BASED APPROACH: Map display index to original index
                 display_index = selected_offer_index
@@ -584,6 +688,9 @@ class FlightPricingService(FlightService):
                         transformed_offers = data_section['offers']
                     elif 'data' in data_section and 'offers' in data_section['data']:
                         transformed_offers = data_section['data']['offers']
+                elif offer_index is not None and offer_index.display_to_raw:
+                    # Display order was recorded when the search results were built
+                    transformed_offers = [{'original_index': raw_index} for raw_index in offer_index.display_to_raw]
                 else:
                     # If we don't have transformed offers, recreate them to get the mapping
                     try:
@@ -613,19 +720,22 @@ class FlightPricingService(FlightService):
                     selected_offer_index = display_index
 
                 # Validate that the original index is within bounds of raw response
-                offers_group = unwrapped_response.get('OffersGroup', {})
-                airline_offers_list = offers_group.get('AirlineOffers', [])
-                if not isinstance(airline_offers_list, list):
-                    airline_offers_list = [airline_offers_list]
-
-                # Count total offers to validate original index
-                total_offers = 0
-                for airline_offers_entry in airline_offers_list:
-                    if isinstance(airline_offers_entry, dict):
-                        airline_offers = airline_offers_entry.get('AirlineOffer', [])
-                        if not isinstance(airline_offers, list):
-                            airline_offers = [airline_offers]
-                        total_offers += len(airline_offers)
+                if offer_index is not None:
+                    total_offers = offer_index.total_offers
+                else:
+                    offers_group = unwrapped_response.get('OffersGroup', {})
+                    airline_offers_list = offers_group.get('AirlineOffers', [])
+                    if not isinstance(airline_offers_list, list):
+                        airline_offers_list = [airline_offers_list]
+
+                    # Count total offers to validate original index
+                    total_offers = 0
+                    for airline_offers_entry in airline_offers_list:
+                        if isinstance(airline_offers_entry, dict):
+                            airline_offers = airline_offers_entry.get('AirlineOffer', [])
+                            if not isinstance(airline_offers, list):
+                                airline_offers = [airline_offers]
+                            total_offers += len(airline_offers)
 
                 if selected_offer_index >= total_offers:
                     raise ValueError(f"Original index {selected_offer_index} is out of bounds. Total offers in raw response: {total_offers}")
@@ -636,61 +746,30 @@ class FlightPricingService(FlightService):
                 # LEGACY OFFERID-BASED APPROACH: Keep the complex mapping for backward compatibility
                 logger.info(f"[DEBUG] Using legacy OfferID approach for: {offer_id}")
 
-                # Re-transform the raw response to create OfferID mapping
-                from utils.air_shopping_transformer import transform_air_shopping_for_results
-                transformed_data = transform_air_shopping_for_results(original_response)
-
-                # Build mapping from original OfferIDs to their indices
-                offers_group = unwrapped_response.get('OffersGroup', {})
-                airline_offers_list = offers_group.get('AirlineOffers', [])
-                if not isinstance(airline_offers_list, list):
-                    airline_offers_list = [airline_offers_list]
-
-                original_offer_mapping = {}
-                all_original_ids = []
-                offer_index = 0
-
-                for airline_offers_entry in airline_offers_list:
-                    if not isinstance(airline_offers_entry, dict):
-                        continue
-
-                    airline_offers = airline_offers_entry.get('AirlineOffer', [])
-                    if not isinstance(airline_offers, list):
-                        airline_offers = [airline_offers]
-
-                    for offer in airline_offers:
-                        if not isinstance(offer, dict):
-                            continue
-
-                        # Extract original OfferID from NDC format
-                        original_offer_id = None
-                        if 'OfferID' in offer:
-                            offer_id_obj = offer['OfferID']
-                            if isinstance(offer_id_obj, dict):
-                                original_offer_id = offer_id_obj.get('value') or offer_id_obj.get('ObjectKey')
-                            elif isinstance(offer_id_obj, str):
-                                original_offer_id = offer_id_obj
-
-                        if original_offer_id:
-                            original_offer_mapping[original_offer_id] = offer_index
-                            all_original_ids.append(original_offer_id)
-                            logger.debug(f"[DEBUG] Mapped original offer ID {original_offer_id} to index {offer_index}")
-
-                        offer_index += 1
+                # Map original OfferIDs to their indices (precomputed when the index is available)
+                if offer_index is not None:
+                    find_original_index = offer_index.find_raw_index
+                    all_original_ids = None
+                else:
+                    original_offer_mapping, all_original_ids = self._map_original_offer_ids(unwrapped_response)
+                    find_original_index = original_offer_mapping.get
 
                 # Try to find the offer using different strategies
                 offer_found = False
-                if offer_id in original_offer_mapping:
-                    selected_offer_index = original_offer_mapping[offer_id]
+                if find_original_index(offer_id) is not None:
+                    selected_offer_index = find_original_index(offer_id)
                     offer_found = True
                     logger.info(f"[DEBUG] Found direct match for offer_id: {offer_id} at index {selected_offer_index}")
                 else:
+                    if all_original_ids is None:
+                        all_original_ids = offer_index.lookup_ids()
+
                     # Suffix matching strategy
                     offer_suffix = offer_id.split('_', 1)[-1] if '_' in offer_id else offer_id
                     for original_id in all_original_ids:
                         original_suffix = original_id.split('_', 1)[-1] if '_' in original_id else original_id
                         if original_suffix == offer_suffix:
-                            selected_offer_index = original_offer_mapping[original_id]
+                            selected_offer_index = find_original_index(original_id)
                             offer_found = True
                             logger.info(f"[DEBUG] Found suffix match: frontend {offer_id} matches original {original_id} at index {selected_offer_index}")
                             break
@@ -707,7 +786,8 @@ class FlightPricingService(FlightService):
             logger.info(f"[DEBUG] Building FlightPrice payload for offer {offer_id} at index {selected_offer_index}")
             payload = build_flight_price_request(
                 airshopping_response=unwrapped_response,
-                selected_offer_index=selected_offer_index
+                selected_offer_index=selected_offer_index,
+                offer_index=offer_index
             )
             
             logger.info("[DEBUG] Successfully built FlightPrice payload")
@@ -717,6 +797,55 @@ class FlightPricingService(FlightService):
             logger.error(f"[ERROR] Error building FlightPrice payload: {str(e)}", exc_info=True)
             raise ValidationError(f"Failed to build pricing payload: {str(e)}") from e
 
+    def _map_original_offer_ids(self, airshopping_response: Dict[str, Any]) -> Tuple[Dict[str, int], List[str]]:
+        """
+        Map original NDC OfferIDs to their raw offer indices.
+
+        Args:
+            airshopping_response: The unwrapped AirShopping response
+
+        Returns:
+            Tuple of (OfferID -> raw index mapping, OfferIDs in raw order)
+        """
+        offers_group = airshopping_response.get('OffersGroup', {})
+        airline_offers_list = offers_group.get('AirlineOffers', [])
+        if not isinstance(airline_offers_list, list):
+            airline_offers_list = [airline_offers_list]
+
+        original_offer_mapping = {}
+        all_original_ids = []
+        offer_position = 0
+
+        for airline_offers_entry in airline_offers_list:
+            if not isinstance(airline_offers_entry, dict):
+                continue
+
+            airline_offers = airline_offers_entry.get('AirlineOffer', [])
+            if not isinstance(airline_offers, list):
+                airline_offers = [airline_offers]
+
+            for offer in airline_offers:
+                if not isinstance(offer, dict):
+                    continue
+
+                # Extract original OfferID from NDC format
+                original_offer_id = None
+                if 'OfferID' in offer:
+                    offer_id_obj = offer['OfferID']
+                    if isinstance(offer_id_obj, dict):
+                        original_offer_id = offer_id_obj.get('value') or offer_id_obj.get('ObjectKey')
+                    elif isinstance(offer_id_obj, str):
+                        original_offer_id = offer_id_obj
+
+                if original_offer_id:
+                    original_offer_mapping[original_offer_id] = offer_position
+                    all_original_ids.append(original_offer_id)
+                    logger.debug(f"[DEBUG] Mapped original offer ID {original_offer_id} to index {offer_position}")
+
+                offer_position += 1
+
+        return original_offer_mapping, all_original_ids
+
     def _validate_offer_expiration(self, airshopping_response: Dict[str, Any], selected_offer_index: int) -> None:
         """
         Validate that the selected offer has not expired.
@@ -779,7 +908,7 @@ class FlightPricingService(FlightService):
             logger.error(f"Error validating offer expiration: {str(e)}")
             # Don't fail the request if we can't validate expiration, just log the error
 
-    def _process_pricing_response(
+    async def _process_pricing_response(
         self,
         response: Dict[str, Any],
         request_id: Optional[str] = None,
@@ -841,8 +970,8 @@ class FlightPricingService(FlightService):
                 # For now, skip transformation if required structure is missing
                 raise ValueError(f"FlightPrice response missing required structure. Missing keys: {missing_keys}")
             
-            # Use transform_for_frontend to transform the response
-            transformation_result = transform_for_frontend(flight_price_data)
+            # Use transform_for_frontend (off the event loop) to transform the response
+            transformation_result = await transform_executor.run('flight_price', flight_price_data)
 
             # Extract the offers array from the transformation result
             transformed_offers = transformation_result.get('offers', [])
@@ -856,58 +985,16 @@ class FlightPricingService(FlightService):
             
             logger.info(f"Successfully transformed FlightPrice response with {len(transformed_offers)} offers")
             
-            # Cache the raw flight price response for order creation
-            from utils.cache_manager import cache_manager
+            # The raw response is already in the shared store under flight_price_cache_key
+            # (see get_flight_price); order creation and seat/service lookups read that key
 
-            # Generate multiple cache keys for flight price response to ensure booking can find it
-            cache_keys = [
-                f"flight_price_response:{request_id or 'unknown'}",  # Primary key with request_id
-            ]
-
-            # Extract ShoppingResponseID and OfferID from response for additional cache keys
-            try:
-                shopping_response_id = None
-                offer_id = None
-
-                if response and 'ShoppingResponseID' in response:
-                    shopping_response_id_node = response['ShoppingResponseID']
-                    if isinstance(shopping_response_id_node, dict) and 'ResponseID' in shopping_response_id_node:
-                        shopping_response_id = shopping_response_id_node['ResponseID'].get('value')
-
-                if response and 'PricedFlightOffers' in response:
-                    priced_offers = response['PricedFlightOffers']
-                    if isinstance(priced_offers, dict) and 'PricedFlightOffer' in priced_offers:
-                        priced_offer_list = priced_offers['PricedFlightOffer']
-                        if isinstance(priced_offer_list, list) and len(priced_offer_list) > 0:
-                            first_offer = priced_offer_list[0]
-                            if 'OfferID' in first_offer:
-                                offer_id_node = first_offer['OfferID']
-                                if isinstance(offer_id_node, dict) and 'value' in offer_id_node:
-                                    offer_id = offer_id_node['value']
-
-                # Add additional cache keys if we found the IDs
-                if shopping_response_id:
-                    cache_keys.append(f"flight_price_response:{shopping_response_id}")
-                if offer_id:
-                    cache_keys.append(f"flight_price_response:{offer_id}")
-
-            except Exception as e:
-                logger.warning(f"Could not extract IDs for additional cache keys: {str(e)}")
-
-            # Store the complete raw response in cache for 30 minutes using all keys
-            for cache_key in cache_keys:
-                cache_manager.set(cache_key, response, ttl=1800)
-                logger.info(f"Stored flight price response in cache with key: {cache_key}")
-            
-            # Cache the response using the primary cache key only
-            
             # Return in a format compatible with frontend expectations
             result = {
                 'priced_offers': transformed_offers,
                 'total_offers': len(transformed_offers),
                 'transformation_status': 'success',
                 'metadata': {
-                    'cache_key': cache_keys[0] if cache_keys else f"flight_price_response:{request_id or 'unknown'}",
+                    'cache_key': flight_price_cache_key or f"flight_price_response:{request_id or 'unknown'}",
                     'flight_price_cache_key': flight_price_cache_key,  # For order creation to retrieve raw response
                     'cached': True,
                     'request_id': request_id
@@ -924,49 +1011,6 @@ class FlightPricingService(FlightService):
         except Exception as e:
             logger.error(f"Error transforming FlightPrice response: {str(e)}", exc_info=True)
             
-            # Cache the raw flight price response even when transformation fails
-            from utils.cache_manager import cache_manager
-
-            # Generate multiple cache keys for flight price response to ensure booking can find it
-            cache_keys = [
-                f"flight_price_response:{request_id or 'unknown'}",  # Primary key with request_id
-            ]
-
-            # Extract ShoppingResponseID and OfferID from response for additional cache keys
-            try:
-                shopping_response_id = None
-                offer_id = None
-
-                if response and 'ShoppingResponseID' in response:
-                    shopping_response_id_node = response['ShoppingResponseID']
-                    if isinstance(shopping_response_id_node, dict) and 'ResponseID' in shopping_response_id_node:
-                        shopping_response_id = shopping_response_id_node['ResponseID'].get('value')
-
-                if response and 'PricedFlightOffers' in response:
-                    priced_offers = response['PricedFlightOffers']
-                    if isinstance(priced_offers, dict) and 'PricedFlightOffer' in priced_offers:
-                        priced_offer_list = priced_offers['PricedFlightOffer']
-                        if isinstance(priced_offer_list, list) and len(priced_offer_list) > 0:
-                            first_offer = priced_offer_list[0]
-                            if 'OfferID' in first_offer:
-                                offer_id_node = first_offer['OfferID']
-                                if isinstance(offer_id_node, dict) and 'value' in offer_id_node:
-                                    offer_id = offer_id_node['value']
-
-                # Add additional cache keys if we found the IDs
-                if shopping_response_id:
-                    cache_keys.append(f"flight_price_response:{shopping_response_id}")
-                if offer_id:
-                    cache_keys.append(f"flight_price_response:{offer_id}")
-
-            except Exception as e:
-                logger.warning(f"Could not extract IDs for additional cache keys: {str(e)}")
-
-            # Store the complete raw response in cache for 30 minutes using all keys
-            for cache_key in cache_keys:
-                cache_manager.set(cache_key, response, ttl=1800)
-                logger.info(f"Stored flight price response in cache with key: {cache_key}")
-            
             # Try to extract basic offer information for fallback
             basic_offers = []
             try:
@@ -1030,7 +1074,7 @@ class FlightPricingService(FlightService):
                     'transformation_status': 'failed',
                     'transformation_error': str(e),
                     'error_type': error_type,
-                    'cache_key': f"flight_price_response:{request_id or 'unknown'}"
+                    'cache_key': flight_price_cache_key or f"flight_price_response:{request_id or 'unknown'}"
                 }
             }
 
@@ -0,0 +1,220 @@
+"""
+Outbound Rate Governor
+
+Token buckets limiting calls to Verteil, shared by all workers and instances
+through Redis.
+
+Each bucket refills at ``rate`` tokens per second up to ``capacity`` (the
+burst). A caller takes one token; if none is left it reserves the next one
+and sleeps until it is due instead of failing, so callers are served in
+arrival order. Only a caller that would have to wait longer than
+``max_wait`` is rejected with ``RateLimitExceeded`` (its token is not
+reserved).
+
+The check is a single Lua script (constant time, atomic, using the Redis
+server clock so instances with skewed clocks agree). While Redis is
+unavailable the same algorithm runs per process with the limit divided by
+``RATE_LIMIT_LOCAL_WORKERS``.
+
+Limits per Verteil service come from ``VERTEIL_RATE_LIMITS``, e.g.
+``AirShopping=60:10,FlightPrice=120:20`` (calls per minute : burst); other
+services use ``VERTEIL_RATE_LIMIT_PER_MINUTE`` / ``VERTEIL_RATE_LIMIT_BURST``.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from services.async_redis_flight_storage import async_redis_flight_storage
+from services.flight.exceptions import RateLimitExceeded
+from services.metrics import rate_limit_rejections, rate_limit_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] bucket; ARGV: capacity, rate (tokens/s), max wait (s).
+# Returns {1 if a token was taken, milliseconds to wait before using it}.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+local granted = 0
+if wait <= max_wait then
+    tokens = tokens - 1
+    granted = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity / rate + max_wait) * 1000) + 1000)
+return {granted, math.ceil(wait * 1000)}
+"""
+
+
+def _parse_limits(value: str) -> Dict[str, Tuple[float, int]]:
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        service, limit = item.split('=', 1)
+        per_minute, _, burst = limit.partition(':')
+        try:
+            limits[service.strip()] = (float(per_minute), int(burst) if burst else 0)
+        except ValueError:
+            logger.warning(f"Ignoring invalid VERTEIL_RATE_LIMITS entry: {item}")
+    return limits
+
+
+class RateGovernorConfig:
+    """Environment driven settings for outbound rate limiting."""
+
+    ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Default Verteil limit per service and ThirdpartyId
+    PER_MINUTE = float(os.getenv('VERTEIL_RATE_LIMIT_PER_MINUTE', 100))
+    BURST = int(os.getenv('VERTEIL_RATE_LIMIT_BURST', 20))
+    # Per-service overrides: "Service=per_minute:burst,..."
+    SERVICE_LIMITS = _parse_limits(os.getenv('VERTEIL_RATE_LIMITS', ''))
+    # Longest a caller is queued before RateLimitExceeded is raised
+    MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 5))
+    # Processes sharing the limit while Redis is unavailable (gunicorn workers)
+    LOCAL_WORKERS = max(int(os.getenv('RATE_LIMIT_LOCAL_WORKERS', 1)), 1)
+
+
+class _LocalBucket:
+    """In-process token bucket (same algorithm as the Lua script)."""
+
+    __slots__ = ('tokens', 'updated_at')
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+
+class RateGovernor:
+    """Token bucket rate limiter shared through Redis with an in-process fallback."""
+
+    def __init__(self):
+        self._local: Dict[str, _LocalBucket] = {}
+        self._lock = threading.Lock()
+        self._script = None
+        self._script_client = None
+        self._stats = {
+            'granted': 0,
+            'queued': 0,
+            'rejected': 0,
+            'local_checks': 0,
+            'errors': 0,
+        }
+
+    @staticmethod
+    def verteil_limit(service_name: str) -> Tuple[float, int]:
+        """Return (calls per second, burst) for a Verteil service."""
+        per_minute, burst = RateGovernorConfig.SERVICE_LIMITS.get(
+            service_name, (RateGovernorConfig.PER_MINUTE, RateGovernorConfig.BURST)
+        )
+        return per_minute / 60.0, burst or RateGovernorConfig.BURST
+
+    async def _take_shared(self, bucket: str, rate: float, capacity: int, max_wait: float) -> Optional[Tuple[bool, float]]:
+        client = await async_redis_flight_storage.get_client()
+        if client is None:
+            return None
+        try:
+            if self._script is None or self._script_client is not client:
+                # EVALSHA with automatic reload; re-registered when the pool is recreated
+                self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+                self._script_client = client
+            granted, wait_ms = await self._script(keys=[f"ratelimit:{bucket}"], args=[capacity, rate, max_wait])
+        except Exception as e:
+            self._increment('errors')
+            logger.warning(f"Shared rate limiter unavailable for {bucket}: {e}. Using the local limiter.")
+            return None
+        return bool(int(granted)), int(wait_ms) / 1000.0
+
+    def _take_local(self, bucket: str, rate: float, capacity: int, max_wait: float) -> Tuple[bool, float]:
+        # The limit is shared by every process; each one gets its share
+        rate = rate / RateGovernorConfig.LOCAL_WORKERS
+        capacity = max(capacity / RateGovernorConfig.LOCAL_WORKERS, 1)
+        with self._lock:
+            self._stats['local_checks'] += 1
+            state = self._local.get(bucket)
+            if state is None:
+                state = self._local[bucket] = _LocalBucket(capacity)
+            now = time.monotonic()
+            state.tokens = min(capacity, state.tokens + (now - state.updated_at) * rate)
+            state.updated_at = now
+
+            wait = (1 - state.tokens) / rate if state.tokens < 1 else 0.0
+            if wait > max_wait:
+                return False, wait
+            state.tokens -= 1
+            return True, wait
+
+    def _increment(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    async def acquire(
+        self,
+        bucket: str,
+        rate: float,
+        capacity: int,
+        max_wait: Optional[float] = None
+    ) -> float:
+        """
+        Take one token from ``bucket``, waiting for it if necessary.
+
+        Args:
+            bucket: Bucket name (e.g. 'verteil:AirShopping:all')
+            rate: Tokens added per second
+            capacity: Bucket size (burst)
+            max_wait: Longest acceptable wait in seconds (default RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            RateLimitExceeded: If the next token is further away than ``max_wait``
+        """
+        if not RateGovernorConfig.ENABLED or rate <= 0:
+            return 0.0
+        if max_wait is None:
+            max_wait = RateGovernorConfig.MAX_WAIT
+
+        result = await self._take_shared(bucket, rate, capacity, max_wait)
+        if result is None:
+            result = self._take_local(bucket, rate, capacity, max_wait)
+        granted, wait = result
+
+        if not granted:
+            self._increment('rejected')
+            rate_limit_rejections.inc(bucket=bucket)
+            raise RateLimitExceeded(
+                f"Rate limit exceeded for {bucket}: next slot in {wait:.1f}s. Please try again later."
+            )
+
+        self._increment('queued' if wait > 0 else 'granted')
+        rate_limit_wait_seconds.observe(wait, bucket=bucket)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return counters and the number of local buckets."""
+        with self._lock:
+            return {**self._stats, 'local_buckets': len(self._local)}
+
+
+# Create a singleton instance (one governor per worker process)
+rate_governor = RateGovernor()
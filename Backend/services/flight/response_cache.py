@@ -0,0 +1,296 @@
+"""
+Verteil Response Cache
+
+Caches responses of ``FlightService._make_request`` per worker, applied
+through ``decorators.async_response_cache``.
+
+- Keys are a SHA-256 of the canonicalized request (service, endpoint, method,
+  office / airline headers and the payload without ``request_id``), so they
+  are short and identical requests share an entry whatever their request ID.
+- Each service has a policy; services without one (OrderCreate,
+  OrderRetrieve, ...) are never cached. AirShopping and FlightPrice entries
+  never outlive the earliest ``OfferExpiration`` in the response.
+- Entries are stored encoded (see ``services.payload_codec``), so every hit
+  returns a fresh copy. They are kept in a ``CacheManager``, which evicts the
+  least recently used entries beyond ``RESPONSE_CACHE_MAX_BYTES`` and sweeps
+  expired ones through its expiry heap.
+- Expired entries are kept for another ``RESPONSE_CACHE_STALE_TTL`` seconds
+  (never past their first offer's expiration) and are only returned by
+  ``get_stale``, used while the service's circuit breaker is open.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.metrics import cache_payload_bytes, cache_requests, cache_writes
+from services.payload_codec import decode_payload, encode_payload
+from utils.cache_manager import CacheManager
+
+logger = logging.getLogger(__name__)
+
+STORAGE_LABEL = 'verteil_response'
+
+
+class ResponseCacheConfig:
+    """Environment driven settings for the Verteil response cache."""
+
+    ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Total encoded bytes kept per worker
+    MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Encoded responses larger than this are not cached
+    MAX_ENTRY_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRY_BYTES', 8 * 1024 * 1024))
+    AIR_SHOPPING_TTL = int(os.getenv('RESPONSE_CACHE_AIR_SHOPPING_TTL', 300))
+    FLIGHT_PRICE_TTL = int(os.getenv('RESPONSE_CACHE_FLIGHT_PRICE_TTL', 60))
+    SEAT_AVAILABILITY_TTL = int(os.getenv('RESPONSE_CACHE_SEAT_AVAILABILITY_TTL', 60))
+    SERVICE_LIST_TTL = int(os.getenv('RESPONSE_CACHE_SERVICE_LIST_TTL', 120))
+    # Entries stop being served this many seconds before their first offer expires
+    OFFER_EXPIRY_MARGIN = int(os.getenv('RESPONSE_CACHE_OFFER_EXPIRY_MARGIN', 60))
+    # Seconds an expired entry may still be served while Verteil is unavailable
+    STALE_TTL = int(os.getenv('RESPONSE_CACHE_STALE_TTL', 600))
+
+
+class CachePolicy:
+    """How long responses of one Verteil service may be reused."""
+
+    def __init__(self, ttl: int, offer_expiry_aware: bool = False):
+        self.ttl = ttl
+        self.offer_expiry_aware = offer_expiry_aware
+
+    def __repr__(self) -> str:
+        return f"CachePolicy(ttl={self.ttl}, offer_expiry_aware={self.offer_expiry_aware})"
+
+
+# Service name -> policy; None (or no entry) means never cached
+SERVICE_POLICIES: Dict[str, Optional[CachePolicy]] = {
+    'AirShopping': CachePolicy(ResponseCacheConfig.AIR_SHOPPING_TTL, offer_expiry_aware=True),
+    'FlightPrice': CachePolicy(ResponseCacheConfig.FLIGHT_PRICE_TTL, offer_expiry_aware=True),
+    'SeatAvailability': CachePolicy(ResponseCacheConfig.SEAT_AVAILABILITY_TTL),
+    'ServiceList': CachePolicy(ResponseCacheConfig.SERVICE_LIST_TTL),
+    'OrderCreate': None,
+    'OrderRetrieve': None,
+}
+
+
+def canonical_hash(value: Any) -> str:
+    """Return a SHA-256 hex digest of ``value`` serialized as canonical JSON (sorted keys)."""
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _as_list(value: Any) -> List[Any]:
+    """Normalize an NDC element that may be a single object or a list."""
+    if isinstance(value, list):
+        return value
+    return [value] if value else []
+
+
+def _parse_expiry(value: Any) -> Optional[float]:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        # Verteil sends offer time limits without an offset, in UTC
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def earliest_offer_expiry(service_name: str, response: Dict[str, Any]) -> Optional[float]:
+    """Return the earliest OfferExpiration (epoch seconds) of the offers in an AirShopping or FlightPrice response."""
+    if service_name == 'AirShopping':
+        offers = [
+            offer
+            for airline_offers in _as_list((response.get('OffersGroup') or {}).get('AirlineOffers'))
+            if isinstance(airline_offers, dict)
+            for offer in _as_list(airline_offers.get('AirlineOffer'))
+        ]
+    elif service_name == 'FlightPrice':
+        offers = _as_list((response.get('PricedFlightOffers') or {}).get('PricedFlightOffer'))
+    else:
+        return None
+
+    expiries = []
+    for offer in offers:
+        if not isinstance(offer, dict):
+            continue
+        time_limits = offer.get('TimeLimits')
+        if not isinstance(time_limits, dict):
+            continue
+        for expiration in _as_list(time_limits.get('OfferExpiration')):
+            expiry = _parse_expiry(expiration.get('DateTime') if isinstance(expiration, dict) else None)
+            if expiry is not None:
+                expiries.append(expiry)
+    return min(expiries) if expiries else None
+
+
+class ResponseCache:
+    """Per-worker, byte-bounded LRU of encoded Verteil responses."""
+
+    def __init__(self, max_bytes: int = ResponseCacheConfig.MAX_BYTES):
+        self.max_bytes = max_bytes
+        # key -> (service name, encoded response, fresh until); the entry itself
+        # lives until the end of its stale window
+        self._entries = CacheManager(max_bytes=max_bytes, max_item_bytes=ResponseCacheConfig.MAX_ENTRY_BYTES)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale_hits': 0,
+            'writes': 0,
+            'skipped': 0,
+        }
+
+    def policy_for(self, service_name: str) -> Optional[CachePolicy]:
+        """Return the cache policy of ``service_name``, or None if it must not be cached."""
+        if not ResponseCacheConfig.ENABLED:
+            return None
+        return SERVICE_POLICIES.get(service_name)
+
+    def make_key(
+        self,
+        service_name: str,
+        endpoint: str,
+        method: str,
+        payload: Dict[str, Any],
+        scope: Dict[str, Any]
+    ) -> str:
+        """
+        Build the cache key of one upstream request.
+
+        Args:
+            service_name: Verteil service (e.g. 'AirShopping')
+            endpoint: Request path
+            method: HTTP method
+            payload: Request body; ``request_id`` is ignored
+            scope: Values that change the response besides the body (base
+                URL, office ID, ThirdpartyId)
+        """
+        digest = canonical_hash({
+            'service': service_name,
+            'endpoint': endpoint,
+            'method': method.upper(),
+            'scope': scope,
+            'payload': {k: v for k, v in payload.items() if k != 'request_id'},
+        })
+        return f"{service_name}:{digest}"
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _lookup(self, key: str, allow_stale: bool = False) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time() and not allow_stale:
+            return None
+        return entry[1]
+
+    def _increment(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached response for ``key``, or None."""
+        payload = self._lookup(key)
+        if payload is None:
+            self._increment('misses')
+            cache_requests.inc(storage=STORAGE_LABEL, result='miss')
+            return None
+
+        self._increment('hits')
+        cache_requests.inc(storage=STORAGE_LABEL, result='hit')
+        cache_payload_bytes.observe(len(payload), storage=STORAGE_LABEL, operation='read')
+        # Decompressing and parsing a large response would stall the event loop
+        return await asyncio.to_thread(decode_payload, payload)
+
+    async def get_stale(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached response for ``key`` even if expired (within its stale window), or None."""
+        payload = self._lookup(key, allow_stale=True)
+        if payload is None:
+            return None
+
+        self._increment('stale_hits')
+        cache_requests.inc(storage=STORAGE_LABEL, result='stale')
+        cache_payload_bytes.observe(len(payload), storage=STORAGE_LABEL, operation='read')
+        return await asyncio.to_thread(decode_payload, payload)
+
+    def _lifetime(self, service_name: str, policy: CachePolicy, response: Dict[str, Any]) -> Tuple[float, float]:
+        """Return (fresh TTL, stale TTL) in seconds from now."""
+        ttl = float(policy.ttl)
+        stale_ttl = ttl + ResponseCacheConfig.STALE_TTL
+        if policy.offer_expiry_aware:
+            expiry = earliest_offer_expiry(service_name, response)
+            if expiry is not None:
+                remaining = expiry - time.time()
+                ttl = min(ttl, remaining - ResponseCacheConfig.OFFER_EXPIRY_MARGIN)
+                # An expired offer cannot be priced or booked, stale or not
+                stale_ttl = min(stale_ttl, remaining)
+        return ttl, stale_ttl
+
+    async def set(self, key: str, service_name: str, policy: CachePolicy, response: Dict[str, Any]) -> bool:
+        """
+        Cache ``response`` under ``key`` according to ``policy``.
+
+        Error responses, responses whose offers are about to expire and
+        responses larger than ``RESPONSE_CACHE_MAX_ENTRY_BYTES`` are skipped.
+
+        Returns:
+            bool: True if the response was cached
+        """
+        if not isinstance(response, dict) or response.get('Errors'):
+            return self._skip('error_response')
+
+        ttl, stale_ttl = self._lifetime(service_name, policy, response)
+        if ttl < 1:
+            return self._skip('offer_expiring')
+
+        payload = await asyncio.to_thread(encode_payload, response)
+        if len(payload) > min(ResponseCacheConfig.MAX_ENTRY_BYTES, self.max_bytes):
+            return self._skip('too_large')
+
+        self._entries.set(key, (service_name, payload, time.time() + ttl), stale_ttl)
+        self._increment('writes')
+        cache_writes.inc(storage=STORAGE_LABEL, result='stored')
+        cache_payload_bytes.observe(len(payload), storage=STORAGE_LABEL, operation='write')
+        logger.debug(f"Cached {service_name} response for {ttl:.0f}s ({len(payload)} bytes)")
+        return True
+
+    def _skip(self, reason: str) -> bool:
+        self._increment('skipped')
+        cache_writes.inc(storage=STORAGE_LABEL, result=reason)
+        return False
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return counters, entry count and cached bytes (total and per service)."""
+        per_service: Dict[str, Dict[str, int]] = {}
+        for service_name, payload, _ in self._entries.values():
+            service = per_service.setdefault(service_name, {'entries': 0, 'bytes': 0})
+            service['entries'] += 1
+            service['bytes'] += len(payload)
+        storage = self._entries.get_stats()
+        with self._lock:
+            return {
+                **self._stats,
+                'evictions': storage['evictions'],
+                'expirations': storage['expirations'],
+                'entries': storage['entries'],
+                'bytes': storage['bytes'],
+                'max_bytes': self.max_bytes,
+                'services': per_service,
+            }
+
+
+# Create a singleton instance (one cache per worker process)
+response_cache = ResponseCache()
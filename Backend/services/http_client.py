@@ -0,0 +1,155 @@
+"""
+Shared HTTP Client Pool
+
+All Verteil calls (AirShopping, FlightPrice, OrderCreate, seat/service lists and
+the OAuth token endpoint) go through one long-lived ``aiohttp.ClientSession`` per
+worker process. Its ``TCPConnector`` keeps connections alive between requests,
+caches DNS lookups and caps connections per host, so follow-up requests reuse
+an open TLS connection instead of paying a new handshake every time.
+
+The session is opened in ``before_serving`` (bound to the worker's event loop)
+and closed in ``after_serving``. Connection reuse is tracked with aiohttp trace
+hooks and exposed through ``get_stats()``.
+"""
+import asyncio
+import logging
+import os
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClientConfig:
+    """Environment driven settings for the shared connection pool."""
+
+    # Total number of simultaneous connections in the pool
+    POOL_LIMIT = int(os.getenv('VERTEIL_HTTP_POOL_LIMIT', 100))
+    # Simultaneous connections to a single host (api.stage.verteil.com)
+    POOL_LIMIT_PER_HOST = int(os.getenv('VERTEIL_HTTP_POOL_LIMIT_PER_HOST', 30))
+    # Seconds an idle connection is kept open for reuse
+    KEEPALIVE_TIMEOUT = float(os.getenv('VERTEIL_HTTP_KEEPALIVE_TIMEOUT', 30))
+    # Seconds resolved host addresses are cached
+    DNS_CACHE_TTL = int(os.getenv('VERTEIL_HTTP_DNS_CACHE_TTL', 300))
+    # Default total timeout; FlightService passes its own per request
+    DEFAULT_TIMEOUT = float(os.getenv('VERTEIL_API_TIMEOUT', 60))
+
+
+class SharedHttpClient:
+    """Per-worker pooled aiohttp session shared by all Verteil callers."""
+
+    def __init__(self):
+        """Create the client; the session is opened by ``initialize()``."""
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        self._stats = {
+            'sessions_created': 0,
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'connections_queued': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+
+    def _increment(self, stat: str) -> None:
+        self._stats[stat] += 1
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Trace hooks that count requests, new vs reused connections and DNS hits."""
+        trace_config = aiohttp.TraceConfig()
+
+        def counter(stat: str):
+            async def _hook(session, context: SimpleNamespace, params) -> None:
+                self._increment(stat)
+            return _hook
+
+        trace_config.on_request_start.append(counter('requests'))
+        trace_config.on_connection_create_end.append(counter('connections_created'))
+        trace_config.on_connection_reuseconn.append(counter('connections_reused'))
+        trace_config.on_connection_queued_start.append(counter('connections_queued'))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+        return trace_config
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=HttpClientConfig.POOL_LIMIT,
+            limit_per_host=HttpClientConfig.POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HttpClientConfig.KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HttpClientConfig.DNS_CACHE_TTL,
+            use_dns_cache=True,
+            enable_cleanup_closed=True
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HttpClientConfig.DEFAULT_TIMEOUT),
+            trace_configs=[self._build_trace_config()]
+        )
+        self._increment('sessions_created')
+        return session
+
+    async def initialize(self) -> aiohttp.ClientSession:
+        """Open the worker's pooled session on the running event loop."""
+        return self.get_session()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the shared session for the running event loop.
+
+        The session is created on first use if ``initialize()`` was not called
+        (scripts, tests). A session bound to another loop is never reused.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = self._create_session()
+            self._loop = loop
+            logger.info(
+                f"Shared HTTP pool created (limit={HttpClientConfig.POOL_LIMIT}, "
+                f"per_host={HttpClientConfig.POOL_LIMIT_PER_HOST}, "
+                f"keepalive={HttpClientConfig.KEEPALIVE_TIMEOUT}s, "
+                f"dns_ttl={HttpClientConfig.DNS_CACHE_TTL}s)"
+            )
+        return self._session
+
+    def is_shared(self, session: Optional[aiohttp.ClientSession]) -> bool:
+        """Return True if ``session`` is the pooled session (callers must not close it)."""
+        return session is not None and session is self._session
+
+    async def close(self) -> None:
+        """Close the pooled session and all of its connections."""
+        session, self._session = self._session, None
+        self._loop = None
+        if session is not None and not session.closed:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"Error closing shared HTTP pool: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool settings, live connection counts and reuse counters."""
+        stats: Dict[str, Any] = dict(self._stats)
+        total = stats['connections_created'] + stats['connections_reused']
+        stats['reuse_ratio'] = round(stats['connections_reused'] / total, 3) if total else 0.0
+        stats['limit'] = HttpClientConfig.POOL_LIMIT
+        stats['limit_per_host'] = HttpClientConfig.POOL_LIMIT_PER_HOST
+        stats['keepalive_timeout'] = HttpClientConfig.KEEPALIVE_TIMEOUT
+        stats['dns_cache_ttl'] = HttpClientConfig.DNS_CACHE_TTL
+
+        session = self._session
+        stats['open'] = session is not None and not session.closed
+        if stats['open']:
+            connector = session.connector
+            # The connector does not expose these counts publicly
+            try:
+                stats['idle_connections'] = sum(len(conns) for conns in connector._conns.values())
+                stats['active_connections'] = len(connector._acquired)
+            except Exception:
+                pass
+        return stats
+
+
+# Create a singleton instance (one connection pool per worker process)
+http_client = SharedHttpClient()
@@ -0,0 +1,253 @@
+"""
+Event Loop Watchdog
+
+Blocking calls on a worker's event loop (synchronous Redis, ``requests`` and
+``time.sleep`` in token refreshes, file writes, large JSON transforms) stall
+every request the worker is serving. The watchdog finds them in production.
+
+A heartbeat task sleeps ``LOOP_WATCHDOG_INTERVAL`` seconds at a time and
+records how late it wakes up (``flight_event_loop_lag_seconds``). A monitor
+thread checks the heartbeat; once the loop has not run it for more than
+``LOOP_WATCHDOG_THRESHOLD`` seconds past its interval, the thread captures the
+loop thread's stack and the task that is running, which ``track_request``
+maps to the route and request ID being served. When the loop resumes the
+stall is logged, counted in ``flight_event_loop_block_duration_seconds`` by
+route and kept in a ring buffer returned by ``get_report()`` (served on
+``/debug/event-loop`` when ``LOOP_WATCHDOG_DEBUG_ENDPOINT`` is on and
+``LOOP_WATCHDOG_DEBUG_TOKEN`` is set).
+
+The monitor thread needs the GIL to sample the stack, so a stall inside a
+single C call that holds it (e.g. ``json.loads`` of a huge payload) is still
+measured but reported without a stack.
+"""
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from services.metrics import event_loop_block_seconds, event_loop_lag_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdogConfig:
+    """Environment driven settings for the event loop watchdog."""
+
+    ENABLED = os.getenv('LOOP_WATCHDOG_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Seconds between heartbeats
+    INTERVAL = float(os.getenv('LOOP_WATCHDOG_INTERVAL', 0.1))
+    # Lag (seconds) after which the loop counts as blocked and its stack is captured
+    THRESHOLD = float(os.getenv('LOOP_WATCHDOG_THRESHOLD', 0.25))
+    # Stalls kept for /debug/event-loop
+    MAX_REPORTS = int(os.getenv('LOOP_WATCHDOG_MAX_REPORTS', 50))
+    # Innermost frames kept per captured stack
+    STACK_DEPTH = int(os.getenv('LOOP_WATCHDOG_STACK_DEPTH', 25))
+    # Serve /debug/event-loop (stacks, file paths, routes and request IDs); requests
+    # must send the token in the X-Debug-Token header, and nothing is served without one
+    DEBUG_ENDPOINT = os.getenv('LOOP_WATCHDOG_DEBUG_ENDPOINT', 'false').lower() in ('true', '1', 'yes', 'on')
+    DEBUG_TOKEN = os.getenv('LOOP_WATCHDOG_DEBUG_TOKEN', '')
+
+
+class LoopWatchdog:
+    """Measures event loop lag and reports what blocked the loop."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        self._last_beat = 0.0
+        # Heartbeat time of the stall the monitor already captured
+        self._captured_beat: Optional[float] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._reports = collections.deque(maxlen=max(LoopWatchdogConfig.MAX_REPORTS, 1))
+        # Task -> route and request ID of the request it serves
+        self._requests: Dict[asyncio.Task, Dict[str, Any]] = {}
+
+        self._stats = {
+            'heartbeats': 0,
+            'blocks': 0,
+            'blocked_seconds_total': 0.0,
+            'max_lag_seconds': 0.0,
+            'last_lag_seconds': 0.0,
+        }
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def start(self) -> None:
+        """Start the heartbeat and monitor thread on this worker (call from ``before_serving``)."""
+        if not LoopWatchdogConfig.ENABLED or self._heartbeat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat(), name='loop-watchdog-heartbeat')
+        self._monitor_thread = threading.Thread(target=self._monitor, name='loop-watchdog', daemon=True)
+        self._monitor_thread.start()
+        logger.info(f"Event loop watchdog started: heartbeat every {LoopWatchdogConfig.INTERVAL}s, "
+                    f"capturing stalls over {LoopWatchdogConfig.THRESHOLD}s")
+
+    async def stop(self) -> None:
+        """Stop the heartbeat and monitor thread (call from ``after_serving``)."""
+        if self._heartbeat_task is None:
+            return
+        self._stop_event.set()
+        self._heartbeat_task.cancel()
+        self._heartbeat_task = None
+        if self._monitor_thread is not None:
+            await asyncio.to_thread(self._monitor_thread.join, 1.0)
+            self._monitor_thread = None
+
+    # -- request attribution -------------------------------------------------
+
+    def track_request(self, route: str, method: str, path: str, request_id: str) -> None:
+        """Attribute stalls in the current task to this request (call from ``before_request``)."""
+        task = asyncio.current_task()
+        if task is None or self._heartbeat_task is None:
+            return
+        with self._lock:
+            self._requests[task] = {
+                'route': route,
+                'method': method,
+                'path': path,
+                'request_id': request_id,
+                'started_at': time.monotonic(),
+            }
+
+    def untrack_request(self) -> None:
+        """Forget the current task's request (call from ``teardown_request``)."""
+        task = asyncio.current_task()
+        if task is None:
+            return
+        with self._lock:
+            self._requests.pop(task, None)
+
+    # -- heartbeat (event loop) ----------------------------------------------
+
+    async def _heartbeat(self) -> None:
+        interval = LoopWatchdogConfig.INTERVAL
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self._last_beat = now
+
+            self._stats['heartbeats'] += 1
+            self._stats['last_lag_seconds'] = lag
+            self._stats['max_lag_seconds'] = max(self._stats['max_lag_seconds'], lag)
+            event_loop_lag_seconds.observe(lag)
+
+            if lag > LoopWatchdogConfig.THRESHOLD or self._pending is not None:
+                self._finish_block(lag)
+
+    def _finish_block(self, lag: float) -> None:
+        with self._lock:
+            report = self._pending
+            self._pending = None
+        if report is None:
+            # The monitor thread could not sample this stall (GIL held throughout)
+            report = self._new_report(stack=None, attribution={'route': 'unknown'})
+            with self._lock:
+                self._reports.append(report)
+
+        report['blocked_seconds'] = round(lag, 4)
+        report['in_progress'] = False
+        self._stats['blocks'] += 1
+        self._stats['blocked_seconds_total'] += lag
+        event_loop_block_seconds.observe(lag, route=report['route'])
+
+        location = report['stack'][-1] if report.get('stack') else 'stack not captured'
+        request_id = f" (request {report['request_id']})" if report.get('request_id') else ''
+        logger.warning(f"Event loop blocked for {lag:.3f}s in {report['route']}{request_id} at {location}")
+
+    # -- monitor (thread) ----------------------------------------------------
+
+    def _monitor(self) -> None:
+        check_interval = min(LoopWatchdogConfig.INTERVAL, LoopWatchdogConfig.THRESHOLD) / 2
+        while not self._stop_event.wait(check_interval):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - LoopWatchdogConfig.INTERVAL
+            if stalled <= LoopWatchdogConfig.THRESHOLD or self._captured_beat == last_beat:
+                continue
+            self._captured_beat = last_beat
+            try:
+                self._capture(last_beat)
+            except Exception as e:
+                logger.debug(f"Event loop watchdog failed to capture a stack: {e}")
+
+    def _capture(self, last_beat: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = None
+        if frame is not None:
+            stack = [
+                f"{entry.filename}:{entry.lineno} in {entry.name}" + (f": {entry.line}" if entry.line else '')
+                for entry in traceback.extract_stack(frame, limit=LoopWatchdogConfig.STACK_DEPTH)
+            ]
+        del frame
+
+        task = asyncio.current_task(self._loop)
+        with self._lock:
+            attribution = dict(self._requests.get(task, {})) if task is not None else {}
+        if not attribution:
+            if task is not None:
+                # A background task (token refresh, snapshot writer, ...)
+                attribution = {'route': 'background', 'task': task.get_name(),
+                               'coroutine': getattr(task.get_coro(), '__qualname__', None)}
+            else:
+                # A plain callback scheduled on the loop
+                attribution = {'route': 'callback'}
+        if 'started_at' in attribution:
+            attribution['request_age_seconds'] = round(time.monotonic() - attribution.pop('started_at'), 4)
+
+        if self._last_beat != last_beat:
+            # The loop resumed while the stack was being sampled; it no longer shows the stall
+            return
+        report = self._new_report(stack=stack, attribution=attribution)
+        with self._lock:
+            self._pending = report
+            self._reports.append(report)
+
+    @staticmethod
+    def _new_report(stack: Optional[List[str]], attribution: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'detected_at': datetime.utcnow().isoformat() + 'Z',
+            'in_progress': True,
+            'blocked_seconds': None,
+            **attribution,
+            'stack': stack,
+        }
+
+    # -- reporting -----------------------------------------------------------
+
+    def get_report(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Return this worker's lag statistics and the most recent stalls (newest first)."""
+        with self._lock:
+            reports = [dict(report) for report in reversed(self._reports)]
+            active_requests = len(self._requests)
+        if limit is not None:
+            reports = reports[:max(limit, 0)]
+        return {
+            'pid': os.getpid(),
+            'running': self._heartbeat_task is not None,
+            'interval_seconds': LoopWatchdogConfig.INTERVAL,
+            'threshold_seconds': LoopWatchdogConfig.THRESHOLD,
+            'seconds_since_heartbeat': round(time.monotonic() - self._last_beat, 4) if self._last_beat else None,
+            'active_requests': active_requests,
+            'stats': dict(self._stats),
+            'blocks': reports,
+        }
+
+
+# Create a singleton instance (one watchdog per worker process)
+loop_watchdog = LoopWatchdog()
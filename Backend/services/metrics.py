@@ -0,0 +1,533 @@
+"""
+Metrics
+
+Counters, gauges and histograms for capacity tuning, exported in the
+Prometheus text format on ``/metrics``.
+
+Code records values through the metric objects defined at the bottom of this
+module (e.g. ``verteil_request_seconds.observe(0.8, service='AirShopping',
+status='200')``). Values that other components already keep (TokenManager
+counters, transform executor queue depth) are read at scrape time by
+collectors, so those components do not need to change.
+
+Every gunicorn worker has its own registry. When ``METRICS_MULTIPROC_DIR`` is
+set, each worker writes a snapshot of its registry to that directory every
+``METRICS_SNAPSHOT_INTERVAL`` seconds and ``/metrics`` merges the snapshots of
+all workers: counters and histograms are summed (including workers that have
+exited), gauges are combined across live workers according to their mode.
+Empty the directory before starting gunicorn. Without it, ``/metrics`` only
+reports the worker that served the scrape.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsConfig:
+    """Environment driven settings for metrics collection."""
+
+    ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Shared directory for per-worker snapshots (unset: report this worker only)
+    MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+    # Seconds between snapshot writes of each worker
+    SNAPSHOT_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_INTERVAL', 5))
+
+
+# Latency buckets in seconds; Verteil calls range from ~100ms to tens of seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+# Payload size buckets in bytes (1KB .. 16MB)
+SIZE_BUCKETS = tuple(1024 * 4 ** exponent for exponent in range(8))
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+class Metric:
+    """Base class for a metric family with a fixed set of label names."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serializable copy of the metric."""
+        with self._lock:
+            samples = [[list(key), value if not isinstance(value, list) else list(value)]
+                       for key, value in self._values.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames), 'samples': samples}
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down.
+
+    ``mode`` decides how values from several workers are combined:
+    'sum', 'max', 'min' or 'all' (one series per worker with a ``pid`` label).
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = 'sum'):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), 'mode': self.mode}
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then +Inf, sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), 'buckets': list(self.buckets)}
+
+
+Collector = Callable[[], Iterable[Tuple[str, str, str, Dict[LabelValues, float], Sequence[str]]]]
+
+
+class MetricsRegistry:
+    """Holds the metrics of this process and renders them for scraping."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = 'sum') -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        """
+        Add a callable run at scrape time.
+
+        It yields ``(name, kind, help, {label values: value}, label names)``
+        for values kept elsewhere (kind is 'counter' or 'gauge').
+        """
+        self._collectors.append(collector)
+
+    # -- snapshots -----------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return all metrics of this process, including collector values."""
+        families = {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+        for collector in self._collectors:
+            try:
+                for name, kind, documentation, values, labelnames in collector():
+                    families[name] = {
+                        'kind': kind,
+                        'help': documentation,
+                        'labelnames': list(labelnames),
+                        'samples': [[list(key), value] for key, value in values.items()],
+                        'mode': 'sum',
+                    }
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return families
+
+    def write_snapshot(self) -> None:
+        """Write this worker's snapshot into the multiprocess directory."""
+        directory = Path(MetricsConfig.MULTIPROC_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"metrics_{os.getpid()}.json"
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'written_at': time.time(), 'families': self.snapshot()}, f)
+        os.replace(temp_path, path)
+
+    async def start(self) -> None:
+        """Start writing snapshots periodically (call from ``before_serving``)."""
+        if not MetricsConfig.ENABLED or not MetricsConfig.MULTIPROC_DIR or self._snapshot_task is not None:
+            return
+        self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+        logger.info(f"Writing metrics snapshots to {MetricsConfig.MULTIPROC_DIR} every {MetricsConfig.SNAPSHOT_INTERVAL}s")
+
+    async def stop(self) -> None:
+        """Stop the snapshot task and write a final snapshot (call from ``after_serving``)."""
+        if self._snapshot_task is None:
+            return
+        self._snapshot_task.cancel()
+        self._snapshot_task = None
+        try:
+            await asyncio.to_thread(self.write_snapshot)
+        except Exception as e:
+            logger.warning(f"Failed to write final metrics snapshot: {e}")
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.write_snapshot)
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot: {e}")
+            await asyncio.sleep(MetricsConfig.SNAPSHOT_INTERVAL)
+
+    def _load_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = []
+        for path in Path(MetricsConfig.MULTIPROC_DIR).glob('metrics_*.json'):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+        return snapshots
+
+    # -- exposition ------------------------------------------------------------
+
+    def collect(self) -> Dict[str, Any]:
+        """Return merged metric families for this worker or, in multiprocess mode, all workers."""
+        if not MetricsConfig.MULTIPROC_DIR:
+            return {name: {**family, 'samples': {tuple(key): value for key, value in family['samples']}}
+                    for name, family in self.snapshot().items()}
+
+        # The serving worker's own numbers should be current
+        self.write_snapshot()
+        return _merge_snapshots(self._load_snapshots())
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            labelnames = family['labelnames']
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for key, value in sorted(family['samples'].items()):
+                if family['kind'] == 'histogram':
+                    cumulative = 0
+                    bounds = list(family['buckets']) + [math.inf]
+                    for bound, count in zip(bounds, value[:-1]):
+                        cumulative += count
+                        labels = _format_labels(labelnames + ['le'], list(key) + [_format_value(bound)])
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(labelnames, key)
+                    lines.append(f"{name}_sum{labels} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{labels} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-worker snapshots into one set of families."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        pid = snapshot.get('pid')
+        alive = _pid_alive(pid) if isinstance(pid, int) else False
+        for name, family in snapshot.get('families', {}).items():
+            kind = family['kind']
+            # Gauges of exited workers no longer describe anything
+            if kind == 'gauge' and not alive:
+                continue
+            mode = family.get('mode', 'sum')
+            labelnames = list(family['labelnames'])
+            if kind == 'gauge' and mode == 'all':
+                labelnames = labelnames + ['pid']
+            target = merged.setdefault(name, {**family, 'labelnames': labelnames, 'samples': {}})
+            samples = target['samples']
+            for key, value in family['samples']:
+                key = tuple(key) + ((str(pid),) if kind == 'gauge' and mode == 'all' else ())
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif kind == 'histogram':
+                    samples[key] = [a + b for a, b in zip(current, value)]
+                elif kind == 'gauge' and mode == 'max':
+                    samples[key] = max(current, value)
+                elif kind == 'gauge' and mode == 'min':
+                    samples[key] = min(current, value)
+                else:
+                    samples[key] = current + value
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Collectors for values kept by other components
+# ---------------------------------------------------------------------------
+
+def _collect_token_metrics():
+    from utils.auth import TokenManager
+
+    if TokenManager._instance is None:
+        return
+    token_metrics = TokenManager._instance.get_metrics()
+    for key, name, documentation in (
+        ('token_generations', 'flight_token_generations_total', 'OAuth tokens fetched from the token endpoint'),
+        ('token_refreshes', 'flight_token_refreshes_total', 'Forced token refreshes'),
+        ('background_refreshes', 'flight_token_background_refreshes_total', 'Token renewals by the background task'),
+        ('total_token_requests', 'flight_token_requests_total', 'Token lookups by API calls'),
+        ('concurrent_refresh_attempts', 'flight_token_concurrent_refresh_attempts_total',
+         'Token lookups that found a refresh already in progress'),
+        ('shared_token_adoptions', 'flight_token_shared_adoptions_total',
+         'Tokens installed from the shared Redis store instead of fetched'),
+    ):
+        yield name, 'counter', documentation, {(): token_metrics.get(key, 0)}, ()
+
+
+def _collect_transform_executor_metrics():
+    from services.transform_executor import transform_executor
+
+    stats = transform_executor.get_stats()
+    yield 'flight_transform_in_flight', 'gauge', 'Transforms submitted and not finished', {(): stats['in_flight']}, ()
+    yield 'flight_transform_queue_depth', 'gauge', 'Transforms waiting for a pool worker', {(): stats['queue_depth']}, ()
+    stages = stats['stages']
+    for field, name, documentation in (
+        ('submitted', 'flight_transform_submitted_total', 'Transforms submitted per stage'),
+        ('inline', 'flight_transform_inline_total', 'Transforms run on the event loop per stage'),
+        ('failed', 'flight_transform_failed_total', 'Transforms that raised per stage'),
+    ):
+        yield name, 'counter', documentation, {(stage,): values[field] for stage, values in stages.items()}, ('stage',)
+
+
+def _collect_cache_size_metrics():
+    from services.flight.airport_service import AirportService
+    from services.flight.response_cache import response_cache
+    from services.raw_response_store import raw_response_store
+    from utils.cache_manager import cache_manager
+
+    raw_stats = raw_response_store.get_stats()
+    # Storage type -> stats with 'entries', 'bytes' and eviction/expiry counters
+    bounded = {
+        'verteil_response': response_cache.get_stats(),
+        'cache_manager': cache_manager.get_stats(),
+        'raw_response_memory': raw_stats['memory_backend'],
+    }
+
+    entries = {('raw_response',): raw_stats['local_entries']}
+    entries.update({(storage,): stats['entries'] for storage, stats in bounded.items()})
+    if AirportService._airport_index is not None:
+        entries[('airport',)] = len(AirportService._airport_index)
+    yield 'flight_cache_entries', 'gauge', 'Entries held in process-local caches and indexes, by storage type', entries, ('storage',)
+    yield ('flight_cache_bytes', 'gauge', 'Bytes held in process-local byte-accounted caches, by storage type',
+           {(storage,): stats['bytes'] for storage, stats in bounded.items()}, ('storage',))
+    yield ('flight_cache_max_bytes', 'gauge', 'Byte budget of process-local caches, by storage type',
+           {(storage,): stats['max_bytes'] for storage, stats in bounded.items()}, ('storage',))
+
+    evictions = {}
+    for storage, stats in bounded.items():
+        evictions[(storage, 'lru')] = stats['evictions']
+        evictions[(storage, 'expired')] = stats['expirations']
+    yield ('flight_cache_evictions_total', 'counter', 'Entries dropped from process-local caches, by storage type and reason',
+           evictions, ('storage', 'reason'))
+
+
+def _collect_concurrency_metrics():
+    from services.flight.concurrency_limiter import concurrency_limiter
+
+    stats = concurrency_limiter.get_stats()
+    for field, name, documentation in (
+        ('limit', 'flight_verteil_concurrency_limit', 'Adaptive limit of in-flight Verteil calls, by service'),
+        ('in_flight', 'flight_verteil_in_flight', 'Verteil calls in flight, by service'),
+        ('queued', 'flight_verteil_concurrency_queued', 'Verteil calls waiting for a concurrency slot, by service'),
+    ):
+        yield name, 'gauge', documentation, {(service,): values[field] for service, values in stats.items()}, ('service',)
+    decreases = {}
+    for service, values in stats.items():
+        for reason, count in values['decreases'].items():
+            decreases[(service, reason)] = count
+    yield ('flight_verteil_concurrency_decreases_total', 'counter',
+           'Times the adaptive concurrency limit was lowered, by service and reason (throttled, latency)',
+           decreases, ('service', 'reason'))
+
+
+def _collect_circuit_breaker_metrics():
+    from services.flight.circuit_breaker import STATES, circuit_breaker
+
+    stats = circuit_breaker.get_stats()
+    # One series per state set to 1 for the current one, so merged workers count as workers per state
+    yield ('flight_verteil_circuit_state', 'gauge',
+           'Circuit breaker state per Verteil service (1 for the current state: closed, half_open, open)',
+           {(service, state): int(values['state'] == state) for service, values in stats.items() for state in STATES},
+           ('service', 'state'))
+    # Counts rather than a ratio: gauges from collectors are summed across workers
+    yield ('flight_verteil_circuit_window_calls', 'gauge',
+           'Verteil calls counted in the circuit breaker window, by service',
+           {(service,): values['calls'] for service, values in stats.items()}, ('service',))
+    yield ('flight_verteil_circuit_window_failures', 'gauge',
+           'Failed Verteil calls in the circuit breaker window, by service',
+           {(service,): values['failures'] for service, values in stats.items()}, ('service',))
+    yield ('flight_verteil_circuit_transitions_total', 'counter',
+           'Circuit breaker state changes, by service and new state',
+           {(service, state): count for service, values in stats.items() for state, count in values['transitions'].items()},
+           ('service', 'state'))
+    yield ('flight_verteil_circuit_rejections_total', 'counter',
+           'Verteil calls rejected by an open circuit breaker, by service',
+           {(service,): values['rejections'] for service, values in stats.items()}, ('service',))
+
+
+# ---------------------------------------------------------------------------
+# Metric catalogue
+# ---------------------------------------------------------------------------
+
+metrics_registry = MetricsRegistry()
+metrics_registry.register_collector(_collect_token_metrics)
+metrics_registry.register_collector(_collect_transform_executor_metrics)
+metrics_registry.register_collector(_collect_cache_size_metrics)
+metrics_registry.register_collector(_collect_concurrency_metrics)
+metrics_registry.register_collector(_collect_circuit_breaker_metrics)
+
+verteil_request_seconds = metrics_registry.histogram(
+    'flight_verteil_request_duration_seconds',
+    'Latency of each Verteil API attempt by service and HTTP status (or error kind)',
+    ('service', 'status')
+)
+verteil_retries = metrics_registry.counter(
+    'flight_verteil_retries_total',
+    'Verteil API attempts that were retried, by service and status of the failed attempt',
+    ('service', 'status')
+)
+cache_requests = metrics_registry.counter(
+    'flight_cache_requests_total',
+    'Cache lookups by storage type and result (hit, miss, error, unavailable)',
+    ('storage', 'result')
+)
+cache_writes = metrics_registry.counter(
+    'flight_cache_writes_total',
+    'Cache writes by storage type and result (stored, error, unavailable)',
+    ('storage', 'result')
+)
+cache_payload_bytes = metrics_registry.histogram(
+    'flight_cache_payload_bytes',
+    'Size of cached payloads read and written, by storage type',
+    ('storage', 'operation'),
+    buckets=SIZE_BUCKETS
+)
+transform_seconds = metrics_registry.histogram(
+    'flight_transform_duration_seconds',
+    'Transform stage run time and time spent waiting for a pool worker',
+    ('stage', 'phase')
+)
+event_loop_lag_seconds = metrics_registry.histogram(
+    'flight_event_loop_lag_seconds',
+    'How late the event loop watchdog heartbeat woke up'
+)
+event_loop_block_seconds = metrics_registry.histogram(
+    'flight_event_loop_block_duration_seconds',
+    'Event loop stalls longer than the watchdog threshold, by the route (or background task) that blocked',
+    ('route',)
+)
+rate_limit_wait_seconds = metrics_registry.histogram(
+    'flight_rate_limit_wait_seconds',
+    'Time outbound calls were queued by the rate governor, by bucket',
+    ('bucket',)
+)
+rate_limit_rejections = metrics_registry.counter(
+    'flight_rate_limit_rejections_total',
+    'Outbound calls rejected because the next rate limit slot was too far away, by bucket',
+    ('bucket',)
+)
+concurrency_wait_seconds = metrics_registry.histogram(
+    'flight_verteil_concurrency_wait_seconds',
+    'Time Verteil calls waited for a slot under the adaptive concurrency limit, by service',
+    ('service',)
+)
+deadline_exceeded = metrics_registry.counter(
+    'flight_deadline_exceeded_total',
+    'Verteil attempts not started or cut short because the request deadline was reached, by service and stage',
+    ('service', 'stage')
+)
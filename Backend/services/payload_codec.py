@@ -0,0 +1,225 @@
+"""
+Binary Payload Codec for Redis Flight Storage
+
+Payloads are stored as raw bytes with a small versioned header instead of
+``json -> gzip -> base64`` text:
+
+    b'FPC' | format version (1 byte) | serializer id (1 byte) | compressor id (1 byte) | body
+
+The serializer is orjson when installed (stdlib json otherwise) and the
+compressor is zstd, lz4 or zlib, whichever is available first. The header
+records both, so any worker can read what another worker wrote. Entries in
+the legacy formats (base64 gzip text or plain JSON) are still decoded
+transparently, and ``REDIS_PAYLOAD_FORMAT=legacy`` switches writers back to
+them (e.g. during a rolling deploy).
+"""
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+
+MAGIC = b'FPC'
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+SERIALIZER_ORJSON = 1
+SERIALIZER_JSON = 2
+
+COMPRESSOR_NONE = 0
+COMPRESSOR_ZSTD = 1
+COMPRESSOR_LZ4 = 2
+COMPRESSOR_ZLIB = 3
+
+COMPRESSOR_NAMES = {
+    'none': COMPRESSOR_NONE,
+    'zstd': COMPRESSOR_ZSTD,
+    'lz4': COMPRESSOR_LZ4,
+    'zlib': COMPRESSOR_ZLIB,
+}
+
+
+class PayloadCodecConfig:
+    """Environment driven settings for Redis payload encoding."""
+
+    # 'binary' (versioned bytes) or 'legacy' (base64 gzip / plain JSON text)
+    FORMAT = os.getenv('REDIS_PAYLOAD_FORMAT', 'binary').lower()
+    # 'auto' picks zstd, then lz4, then zlib
+    COMPRESSION = os.getenv('REDIS_PAYLOAD_COMPRESSION', 'auto').lower()
+    ZSTD_LEVEL = int(os.getenv('REDIS_PAYLOAD_ZSTD_LEVEL', 3))
+    ZLIB_LEVEL = int(os.getenv('REDIS_PAYLOAD_ZLIB_LEVEL', 1))
+    # Payloads smaller than this are stored uncompressed
+    MIN_COMPRESS_BYTES = int(os.getenv('REDIS_PAYLOAD_MIN_COMPRESS_BYTES', 1024))
+
+
+def _available(compressor_id: int) -> bool:
+    if compressor_id == COMPRESSOR_ZSTD:
+        return zstandard is not None
+    if compressor_id == COMPRESSOR_LZ4:
+        return lz4_frame is not None
+    return True
+
+
+def default_compressor() -> int:
+    """Return the compressor id used for new payloads."""
+    configured = COMPRESSOR_NAMES.get(PayloadCodecConfig.COMPRESSION)
+    if configured is not None and _available(configured):
+        return configured
+    if configured is not None:
+        logger.warning(f"Compressor '{PayloadCodecConfig.COMPRESSION}' is not installed; choosing automatically")
+    for compressor_id in (COMPRESSOR_ZSTD, COMPRESSOR_LZ4, COMPRESSOR_ZLIB):
+        if _available(compressor_id):
+            return compressor_id
+    return COMPRESSOR_ZLIB
+
+
+def use_binary_format() -> bool:
+    """Return True if writers should use the binary format."""
+    return PayloadCodecConfig.FORMAT != 'legacy'
+
+
+def _serialize(data: Any) -> Tuple[int, bytes]:
+    if orjson is not None:
+        try:
+            return SERIALIZER_ORJSON, orjson.dumps(data, default=str)
+        except TypeError:
+            # e.g. integers beyond 64 bits; stdlib json handles them
+            pass
+    return SERIALIZER_JSON, json.dumps(data, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def _deserialize(serializer_id: int, body: bytes) -> Any:
+    if serializer_id == SERIALIZER_ORJSON and orjson is not None:
+        return orjson.loads(body)
+    # Both serializers write standard JSON
+    return json.loads(body)
+
+
+def _compress(compressor_id: int, body: bytes) -> bytes:
+    if compressor_id == COMPRESSOR_ZSTD:
+        return zstandard.ZstdCompressor(level=PayloadCodecConfig.ZSTD_LEVEL).compress(body)
+    if compressor_id == COMPRESSOR_LZ4:
+        return lz4_frame.compress(body)
+    if compressor_id == COMPRESSOR_ZLIB:
+        return zlib.compress(body, PayloadCodecConfig.ZLIB_LEVEL)
+    return body
+
+
+def _decompress(compressor_id: int, body: bytes) -> bytes:
+    if compressor_id == COMPRESSOR_NONE:
+        return body
+    if compressor_id == COMPRESSOR_ZLIB:
+        return zlib.decompress(body)
+    if compressor_id == COMPRESSOR_ZSTD:
+        if zstandard is None:
+            raise ValueError("Payload is zstd compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if compressor_id == COMPRESSOR_LZ4:
+        if lz4_frame is None:
+            raise ValueError("Payload is lz4 compressed but lz4 is not installed")
+        return lz4_frame.decompress(body)
+    raise ValueError(f"Unknown payload compressor id: {compressor_id}")
+
+
+def encode_payload(data: Any, compressor_id: Optional[int] = None) -> bytes:
+    """
+    Encode ``data`` in the versioned binary format.
+
+    Args:
+        data: JSON-compatible data
+        compressor_id: Override the configured compressor (benchmarks)
+
+    Returns:
+        bytes: Header followed by the (possibly compressed) body
+    """
+    serializer_id, body = _serialize(data)
+    if compressor_id is None:
+        compressor_id = default_compressor() if len(body) >= PayloadCodecConfig.MIN_COMPRESS_BYTES else COMPRESSOR_NONE
+    body = _compress(compressor_id, body)
+    return MAGIC + bytes((FORMAT_VERSION, serializer_id, compressor_id)) + body
+
+
+def is_binary_payload(stored: Union[bytes, str]) -> bool:
+    """Return True if ``stored`` was written by ``encode_payload``."""
+    return isinstance(stored, bytes) and stored[:len(MAGIC)] == MAGIC
+
+
+def decode_payload(stored: Union[bytes, str]) -> Dict[str, Any]:
+    """
+    Decode a stored payload in any supported format.
+
+    Handles the binary format as well as the legacy base64 gzip text and
+    plain JSON written by earlier versions.
+
+    Args:
+        stored: Value read from Redis (bytes or str)
+
+    Returns:
+        The decoded data
+    """
+    if is_binary_payload(stored):
+        version, serializer_id, compressor_id = stored[len(MAGIC):HEADER_SIZE]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported payload format version: {version}")
+        return _deserialize(serializer_id, _decompress(compressor_id, stored[HEADER_SIZE:]))
+
+    if isinstance(stored, bytes):
+        stored = stored.decode('utf-8')
+
+    # Plain JSON starts with '{'; anything else is the base64 gzip format
+    if stored.startswith('{'):
+        return json.loads(stored)
+
+    from services.redis_flight_storage import decompress_data
+    return decompress_data(stored)
+
+
+def encode_storage_data(storage_data: Dict[str, Any], compressed: bool) -> Union[bytes, str]:
+    """
+    Encode a storage envelope for Redis.
+
+    Args:
+        storage_data: The envelope (data, stored_at, expires_at, ...)
+        compressed: Whether the legacy format for this data type is compressed
+
+    Returns:
+        Binary payload, or legacy text when ``REDIS_PAYLOAD_FORMAT=legacy``
+    """
+    if use_binary_format():
+        return encode_payload(storage_data)
+
+    if compressed:
+        from services.redis_flight_storage import compress_data
+        return compress_data(storage_data)
+    return json.dumps(storage_data, default=str)
+
+
+def describe_codec() -> Dict[str, Any]:
+    """Return the active format and which optional libraries are installed."""
+    compressor_id = default_compressor()
+    return {
+        'format': 'binary' if use_binary_format() else 'legacy',
+        'format_version': FORMAT_VERSION,
+        'serializer': 'orjson' if orjson is not None else 'json',
+        'compressor': next(name for name, value in COMPRESSOR_NAMES.items() if value == compressor_id),
+        'zstd_available': zstandard is not None,
+        'lz4_available': lz4_frame is not None,
+    }
@@ -0,0 +1,238 @@
+"""
+Shared Raw NDC Response Store
+
+Raw AirShopping and FlightPrice responses are needed again by follow-up calls
+(flight price, seat availability, service list, order create). With several
+uvicorn workers those follow-ups can land on any worker, so the raw responses
+are kept in a store shared by all workers (Redis) with a small per-process LRU
+in front of it to avoid a network round trip for hot keys.
+
+The store is async: Redis is reached through the worker's async pool
+(``async_redis_flight_storage``) and encoding/decoding runs in a thread, so
+a ~600KB response never blocks the event loop. Values are stored in the
+binary payload format (see ``services.payload_codec``) under the same key the
+callers already use (e.g. ``air_shopping_raw_{request_id}``), so the
+``raw_response_cache_key`` contract towards the frontend is unchanged.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from services.async_redis_flight_storage import async_redis_flight_storage
+from services.metrics import cache_payload_bytes, cache_requests, cache_writes
+from services.payload_codec import decode_payload, encode_payload
+from utils.cache_manager import CacheManager
+
+logger = logging.getLogger(__name__)
+
+# Internal stat -> (metric, result label)
+_STAT_METRICS = {
+    'local_hits': (cache_requests, 'local_hit'),
+    'shared_hits': (cache_requests, 'hit'),
+    'misses': (cache_requests, 'miss'),
+    'writes': (cache_writes, 'stored'),
+}
+
+# Entries written before the payload codec was used are gzip-compressed JSON
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class RawResponseStoreConfig:
+    """Environment driven settings for the raw response store."""
+
+    # 'redis' shares responses across workers, 'memory' keeps them per process
+    BACKEND = os.getenv('RAW_RESPONSE_STORE_BACKEND', 'redis').lower()
+    # Number of decoded responses kept in the per-process LRU
+    LOCAL_CACHE_SIZE = int(os.getenv('RAW_RESPONSE_LOCAL_CACHE_SIZE', 32))
+    # Bytes of encoded responses kept per process while Redis is unavailable
+    MEMORY_MAX_BYTES = int(os.getenv('RAW_RESPONSE_MEMORY_MAX_BYTES', 128 * 1024 * 1024))
+
+
+def _decode(data: bytes) -> Any:
+    """Decode a stored response (payload codec format, or the earlier gzip JSON)."""
+    if data[:2] == _GZIP_MAGIC:
+        return json.loads(gzip.decompress(data))
+    return decode_payload(data)
+
+
+class RawResponseStore:
+    """Two-tier store for raw NDC responses: local LRU in front of Redis."""
+
+    def __init__(self, local_cache_size: int = RawResponseStoreConfig.LOCAL_CACHE_SIZE):
+        """
+        Initialize the store.
+
+        Args:
+            local_cache_size: Maximum number of decoded responses kept in process
+        """
+        # Used when RAW_RESPONSE_STORE_BACKEND=memory and while Redis is unavailable;
+        # bounded by bytes with LRU eviction, so a Redis outage cannot exhaust memory
+        self._memory = CacheManager(max_bytes=RawResponseStoreConfig.MEMORY_MAX_BYTES)
+        self.local_cache_size = local_cache_size
+
+        self._local: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'local_hits': 0,
+            'shared_hits': 0,
+            'memory_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'memory_writes': 0,
+            'errors': 0
+        }
+
+    async def _get_client(self):
+        """Return the worker's async Redis client, or None to use per-process storage."""
+        if RawResponseStoreConfig.BACKEND != 'redis':
+            return None
+        return await async_redis_flight_storage.get_client()
+
+    # ------------------------------------------------------------------
+    # Local LRU tier
+    # ------------------------------------------------------------------
+    def _local_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: Any, ttl: int) -> None:
+        if self.local_cache_size <= 0:
+            return
+        with self._lock:
+            self._local[key] = (value, time.time() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_cache_size:
+                self._local.popitem(last=False)
+
+    def _increment(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+        metric = _STAT_METRICS.get(stat)
+        if metric is not None:
+            metric[0].inc(storage='raw_response', result=metric[1])
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    async def set(self, key: str, value: Any, ttl: int = 1800) -> bool:
+        """
+        Store a raw response under ``key`` for ``ttl`` seconds.
+
+        Returns:
+            bool: True if the response was stored (in Redis, or in this worker
+                without Redis)
+        """
+        self._local_set(key, value, ttl)
+        try:
+            encoded = await asyncio.to_thread(encode_payload, value)
+            cache_payload_bytes.observe(len(encoded), storage='raw_response', operation='write')
+            client = await self._get_client()
+            if client is not None:
+                try:
+                    await client.set(key, encoded, ex=ttl)
+                    self._increment('writes')
+                    logger.info(f"Stored raw response {key} in redis store ({len(encoded)} bytes encoded)")
+                    return True
+                except Exception as e:
+                    logger.warning(f"Failed to store raw response {key} in Redis: {e}. Keeping it in this worker.")
+            self._memory.set(key, encoded, ttl)
+            self._increment('memory_writes')
+            return True
+        except Exception as e:
+            self._increment('errors')
+            cache_writes.inc(storage='raw_response', result='error')
+            logger.warning(f"Failed to store raw response {key}: {e}")
+            return False
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the raw response stored under ``key`` or None if missing/expired."""
+        if not key:
+            return None
+
+        value = self._local_get(key)
+        if value is not None:
+            self._increment('local_hits')
+            return value
+
+        try:
+            data = None
+            ttl = 300
+            client = await self._get_client()
+            if client is not None:
+                data = await client.get(key)
+                if data is not None:
+                    # Keep the local copy no longer than the shared entry lives
+                    remaining = await client.ttl(key)
+                    if remaining and remaining > 0:
+                        ttl = int(remaining)
+            if data is None:
+                # Entries written while Redis was unreachable live in this worker
+                data = self._memory.get(key)
+                if data is None:
+                    self._increment('misses')
+                    return None
+                self._increment('memory_hits')
+            else:
+                self._increment('shared_hits')
+
+            value = await asyncio.to_thread(_decode, data)
+            cache_payload_bytes.observe(len(data), storage='raw_response', operation='read')
+            self._local_set(key, value, ttl)
+            return value
+        except Exception as e:
+            self._increment('errors')
+            cache_requests.inc(storage='raw_response', result='error')
+            logger.warning(f"Failed to read raw response {key} from shared store: {e}")
+            return None
+
+    async def exists(self, key: str) -> bool:
+        """Check whether ``key`` is still available in any tier."""
+        if not key:
+            return False
+        if self._local_get(key) is not None or self._memory.get(key) is not None:
+            return True
+        try:
+            client = await self._get_client()
+            return client is not None and bool(await client.exists(key))
+        except Exception as e:
+            logger.warning(f"Failed to check raw response {key} in shared store: {e}")
+            return False
+
+    async def delete(self, key: str) -> None:
+        """Remove ``key`` from all tiers."""
+        with self._lock:
+            self._local.pop(key, None)
+        self._memory.delete(key)
+        try:
+            client = await self._get_client()
+            if client is not None:
+                await client.delete(key)
+        except Exception as e:
+            logger.warning(f"Failed to delete raw response {key} from shared store: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and local cache occupancy."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['local_entries'] = len(self._local)
+        stats['backend'] = RawResponseStoreConfig.BACKEND
+        stats['memory_backend'] = self._memory.get_stats()
+        return stats
+
+
+# Create a singleton instance
+raw_response_store = RawResponseStore()
@@ -15,17 +15,56 @@ import logging
 import redis
 import os
 from config.redis_config import get_redis_connection, _mask_password
+from services.metrics import cache_payload_bytes, cache_requests
+from services.payload_codec import decode_payload, encode_storage_data
 
 logger = logging.getLogger(__name__)
 
+def compress_data(data: Dict[str, Any]) -> str:
+    """Compress data using gzip and base64 encoding."""
+    try:
+        # Convert to JSON string
+        json_str = json.dumps(data, default=str)
+
+        # Compress using gzip
+        compressed = gzip.compress(json_str.encode('utf-8'))
+
+        # Encode to base64 for storage
+        encoded = base64.b64encode(compressed).decode('utf-8')
+
+        logger.info(f"Data compression: {len(json_str)} -> {len(encoded)} bytes ({len(encoded)/len(json_str)*100:.1f}%)")
+
+        return encoded
+    except Exception as e:
+        logger.error(f"Failed to compress data: {str(e)}")
+        raise
+
+def decompress_data(encoded_data: str) -> Dict[str, Any]:
+    """Decompress data from base64 and gzip."""
+    try:
+        # Decode from base64
+        compressed = base64.b64decode(encoded_data.encode('utf-8'))
+
+        # Decompress using gzip
+        json_str = gzip.decompress(compressed).decode('utf-8')
+
+        # Parse JSON
+        data = json.loads(json_str)
+
+        return data
+    except Exception as e:
+        logger.error(f"Failed to decompress data: {str(e)}")
+        raise
+
 class RedisFlightStorage:
     """Redis-based storage for flight data with automatic expiration."""
 
     def __init__(self):
         """Initialize Redis Flight Storage with enhanced connection handling"""
         try:
-            # Use the centralized Redis connection configuration
-            self.redis_client = get_redis_connection()
+            # Use the centralized Redis connection configuration. Payloads are
+            # stored as raw bytes, so replies are not decoded to str.
+            self.redis_client = get_redis_connection(decode_responses=False)
             self.redis_available = True
             
             redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -48,39 +87,11 @@ class RedisFlightStorage:
 
     def _compress_data(self, data: Dict[str, Any]) -> str:
         """Compress data using gzip and base64 encoding."""
-        try:
-            # Convert to JSON string
-            json_str = json.dumps(data, default=str)
-
-            # Compress using gzip
-            compressed = gzip.compress(json_str.encode('utf-8'))
-
-            # Encode to base64 for storage
-            encoded = base64.b64encode(compressed).decode('utf-8')
-
-            logger.info(f"Data compression: {len(json_str)} -> {len(encoded)} bytes ({len(encoded)/len(json_str)*100:.1f}%)")
-
-            return encoded
-        except Exception as e:
-            logger.error(f"Failed to compress data: {str(e)}")
-            raise
+        return compress_data(data)
 
     def _decompress_data(self, encoded_data: str) -> Dict[str, Any]:
         """Decompress data from base64 and gzip."""
-        try:
-            # Decode from base64
-            compressed = base64.b64decode(encoded_data.encode('utf-8'))
-
-            # Decompress using gzip
-            json_str = gzip.decompress(compressed).decode('utf-8')
-
-            # Parse JSON
-            data = json.loads(json_str)
-
-            return data
-        except Exception as e:
-            logger.error(f"Failed to decompress data: {str(e)}")
-            raise
+        return decompress_data(encoded_data)
     
     def store_flight_search(
         self,
@@ -127,8 +138,8 @@ class RedisFlightStorage:
                 "compressed": True
             }
 
-            # Compress the data before storing
-            compressed_data = self._compress_data(storage_data)
+            # Encode (and compress) the data before storing
+            compressed_data = encode_storage_data(storage_data, compressed=True)
 
             # Store compressed data in Redis with expiration
             self.redis_client.setex(key, ttl, compressed_data)
@@ -163,6 +174,7 @@ class RedisFlightStorage:
         try:
             # If Redis is not available, return not found
             if not self.redis_available:
+                cache_requests.inc(storage='search', result='unavailable')
                 logger.warning("Redis not available, cannot retrieve flight search data")
                 return {
                     "success": False,
@@ -174,21 +186,18 @@ class RedisFlightStorage:
             stored_data = self.redis_client.get(key)
 
             if not stored_data:
+                cache_requests.inc(storage='search', result='miss')
                 return {
                     "success": False,
                     "error": "Flight search data not found or expired",
                     "message": "No flight search data found for this session"
                 }
 
-            # Check if data is compressed
-            try:
-                # Try to decompress first (new format)
-                parsed_data = self._decompress_data(stored_data)
-                logger.info(f"Retrieved compressed flight search data for session_id: {session_id}")
-            except:
-                # Fallback to uncompressed format (old format)
-                parsed_data = json.loads(stored_data)
-                logger.info(f"Retrieved uncompressed flight search data for session_id: {session_id}")
+            # Binary, compressed text and plain JSON entries are all decoded here
+            parsed_data = decode_payload(stored_data)
+            cache_requests.inc(storage='search', result='hit')
+            cache_payload_bytes.observe(len(stored_data), storage='search', operation='read')
+            logger.info(f"Retrieved flight search data for session_id: {session_id}")
 
             return {
                 "success": True,
@@ -199,6 +208,7 @@ class RedisFlightStorage:
             }
             
         except Exception as e:
+            cache_requests.inc(storage='search', result='error')
             logger.error(f"Failed to retrieve flight search data: {str(e)}")
             return {
                 "success": False,
@@ -251,7 +261,7 @@ class RedisFlightStorage:
             self.redis_client.setex(
                 key,
                 ttl,
-                json.dumps(storage_data, default=str)
+                encode_storage_data(storage_data, compressed=False)
             )
 
             logger.info(f"Stored flight price data for session_id: {session_id}")
@@ -284,6 +294,7 @@ class RedisFlightStorage:
         try:
             # If Redis is not available, return not found
             if not self.redis_available:
+                cache_requests.inc(storage='price', result='unavailable')
                 logger.warning("Redis not available, cannot retrieve flight price data")
                 return {
                     "success": False,
@@ -295,13 +306,16 @@ class RedisFlightStorage:
             stored_data = self.redis_client.get(key)
 
             if not stored_data:
+                cache_requests.inc(storage='price', result='miss')
                 return {
                     "success": False,
                     "error": "Flight price data not found or expired",
                     "message": "No flight price data found for this session"
                 }
 
-            parsed_data = json.loads(stored_data)
+            parsed_data = decode_payload(stored_data)
+            cache_requests.inc(storage='price', result='hit')
+            cache_payload_bytes.observe(len(stored_data), storage='price', operation='read')
 
             logger.info(f"Retrieved flight price data for session_id: {session_id}")
 
@@ -314,6 +328,7 @@ class RedisFlightStorage:
             }
             
         except Exception as e:
+            cache_requests.inc(storage='price', result='error')
             logger.error(f"Failed to retrieve flight price data: {str(e)}")
             return {
                 "success": False,
@@ -366,7 +381,7 @@ class RedisFlightStorage:
             self.redis_client.setex(
                 key,
                 ttl,
-                json.dumps(storage_data, default=str)
+                encode_storage_data(storage_data, compressed=False)
             )
 
             logger.info(f"Stored booking data for session_id: {session_id}")
@@ -399,6 +414,7 @@ class RedisFlightStorage:
         try:
             # If Redis is not available, return not found
             if not self.redis_available:
+                cache_requests.inc(storage='booking', result='unavailable')
                 logger.warning("Redis not available, cannot retrieve booking data")
                 return {
                     "success": False,
@@ -410,13 +426,16 @@ class RedisFlightStorage:
             stored_data = self.redis_client.get(key)
 
             if not stored_data:
+                cache_requests.inc(storage='booking', result='miss')
                 return {
                     "success": False,
                     "error": "Booking data not found or expired",
                     "message": "No booking data found for this session"
                 }
 
-            parsed_data = json.loads(stored_data)
+            parsed_data = decode_payload(stored_data)
+            cache_requests.inc(storage='booking', result='hit')
+            cache_payload_bytes.observe(len(stored_data), storage='booking', operation='read')
 
             logger.info(f"Retrieved booking data for session_id: {session_id}")
 
@@ -429,6 +448,7 @@ class RedisFlightStorage:
             }
             
         except Exception as e:
+            cache_requests.inc(storage='booking', result='error')
             logger.error(f"Failed to retrieve booking data: {str(e)}")
             return {
                 "success": False,
@@ -522,15 +542,11 @@ class RedisFlightStorage:
             }
 
             # Compress and store data
-            compressed_data = self._compress_data(storage_data)
-            original_size = len(json.dumps(storage_data).encode())
-            compressed_size = len(compressed_data.encode())
-            compression_ratio = (compressed_size / original_size) * 100
+            compressed_data = encode_storage_data(storage_data, compressed=True)
 
             self.redis_client.setex(key, ttl, compressed_data)
 
-            logger.info(f"Data compression: {original_size} -> {compressed_size} bytes ({compression_ratio:.1f}%)")
-            logger.info(f"Stored seat availability data with session_id: {session_id}")
+            logger.info(f"Stored seat availability data ({len(compressed_data)} bytes) with session_id: {session_id}")
 
             return {
                 "success": True,
@@ -560,6 +576,7 @@ class RedisFlightStorage:
         try:
             # If Redis is not available, return not found
             if not self.redis_available:
+                cache_requests.inc(storage='seat_availability', result='unavailable')
                 logger.warning("Redis not available, cannot retrieve seat availability data")
                 return {
                     "success": False,
@@ -571,13 +588,16 @@ class RedisFlightStorage:
             stored_data = self.redis_client.get(key)
 
             if not stored_data:
+                cache_requests.inc(storage='seat_availability', result='miss')
                 return {
                     "success": False,
                     "error": "Seat availability data not found or expired",
                     "message": "No seat availability data found for this session"
                 }
 
-            decompressed_data = self._decompress_data(stored_data)
+            decompressed_data = decode_payload(stored_data)
+            cache_requests.inc(storage='seat_availability', result='hit')
+            cache_payload_bytes.observe(len(stored_data), storage='seat_availability', operation='read')
             
             logger.info(f"Retrieved compressed seat availability data for session_id: {session_id}")
 
@@ -590,6 +610,7 @@ class RedisFlightStorage:
             }
             
         except Exception as e:
+            cache_requests.inc(storage='seat_availability', result='error')
             logger.error(f"Failed to retrieve seat availability data: {str(e)}")
             return {
                 "success": False,
@@ -639,15 +660,11 @@ class RedisFlightStorage:
             }
 
             # Compress and store data
-            compressed_data = self._compress_data(storage_data)
-            original_size = len(json.dumps(storage_data).encode())
-            compressed_size = len(compressed_data.encode())
-            compression_ratio = (compressed_size / original_size) * 100
+            compressed_data = encode_storage_data(storage_data, compressed=True)
 
             self.redis_client.setex(key, ttl, compressed_data)
 
-            logger.info(f"Data compression: {original_size} -> {compressed_size} bytes ({compression_ratio:.1f}%)")
-            logger.info(f"Stored service list data with session_id: {session_id}")
+            logger.info(f"Stored service list data ({len(compressed_data)} bytes) with session_id: {session_id}")
 
             return {
                 "success": True,
@@ -677,6 +694,7 @@ class RedisFlightStorage:
         try:
             # If Redis is not available, return not found
             if not self.redis_available:
+                cache_requests.inc(storage='service_list', result='unavailable')
                 logger.warning("Redis not available, cannot retrieve service list data")
                 return {
                     "success": False,
@@ -688,13 +706,16 @@ class RedisFlightStorage:
             stored_data = self.redis_client.get(key)
 
             if not stored_data:
+                cache_requests.inc(storage='service_list', result='miss')
                 return {
                     "success": False,
                     "error": "Service list data not found or expired",
                     "message": "No service list data found for this session"
                 }
 
-            decompressed_data = self._decompress_data(stored_data)
+            decompressed_data = decode_payload(stored_data)
+            cache_requests.inc(storage='service_list', result='hit')
+            cache_payload_bytes.observe(len(stored_data), storage='service_list', operation='read')
             
             logger.info(f"Retrieved compressed service list data for session_id: {session_id}")
 
@@ -707,6 +728,7 @@ class RedisFlightStorage:
             }
             
         except Exception as e:
+            cache_requests.inc(storage='service_list', result='error')
             logger.error(f"Failed to retrieve service list data: {str(e)}")
             return {
                 "success": False,
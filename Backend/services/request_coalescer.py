@@ -0,0 +1,241 @@
+"""
+Request Coalescing (single-flight)
+
+Identical air-shopping and flight-price requests that arrive while the first
+one is still waiting on Verteil share that one upstream call instead of each
+making their own (or being rejected with a 429).
+
+Within a worker, the first caller for a key starts an ``asyncio`` task and
+every concurrent caller awaits the same task. Across workers, the task first
+takes a Redis lock (``SET NX PX``). Workers that do not get the lock subscribe
+to a pub/sub channel and wait for the lock holder to publish its result. The
+result is kept under a short-lived key so late subscribers can still read it.
+If Redis is unavailable or the lock holder dies without a result, the waiting
+worker makes the call itself.
+
+The shared call runs under the request deadline of the caller that started
+it; every caller stops waiting when its own deadline is reached.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.async_redis_flight_storage import async_redis_flight_storage
+from services.flight.deadline import time_remaining
+from services.flight.exceptions import DeadlineExceeded
+from services.payload_codec import decode_payload, encode_payload
+
+logger = logging.getLogger(__name__)
+
+# Sentinel for "no result was published by another worker"
+_MISSING = object()
+
+# Releases the lock only if it is still held by the caller's token
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class CoalescerConfig:
+    """Environment driven settings for request coalescing."""
+
+    # Seconds a worker may hold the lock for one upstream call
+    LOCK_TTL = float(os.getenv('COALESCE_LOCK_TTL', 90))
+    # Seconds a published result stays readable for late waiters
+    RESULT_TTL = int(os.getenv('COALESCE_RESULT_TTL', 30))
+    # Maximum seconds between lock checks while waiting for a notification
+    LOCK_CHECK_INTERVAL = float(os.getenv('COALESCE_LOCK_CHECK_INTERVAL', 2))
+
+
+class RequestCoalescer:
+    """Per-worker single-flight registry backed by a Redis lock and pub/sub."""
+
+    def __init__(self):
+        """Create the coalescer; Redis is reached through the async flight storage."""
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            'leader_calls': 0,
+            'local_followers': 0,
+            'remote_followers': 0,
+            'fallback_calls': 0,
+            'errors': 0,
+        }
+
+    def _lock_key(self, key: str) -> str:
+        return f"coalesce:lock:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"coalesce:result:{key}"
+
+    def _channel(self, key: str) -> str:
+        return f"coalesce:done:{key}"
+
+    async def run(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]],
+        share_result: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run ``func`` once for all concurrent callers using the same ``key``.
+
+        Args:
+            key: Request key (e.g. from ``_generate_cache_key``)
+            func: Coroutine function making the upstream call; must return a
+                JSON-serializable dict
+            share_result: Optional predicate deciding whether a result may be
+                handed to other workers (default: always)
+
+        Returns:
+            The result of the shared call
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats['local_followers'] += 1
+            logger.info(f"Coalescing request with in-flight call for key: {key}")
+        else:
+            task = asyncio.ensure_future(self._run_shared(key, func, share_result))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _task, key=key: self._inflight.pop(key, None))
+
+        # Shield so that one caller going away does not cancel the call for the others.
+        # The call runs under the first caller's deadline; later callers stop
+        # waiting at their own.
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=time_remaining())
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            raise DeadlineExceeded(f"Request deadline reached while waiting for the shared call for key {key}.") from None
+
+    async def _run_shared(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]],
+        share_result: Optional[Callable[[Dict[str, Any]], bool]]
+    ) -> Dict[str, Any]:
+        """Make the call as the cross-worker leader, or wait for the worker that is."""
+        client = await async_redis_flight_storage.get_client()
+        if client is None:
+            self._stats['fallback_calls'] += 1
+            return await func()
+
+        # Two rounds: if the first lock holder disappears, try to take over once
+        for _ in range(2):
+            token = uuid.uuid4().hex
+            try:
+                acquired = await client.set(self._lock_key(key), token, nx=True, px=int(CoalescerConfig.LOCK_TTL * 1000))
+            except Exception as e:
+                logger.warning(f"Coalescing lock unavailable for key {key}: {e}")
+                break
+
+            if acquired:
+                # Drop any result left over from an earlier call for this key
+                await client.delete(self._result_key(key))
+                return await self._lead(client, key, token, func, share_result)
+
+            result = await self._wait_for_leader(client, key)
+            if result is not _MISSING:
+                self._stats['remote_followers'] += 1
+                logger.info(f"Received result from another worker for key: {key}")
+                return result
+
+        self._stats['fallback_calls'] += 1
+        logger.warning(f"No shared result for key {key}; making the call directly")
+        return await func()
+
+    async def _lead(
+        self,
+        client,
+        key: str,
+        token: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]],
+        share_result: Optional[Callable[[Dict[str, Any]], bool]]
+    ) -> Dict[str, Any]:
+        """Make the call while holding the lock, then publish the result."""
+        self._stats['leader_calls'] += 1
+        try:
+            result = await func()
+        except BaseException:
+            self._stats['errors'] += 1
+            await self._release(client, key, token)
+            raise
+
+        if share_result is None or share_result(result):
+            try:
+                await client.set(self._result_key(key), encode_payload(result), ex=CoalescerConfig.RESULT_TTL)
+            except Exception as e:
+                logger.warning(f"Failed to share coalesced result for key {key}: {e}")
+
+        await self._release(client, key, token)
+        return result
+
+    async def _release(self, client, key: str, token: str) -> None:
+        """Release the lock and wake up waiting workers."""
+        try:
+            await client.eval(_RELEASE_LOCK_SCRIPT, 1, self._lock_key(key), token)
+        except Exception as e:
+            logger.warning(f"Failed to release coalescing lock for key {key}: {e}")
+        try:
+            await client.publish(self._channel(key), token)
+        except Exception as e:
+            logger.warning(f"Failed to notify waiters for key {key}: {e}")
+
+    async def _read_result(self, client, key: str) -> Any:
+        payload = await client.get(self._result_key(key))
+        if not payload:
+            return _MISSING
+        return decode_payload(payload)
+
+    async def _wait_for_leader(self, client, key: str) -> Any:
+        """
+        Wait until the lock holder publishes a result or gives up the lock.
+
+        Returns:
+            The shared result, or ``_MISSING`` if none was published
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CoalescerConfig.LOCK_TTL
+        pubsub = client.pubsub()
+        try:
+            # Subscribe before checking the result key so a publish cannot be missed
+            await pubsub.subscribe(self._channel(key))
+            while True:
+                result = await self._read_result(client, key)
+                if result is not _MISSING:
+                    return result
+                if not await client.exists(self._lock_key(key)):
+                    # Released without a result (failed call) or expired
+                    return await self._read_result(client, key)
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return _MISSING
+                await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=min(remaining, CoalescerConfig.LOCK_CHECK_INTERVAL)
+                )
+        except Exception as e:
+            logger.warning(f"Error waiting for coalesced result for key {key}: {e}")
+            return _MISSING
+        finally:
+            try:
+                await pubsub.unsubscribe()
+                await pubsub.aclose() if hasattr(pubsub, 'aclose') else await pubsub.close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return coalescing counters and the number of in-flight keys."""
+        stats: Dict[str, Any] = dict(self._stats)
+        stats['inflight'] = len(self._inflight)
+        return stats
+
+
+# Create a singleton instance (one registry per worker process)
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,278 @@
+"""
+Shared OAuth Token Store
+
+Every gunicorn worker and every instance has its own ``TokenManager``. Without
+sharing, each of them fetches a token at cold start and again after each 401.
+This store keeps the current Verteil token in Redis so they can all use one.
+
+- The token is stored under a key scoped by the API base URL and credentials,
+  with a TTL matching its expiry.
+- A process that needs a new token first takes a lease (``SET NX PX``). Only
+  the lease holder calls the token endpoint; it stores the new token, releases
+  the lease and publishes the token on a pub/sub channel.
+- Processes that do not get the lease wait on the channel for the new token.
+- Every worker also runs a subscriber (``listen``) that installs tokens
+  published by other processes as soon as they arrive.
+
+When Redis is unavailable every method returns ``None``/``False`` and the
+``TokenManager`` falls back to fetching its own token (persisted to disk).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.async_redis_flight_storage import async_redis_flight_storage
+
+logger = logging.getLogger(__name__)
+
+# Releases the lease only if it is still held by the caller's token
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SharedTokenConfig:
+    """Environment driven settings for the shared token store."""
+
+    ENABLED = os.getenv('SHARED_TOKEN_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+    # Seconds one process may hold the refresh lease (token requests time out after 10s)
+    LEASE_TTL = float(os.getenv('SHARED_TOKEN_LEASE_TTL', 15))
+    # Seconds before reconnecting the subscriber after Redis errors
+    RECONNECT_DELAY = float(os.getenv('SHARED_TOKEN_RECONNECT_DELAY', 5))
+
+
+def token_scope(config: Dict[str, Any]) -> str:
+    """Return the key scope for the credentials in ``config`` (environments sharing Redis stay apart)."""
+    identity = '|'.join(str(config.get(key) or '') for key in (
+        'VERTEIL_API_BASE_URL', 'VERTEIL_USERNAME', 'VERTEIL_THIRD_PARTY_ID', 'VERTEIL_OFFICE_ID'
+    ))
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]
+
+
+class SharedTokenStore:
+    """Redis-backed token record, refresh lease and update channel."""
+
+    def __init__(self):
+        """Create the store; Redis is reached through the async flight storage."""
+        self._stats = {
+            'shared_reads': 0,
+            'shared_hits': 0,
+            'published': 0,
+            'leases_acquired': 0,
+            'lease_waits': 0,
+            'received': 0,
+            'errors': 0,
+        }
+
+    def _token_key(self, scope: str) -> str:
+        return f"verteil_token:{scope}"
+
+    def _lease_key(self, scope: str) -> str:
+        return f"verteil_token:lease:{scope}"
+
+    def _channel(self, scope: str) -> str:
+        return f"verteil_token:updated:{scope}"
+
+    async def _get_client(self):
+        if not SharedTokenConfig.ENABLED:
+            return None
+        return await async_redis_flight_storage.get_client()
+
+    @staticmethod
+    def _parse(payload: Any) -> Optional[Dict[str, Any]]:
+        if not payload:
+            return None
+        record = json.loads(payload)
+        if not isinstance(record, dict) or not record.get('access_token') or not record.get('token_expiry'):
+            return None
+        return record
+
+    async def get(self, scope: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the shared token record, if any.
+
+        Returns:
+            Dict with ``access_token``, ``token_data`` and ``token_expiry``
+            (epoch seconds), or None if there is none or Redis is unavailable
+        """
+        client = await self._get_client()
+        if client is None:
+            return None
+        self._stats['shared_reads'] += 1
+        try:
+            record = self._parse(await client.get(self._token_key(scope)))
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.warning(f"Failed to read shared token: {e}")
+            return None
+        if record is not None:
+            self._stats['shared_hits'] += 1
+        return record
+
+    async def publish(self, scope: str, record: Dict[str, Any]) -> bool:
+        """Store a new token record until it expires and notify the other processes."""
+        client = await self._get_client()
+        if client is None:
+            return False
+        ttl = int(record['token_expiry'] - time.time())
+        if ttl <= 0:
+            return False
+        payload = json.dumps(record)
+        try:
+            await client.set(self._token_key(scope), payload, ex=ttl)
+            await client.publish(self._channel(scope), payload)
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.warning(f"Failed to publish shared token: {e}")
+            return False
+        self._stats['published'] += 1
+        return True
+
+    async def acquire_lease(self, scope: str) -> Optional[str]:
+        """
+        Try to become the process that refreshes the token.
+
+        Returns:
+            The lease token to pass to ``release_lease``, or None if another
+            process holds the lease or Redis is unavailable
+        """
+        client = await self._get_client()
+        if client is None:
+            return None
+        lease = uuid.uuid4().hex
+        try:
+            acquired = await client.set(self._lease_key(scope), lease, nx=True,
+                                        px=int(SharedTokenConfig.LEASE_TTL * 1000))
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.warning(f"Token refresh lease unavailable: {e}")
+            return None
+        if not acquired:
+            return None
+        self._stats['leases_acquired'] += 1
+        return lease
+
+    async def release_lease(self, scope: str, lease: str) -> None:
+        """Release the lease if it is still held by ``lease``."""
+        client = await self._get_client()
+        if client is None:
+            return
+        try:
+            await client.eval(_RELEASE_LEASE_SCRIPT, 1, self._lease_key(scope), lease)
+        except Exception as e:
+            logger.warning(f"Failed to release token refresh lease: {e}")
+
+    async def wait_for_token(
+        self,
+        scope: str,
+        rejected_token: Optional[str] = None,
+        newer_than: float = 0
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the lease holder to publish a new token.
+
+        Args:
+            scope: Key scope from ``token_scope``
+            rejected_token: Token that must not be returned (it got a 401)
+            newer_than: Only return tokens expiring after this epoch time
+
+        Returns:
+            The new token record, or None if the lease holder gave up, the
+            lease expired or Redis is unavailable
+        """
+        client = await self._get_client()
+        if client is None:
+            return None
+        self._stats['lease_waits'] += 1
+
+        def usable(record: Optional[Dict[str, Any]]) -> bool:
+            return (record is not None and record['access_token'] != rejected_token
+                    and record['token_expiry'] > max(newer_than, time.time()))
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SharedTokenConfig.LEASE_TTL
+        pubsub = client.pubsub()
+        try:
+            # Subscribe before reading the key so a publish cannot be missed
+            await pubsub.subscribe(self._channel(scope))
+            while True:
+                record = self._parse(await client.get(self._token_key(scope)))
+                if usable(record):
+                    return record
+                if not await client.exists(self._lease_key(scope)):
+                    # Released without a new token (failed refresh) or expired
+                    record = self._parse(await client.get(self._token_key(scope)))
+                    return record if usable(record) else None
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1.0))
+                if message is not None:
+                    record = self._parse(message.get('data'))
+                    if usable(record):
+                        return record
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.warning(f"Error waiting for shared token: {e}")
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe()
+                await pubsub.aclose() if hasattr(pubsub, 'aclose') else await pubsub.close()
+            except Exception:
+                pass
+
+    async def listen(self, scope: str, on_token: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """
+        Call ``on_token`` with every token published by any process until cancelled.
+
+        Reconnects after Redis errors; returns immediately if sharing is disabled.
+        """
+        if not SharedTokenConfig.ENABLED:
+            return
+        while True:
+            client = await self._get_client()
+            if client is None:
+                await asyncio.sleep(max(SharedTokenConfig.RECONNECT_DELAY, async_redis_flight_storage.RECONNECT_INTERVAL))
+                continue
+
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self._channel(scope))
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=30.0)
+                    if message is None:
+                        continue
+                    record = self._parse(message.get('data'))
+                    if record is not None:
+                        self._stats['received'] += 1
+                        await on_token(record)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.warning(f"Shared token subscriber error: {e}. Reconnecting in {SharedTokenConfig.RECONNECT_DELAY}s")
+                await asyncio.sleep(SharedTokenConfig.RECONNECT_DELAY)
+            finally:
+                try:
+                    await pubsub.unsubscribe()
+                    await pubsub.aclose() if hasattr(pubsub, 'aclose') else await pubsub.close()
+                except Exception:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return shared token counters."""
+        return dict(self._stats)
+
+
+# Create a singleton instance (one store per worker process)
+shared_token_store = SharedTokenStore()
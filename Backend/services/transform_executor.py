@@ -0,0 +1,335 @@
+"""
+Transform Executor
+
+CPU-heavy NDC transformations (air shopping results and flight cards,
+FlightPrice and SeatAvailability frontend transforms) run on responses from
+400KB to several MB. Running them on the event loop stalls every other request
+on the worker, so services submit them here instead.
+
+``TRANSFORM_EXECUTOR`` selects where they run:
+
+- ``process`` (default): a per-worker ``ProcessPoolExecutor`` whose processes
+  are started and warmed up (transformer modules imported) in
+  ``before_serving``. The response is sent as one binary payload (see
+  ``payload_codec``) and the result comes back the same way, so only bytes are
+  pickled. Responses smaller than ``TRANSFORM_INLINE_MAX_BYTES`` are
+  transformed inline because the round trip would cost more than the work.
+- ``thread``: a ``ThreadPoolExecutor``; data is passed without copying.
+- ``inline``: run on the event loop (previous behaviour).
+
+Per-stage counters, in-flight depth, queue wait and run times are exposed
+through ``get_stats()``.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services.metrics import transform_seconds
+from services.payload_codec import COMPRESSOR_NONE, decode_payload, encode_payload
+
+logger = logging.getLogger(__name__)
+
+
+class TransformExecutorConfig:
+    """Environment driven settings for the transform executor."""
+
+    # 'process', 'thread' or 'inline'
+    MODE = os.getenv('TRANSFORM_EXECUTOR', 'process').lower()
+    # Pool size per gunicorn worker
+    WORKERS = int(os.getenv('TRANSFORM_EXECUTOR_WORKERS', 2))
+    # Encoded responses smaller than this are transformed inline in process mode
+    INLINE_MAX_BYTES = int(os.getenv('TRANSFORM_INLINE_MAX_BYTES', 32 * 1024))
+
+
+# ---------------------------------------------------------------------------
+# Stages (run inside the pool; imports are local so pool processes only load
+# what they use)
+# ---------------------------------------------------------------------------
+
+def _air_shopping_stage(
+    raw_response: Dict[str, Any],
+    filter_airlines: bool = False,
+    search_context: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Transform an AirShopping response into metadata, flight cards and an offer index."""
+    from transformers.enhanced_air_shopping_transformer import transform_air_shopping_for_results_enhanced
+    from utils.multi_airline_flight_card_generator import generate_enhanced_flight_cards
+    from utils.ndc_response_index import NdcResponseIndex
+    from utils.offer_index import OfferIndex
+
+    transform_start = time.perf_counter()
+    # Parse the response once; the transformer and card generator share the index
+    response_index = NdcResponseIndex(raw_response)
+    transformed_data = transform_air_shopping_for_results_enhanced(
+        raw_response, filter_airlines, search_context, index=response_index
+    )
+    transform_time = time.perf_counter() - transform_start
+
+    offers = transformed_data.get('offers', [])
+    card_start = time.perf_counter()
+    cards = generate_enhanced_flight_cards(raw_response, offers, index=response_index)
+    card_time = time.perf_counter() - card_start
+
+    try:
+        offer_index = OfferIndex.build(raw_response, response_index, offers).to_dict()
+    except Exception as e:
+        logger.warning(f"Failed to build offer index: {e}")
+        offer_index = None
+
+    return {
+        'metadata': transformed_data.get('metadata', {}),
+        'cards': cards,
+        'offer_index': offer_index,
+        'transform_time': transform_time,
+        'card_time': card_time,
+    }
+
+
+def _flight_price_stage(flight_price_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Transform a FlightPrice response for the frontend."""
+    from utils.flight_price_transformer import transform_for_frontend
+    return transform_for_frontend(flight_price_data)
+
+
+def _seat_availability_stage(seat_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Transform a SeatAvailability response for the frontend."""
+    from utils.seat_availability_transformer import transform_seat_availability_lean_frontend
+    return transform_seat_availability_lean_frontend(seat_data)
+
+
+STAGES: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'air_shopping': _air_shopping_stage,
+    'flight_price': _flight_price_stage,
+    'seat_availability': _seat_availability_stage,
+}
+
+
+def _execute(stage: str, payload: Any, kwargs: Dict[str, Any], encoded: bool) -> Tuple[Any, float, float]:
+    """
+    Run one stage (in a pool process/thread or inline).
+
+    Returns:
+        (result, wall-clock start time, run seconds); the result is encoded
+        when the payload was
+    """
+    started_at = time.time()
+    run_start = time.perf_counter()
+    data = decode_payload(payload) if encoded else payload
+    result = STAGES[stage](data, **kwargs)
+    if encoded:
+        result = encode_payload(result, COMPRESSOR_NONE)
+    return result, started_at, time.perf_counter() - run_start
+
+
+def _warm_up() -> int:
+    """Import the transformer modules so the first real task does not pay for it."""
+    import transformers.enhanced_air_shopping_transformer  # noqa: F401
+    import utils.flight_price_transformer  # noqa: F401
+    import utils.multi_airline_flight_card_generator  # noqa: F401
+    import utils.offer_index  # noqa: F401
+    import utils.seat_availability_transformer  # noqa: F401
+    return os.getpid()
+
+
+# ---------------------------------------------------------------------------
+# Executor
+# ---------------------------------------------------------------------------
+
+class TransformExecutor:
+    """Per-worker executor stage for CPU-heavy transforms."""
+
+    def __init__(self):
+        """Create the executor; the pool is started by ``initialize()`` or on first use."""
+        self._executor: Optional[Executor] = None
+        self._mode = TransformExecutorConfig.MODE
+        self._in_flight = 0
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def _create_executor(self) -> Optional[Executor]:
+        workers = max(TransformExecutorConfig.WORKERS, 1)
+        if self._mode == 'process':
+            # Spawned processes do not inherit the worker's event loop, sockets or locks
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        if self._mode == 'thread':
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transform')
+        return None
+
+    async def initialize(self) -> None:
+        """Start the pool and warm up every process (call from ``before_serving``)."""
+        if self._mode not in ('process', 'thread', 'inline'):
+            logger.warning(f"Unknown TRANSFORM_EXECUTOR '{self._mode}'; using 'process'")
+            self._mode = 'process'
+        if self._executor is None:
+            self._executor = self._create_executor()
+        if self._executor is None:
+            logger.info("Transform executor running inline")
+            return
+
+        if self._mode == 'process':
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                # Submitting starts the processes, which can fail right here
+                # (e.g. a daemonic worker may not have children)
+                pids = await asyncio.gather(*[
+                    loop.run_in_executor(self._executor, _warm_up)
+                    for _ in range(max(TransformExecutorConfig.WORKERS, 1))
+                ], return_exceptions=True)
+                error = next((pid for pid in pids if isinstance(pid, BaseException)), None)
+            except Exception as e:
+                error = e
+            if error is None:
+                logger.info(f"Transform process pool warmed up in {time.perf_counter() - start:.2f}s "
+                            f"(pids: {sorted(pids)})")
+                return
+            # Serve with threads rather than failing startup
+            logger.error(f"Transform process pool failed to start: {error!r}; using a thread pool")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._mode = 'thread'
+            self._executor = self._create_executor()
+
+        logger.info(f"Transform thread pool started with {TransformExecutorConfig.WORKERS} threads")
+
+    async def close(self) -> None:
+        """Shut the pool down (call from ``after_serving``)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _stage_stats(self, stage: str) -> Dict[str, Any]:
+        stats = self._stats.get(stage)
+        if stats is None:
+            stats = self._stats[stage] = {
+                'submitted': 0,
+                'completed': 0,
+                'failed': 0,
+                'inline': 0,
+                'in_flight': 0,
+                'max_in_flight': 0,
+                'queue_wait_ms_total': 0.0,
+                'queue_wait_ms_max': 0.0,
+                'run_ms_total': 0.0,
+                'run_ms_max': 0.0,
+            }
+        return stats
+
+    def _record(self, stage: str, stats: Dict[str, Any], queue_wait: float, run_time: float) -> None:
+        transform_seconds.observe(queue_wait, stage=stage, phase='queue_wait')
+        transform_seconds.observe(run_time, stage=stage, phase='run')
+        stats['completed'] += 1
+        stats['queue_wait_ms_total'] += queue_wait * 1000
+        stats['queue_wait_ms_max'] = max(stats['queue_wait_ms_max'], queue_wait * 1000)
+        stats['run_ms_total'] += run_time * 1000
+        stats['run_ms_max'] = max(stats['run_ms_max'], run_time * 1000)
+
+    async def run(self, stage: str, data: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        """
+        Run a transform stage off the event loop.
+
+        Args:
+            stage: Name of the stage in ``STAGES``
+            data: Parsed NDC response to transform
+            **kwargs: Small extra arguments for the stage (must be picklable)
+
+        Returns:
+            The stage result
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown transform stage: {stage}")
+        if self._executor is None and self._mode in ('process', 'thread'):
+            self._executor = self._create_executor()
+
+        stats = self._stage_stats(stage)
+        stats['submitted'] += 1
+
+        payload, encoded = data, False
+        if self._mode == 'process':
+            payload, encoded = encode_payload(data, COMPRESSOR_NONE), True
+        if self._executor is None or (encoded and len(payload) < TransformExecutorConfig.INLINE_MAX_BYTES):
+            stats['inline'] += 1
+            return self._run_inline(stage, data, kwargs, stats)
+
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        stats['in_flight'] += 1
+        stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        self._in_flight += 1
+        executor = self._executor
+        try:
+            try:
+                result, started_at, run_time = await loop.run_in_executor(
+                    executor, _execute, stage, payload, kwargs, encoded
+                )
+            except BrokenProcessPool as e:
+                # A pool process died (e.g. OOM); every task in flight on that pool
+                # fails with it, so only the first one replaces it
+                self._replace_broken(executor, stage, e)
+                try:
+                    result, started_at, run_time = await loop.run_in_executor(
+                        self._executor, _execute, stage, payload, kwargs, encoded
+                    )
+                except BrokenProcessPool:
+                    # The new pool died as well; keep the transform off the event loop
+                    logger.error(f"Transform process pool broken again during '{stage}'; using a thread")
+                    result, started_at, run_time = await asyncio.to_thread(
+                        _execute, stage, payload, kwargs, encoded
+                    )
+        except Exception:
+            stats['failed'] += 1
+            raise
+        finally:
+            stats['in_flight'] -= 1
+            self._in_flight -= 1
+
+        self._record(stage, stats, max(started_at - submitted_at, 0.0), run_time)
+        return decode_payload(result) if encoded else result
+
+    def _replace_broken(self, executor: Executor, stage: str, error: BaseException) -> None:
+        """Swap out ``executor`` if it is still the current pool."""
+        if self._executor is not executor:
+            return
+        logger.error(f"Transform process pool broken during '{stage}': {error}; restarting pool")
+        self._executor = self._create_executor()
+        executor.shutdown(wait=False)
+
+    def _run_inline(self, stage: str, data: Dict[str, Any], kwargs: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result, _, run_time = _execute(stage, data, kwargs, False)
+        except Exception:
+            stats['failed'] += 1
+            raise
+        self._record(stage, stats, 0.0, run_time)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the executor mode, queue depth and per-stage counters and timings."""
+        workers = max(TransformExecutorConfig.WORKERS, 1) if self._executor is not None else 0
+        stages = {}
+        for stage, stats in self._stats.items():
+            completed = stats['completed'] or 1
+            stages[stage] = {
+                **stats,
+                'queue_wait_ms_avg': stats['queue_wait_ms_total'] / completed,
+                'run_ms_avg': stats['run_ms_total'] / completed,
+            }
+        return {
+            'mode': self._mode,
+            'workers': workers,
+            'in_flight': self._in_flight,
+            # Tasks beyond the pool size wait in the executor queue
+            'queue_depth': max(self._in_flight - workers, 0),
+            'stages': stages,
+        }
+
+
+# Create a singleton instance (one pool per worker process)
+transform_executor = TransformExecutor()
@@ -15,7 +15,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 # Import Phase 1 core infrastructure modules
-from utils.multi_airline_detector import MultiAirlineDetector
+from utils.ndc_response_index import NdcResponseIndex, get_response_index
 from utils.reference_extractor import EnhancedReferenceExtractor
 from services.airline_mapping_service import AirlineMappingService
 
@@ -31,7 +31,7 @@ class EnhancedAirShoppingTransformer:
     Enhanced transformer for air shopping responses with multi-airline support.
     """
 
-    def __init__(self, response: Dict[str, Any], filter_unsupported_airlines: bool = False, search_context: Optional[Dict[str, Any]] = None):
+    def __init__(self, response: Dict[str, Any], filter_unsupported_airlines: bool = False, search_context: Optional[Dict[str, Any]] = None, index: Optional[NdcResponseIndex] = None):
         """
         Initialize the enhanced transformer.
 
@@ -40,12 +40,14 @@ class EnhancedAirShoppingTransformer:
             filter_unsupported_airlines (bool): Whether to filter out unsupported airlines.
                                                Default False to include all airlines from API response.
             search_context (Optional[Dict[str, Any]]): User's original search parameters for route context
+            index (Optional[NdcResponseIndex]): Pre-built index of ``response``; built here if not provided
         """
         self.response = response
         self.filter_unsupported_airlines = filter_unsupported_airlines
         self.search_context = search_context or {}
-        self.is_multi_airline = MultiAirlineDetector.is_multi_airline_response(response)
-        self.reference_extractor = EnhancedReferenceExtractor(response)
+        self.index = get_response_index(response, index)
+        self.is_multi_airline = self.index.is_multi_airline
+        self.reference_extractor = EnhancedReferenceExtractor(response, self.index)
         self.refs = self.reference_extractor.extract_references()
 
 
@@ -573,18 +575,12 @@ class EnhancedAirShoppingTransformer:
                 logger.debug("No segment references found in offer")
                 return '??'
 
-            # Look up segments in DataLists to find operating carrier
-            data_lists = self.response.get('DataLists', {})
-            segments = data_lists.get('FlightSegmentList', {}).get('FlightSegment', [])
-            if not isinstance(segments, list):
-                segments = [segments] if segments else []
-
+            # Look up segments in the index (kept in DataLists order) to find operating carrier
             # Collect all carriers from relevant segments
             operating_carriers = []
             marketing_carriers = []
 
-            for segment in segments:
-                segment_key = segment.get('SegmentKey', '')
+            for segment_key, segment in self.index.segments.items():
                 if segment_key in segment_refs:
                     # Extract OperatingCarrier
                     operating_carrier = segment.get('OperatingCarrier', {})
@@ -664,7 +660,7 @@ class EnhancedAirShoppingTransformer:
             }
 
 
-def transform_air_shopping_for_results_enhanced(response: Dict[str, Any], filter_unsupported_airlines: bool = False, search_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def transform_air_shopping_for_results_enhanced(response: Dict[str, Any], filter_unsupported_airlines: bool = False, search_context: Optional[Dict[str, Any]] = None, index: Optional[NdcResponseIndex] = None) -> Dict[str, Any]:
     """
     Enhanced transformation function for air shopping responses.
 
@@ -676,9 +672,10 @@ def transform_air_shopping_for_results_enhanced(response: Dict[str, Any], filter
         filter_unsupported_airlines (bool): Whether to filter out unsupported airlines.
                                            Default False to include all airlines from API response.
         search_context (Optional[Dict[str, Any]]): User's original search parameters for route context
+        index (Optional[NdcResponseIndex]): Pre-built index of ``response``, shared with the card generator
 
     Returns:
         Dict[str, Any]: Transformed response with flight offers
     """
-    transformer = EnhancedAirShoppingTransformer(response, filter_unsupported_airlines, search_context)
+    transformer = EnhancedAirShoppingTransformer(response, filter_unsupported_airlines, search_context, index)
     return transformer.transform_for_results()
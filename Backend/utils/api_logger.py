@@ -2,50 +2,131 @@
 
 This module provides centralized logging functionality for API requests and responses
 to help with debugging and monitoring API interactions.
+
+Records are serialized compactly on the caller and handed to a background
+writer thread through a bounded queue, so ``log_request``/``log_response``
+never wait on disk. The writer appends one JSON object per line to segment
+files (``api_logs/<service>/<timestamp>_<pid>_<n>.jsonl[.gz]``) that rotate
+by size and age. When the queue is full, records are dropped and counted
+instead of blocking the event loop.
 """
+import atexit
+import gzip
 import os
 import json
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('true', '1', 'yes', 'on')
+
+
+class APILoggerConfig:
+    """Environment driven settings for the background API log writer."""
+
+    # Maximum records and bytes waiting to be written before new records are dropped
+    QUEUE_MAX_RECORDS = int(os.getenv('API_LOG_QUEUE_MAX_RECORDS', 1000))
+    QUEUE_MAX_BYTES = int(os.getenv('API_LOG_QUEUE_MAX_BYTES', 64 * 1024 * 1024))
+    # A segment file is closed and a new one started past this size or age
+    SEGMENT_MAX_BYTES = int(os.getenv('API_LOG_SEGMENT_MAX_BYTES', 50 * 1024 * 1024))
+    SEGMENT_MAX_SECONDS = int(os.getenv('API_LOG_SEGMENT_MAX_SECONDS', 3600))
+    # gzip each record (segments stay readable with zcat / gzip.open)
+    COMPRESS = _env_flag('API_LOG_COMPRESS', 'true')
+    COMPRESS_LEVEL = int(os.getenv('API_LOG_COMPRESS_LEVEL', 1))
+
+
+class _Segment:
+    """An open JSONL segment file for one service directory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.opened_at = time.monotonic()
+        self.size = 0
+
+    def is_full(self) -> bool:
+        return (self.size >= APILoggerConfig.SEGMENT_MAX_BYTES
+                or time.monotonic() - self.opened_at >= APILoggerConfig.SEGMENT_MAX_SECONDS)
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+        except Exception:
+            pass
+
+
 class APILogger:
     """Centralized API request/response logger for debugging purposes."""
-    
+
+    # Sentinel telling the writer thread to flush and exit
+    _STOP = object()
+
     def __init__(self, base_dir: str = "api_logs"):
         """
         Initialize the API logger.
-        
+
         Args:
             base_dir: Base directory for storing API logs
         """
         self.base_dir = Path(base_dir)
         self.enabled = self._is_logging_enabled()
-        
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=APILoggerConfig.QUEUE_MAX_RECORDS)
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._segments: Dict[str, _Segment] = {}
+        self._segment_counter = 0
+        self._stats = {
+            'records_enqueued': 0,
+            'records_written': 0,
+            'records_dropped': 0,
+            'bytes_dropped': 0,
+            'bytes_written': 0,
+            'segments_opened': 0,
+            'write_errors': 0,
+        }
+
         if self.enabled:
             self._ensure_directories()
-    
+            atexit.register(self.close)
+
     def _is_logging_enabled(self) -> bool:
         """Check if API logging is enabled via environment variable."""
         return os.getenv('API_DEBUG_LOGGING', 'false').lower() in ('true', '1', 'yes', 'on')
-    
+
     def _ensure_directories(self):
         """Ensure all required directories exist."""
         directories = [
             self.base_dir,
             self.base_dir / "air_shopping",
-            self.base_dir / "flight_price", 
+            self.base_dir / "flight_price",
             self.base_dir / "booking",
             self.base_dir / "service_list",
             self.base_dir / "seat_availability"
         ]
-        
+
         for directory in directories:
             directory.mkdir(parents=True, exist_ok=True)
-    
+
     def _get_service_dir(self, service_name: str) -> Path:
         """Get the directory for a specific service."""
         service_mapping = {
@@ -55,20 +136,145 @@ class APILogger:
             'ServiceList': 'service_list',
             'SeatAvailability': 'seat_availability'
         }
-        
+
         service_dir = service_mapping.get(service_name, service_name.lower())
         return self.base_dir / service_dir
-    
-    def _generate_filename(self, service_name: str, request_id: str, data_type: str) -> str:
-        """Generate a filename for the log entry."""
+
+    def _serialize(self, record: Dict[str, Any]) -> bytes:
+        """Serialize a record as one compact JSON line."""
+        if orjson is not None:
+            try:
+                return orjson.dumps(record, default=str) + b'\n'
+            except TypeError:
+                pass
+        return json.dumps(record, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    def _ensure_writer(self) -> None:
+        """Start the writer thread for this process if it is not running."""
+        pid = os.getpid()
+        if self._writer is not None and self._writer_pid == pid and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is not None and self._writer_pid == pid and self._writer.is_alive():
+                return
+            if self._writer_pid != pid:
+                # Forked worker: the parent's queue contents and open files are not ours
+                self._queue = queue.Queue(maxsize=APILoggerConfig.QUEUE_MAX_RECORDS)
+                self._queued_bytes = 0
+                self._segments = {}
+            self._writer_pid = pid
+            self._writer = threading.Thread(target=self._run_writer, name='api-log-writer', daemon=True)
+            self._writer.start()
+
+    def _enqueue(self, service_name: str, record: Dict[str, Any]) -> None:
+        """Serialize ``record`` and queue it for the writer, dropping it if the queue is full."""
+        line = self._serialize(record)
+        size = len(line)
+
+        self._ensure_writer()
+        with self._lock:
+            if self._queued_bytes + size > APILoggerConfig.QUEUE_MAX_BYTES:
+                self._record_drop(size)
+                return
+            try:
+                self._queue.put_nowait((service_name, line))
+            except queue.Full:
+                self._record_drop(size)
+                return
+            self._queued_bytes += size
+            self._stats['records_enqueued'] += 1
+
+    def _record_drop(self, size: int) -> None:
+        """Count a dropped record (caller holds the lock)."""
+        self._stats['records_dropped'] += 1
+        self._stats['bytes_dropped'] += size
+        dropped = self._stats['records_dropped']
+        # Log the first drop and then every 100th so logging cannot become the bottleneck
+        if dropped == 1 or dropped % 100 == 0:
+            logger.warning(f"API log queue full; {dropped} records dropped so far")
+
+    def _run_writer(self) -> None:
+        """Writer thread: drain the queue into segment files."""
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                self._close_segments()
+                return
+
+            service_name, line = item
+            with self._lock:
+                self._queued_bytes -= len(line)
+            try:
+                self._write_line(service_name, line)
+                self._stats['records_written'] += 1
+            except Exception as e:
+                self._stats['write_errors'] += 1
+                logger.error(f"Failed to write API log record for {service_name}: {e}")
+
+            # Flush once the burst is written rather than after every record
+            if self._queue.empty():
+                for segment in self._segments.values():
+                    try:
+                        segment.file.flush()
+                    except Exception:
+                        pass
+
+    def _open_segment(self, service_name: str) -> _Segment:
+        service_dir = self._get_service_dir(service_name)
+        service_dir.mkdir(parents=True, exist_ok=True)
+        self._segment_counter += 1
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"{timestamp}_{request_id}_{data_type}.json"
-    
-    def log_request(self, service_name: str, request_id: str, payload: Dict[str, Any], 
+        suffix = '.jsonl.gz' if APILoggerConfig.COMPRESS else '.jsonl'
+        path = service_dir / f"{timestamp}_{os.getpid()}_{self._segment_counter}{suffix}"
+        self._stats['segments_opened'] += 1
+        return _Segment(path)
+
+    def _write_line(self, service_name: str, line: bytes) -> None:
+        segment = self._segments.get(service_name)
+        if segment is None or segment.is_full():
+            if segment is not None:
+                segment.close()
+            segment = self._open_segment(service_name)
+            self._segments[service_name] = segment
+
+        if APILoggerConfig.COMPRESS:
+            # Concatenated gzip members form a valid gzip file
+            line = gzip.compress(line, compresslevel=APILoggerConfig.COMPRESS_LEVEL)
+        segment.write(line)
+        self._stats['bytes_written'] += len(line)
+
+    def _close_segments(self) -> None:
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush queued records and stop the writer thread."""
+        writer = self._writer
+        if writer is None or self._writer_pid != os.getpid() or not writer.is_alive():
+            return
+        try:
+            # Blocks at most ``timeout`` if the queue is full
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("API log queue still full at shutdown; some records were not written")
+            return
+        writer.join(timeout)
+        self._writer = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return writer counters and the current queue depth."""
+        stats: Dict[str, Any] = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['queued_records'] = self._queue.qsize()
+        stats['queued_bytes'] = self._queued_bytes
+        return stats
+
+    def log_request(self, service_name: str, request_id: str, payload: Dict[str, Any],
                    endpoint: str, headers: Dict[str, str]) -> None:
         """
         Log API request data.
-        
+
         Args:
             service_name: Name of the service (AirShopping, FlightPrice, OrderCreate, ServiceList, SeatAvailability)
             request_id: Unique request identifier
@@ -78,37 +284,31 @@ class APILogger:
         """
         if not self.enabled:
             return
-        
+
         try:
-            service_dir = self._get_service_dir(service_name)
-            filename = self._generate_filename(service_name, request_id, "request")
-            filepath = service_dir / filename
-            
             # Mask sensitive headers
             safe_headers = self._mask_sensitive_headers(headers)
-            
+
             request_data = {
                 "timestamp": datetime.now().isoformat(),
+                "type": "request",
                 "service": service_name,
                 "request_id": request_id,
                 "endpoint": endpoint,
                 "headers": safe_headers,
                 "payload": payload
             }
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(request_data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"API request logged: {filepath}")
-            
+
+            self._enqueue(service_name, request_data)
+
         except Exception as e:
             logger.error(f"Failed to log API request for {service_name}: {e}")
-    
+
     def log_response(self, service_name: str, request_id: str, response: Dict[str, Any],
                     status_code: int, response_time_ms: Optional[float] = None) -> None:
         """
         Log API response data.
-        
+
         Args:
             service_name: Name of the service
             request_id: Unique request identifier
@@ -118,34 +318,28 @@ class APILogger:
         """
         if not self.enabled:
             return
-        
+
         try:
-            service_dir = self._get_service_dir(service_name)
-            filename = self._generate_filename(service_name, request_id, "response")
-            filepath = service_dir / filename
-            
             response_data = {
                 "timestamp": datetime.now().isoformat(),
+                "type": "response",
                 "service": service_name,
                 "request_id": request_id,
                 "status_code": status_code,
                 "response_time_ms": response_time_ms,
                 "response": response
             }
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(response_data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"API response logged: {filepath}")
-            
+
+            self._enqueue(service_name, response_data)
+
         except Exception as e:
             logger.error(f"Failed to log API response for {service_name}: {e}")
-    
+
     def _mask_sensitive_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
         """Mask sensitive information in headers."""
         sensitive_keys = ['authorization', 'thirdpartyid', 'officeid']
         safe_headers = {}
-        
+
         for key, value in headers.items():
             if key.lower() in sensitive_keys:
                 if key.lower() == 'authorization' and value.startswith('Bearer '):
@@ -154,27 +348,73 @@ class APILogger:
                     safe_headers[key] = f"***{value[-4:]}" if len(value) > 4 else "***"
             else:
                 safe_headers[key] = value
-        
+
         return safe_headers
-    
+
+    def iter_records(self, service_name: str, record_type: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Read back the records logged for a service.
+
+        Covers legacy per-call ``*_request.json``/``*_response.json`` files and
+        ``*.jsonl``/``*.jsonl.gz`` segments. Unreadable files and lines are skipped.
+
+        Args:
+            service_name: Service name (e.g. 'AirShopping') or log directory name
+            record_type: Only yield records of this type ('request' or 'response')
+
+        Yields:
+            (source, record) where source is the file path, with '#<line>' for segment records
+        """
+        service_dir = self._get_service_dir(service_name)
+        if not service_dir.is_dir():
+            return
+
+        for path in sorted(service_dir.glob('*_re*.json')):
+            file_type = 'response' if path.name.endswith('_response.json') else 'request'
+            if record_type and file_type != record_type:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable API log file {path}: {e}")
+                continue
+            yield str(path), {'type': file_type, **record}
+
+        for path in sorted([*service_dir.glob('*.jsonl'), *service_dir.glob('*.jsonl.gz')]):
+            opener = gzip.open if path.suffix == '.gz' else open
+            try:
+                with opener(path, 'rt', encoding='utf-8') as f:
+                    for line_number, line in enumerate(f, start=1):
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Typically the last line of a segment that is still being written
+                            continue
+                        if not record_type or record.get('type') == record_type:
+                            yield f"{path}#{line_number}", record
+            except (OSError, EOFError) as e:
+                logger.warning(f"Skipping unreadable API log segment {path}: {e}")
+
     def cleanup_old_logs(self, days_to_keep: int = 7) -> None:
         """
         Clean up log files older than specified days.
-        
+
         Args:
             days_to_keep: Number of days to keep log files
         """
         if not self.enabled or not self.base_dir.exists():
             return
-        
+
         try:
             cutoff_time = datetime.now().timestamp() - (days_to_keep * 24 * 60 * 60)
-            
-            for log_file in self.base_dir.rglob("*.json"):
+
+            # Legacy per-call *.json files and *.jsonl / *.jsonl.gz segments
+            for log_file in self.base_dir.rglob("*.json*"):
                 if log_file.stat().st_mtime < cutoff_time:
                     log_file.unlink()
                     logger.info(f"Cleaned up old log file: {log_file}")
-                    
+
         except Exception as e:
             logger.error(f"Failed to cleanup old logs: {e}")
 
@@ -4,8 +4,10 @@ Authentication utilities for Verteil API
 This module handles OAuth2 authentication with the Verteil API, including token
 management and request authentication.
 """
+import asyncio
 import base64
 import logging
+import aiohttp
 import requests
 import threading
 import time
@@ -92,12 +94,71 @@ def get_oauth_token(config: Dict[str, str]) -> Dict[str, Any]:
             error_msg += f" - {e.response.text}"
         raise AuthError(error_msg) from e
 
+async def get_oauth_token_async(
+    config: Dict[str, str],
+    session: Optional[aiohttp.ClientSession] = None
+) -> Dict[str, Any]:
+    """
+    Async variant of get_oauth_token that does not block the event loop.
+
+    Args:
+        config: Same configuration as get_oauth_token
+        session: Optional aiohttp session to reuse. A short-lived session is
+                 created when none (or a closed one) is provided.
+
+    Returns:
+        Dict containing access token and token metadata
+
+    Raises:
+        AuthError: If authentication fails or required config is missing
+    """
+    required_config = [
+        'VERTEIL_API_BASE_URL',
+        'VERTEIL_TOKEN_ENDPOINT',
+        'VERTEIL_USERNAME',
+        'VERTEIL_PASSWORD'
+    ]
+
+    missing = [key for key in required_config if not config.get(key)]
+    if missing:
+        raise AuthError(f"Missing required configuration: {', '.join(missing)}")
+
+    url = f"{config['VERTEIL_API_BASE_URL'].rstrip('/')}/{config['VERTEIL_TOKEN_ENDPOINT'].lstrip('/')}"
+    headers = {
+        'Authorization': get_basic_auth_token(config),
+        'Content-Type': 'application/x-www-form-urlencoded'
+    }
+
+    data = {
+        'grant_type': 'client_credentials'
+    }
+
+    own_session = session is None or session.closed
+    if own_session:
+        session = aiohttp.ClientSession()
+
+    try:
+        async with session.post(url, headers=headers, data=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status >= 400:
+                body = await response.text()
+                raise AuthError(f"Failed to get OAuth token: HTTP {response.status} - {body}")
+            return await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise AuthError(f"Failed to get OAuth token: {str(e)}") from e
+    finally:
+        if own_session:
+            await session.close()
+
 class TokenManager:
     """
     Manages OAuth2 token lifecycle including caching and automatic renewal.
 
     Implements the singleton pattern to ensure only one token manager exists.
     Tokens are cached in memory and persisted to disk to survive server restarts.
+    On the async path the token is also shared through Redis (see
+    ``services.shared_token_store``): only the process holding the refresh
+    lease calls the token endpoint and every worker installs the token it
+    publishes. The disk file remains the fallback when Redis is unavailable.
     """
     _instance = None
     _token = None
@@ -107,7 +168,20 @@ class TokenManager:
     _lock = threading.RLock()
     _is_refreshing = False
     _last_refresh_attempt = 0
+    _last_refresh_failure = 0
     REFRESH_COOLDOWN = 5  # seconds to wait before retrying after a failed refresh
+    REFRESH_AHEAD_SECONDS = int(os.environ.get('TOKEN_REFRESH_AHEAD_SECONDS', 300))  # refresh this long before the expiry buffer
+    BACKGROUND_RETRY_DELAY = 30  # seconds between background refresh retries after a failure
+
+    # Async refresh state (one event loop per worker process)
+    _async_lock = None
+    _async_lock_loop = None
+    _refresh_task = None
+    _refresh_session = None
+
+    # Shared (Redis) token state
+    _subscriber_task = None
+    _rejected_token = None  # last token a 401 was received for
 
     # Token persistence settings
     _token_file_path = None
@@ -121,7 +195,9 @@ class TokenManager:
         'last_token_generation_time': 0,
         'last_token_refresh_time': 0,
         'concurrent_refresh_peaks': 0,
-        'total_token_requests': 0
+        'total_token_requests': 0,
+        'background_refreshes': 0,
+        'shared_token_adoptions': 0
     }
     
     def __new__(cls):
@@ -152,7 +228,9 @@ class TokenManager:
                 'last_token_generation_time': 0,
                 'last_token_refresh_time': 0,
                 'concurrent_refresh_peaks': 0,
-                'total_token_requests': 0
+                'total_token_requests': 0,
+                'background_refreshes': 0,
+                'shared_token_adoptions': 0
             }
     
     @classmethod
@@ -491,6 +569,260 @@ class TokenManager:
             finally:
                 self._is_refreshing = False
     
+    def _install_token(self, token_data: Dict[str, Any]) -> int:
+        """
+        Store a freshly fetched token and update generation metrics.
+
+        Returns:
+            int: Token lifetime in seconds
+        """
+        if not token_data or 'access_token' not in token_data:
+            raise AuthError("Invalid token response: missing access_token")
+
+        expires_in = int(token_data.get('expires_in', 3600))  # Default to 1 hour
+        with self._lock:
+            self._token_expiry = int(time.time()) + expires_in
+            self._token = token_data['access_token']
+            self._token_data = token_data
+
+        self._increment_metric('token_generations')
+        self._metrics['last_token_generation_time'] = int(time.time())
+        return expires_in
+
+    def _get_async_lock(self) -> asyncio.Lock:
+        """Return the single-flight lock for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_lock_loop is not loop:
+            self._async_lock = asyncio.Lock()
+            self._async_lock_loop = loop
+        return self._async_lock
+
+    def _refresh_due_at(self) -> float:
+        """Epoch seconds at which the background task should refresh the token."""
+        buffer_seconds = int(self._config.get('OAUTH2_TOKEN_EXPIRY_BUFFER', 60)) if self._config else 60
+        return self._token_expiry - buffer_seconds - self.REFRESH_AHEAD_SECONDS
+
+    def _install_shared_token(self, record: Dict[str, Any], newer_than: float) -> bool:
+        """
+        Install a token published by another process.
+
+        Args:
+            record: Shared token record (see ``services.shared_token_store``)
+            newer_than: Only accept tokens expiring after this epoch time
+
+        Returns:
+            bool: True if the token is usable (installed now or already current)
+        """
+        if not record or record.get('access_token') == self._rejected_token:
+            return False
+        buffer_seconds = int(self._config.get('OAUTH2_TOKEN_EXPIRY_BUFFER', 60)) if self._config else 60
+        if record['token_expiry'] <= newer_than or record['token_expiry'] - buffer_seconds <= time.time():
+            return False
+
+        with self._lock:
+            if self._token == record['access_token']:
+                return True
+            self._token = record['access_token']
+            self._token_data = record.get('token_data') or {'access_token': record['access_token']}
+            self._token_expiry = int(record['token_expiry'])
+
+        self._increment_metric('shared_token_adoptions')
+        logger.info(f"Installed shared token from another process. Expires in {int(record['token_expiry'] - time.time())} seconds.")
+        return True
+
+    async def _refresh_token_async(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        clear_on_failure: bool = True
+    ) -> None:
+        """
+        Replace the token without blocking the event loop. Caller holds the async lock.
+
+        A newer token shared by another process is used when there is one.
+        Otherwise only the holder of the shared refresh lease fetches a token;
+        the other processes wait for it to be published and fall back to
+        fetching their own if it does not arrive (or Redis is unavailable).
+        """
+        from services.shared_token_store import shared_token_store, token_scope
+
+        effective_config = self._get_effective_config(config)
+        scope = token_scope(effective_config)
+        previous_expiry = self._token_expiry
+
+        # Another process may already have replaced the token
+        if self._install_shared_token(await shared_token_store.get(scope), previous_expiry):
+            return
+
+        # Only a failed fetch starts the cooldown; a 401 right after a successful
+        # fetch (e.g. the token was revoked) must still be able to refresh
+        current_time = time.time()
+        if current_time - self._last_refresh_failure < self.REFRESH_COOLDOWN:
+            raise AuthError("Token refresh on cooldown. Please try again later.")
+
+        lease = None
+        try:
+            self._is_refreshing = True
+            self._last_refresh_attempt = current_time
+
+            lease = await shared_token_store.acquire_lease(scope)
+            if lease is None:
+                # Another process holds the lease (or Redis is down): use the token it publishes
+                record = await shared_token_store.wait_for_token(scope, self._rejected_token, previous_expiry)
+                if self._install_shared_token(record, previous_expiry):
+                    return
+
+            logger.info("Fetching new OAuth2 token (async)...")
+            token_data = await get_oauth_token_async(effective_config, session or self._refresh_session)
+            expires_in = self._install_token(token_data)
+
+            logger.info(f"Successfully obtained new token. Expires in {expires_in} seconds ({expires_in/3600:.1f} hours).")
+            logger.info(f"Total tokens generated in this session: {self._metrics['token_generations']}")
+
+            await shared_token_store.publish(scope, {
+                'access_token': self._token,
+                'token_data': self._token_data,
+                'token_expiry': self._token_expiry,
+            })
+
+            # Disk persistence is blocking file I/O - keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self._save_token_to_disk)
+
+        except Exception as e:
+            self._last_refresh_failure = time.time()
+            if clear_on_failure:
+                self.clear_token()
+            if isinstance(e, AuthError):
+                raise
+            raise AuthError(f"Failed to get token: {str(e)}") from e
+
+        finally:
+            if lease is not None:
+                await shared_token_store.release_lease(scope, lease)
+            self._is_refreshing = False
+
+    async def get_token_async(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> str:
+        """
+        Async variant of get_token for use inside the event loop.
+
+        Concurrent callers share a single refresh (asyncio.Lock single-flight),
+        and a background task renews the token before it expires so callers
+        normally never wait on the token endpoint.
+
+        Args:
+            config: Optional configuration dictionary (see get_token)
+            session: Optional aiohttp session used for the token request
+
+        Returns:
+            str: Valid access token in 'Bearer <token>' format
+
+        Raises:
+            AuthError: If token cannot be obtained
+        """
+        self._increment_metric('total_token_requests')
+
+        if self._is_token_valid():
+            self._ensure_background_refresh(config, session)
+            return f"Bearer {self._token}"
+
+        lock = self._get_async_lock()
+        if lock.locked():
+            self._increment_metric('concurrent_refresh_attempts')
+
+        async with lock:
+            # Another coroutine may have refreshed while we waited for the lock
+            if not self._is_token_valid():
+                await self._refresh_token_async(config, session)
+
+        self._ensure_background_refresh(config, session)
+        return f"Bearer {self._token}"
+
+    def _ensure_background_refresh(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> None:
+        """Start the refresh-ahead task for the running loop if it is not running yet."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if session is not None and not session.closed:
+            self._refresh_session = session
+
+        task = self._refresh_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+
+        self._refresh_task = loop.create_task(self._background_refresh_loop(config))
+
+    async def _background_refresh_loop(self, config: Optional[Dict[str, Any]] = None) -> None:
+        """Renew the token REFRESH_AHEAD_SECONDS before it would be considered expired."""
+        while True:
+            delay = self._refresh_due_at() - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                async with self._get_async_lock():
+                    # Skip if a request-path refresh already replaced the token
+                    if self._refresh_due_at() - time.time() > 0:
+                        continue
+                    await self._refresh_token_async(config, self._refresh_session, clear_on_failure=False)
+                self._increment_metric('background_refreshes')
+                logger.info("Background token refresh completed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Background token refresh failed: {e}. Retrying in {self.BACKGROUND_RETRY_DELAY}s")
+                await asyncio.sleep(self.BACKGROUND_RETRY_DELAY)
+
+    async def start_background_refresh(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> None:
+        """
+        Warm the token and start the refresh-ahead task (call from before_serving).
+
+        Failures are logged, not raised, so the app can still start without
+        credentials; requests will then refresh on demand.
+        """
+        try:
+            await self.get_token_async(config, session)
+        except Exception as e:
+            logger.warning(f"Initial token fetch failed: {e}")
+            self._ensure_background_refresh(config, session)
+
+        # Install tokens fetched by other workers and instances as soon as they are published
+        if self._subscriber_task is None or self._subscriber_task.done():
+            from services.shared_token_store import shared_token_store, token_scope
+
+            async def on_shared_token(record: Dict[str, Any]) -> None:
+                self._install_shared_token(record, self._token_expiry)
+
+            scope = token_scope(self._get_effective_config(config))
+            self._subscriber_task = asyncio.create_task(shared_token_store.listen(scope, on_shared_token))
+
+    async def stop_background_refresh(self) -> None:
+        """Cancel the refresh-ahead and shared token tasks (call from after_serving)."""
+        tasks = (self._refresh_task, self._subscriber_task)
+        self._refresh_task = self._subscriber_task = None
+        self._refresh_session = None
+        for task in tasks:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
     def get_token_info(self) -> Dict[str, Any]:
         """
         Get information about the current token.
@@ -520,12 +852,24 @@ class TokenManager:
             'metrics': self.get_metrics()
         }
     
-    def clear_token(self) -> None:
+    def clear_token(self, token: Optional[str] = None) -> None:
         """
         Clear the current token, forcing a refresh on next request.
         Useful for handling 401 Unauthorized responses.
+
+        Args:
+            token: The token that was rejected. If given, the current token is
+                   only cleared while it is still that token (another worker may
+                   already have published a replacement), and the rejected token
+                   is never installed again from the shared store.
         """
         with self._lock:
+            if token is not None:
+                self._rejected_token = token
+                if self._token != token:
+                    return
+            elif self._token:
+                self._rejected_token = self._token
             self._token = None
             self._token_data = None
             self._token_expiry = 0
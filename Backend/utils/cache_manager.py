@@ -1,77 +1,181 @@
 """
 Simple in-memory cache manager with TTL support
+
+Entries are bounded by an approximate byte budget (``CACHE_MANAGER_MAX_BYTES``)
+and evicted least recently used first. Expired entries are swept through a
+heap ordered by expiry time on every write (and every
+``CACHE_MANAGER_SWEEP_INTERVAL`` seconds on reads), so they do not linger
+until their key happens to be read again.
 """
+import heapq
+import os
+import sys
+import threading
 import time
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class CacheManagerConfig:
+    """Environment driven settings for the in-memory cache."""
+
+    # Approximate bytes of cached values kept per process
+    MAX_BYTES = int(os.getenv('CACHE_MANAGER_MAX_BYTES', 128 * 1024 * 1024))
+    # Values larger than this are not cached
+    MAX_ITEM_BYTES = int(os.getenv('CACHE_MANAGER_MAX_ITEM_BYTES', 16 * 1024 * 1024))
+    # Minimum seconds between expiry sweeps triggered by reads
+    SWEEP_INTERVAL = float(os.getenv('CACHE_MANAGER_SWEEP_INTERVAL', 5))
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate the memory held by ``value`` in bytes.
+
+    Walks dicts, lists, tuples and sets (counting shared objects once) and
+    adds ``sys.getsizeof`` of every object reached.
+    """
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
+
 
 class CacheManager:
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._rate_limits: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        max_bytes: int = CacheManagerConfig.MAX_BYTES,
+        max_item_bytes: int = CacheManagerConfig.MAX_ITEM_BYTES
+    ):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        # key -> {'value', 'expires_at', 'size'}, least recently used first
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # (expires_at, key); entries whose expiry changed since are skipped when popped
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._bytes = 0
+        self._last_sweep = 0.0
+        self._lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'rejected': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'peak_bytes': 0,
+        }
+
+    def _remove(self, key: str) -> None:
+        item = self._cache.pop(key)
+        self._bytes -= item['size']
+
+    def sweep(self) -> int:
+        """Remove every expired entry; returns the number removed."""
+        removed = 0
+        with self._lock:
+            now = time.time()
+            self._last_sweep = now
+            while self._expiry_heap and self._expiry_heap[0][0] < now:
+                expires_at, key = heapq.heappop(self._expiry_heap)
+                item = self._cache.get(key)
+                if item is not None and item['expires_at'] == expires_at:
+                    self._remove(key)
+                    removed += 1
+            # Stale heap entries (overwritten or deleted keys) are dropped lazily;
+            # rebuild when they dominate so the heap stays proportional to the cache
+            if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+                self._expiry_heap = [(item['expires_at'], key) for key, item in self._cache.items()]
+                heapq.heapify(self._expiry_heap)
+            self._stats['expirations'] += removed
+        return removed
 
     def get(self, key: str) -> Optional[Any]:
         """Get a value from the cache if it exists and hasn't expired."""
-        if key not in self._cache:
-            return None
-            
-        item = self._cache[key]
-        if item['expires_at'] < time.time():
-            del self._cache[key]
-            return None
-            
-        return item['value']
+        with self._lock:
+            if time.time() - self._last_sweep >= CacheManagerConfig.SWEEP_INTERVAL:
+                self.sweep()
+
+            item = self._cache.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+
+            if item['expires_at'] < time.time():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._cache.move_to_end(key)
+            self._stats['hits'] += 1
+            return item['value']
 
     def set(self, key: str, value: Any, ttl: int = 300) -> None:
         """Set a value in the cache with a TTL in seconds."""
-        self._cache[key] = {
-            'value': value,
-            'expires_at': time.time() + ttl
-        }
-    
+        # Sizing walks the value; do it outside the lock
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+            if size > min(self.max_item_bytes, self.max_bytes):
+                self._stats['rejected'] += 1
+                return
+
+            expires_at = time.time() + ttl
+            self._cache[key] = {
+                'value': value,
+                'expires_at': expires_at,
+                'size': size
+            }
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self._stats['sets'] += 1
+
+            self.sweep()
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._cache)))
+                self._stats['evictions'] += 1
+            self._stats['peak_bytes'] = max(self._stats['peak_bytes'], self._bytes)
+
+    def values(self) -> List[Any]:
+        """Return the cached values (expired ones not yet swept included), least recently used first."""
+        with self._lock:
+            return [item['value'] for item in self._cache.values()]
+
     def delete(self, key: str) -> None:
         """Delete a key from the cache."""
-        if key in self._cache:
-            del self._cache[key]
-    
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+
     def clear(self) -> None:
         """Clear all items from the cache."""
-        self._cache.clear()
-    
-    def rate_limit(self, key: str, limit: int, window: int) -> bool:
-        """
-        Check if a rate limit has been exceeded.
-        
-        Args:
-            key: The rate limit key
-            limit: Maximum number of requests allowed in the window
-            window: Time window in seconds
-            
-        Returns:
-            bool: True if rate limit exceeded, False otherwise
-        """
-        current_time = time.time()
-        
-        # Remove expired rate limits
-        self._rate_limits = {
-            k: v for k, v in self._rate_limits.items()
-            if v['expires_at'] > current_time
-        }
-        
-        # Get or create rate limit record
-        if key not in self._rate_limits:
-            self._rate_limits[key] = {
-                'count': 1,
-                'expires_at': current_time + window
+        with self._lock:
+            self._cache.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit, eviction and expiry counters and the current occupancy."""
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': len(self._cache),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'utilization': self._bytes / self.max_bytes if self.max_bytes else 0.0,
             }
-            return False
-        
-        # Check if rate limit exceeded
-        if self._rate_limits[key]['count'] >= limit:
-            return True
-            
-        # Increment counter
-        self._rate_limits[key]['count'] += 1
-        return False
 
 # Create a singleton instance
 cache_manager = CacheManager()
@@ -13,7 +13,7 @@ import logging
 from typing import Any, Dict, List, Optional
 
 # Import Phase 1 core infrastructure modules
-from utils.multi_airline_detector import MultiAirlineDetector
+from utils.ndc_response_index import NdcResponseIndex, get_response_index
 from utils.reference_extractor import EnhancedReferenceExtractor
 from services.airline_mapping_service import AirlineMappingService
 
@@ -28,16 +28,18 @@ class MultiAirlineFlightCardGenerator:
     Enhanced flight card generator with multi-airline support.
     """
     
-    def __init__(self, response: Dict[str, Any]):
+    def __init__(self, response: Dict[str, Any], index: Optional[NdcResponseIndex] = None):
         """
         Initialize the flight card generator.
         
         Args:
             response (Dict[str, Any]): The raw air shopping response
+            index (Optional[NdcResponseIndex]): Pre-built index of ``response``; built here if not provided
         """
         self.response = response
-        self.is_multi_airline = MultiAirlineDetector.is_multi_airline_response(response)
-        self.reference_extractor = EnhancedReferenceExtractor(response)
+        self.index = get_response_index(response, index)
+        self.is_multi_airline = self.index.is_multi_airline
+        self.reference_extractor = EnhancedReferenceExtractor(response, self.index)
         self.refs = self.reference_extractor.extract_references()
         
         logger.info(f"Initialized flight card generator for {'multi' if self.is_multi_airline else 'single'}-airline response")
@@ -125,16 +127,17 @@ class MultiAirlineFlightCardGenerator:
             logger.error(f"Error generating flight card for offer {offer.get('id')}: {e}", exc_info=True)
             return None
 
-def generate_enhanced_flight_cards(response: Dict[str, Any], offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def generate_enhanced_flight_cards(response: Dict[str, Any], offers: List[Dict[str, Any]], index: Optional[NdcResponseIndex] = None) -> List[Dict[str, Any]]:
     """
     Main function to generate enhanced flight cards with multi-airline support.
     
     Args:
         response (Dict[str, Any]): The raw air shopping response
         offers (List[Dict[str, Any]]): List of transformed offers
+        index (Optional[NdcResponseIndex]): Pre-built index of ``response``
         
     Returns:
         List[Dict[str, Any]]: List of enhanced flight cards
     """
-    generator = MultiAirlineFlightCardGenerator(response)
+    generator = MultiAirlineFlightCardGenerator(response, index)
     return generator.generate_flight_cards(offers)
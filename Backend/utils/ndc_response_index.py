@@ -0,0 +1,193 @@
+"""
+NDC Response Index Module
+
+This module provides a parsed, indexed view of an NDC air shopping response.
+The index is built in a single pass over the response and is shared by the
+multi-airline detector, the reference extractor, the enhanced transformer and
+the flight card generator, so one search is walked exactly once.
+
+Author: FLIGHT Application
+Created: 2025-07-02
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from .multi_airline_detector import MultiAirlineDetector
+
+logger = logging.getLogger(__name__)
+
+
+# index attribute -> (DataLists list name, item element name, key field)
+DATA_LIST_SPECS = {
+    'travelers': ('AnonymousTravelerList', 'AnonymousTraveler', 'ObjectKey'),
+    'segments': ('FlightSegmentList', 'FlightSegment', 'SegmentKey'),
+    'flights': ('FlightList', 'Flight', 'FlightKey'),
+    'origins': ('OriginDestinationList', 'OriginDestination', 'OriginDestinationKey'),
+    'carry_on_allowances': ('CarryOnAllowanceList', 'CarryOnAllowance', 'ListKey'),
+    'checked_bag_allowances': ('CheckedBagAllowanceList', 'CheckedBagAllowance', 'ListKey'),
+    'services': ('ServiceDefinitionList', 'ServiceDefinition', 'ServiceDefinitionID'),
+    'penalties': ('PenaltyList', 'Penalty', 'ObjectKey'),
+    'price_classes': ('PriceClassList', 'PriceClass', 'ObjectKey'),
+}
+
+# Number of travelers/segments inspected for airline-prefixed keys when
+# deciding whether a response is multi-airline (matches MultiAirlineDetector)
+PREFIX_DETECTION_SAMPLE = 3
+
+
+def _as_list(value: Any) -> List[Any]:
+    """Normalize an NDC element that may be a single object or a list."""
+    if isinstance(value, list):
+        return value
+    return [value] if value else []
+
+
+class NdcResponseIndex:
+    """
+    Indexed view of an air shopping response, built once per response.
+
+    Attributes:
+        response: The raw air shopping response
+        data_lists: The resolved DataLists section
+        is_multi_airline: Whether the response contains multiple airlines
+        airline_codes: Sorted airline codes present in the response
+        shopping_response_ids: ShoppingResponseID per airline (from Metadata)
+        single_shopping_response_id: Top-level ShoppingResponseID value, if any
+        travelers, segments, flights, origins, carry_on_allowances,
+        checked_bag_allowances, services, penalties, price_classes:
+            Dicts mapping each item's key to the item
+        by_airline: Airline-prefixed items grouped as {airline: {type: {key: item}}}
+    """
+
+    def __init__(self, response: Dict[str, Any]):
+        """
+        Build the index.
+
+        Args:
+            response (Dict[str, Any]): The air shopping response dictionary
+        """
+        self.response = response
+
+        # Handle both direct response and wrapped ({'data': ...}) structures
+        self.data_lists = response.get('DataLists', {})
+        if not self.data_lists and 'data' in response:
+            self.data_lists = response.get('data', {}).get('DataLists', {})
+
+        self.by_airline: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._prefixed_sample_found = False
+        prefixed_airlines: Set[str] = set()
+
+        for ref_type, (list_name, item_name, key_field) in DATA_LIST_SPECS.items():
+            items = _as_list(self.data_lists.get(list_name, {}).get(item_name, []))
+            lookup: Dict[str, Any] = {}
+
+            for position, item in enumerate(items):
+                key = item.get(key_field, '')
+                if not key:
+                    continue
+                lookup[key] = item
+
+                match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(key)
+                if not match:
+                    continue
+                airline_code = match.group(1)
+                self.by_airline.setdefault(airline_code, {}).setdefault(ref_type, {})[key] = item
+
+                if ref_type in ('travelers', 'segments'):
+                    prefixed_airlines.add(airline_code)
+                    if position < PREFIX_DETECTION_SAMPLE:
+                        self._prefixed_sample_found = True
+
+            setattr(self, ref_type, lookup)
+
+        self.warning_owners = self._extract_warning_owners()
+        self.shopping_response_ids = MultiAirlineDetector._extract_shopping_response_ids(response)
+        self.single_shopping_response_id = self._extract_single_shopping_response_id()
+
+        self.airline_codes = sorted(
+            self.warning_owners | prefixed_airlines | set(self.shopping_response_ids.keys())
+        )
+        self.is_multi_airline = (
+            self._prefixed_sample_found
+            or len(self.warning_owners) > 1
+            or len(self.shopping_response_ids) > 1
+        )
+
+        logger.info(
+            f"Indexed {'multi' if self.is_multi_airline else 'single'}-airline response: "
+            f"{len(self.segments)} segments, {len(self.flights)} flights, "
+            f"{len(self.travelers)} travelers, airlines {self.airline_codes}"
+        )
+
+    def _extract_warning_owners(self) -> Set[str]:
+        """Collect airline codes that own warnings in the response."""
+        warnings = self.response.get('Warnings', {}).get('Warning', [])
+        if not warnings and 'data' in self.response:
+            warnings = self.response.get('data', {}).get('Warnings', {}).get('Warning', [])
+
+        owners = set()
+        for warning in _as_list(warnings):
+            owner = warning.get('Owner')
+            if owner and MultiAirlineDetector.AIRLINE_CODE_PATTERN.match(owner):
+                owners.add(owner)
+        return owners
+
+    def _extract_single_shopping_response_id(self) -> str:
+        """Extract the top-level ShoppingResponseID value."""
+        try:
+            return self.response.get('ShoppingResponseID', {}).get('ResponseID', {}).get('value', '')
+        except Exception as e:
+            logger.error(f"Error extracting single ShoppingResponseID: {e}")
+            return ''
+
+    def get(self, ref_type: str, ref_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an item by reference key.
+
+        Args:
+            ref_type (str): Index name ('segments', 'flights', 'travelers', ...)
+            ref_key (str): The reference key
+
+        Returns:
+            Optional[Dict[str, Any]]: The referenced item or None
+        """
+        return getattr(self, ref_type, {}).get(ref_key)
+
+    def get_airline_items(self, airline_code: str, ref_type: str) -> Dict[str, Any]:
+        """Return the airline-prefixed items of one type for ``airline_code``."""
+        return self.by_airline.get(airline_code, {}).get(ref_type, {})
+
+    def get_shopping_response_id(self, airline_code: Optional[str] = None) -> str:
+        """
+        Get ShoppingResponseID for the specified airline or the general ID.
+
+        Args:
+            airline_code (Optional[str]): Airline code for multi-airline responses
+
+        Returns:
+            str: The ShoppingResponseID
+        """
+        if self.is_multi_airline:
+            if airline_code and airline_code in self.shopping_response_ids:
+                return self.shopping_response_ids[airline_code]
+            if self.shopping_response_ids:
+                return next(iter(self.shopping_response_ids.values()))
+            return ''
+        return self.single_shopping_response_id
+
+
+def get_response_index(response: Dict[str, Any], index: Optional[NdcResponseIndex] = None) -> NdcResponseIndex:
+    """
+    Return ``index`` if it was built for ``response``, otherwise build a new one.
+
+    Args:
+        response (Dict[str, Any]): The air shopping response dictionary
+        index (Optional[NdcResponseIndex]): A previously built index
+
+    Returns:
+        NdcResponseIndex: Index for ``response``
+    """
+    if index is not None and index.response is response:
+        return index
+    return NdcResponseIndex(response)
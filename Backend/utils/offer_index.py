@@ -0,0 +1,306 @@
+"""
+Offer Index Module
+
+This module provides a compact, JSON-serializable index of the offers in an NDC
+air shopping response. It is built once when the AirShopping response is cached
+and stored next to it, so FlightPrice requests can locate the selected offer,
+its airline and the airline's DataLists entries with direct lookups instead of
+re-scanning OffersGroup and every DataLists section on each price call.
+
+The index stores positions into the raw response rather than copies of its
+nodes; it is always used together with the cached raw response it was built
+from.
+
+Author: FLIGHT Application
+Created: 2025-07-02
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ndc_response_index import NdcResponseIndex, get_response_index
+
+logger = logging.getLogger(__name__)
+
+OFFER_INDEX_VERSION = 1
+
+# Suffix of the raw response store key holding the index of a cached response
+OFFER_INDEX_KEY_SUFFIX = '_offer_index'
+
+# DataLists sections filtered per airline for FlightPrice requests:
+# (list name, item element name, key field)
+AIRLINE_FILTERED_LISTS = (
+    ('AnonymousTravelerList', 'AnonymousTraveler', 'ObjectKey'),
+    ('CarryOnAllowanceList', 'CarryOnAllowance', 'ListKey'),
+    ('CheckedBagAllowanceList', 'CheckedBagAllowance', 'ListKey'),
+    ('FareList', 'FareGroup', 'ListKey'),
+    ('FlightSegmentList', 'FlightSegment', 'SegmentKey'),
+    ('FlightList', 'Flight', 'FlightKey'),
+    ('OriginDestinationList', 'OriginDestination', 'OriginDestinationKey'),
+)
+
+
+def offer_index_cache_key(raw_response_cache_key: str) -> str:
+    """Return the store key of the offer index for a cached raw response."""
+    return f"{raw_response_cache_key}{OFFER_INDEX_KEY_SUFFIX}"
+
+
+def _as_list(value: Any) -> List[Any]:
+    """Normalize an NDC element that may be a single object or a list."""
+    if isinstance(value, list):
+        return value
+    return [value] if value else []
+
+
+def _ref_values(refs: Any) -> List[str]:
+    """Collect string references from a ``refs`` element."""
+    values = []
+    for ref in _as_list(refs):
+        if isinstance(ref, str):
+            values.append(ref)
+        elif isinstance(ref, dict) and 'Ref' in ref:
+            values.append(str(ref['Ref']))
+    return values
+
+
+class OfferIndex:
+    """
+    Offer lookups for one AirShopping response.
+
+    Offers are addressed three ways, matching the existing callers:
+        raw index: position among all AirlineOffer entries (transformer's raw_response_index)
+        priced index: position among offers with a PricedOffer (multi-airline builder)
+        group/local: AirlineOffers[group].AirlineOffer[local] (single-airline builder)
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Load an index from its serialized form (see ``build`` and ``to_dict``).
+
+        Args:
+            data (Dict[str, Any]): Serialized index
+        """
+        self.data = data
+        self.is_multi_airline: bool = data.get('is_multi_airline', False)
+        self.offers: List[Dict[str, Any]] = data.get('offers', [])
+        self.groups: List[Dict[str, Any]] = data.get('groups', [])
+        self.airlines: Dict[str, Dict[str, Any]] = data.get('airlines', {})
+        self.shopping_response_ids: Dict[str, str] = data.get('shopping_response_ids', {})
+        self.display_to_raw: Optional[List[int]] = data.get('display_to_raw')
+
+        self.priced_offers = [entry for entry in self.offers if entry.get('priced')]
+
+        # Later offers win on duplicate IDs, like the dict mappings they replace
+        self._by_offer_id: Dict[str, Dict[str, Any]] = {}
+        self._by_lookup_id: Dict[str, Dict[str, Any]] = {}
+        for entry in self.offers:
+            if entry.get('offer_id'):
+                self._by_offer_id[entry['offer_id']] = entry
+            lookup_id = entry.get('offer_id') or entry.get('object_key')
+            if lookup_id:
+                self._by_lookup_id[lookup_id] = entry
+
+    @property
+    def total_offers(self) -> int:
+        """Number of AirlineOffer entries in the response."""
+        return len(self.offers)
+
+    @classmethod
+    def build(
+        cls,
+        response: Dict[str, Any],
+        response_index: Optional[NdcResponseIndex] = None,
+        transformed_offers: Optional[List[Dict[str, Any]]] = None
+    ) -> 'OfferIndex':
+        """
+        Build the index in one pass over OffersGroup and the filtered DataLists.
+
+        Args:
+            response (Dict[str, Any]): The raw air shopping response
+            response_index (Optional[NdcResponseIndex]): Pre-built index of ``response``
+            transformed_offers (Optional[List[Dict[str, Any]]]): Offers returned to the
+                frontend, used to map display indices to raw indices
+
+        Returns:
+            OfferIndex: The offer index
+        """
+        response_index = get_response_index(response, response_index)
+
+        offers = []
+        groups = []
+        airline_offers_list = _as_list(response.get('OffersGroup', {}).get('AirlineOffers', []))
+
+        for group_index, airline_offers_node in enumerate(airline_offers_list):
+            if not isinstance(airline_offers_node, dict):
+                groups.append({'owner': None, 'size': 0})
+                continue
+
+            owner = airline_offers_node.get('Owner', {})
+            group_offers = _as_list(airline_offers_node.get('AirlineOffer', []))
+            groups.append({
+                'owner': owner.get('value') if isinstance(owner, dict) else None,
+                'size': len(group_offers)
+            })
+
+            for local_index, offer in enumerate(group_offers):
+                entry = cls._index_offer(offer, group_index, local_index)
+                entry['raw'] = len(offers)
+                offers.append(entry)
+
+        display_to_raw = None
+        if transformed_offers is not None:
+            display_to_raw = [offer.get('original_index') for offer in transformed_offers]
+
+        data = {
+            'version': OFFER_INDEX_VERSION,
+            'is_multi_airline': response_index.is_multi_airline,
+            'shopping_response_ids': dict(response_index.shopping_response_ids),
+            'offers': offers,
+            'groups': groups,
+            'airlines': cls._index_airline_data_lists(response_index.data_lists),
+            'display_to_raw': display_to_raw,
+        }
+        logger.info(f"Built offer index: {len(offers)} offers, {len(data['airlines'])} airlines")
+        return cls(data)
+
+    @staticmethod
+    def _index_offer(offer: Any, group_index: int, local_index: int) -> Dict[str, Any]:
+        """Describe one AirlineOffer and the DataLists keys it references."""
+        if not isinstance(offer, dict):
+            return {'group': group_index, 'local': local_index, 'priced': False}
+
+        offer_id_node = offer.get('OfferID', {})
+        if isinstance(offer_id_node, dict):
+            offer_id = offer_id_node.get('value')
+            object_key = offer_id_node.get('ObjectKey')
+            owner = offer_id_node.get('Owner')
+        else:
+            offer_id, object_key, owner = offer_id_node, None, None
+
+        segment_keys: List[str] = []
+        traveler_keys: List[str] = []
+        fare_keys: List[str] = []
+        penalty_keys: List[str] = []
+
+        offer_prices = _as_list(offer.get('PricedOffer', {}).get('OfferPrice', []))
+        for offer_price in offer_prices:
+            for assoc in _as_list(offer_price.get('RequestedDate', {}).get('Associations', [])):
+                for traveler_ref in _as_list(assoc.get('AssociatedTraveler', {}).get('TravelerReferences', [])):
+                    if traveler_ref not in traveler_keys:
+                        traveler_keys.append(traveler_ref)
+                for seg_ref in _as_list(assoc.get('ApplicableFlight', {}).get('FlightSegmentReference', [])):
+                    seg_key = seg_ref.get('ref') if isinstance(seg_ref, dict) else None
+                    if seg_key and seg_key not in segment_keys:
+                        segment_keys.append(seg_key)
+
+            for component in _as_list(offer_price.get('FareDetail', {}).get('FareComponent', [])):
+                fare_keys.extend(ref for ref in _ref_values(component.get('refs', [])) if ref not in fare_keys)
+                penalty_refs = component.get('FareRules', {}).get('Penalty', {}).get('refs', [])
+                penalty_keys.extend(ref for ref in _ref_values(penalty_refs) if ref not in penalty_keys)
+
+        return {
+            'group': group_index,
+            'local': local_index,
+            'priced': bool(offer.get('PricedOffer')),
+            'offer_id': offer_id,
+            'object_key': object_key,
+            'owner': owner,
+            'segment_keys': segment_keys,
+            'traveler_keys': traveler_keys,
+            'fare_keys': fare_keys,
+            'penalty_keys': penalty_keys,
+        }
+
+    @staticmethod
+    def _index_airline_data_lists(data_lists: Dict[str, Any]) -> Dict[str, Dict[str, List[int]]]:
+        """Positions of airline-prefixed DataLists items, grouped as {airline: {list: [positions]}}."""
+        airlines: Dict[str, Dict[str, List[int]]] = {}
+        for list_name, item_name, key_field in AIRLINE_FILTERED_LISTS:
+            items = _as_list(data_lists.get(list_name, {}).get(item_name, []))
+            for position, item in enumerate(items):
+                if not isinstance(item, dict):
+                    continue
+                key = item.get(key_field, '')
+                if '-' not in key:
+                    continue
+                airline_code = key.split('-', 1)[0]
+                airlines.setdefault(airline_code, {}).setdefault(list_name, []).append(position)
+        return airlines
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialized form for the raw response store."""
+        return self.data
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['OfferIndex']:
+        """Load a stored index; returns None for missing or incompatible data."""
+        if not isinstance(data, dict) or data.get('version') != OFFER_INDEX_VERSION:
+            return None
+        return cls(data)
+
+    def get_offer_by_raw_index(self, response: Dict[str, Any], raw_index: int) -> Optional[Dict[str, Any]]:
+        """Return the AirlineOffer at ``raw_index`` (counting all offers)."""
+        if not 0 <= raw_index < len(self.offers):
+            return None
+        entry = self.offers[raw_index]
+        return self.resolve_offer(response, entry)[0]
+
+    def get_priced_offer(
+        self,
+        response: Dict[str, Any],
+        priced_index: int
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Return the priced offer at ``priced_index`` (counting offers with a PricedOffer).
+
+        Returns:
+            Tuple of (index entry, offer node, AirlineOffers node); all None if out of range
+        """
+        if not 0 <= priced_index < len(self.priced_offers):
+            return None, None, None
+        entry = self.priced_offers[priced_index]
+        offer, group_node = self.resolve_offer(response, entry)
+        return entry, offer, group_node
+
+    def find_by_offer_id(self, offer_id: str) -> Optional[Dict[str, Any]]:
+        """Return the index entry whose ``OfferID.value`` equals ``offer_id``."""
+        return self._by_offer_id.get(offer_id)
+
+    def find_raw_index(self, offer_id: str) -> Optional[int]:
+        """Return the raw index of the offer with OfferID value (or ObjectKey) ``offer_id``."""
+        entry = self._by_lookup_id.get(offer_id)
+        return entry['raw'] if entry is not None else None
+
+    def lookup_ids(self) -> List[str]:
+        """OfferID values (or ObjectKeys) of all offers, in raw order."""
+        return [entry.get('offer_id') or entry.get('object_key') for entry in self.offers
+                if entry.get('offer_id') or entry.get('object_key')]
+
+    def resolve_offer(self, response: Dict[str, Any], entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Fetch the offer node and its AirlineOffers node from the raw response."""
+        try:
+            group_node = _as_list(response.get('OffersGroup', {}).get('AirlineOffers', []))[entry['group']]
+            offer = _as_list(group_node.get('AirlineOffer', []))[entry['local']]
+            return offer, group_node
+        except (IndexError, KeyError, TypeError, AttributeError):
+            return None, None
+
+    def get_airline_data_lists(self, data_lists: Dict[str, Any], airline_code: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Return the DataLists items prefixed with ``airline_code``.
+
+        Args:
+            data_lists (Dict[str, Any]): DataLists of the response the index was built from
+            airline_code (str): The airline owner code
+
+        Returns:
+            Dict mapping list name to the airline's items, in response order
+        """
+        result = {}
+        for list_name, item_name, _ in AIRLINE_FILTERED_LISTS:
+            positions = self.airlines.get(airline_code, {}).get(list_name, [])
+            if not positions:
+                continue
+            items = _as_list(data_lists.get(list_name, {}).get(item_name, []))
+            result[list_name] = [items[position] for position in positions if position < len(items)]
+        return result
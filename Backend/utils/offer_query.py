@@ -0,0 +1,190 @@
+"""
+Offer Query Module
+
+Server-side filtering, sorting and paging of the enhanced flight cards returned
+by air shopping. An ``OfferTable`` (columnar filter/sort keys of every card) is
+built once when the search result is cached and stored next to the cards, so a
+filter or sort change is one cache read plus vectorized mask and sort
+operations instead of re-sending every card to the frontend.
+
+Supported parameters (query string, JSON body or a ``filters`` object):
+    minPrice, maxPrice, airlines (codes or names, comma separated or list),
+    maxStops (0, 1, 2+), departTimeMin, departTimeMax (HH:MM),
+    sortBy (price, duration, departure, arrival, stops), sortOrder (asc, desc),
+    page, pageSize
+
+Author: FLIGHT Application
+Created: 2025-07-03
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from .offer_table import OfferTable, SORT_COLUMNS, parse_price, parse_time_minutes
+
+logger = logging.getLogger(__name__)
+
+# Key of the cached offer table inside cached search data
+OFFER_KEYS_FIELD = 'offer_keys'
+
+SORT_FIELDS = tuple(SORT_COLUMNS)
+
+FILTER_PARAMS = ('minPrice', 'maxPrice', 'airlines', 'maxStops', 'departTimeMin', 'departTimeMax')
+QUERY_PARAMS = FILTER_PARAMS + ('sortBy', 'sortOrder', 'page', 'pageSize')
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+def build_offer_keys(offers: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the cacheable offer table for ``offers``.
+
+    Args:
+        offers: Enhanced flight cards in response order
+
+    Returns:
+        Serialized ``OfferTable`` (see ``OfferTable.to_dict``)
+    """
+    return OfferTable.build(offers).to_dict()
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    try:
+        return int(str(value).rstrip('+'))
+    except ValueError:
+        return None
+
+
+class OfferQuery:
+    """Parsed filter, sort and paging options for a list of flight cards."""
+
+    def __init__(self, params: Dict[str, Any]):
+        """
+        Parse query options.
+
+        Args:
+            params: Request parameters; values in a nested ``filters`` dict
+                take precedence over top-level ones
+        """
+        filters = params.get('filters') if isinstance(params.get('filters'), dict) else {}
+        merged = {**{key: params.get(key) for key in QUERY_PARAMS}, **{key: filters.get(key) for key in QUERY_PARAMS if key in filters}}
+
+        self.min_price = parse_price(merged.get('minPrice'))
+        self.max_price = parse_price(merged.get('maxPrice'))
+        self.airlines = {airline.lower() for airline in _as_list(merged.get('airlines'))}
+
+        # '2+' means two or more stops, i.e. no upper limit
+        max_stops = merged.get('maxStops')
+        self.max_stops = None if isinstance(max_stops, str) and max_stops.endswith('+') else _as_int(max_stops)
+
+        self.depart_time_min = parse_time_minutes(merged.get('departTimeMin'))
+        self.depart_time_max = parse_time_minutes(merged.get('departTimeMax'))
+
+        sort_by = (merged.get('sortBy') or '').lower()
+        self.sort_by = sort_by if sort_by in SORT_FIELDS else None
+        self.descending = (merged.get('sortOrder') or 'asc').lower() == 'desc'
+
+        self.page = _as_int(merged.get('page'))
+        page_size = _as_int(merged.get('pageSize'))
+        self.paged = self.page is not None or page_size is not None
+        self.page = max(self.page or 1, 1)
+        self.page_size = min(max(page_size or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+
+        self.active = any(merged.get(key) not in (None, '', []) for key in QUERY_PARAMS)
+
+    def apply(self, offers: List[Dict[str, Any]], offer_keys: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Filter, sort and page ``offers``.
+
+        Args:
+            offers: Enhanced flight cards
+            offer_keys: Cached table from ``build_offer_keys`` (rebuilt if missing or stale)
+
+        Returns:
+            Dict with the selected 'offers' and a 'query' summary
+            (total_offers, total_matching, page, page_size, total_pages, facets)
+        """
+        table = OfferTable.from_dict(offer_keys, expected_count=len(offers))
+        if table is None:
+            table = OfferTable.build(offers)
+
+        positions = table.select(
+            min_price=self.min_price,
+            max_price=self.max_price,
+            airlines=self.airlines,
+            max_stops=self.max_stops,
+            depart_time_min=self.depart_time_min,
+            depart_time_max=self.depart_time_max,
+            sort_by=self.sort_by,
+            descending=self.descending
+        )
+
+        total_matching = len(positions)
+        if self.paged:
+            start = (self.page - 1) * self.page_size
+            positions = positions[start:start + self.page_size]
+            total_pages = (total_matching + self.page_size - 1) // self.page_size
+        else:
+            total_pages = 1
+
+        return {
+            'offers': [offers[i] for i in positions],
+            'query': {
+                'total_offers': len(offers),
+                'total_matching': total_matching,
+                'page': self.page if self.paged else 1,
+                'page_size': self.page_size if self.paged else total_matching,
+                'total_pages': total_pages,
+                'sort_by': self.sort_by,
+                'sort_order': 'desc' if self.descending else 'asc',
+                'facets': _facets(offers, table),
+            }
+        }
+
+
+def _facets(offers: Sequence[Dict[str, Any]], table: OfferTable) -> Dict[str, Any]:
+    """Summarize the unfiltered offers so the frontend can build filter controls."""
+    facets = table.facets()
+    for airline in facets['airlines']:
+        cheapest_row = airline.pop('cheapest_row')
+        airline['cheapest_offer_id'] = offers[cheapest_row].get('id') if cheapest_row is not None else None
+    return facets
+
+
+def apply_offer_query(search_data: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy of cached search data narrowed to the requested offers.
+
+    The cached offer table is never included in the result. Without any query
+    parameters the full offer list is returned unchanged.
+
+    Args:
+        search_data: Cached air shopping data ('offers', 'metadata', 'offer_keys')
+        params: Request parameters (see ``OfferQuery``)
+
+    Returns:
+        Search data with 'offers' replaced by the selected page and a
+        'query' summary in the metadata when a query was applied
+    """
+    data = {key: value for key, value in search_data.items() if key != OFFER_KEYS_FIELD}
+    query = OfferQuery(params)
+    if not query.active or not isinstance(data.get('offers'), list):
+        return data
+
+    result = query.apply(data['offers'], search_data.get(OFFER_KEYS_FIELD))
+    data['offers'] = result['offers']
+    data['metadata'] = {**(data.get('metadata') or {}), 'query': result['query']}
+    logger.info(f"Offer query matched {result['query']['total_matching']} of "
+                f"{result['query']['total_offers']} offers")
+    return data
@@ -0,0 +1,437 @@
+"""
+Offer Table Module
+
+Compact columnar view of the enhanced flight cards of one search. Each card
+becomes one row of fixed-width columns (price, duration minutes, stops,
+departure/arrival epoch, departure minute of day, airline code index and the
+card's offer index), so filtering, sorting and faceting are mask and sort
+operations over arrays instead of walking nested card dicts.
+
+The columns are NumPy arrays when NumPy is installed and plain lists
+otherwise; both produce the same results. ``to_dict`` packs every column into
+little-endian bytes (base64) so the table can be cached with the search.
+
+Author: FLIGHT Application
+Created: 2025-07-03
+"""
+
+import base64
+import calendar
+import logging
+import math
+import re
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+OFFER_TABLE_VERSION = 2
+
+# Column name -> (NumPy dtype, array typecode, missing value)
+COLUMN_TYPES = {
+    'price': ('<f8', 'd', math.nan),
+    'duration': ('<i4', 'i', -1),
+    'stops': ('<i2', 'h', -1),
+    'departure_epoch': ('<i8', 'q', -1),
+    'arrival_epoch': ('<i8', 'q', -1),
+    'departure_minute': ('<i2', 'h', -1),
+    'airline': ('<i2', 'h', -1),
+    'offer_index': ('<i4', 'i', -1),
+}
+
+# sortBy value -> column
+SORT_COLUMNS = {
+    'price': 'price',
+    'duration': 'duration',
+    'departure': 'departure_epoch',
+    'arrival': 'arrival_epoch',
+    'stops': 'stops',
+}
+
+# Departure time buckets (start minute, name)
+DEPARTURE_BUCKETS = ((0, 'night'), (360, 'morning'), (720, 'afternoon'), (1080, 'evening'))
+
+_DURATION_PATTERN = re.compile(r'(?:(\d+)\s*d)?\s*(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?', re.IGNORECASE)
+
+
+def parse_duration_minutes(value: Any) -> Optional[int]:
+    """Parse durations such as '9h 45m', '1d 2h' or ISO 'PT9H45M' into minutes."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().upper().lstrip('P').replace('T', '')
+    match = _DURATION_PATTERN.fullmatch(text)
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes = (int(part) if part else 0 for part in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def parse_time_minutes(value: Any) -> Optional[int]:
+    """Parse 'HH:MM' (or an ISO datetime) into minutes after midnight."""
+    if not isinstance(value, str) or not value:
+        return None
+    if 'T' in value:
+        value = value.split('T', 1)[1]
+    try:
+        hours, minutes = value.split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """Return ``value`` as a float, or None if it is not a number."""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(price) else price
+
+
+def parse_epoch(value: Any) -> Optional[int]:
+    """
+    Convert an ISO datetime into epoch seconds.
+
+    Card times are local airport times without an offset; they are read as UTC
+    so that ordering matches the ISO strings.
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return calendar.timegm(parsed.utctimetuple())
+
+
+def _missing(column: str, value: Any) -> bool:
+    if column == 'price':
+        return value is None or value != value
+    return value is None or value < 0
+
+
+def _pack(column: str, values: Any) -> str:
+    if np is not None:
+        data = np.asarray(values, dtype=COLUMN_TYPES[column][0]).tobytes()
+    else:
+        packed = array(COLUMN_TYPES[column][1], values)
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        data = packed.tobytes()
+    return base64.b64encode(data).decode('ascii')
+
+
+def _unpack(column: str, encoded: str) -> Any:
+    data = base64.b64decode(encoded)
+    if np is not None:
+        return np.frombuffer(data, dtype=COLUMN_TYPES[column][0])
+    unpacked = array(COLUMN_TYPES[column][1])
+    unpacked.frombytes(data)
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+class OfferTable:
+    """Columnar filter/sort/facet keys for a list of flight cards."""
+
+    def __init__(self, columns: Dict[str, Any], airlines: List[str], airline_names: List[str]):
+        """
+        Create a table from prepared columns.
+
+        Args:
+            columns: Column name -> NumPy array (or list without NumPy)
+            airlines: Airline codes referenced by the 'airline' column
+            airline_names: Display names aligned with ``airlines``
+        """
+        self.columns = columns
+        self.airlines = airlines
+        self.airline_names = airline_names
+
+    def __len__(self) -> int:
+        return len(self.columns['price'])
+
+    @classmethod
+    def build(cls, offers: Sequence[Dict[str, Any]]) -> 'OfferTable':
+        """
+        Build the table for ``offers`` (one row per card, in card order).
+
+        Args:
+            offers: Enhanced flight cards
+
+        Returns:
+            OfferTable
+        """
+        values: Dict[str, List[Any]] = {column: [] for column in COLUMN_TYPES}
+        airlines: List[str] = []
+        airline_names: List[str] = []
+        airline_ids: Dict[str, int] = {}
+
+        for offer in offers:
+            departure = offer.get('departure') if isinstance(offer.get('departure'), dict) else {}
+            arrival = offer.get('arrival') if isinstance(offer.get('arrival'), dict) else {}
+            airline = offer.get('airline') if isinstance(offer.get('airline'), dict) else {}
+
+            code = (airline.get('code') or '').upper()
+            if code and code not in airline_ids:
+                airline_ids[code] = len(airlines)
+                airlines.append(code)
+                airline_names.append(airline.get('name') or code)
+
+            stops = offer.get('stops')
+            offer_index = offer.get('offer_index')
+            row = {
+                'price': parse_price(offer.get('price')),
+                'duration': parse_duration_minutes(offer.get('duration')),
+                'stops': stops if isinstance(stops, int) else None,
+                'departure_epoch': parse_epoch(departure.get('datetime')),
+                'arrival_epoch': parse_epoch(arrival.get('datetime')),
+                'departure_minute': parse_time_minutes(departure.get('time') or departure.get('datetime')),
+                'airline': airline_ids.get(code),
+                'offer_index': offer_index if isinstance(offer_index, int) else None,
+            }
+            for column, value in row.items():
+                values[column].append(COLUMN_TYPES[column][2] if value is None else value)
+
+        if np is not None:
+            columns = {column: np.asarray(column_values, dtype=COLUMN_TYPES[column][0])
+                       for column, column_values in values.items()}
+        else:
+            columns = values
+        return cls(columns, airlines, airline_names)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable form for caching."""
+        return {
+            'version': OFFER_TABLE_VERSION,
+            'count': len(self),
+            'airlines': self.airlines,
+            'airline_names': self.airline_names,
+            'columns': {column: _pack(column, self.columns[column]) for column in COLUMN_TYPES},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Any, expected_count: Optional[int] = None) -> Optional['OfferTable']:
+        """
+        Restore a table produced by ``to_dict``.
+
+        Returns:
+            The table, or None if ``data`` is missing, from another version
+            or does not have ``expected_count`` rows
+        """
+        if not isinstance(data, dict) or data.get('version') != OFFER_TABLE_VERSION:
+            return None
+        if expected_count is not None and data.get('count') != expected_count:
+            return None
+        try:
+            columns = {column: _unpack(column, data['columns'][column]) for column in COLUMN_TYPES}
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable offer table: {e}")
+            return None
+        return cls(columns, list(data.get('airlines') or []), list(data.get('airline_names') or []))
+
+    def airline_ids(self, airlines: Iterable[str]) -> List[int]:
+        """Return the airline column values matching the given codes or names (case-insensitive)."""
+        wanted = {airline.lower() for airline in airlines}
+        return [i for i, (code, name) in enumerate(zip(self.airlines, self.airline_names))
+                if code.lower() in wanted or name.lower() in wanted]
+
+    def select(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        airlines: Optional[Iterable[str]] = None,
+        max_stops: Optional[int] = None,
+        depart_time_min: Optional[int] = None,
+        depart_time_max: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = False
+    ) -> List[int]:
+        """
+        Return the rows matching the filters, in the requested order.
+
+        Rows without a value for the sort column go last in either direction;
+        ties are ordered by price, then by row.
+        """
+        airline_ids = self.airline_ids(airlines) if airlines else None
+        sort_column = SORT_COLUMNS.get(sort_by) if sort_by else None
+        if np is not None:
+            return self._select_numpy(min_price, max_price, airline_ids, max_stops,
+                                      depart_time_min, depart_time_max, sort_column, descending)
+        return self._select_python(min_price, max_price, airline_ids, max_stops,
+                                   depart_time_min, depart_time_max, sort_column, descending)
+
+    def _select_numpy(self, min_price, max_price, airline_ids, max_stops,
+                      depart_time_min, depart_time_max, sort_column, descending) -> List[int]:
+        columns = self.columns
+        price = columns['price']
+        mask = np.ones(len(self), dtype=bool)
+        if min_price is not None:
+            mask &= price >= min_price
+        if max_price is not None:
+            mask &= price <= max_price
+        if airline_ids is not None:
+            mask &= np.isin(columns['airline'], airline_ids)
+        if max_stops is not None:
+            mask &= (columns['stops'] >= 0) & (columns['stops'] <= max_stops)
+        if depart_time_min is not None or depart_time_max is not None:
+            minute = columns['departure_minute']
+            mask &= minute >= 0
+            if depart_time_min is not None:
+                mask &= minute >= depart_time_min
+            if depart_time_max is not None:
+                mask &= minute <= depart_time_max
+
+        rows = np.flatnonzero(mask)
+        if sort_column is None or not len(rows):
+            return rows.tolist()
+
+        values = columns[sort_column][rows].astype(np.float64)
+        missing = np.isnan(values) if sort_column == 'price' else values < 0
+        key = np.where(missing, 0.0, -values if descending else values)
+        tie_price = np.nan_to_num(price[rows], nan=np.inf)
+        # lexsort: last key is the primary one
+        order = np.lexsort((rows, tie_price, key, missing))
+        return rows[order].tolist()
+
+    def _select_python(self, min_price, max_price, airline_ids, max_stops,
+                       depart_time_min, depart_time_max, sort_column, descending) -> List[int]:
+        columns = self.columns
+        price, airline, stops, minute = columns['price'], columns['airline'], columns['stops'], columns['departure_minute']
+        allowed = set(airline_ids) if airline_ids is not None else None
+
+        rows = []
+        for i in range(len(self)):
+            if min_price is not None and not price[i] >= min_price:
+                continue
+            if max_price is not None and not price[i] <= max_price:
+                continue
+            if allowed is not None and airline[i] not in allowed:
+                continue
+            if max_stops is not None and not 0 <= stops[i] <= max_stops:
+                continue
+            if depart_time_min is not None or depart_time_max is not None:
+                if minute[i] < 0:
+                    continue
+                if depart_time_min is not None and minute[i] < depart_time_min:
+                    continue
+                if depart_time_max is not None and minute[i] > depart_time_max:
+                    continue
+            rows.append(i)
+
+        if sort_column is None:
+            return rows
+        values = columns[sort_column]
+        known = [i for i in rows if not _missing(sort_column, values[i])]
+        unknown = [i for i in rows if _missing(sort_column, values[i])]
+        known.sort(key=lambda i: (math.isnan(price[i]), 0 if math.isnan(price[i]) else price[i], i))
+        known.sort(key=lambda i: values[i], reverse=descending)
+        return known + unknown
+
+    def facets(self) -> Dict[str, Any]:
+        """
+        Summarize all rows for filter controls.
+
+        Returns:
+            Dict with per-airline count, cheapest price and cheapest row,
+            stop counts, price range and departure time bucket counts
+        """
+        if np is not None:
+            return self._facets_numpy()
+        return self._facets_python()
+
+    def _facets_numpy(self) -> Dict[str, Any]:
+        columns = self.columns
+        price, airline, stops, minute = columns['price'], columns['airline'], columns['stops'], columns['departure_minute']
+        n_airlines = len(self.airlines)
+
+        has_airline = airline >= 0
+        counts = np.bincount(airline[has_airline], minlength=n_airlines) if n_airlines else np.zeros(0, dtype=np.int64)
+
+        # Cheapest row per airline: order by (airline, price, row) and take each airline's first row
+        priced = np.flatnonzero(has_airline & ~np.isnan(price))
+        cheapest_rows: Dict[int, int] = {}
+        if len(priced):
+            order = priced[np.lexsort((priced, price[priced], airline[priced]))]
+            ordered_airlines = airline[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = ordered_airlines[1:] != ordered_airlines[:-1]
+            cheapest_rows = dict(zip(ordered_airlines[first].tolist(), order[first].tolist()))
+
+        has_stops = stops >= 0
+        stop_values, stop_counts = np.unique(stops[has_stops], return_counts=True)
+
+        bucket_starts = np.array([start for start, _ in DEPARTURE_BUCKETS])
+        timed = minute[minute >= 0]
+        bucket_counts = np.bincount(np.searchsorted(bucket_starts, timed, side='right') - 1,
+                                    minlength=len(DEPARTURE_BUCKETS))
+
+        valid_prices = price[~np.isnan(price)]
+        price_range = [float(valid_prices.min()), float(valid_prices.max())] if len(valid_prices) else None
+
+        return self._facet_dict(
+            counts.tolist(), cheapest_rows,
+            {str(value): int(count) for value, count in zip(stop_values.tolist(), stop_counts.tolist())},
+            price_range, bucket_counts.tolist()
+        )
+
+    def _facets_python(self) -> Dict[str, Any]:
+        columns = self.columns
+        price, airline, stops, minute = columns['price'], columns['airline'], columns['stops'], columns['departure_minute']
+        counts = [0] * len(self.airlines)
+        cheapest_rows: Dict[int, int] = {}
+        stop_counts: Dict[int, int] = {}
+        bucket_counts = [0] * len(DEPARTURE_BUCKETS)
+        prices = []
+
+        for i in range(len(self)):
+            if not math.isnan(price[i]):
+                prices.append(price[i])
+            if airline[i] >= 0:
+                counts[airline[i]] += 1
+                if not math.isnan(price[i]):
+                    best = cheapest_rows.get(airline[i])
+                    if best is None or price[i] < price[best]:
+                        cheapest_rows[airline[i]] = i
+            if stops[i] >= 0:
+                stop_counts[stops[i]] = stop_counts.get(stops[i], 0) + 1
+            if minute[i] >= 0:
+                bucket = max(b for b, (start, _) in enumerate(DEPARTURE_BUCKETS) if minute[i] >= start)
+                bucket_counts[bucket] += 1
+
+        return self._facet_dict(
+            counts, cheapest_rows,
+            {str(value): stop_counts[value] for value in sorted(stop_counts)},
+            [min(prices), max(prices)] if prices else None,
+            bucket_counts
+        )
+
+    def _facet_dict(self, counts, cheapest_rows, stops, price_range, bucket_counts) -> Dict[str, Any]:
+        price = self.columns['price']
+        airlines = []
+        for airline_id, code in enumerate(self.airlines):
+            cheapest_row = cheapest_rows.get(airline_id)
+            airlines.append({
+                'code': code,
+                'name': self.airline_names[airline_id],
+                'count': int(counts[airline_id]),
+                'min_price': float(price[cheapest_row]) if cheapest_row is not None else None,
+                'cheapest_row': cheapest_row,
+            })
+        airlines.sort(key=lambda entry: entry['code'])
+
+        return {
+            'airlines': airlines,
+            'stops': stops,
+            'price_range': price_range,
+            'departure_times': {name: int(count) for (_, name), count in zip(DEPARTURE_BUCKETS, bucket_counts)},
+        }
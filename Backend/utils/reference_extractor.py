@@ -12,10 +12,21 @@ Created: 2025-07-02
 import logging
 from typing import Any, Dict, List, Optional
 
-from .multi_airline_detector import MultiAirlineDetector
+from .ndc_response_index import NdcResponseIndex, get_response_index
 
 logger = logging.getLogger(__name__)
 
+# Reference type in the extracted structure -> NdcResponseIndex lookup name
+REFERENCE_TYPES = {
+    'segments': 'segments',
+    'passengers': 'travelers',
+    'flights': 'flights',
+    'origins': 'origins',
+    'carry_on_allowances': 'carry_on_allowances',
+    'checked_bag_allowances': 'checked_bag_allowances',
+    'services': 'services',
+}
+
 
 class EnhancedReferenceExtractor:
     """
@@ -23,15 +34,18 @@ class EnhancedReferenceExtractor:
     multi-airline responses with airline-aware reference resolution.
     """
     
-    def __init__(self, response: Dict[str, Any]):
+    def __init__(self, response: Dict[str, Any], index: Optional[NdcResponseIndex] = None):
         """
         Initialize the reference extractor.
         
         Args:
             response (Dict[str, Any]): The air shopping response dictionary
+            index (Optional[NdcResponseIndex]): Pre-built index of ``response``;
+                built here if not provided
         """
         self.response = response
-        self.is_multi_airline = MultiAirlineDetector.is_multi_airline_response(response)
+        self.index = get_response_index(response, index)
+        self.is_multi_airline = self.index.is_multi_airline
         self._references_cache: Optional[Dict[str, Any]] = None
         
         logger.info(f"Initialized reference extractor for {'multi' if self.is_multi_airline else 'single'}-airline response")
@@ -73,51 +87,17 @@ class EnhancedReferenceExtractor:
             'type': 'multi_airline',
             'by_airline': {},
             'global': {},
-            'airline_codes': [],
-            'shopping_response_ids': {}
+            'airline_codes': list(self.index.airline_codes),
+            'shopping_response_ids': dict(self.index.shopping_response_ids)
         }
         
-        # Get airline codes
-        refs['airline_codes'] = MultiAirlineDetector.extract_airline_codes(self.response)
-        
-        # Get shopping response IDs
-        refs['shopping_response_ids'] = MultiAirlineDetector._extract_shopping_response_ids(self.response)
-        
-        # Extract references by type - handle both direct and nested structures
-        data_lists = self.response.get('DataLists', {})
-        if not data_lists and 'data' in self.response:
-            data_lists = self.response.get('data', {}).get('DataLists', {})
-        
-        # Process each airline
+        # Group the indexed, airline-prefixed references per airline
         for airline_code in refs['airline_codes']:
             refs['by_airline'][airline_code] = {
-                'segments': {},
-                'passengers': {},
-                'flights': {},
-                'origins': {},
-                'carry_on_allowances': {},
-                'checked_bag_allowances': {},
-                'services': {}
+                ref_type: self.index.get_airline_items(airline_code, index_name)
+                for ref_type, index_name in REFERENCE_TYPES.items()
             }
         
-        # Extract segments
-        self._extract_segments_multi_airline(data_lists, refs)
-        
-        # Extract passengers
-        self._extract_passengers_multi_airline(data_lists, refs)
-        
-        # Extract flights
-        self._extract_flights_multi_airline(data_lists, refs)
-        
-        # Extract origins/destinations
-        self._extract_origins_multi_airline(data_lists, refs)
-        
-        # Extract baggage
-        self._extract_baggage_multi_airline(data_lists, refs)
-        
-        # Extract services
-        self._extract_services_multi_airline(data_lists, refs)
-        
         # Create global lookup for all references
         refs['global'] = self._create_global_lookup(refs['by_airline'])
         
@@ -133,231 +113,14 @@ class EnhancedReferenceExtractor:
         """
         logger.info("Extracting single-airline references")
         
-        # Initialize structure
-        refs = {
-            'type': 'single_airline',
-            'segments': {},
-            'passengers': {},
-            'flights': {},
-            'origins': {},
-            'carry_on_allowances': {},
-            'checked_bag_allowances': {},
-            'services': {},
-            'shopping_response_id': ''
-        }
-        
-        # Extract shopping response ID
-        refs['shopping_response_id'] = self._extract_single_shopping_response_id()
-        
-        # Extract references by type
-        data_lists = self.response.get('DataLists', {})
-        
-        # Extract segments
-        self._extract_segments_single_airline(data_lists, refs)
-        
-        # Extract passengers
-        self._extract_passengers_single_airline(data_lists, refs)
-        
-        # Extract flights
-        self._extract_flights_single_airline(data_lists, refs)
-        
-        # Extract origins/destinations
-        self._extract_origins_single_airline(data_lists, refs)
-        
-        # Extract baggage
-        self._extract_baggage_single_airline(data_lists, refs)
-        
-        # Extract services
-        self._extract_services_single_airline(data_lists, refs)
+        # The index already holds key -> item lookups for every DataLists type
+        refs = {'type': 'single_airline'}
+        for ref_type, index_name in REFERENCE_TYPES.items():
+            refs[ref_type] = getattr(self.index, index_name)
+        refs['shopping_response_id'] = self.index.single_shopping_response_id
         
         logger.info("Extracted single-airline references")
         return refs
-    
-    def _extract_segments_multi_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract flight segments for multi-airline response."""
-        segments = data_lists.get('FlightSegmentList', {}).get('FlightSegment', [])
-        
-        for segment in segments:
-            segment_key = segment.get('SegmentKey', '')
-            
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(segment_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    refs['by_airline'][airline_code]['segments'][segment_key] = segment
-            else:
-                # Non-prefixed segment, add to global
-                refs['global'].setdefault('segments', {})[segment_key] = segment
-    
-    def _extract_passengers_multi_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract passengers for multi-airline response."""
-        passengers = data_lists.get('AnonymousTravelerList', {}).get('AnonymousTraveler', [])
-        
-        for passenger in passengers:
-            object_key = passenger.get('ObjectKey', '')
-            
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(object_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    refs['by_airline'][airline_code]['passengers'][object_key] = passenger
-            else:
-                # Non-prefixed passenger, add to global
-                refs['global'].setdefault('passengers', {})[object_key] = passenger
-    
-    def _extract_flights_multi_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract flights for multi-airline response."""
-        flights = data_lists.get('FlightList', {}).get('Flight', [])
-        
-        for flight in flights:
-            flight_key = flight.get('FlightKey', '')
-            
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(flight_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    refs['by_airline'][airline_code]['flights'][flight_key] = flight
-            else:
-                # Non-prefixed flight, add to global
-                refs['global'].setdefault('flights', {})[flight_key] = flight
-    
-    def _extract_origins_multi_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract origin/destinations for multi-airline response."""
-        origins = data_lists.get('OriginDestinationList', {}).get('OriginDestination', [])
-        
-        for origin in origins:
-            origin_key = origin.get('OriginDestinationKey', '')
-            
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(origin_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    refs['by_airline'][airline_code]['origins'][origin_key] = origin
-            else:
-                # Non-prefixed origin, add to global
-                refs['global'].setdefault('origins', {})[origin_key] = origin
-    
-    def _extract_baggage_multi_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract baggage information for multi-airline response."""
-        # Extract carry-on allowances
-        carry_on_list = data_lists.get('CarryOnAllowanceList', {}).get('CarryOnAllowance', [])
-
-        for carry_on in carry_on_list:
-            carry_on_key = carry_on.get('ListKey', '')
-
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(carry_on_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    if 'carry_on_allowances' not in refs['by_airline'][airline_code]:
-                        refs['by_airline'][airline_code]['carry_on_allowances'] = {}
-                    refs['by_airline'][airline_code]['carry_on_allowances'][carry_on_key] = carry_on
-            else:
-                # Non-prefixed carry-on, add to global
-                refs['global'].setdefault('carry_on_allowances', {})[carry_on_key] = carry_on
-
-        # Extract checked bag allowances
-        checked_bag_list = data_lists.get('CheckedBagAllowanceList', {}).get('CheckedBagAllowance', [])
-
-        for checked_bag in checked_bag_list:
-            checked_bag_key = checked_bag.get('ListKey', '')
-
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(checked_bag_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    if 'checked_bag_allowances' not in refs['by_airline'][airline_code]:
-                        refs['by_airline'][airline_code]['checked_bag_allowances'] = {}
-                    refs['by_airline'][airline_code]['checked_bag_allowances'][checked_bag_key] = checked_bag
-            else:
-                # Non-prefixed checked bag, add to global
-                refs['global'].setdefault('checked_bag_allowances', {})[checked_bag_key] = checked_bag
-    
-    def _extract_services_multi_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract service information for multi-airline response."""
-        services = data_lists.get('ServiceDefinitionList', {}).get('ServiceDefinition', [])
-        
-        for service in services:
-            service_key = service.get('ServiceDefinitionID', '')
-            
-            # Check if it's airline-prefixed
-            match = MultiAirlineDetector.PREFIXED_REFERENCE_PATTERN.match(service_key)
-            if match:
-                airline_code = match.group(1)
-                if airline_code in refs['by_airline']:
-                    refs['by_airline'][airline_code]['services'][service_key] = service
-            else:
-                # Non-prefixed service, add to global
-                refs['global'].setdefault('services', {})[service_key] = service
-
-    def _extract_segments_single_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract flight segments for single-airline response."""
-        segments = data_lists.get('FlightSegmentList', {}).get('FlightSegment', [])
-
-        for segment in segments:
-            segment_key = segment.get('SegmentKey', '')
-            if segment_key:
-                refs['segments'][segment_key] = segment
-
-    def _extract_passengers_single_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract passengers for single-airline response."""
-        passengers = data_lists.get('AnonymousTravelerList', {}).get('AnonymousTraveler', [])
-
-        for passenger in passengers:
-            object_key = passenger.get('ObjectKey', '')
-            if object_key:
-                refs['passengers'][object_key] = passenger
-
-    def _extract_flights_single_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract flights for single-airline response."""
-        flights = data_lists.get('FlightList', {}).get('Flight', [])
-
-        for flight in flights:
-            flight_key = flight.get('FlightKey', '')
-            if flight_key:
-                refs['flights'][flight_key] = flight
-
-    def _extract_origins_single_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract origin/destinations for single-airline response."""
-        origins = data_lists.get('OriginDestinationList', {}).get('OriginDestination', [])
-
-        for origin in origins:
-            origin_key = origin.get('OriginDestinationKey', '')
-            if origin_key:
-                refs['origins'][origin_key] = origin
-
-    def _extract_baggage_single_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract baggage information for single-airline response."""
-        # Extract carry-on allowances using correct ListKey
-        carry_on_list = data_lists.get('CarryOnAllowanceList', {}).get('CarryOnAllowance', [])
-        refs['carry_on_allowances'] = {
-            allowance.get('ListKey'): allowance
-            for allowance in carry_on_list
-            if allowance.get('ListKey')
-        }
-
-        # Extract checked bag allowances using correct ListKey
-        checked_bag_list = data_lists.get('CheckedBagAllowanceList', {}).get('CheckedBagAllowance', [])
-        refs['checked_bag_allowances'] = {
-            allowance.get('ListKey'): allowance
-            for allowance in checked_bag_list
-            if allowance.get('ListKey')
-        }
-
-    def _extract_services_single_airline(self, data_lists: Dict, refs: Dict) -> None:
-        """Extract service information for single-airline response."""
-        services = data_lists.get('ServiceDefinitionList', {}).get('ServiceDefinition', [])
-
-        for service in services:
-            service_key = service.get('ServiceDefinitionID', '')
-            if service_key:
-                refs['services'][service_key] = service
 
     def _create_global_lookup(self, by_airline: Dict) -> Dict:
         """Create a global lookup table from airline-specific references."""
@@ -378,14 +141,6 @@ class EnhancedReferenceExtractor:
 
         return global_refs
 
-    def _extract_single_shopping_response_id(self) -> str:
-        """Extract ShoppingResponseID for single-airline response."""
-        try:
-            return self.response.get('ShoppingResponseID', {}).get('ResponseID', {}).get('value', '')
-        except Exception as e:
-            logger.error(f"Error extracting single ShoppingResponseID: {e}")
-            return ''
-
     def _get_empty_references_structure(self) -> Dict[str, Any]:
         """Return empty reference structure for error cases."""
         if self.is_multi_airline: